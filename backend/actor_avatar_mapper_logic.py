@@ -6,7 +6,6 @@ import threading
 import time
 import re
 import base64
-import subprocess
 from typing import List, Dict, Any, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from filelock import FileLock, Timeout
@@ -17,6 +16,8 @@ from models import AppConfig, ScheduledTasksTargetScope
 from task_manager import TaskManager
 from media_selector import MediaSelector
 from proxy_manager import ProxyManager
+from emby_client import emby_client
+from github_client import github_client
 
 ACTOR_AVATAR_MAP_FILE = os.path.join('/app/data', 'actor_avatar_map.json')
 ACTOR_AVATAR_MAP_LOCK_FILE = ACTOR_AVATAR_MAP_FILE + ".lock"
@@ -28,22 +29,7 @@ class ActorAvatarMapperLogic:
         self.server_config = config.server_config
         self.github_config = config.episode_refresher_config.github_config
         self.proxy_manager = ProxyManager(config)
-        self.session = self._create_session()
-
-    def _create_session(self):
-        import requests
-        from requests.adapters import HTTPAdapter
-        from urllib3.util.retry import Retry
-        
-        session = requests.Session()
-        retry_strategy = Retry(
-            total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504]
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("https://", adapter)
-        session.mount("http://", adapter)
-        return session
-
+        self.session = emby_client
 
     def save_avatar_choice_to_map(self, tmdb_person_id: int, image_info: Dict[str, Any]):
         """
@@ -99,69 +85,13 @@ class ActorAvatarMapperLogic:
             "Authorization": f"token {self.github_config.personal_access_token}"
         }
         proxies = self.proxy_manager.get_proxies(url)
-        response = self.session.request(method, url, headers=headers, timeout=30, proxies=proxies, **kwargs)
+        response = github_client.request(method, url, headers=headers, timeout=30, proxies=proxies, **kwargs)
         response.raise_for_status()
         return response.json() if response.content else None
     
-    def _execute_github_write_request(self, method: str, url: str, pat: str, payload: Optional[Dict] = None) -> Dict:
-        """通过 curl 执行 GitHub 写入操作（无重试）"""
-        command = [
-            'curl', '-L', '-X', method,
-            '-H', 'Accept: application/vnd.github.v3+json',
-            '-H', f'Authorization: token {pat}',
-            '-H', 'Content-Type: application/json'
-        ]
-        
-        json_payload_str = ""
-        if payload:
-            command.extend(['--data-binary', '@-'])
-            json_payload_str = json.dumps(payload)
-
-        proxies = self.proxy_manager.get_proxies(url)
-        if proxies.get('https'):
-            command.extend(['--proxy', proxies['https']])
-
-        command.append(url)
-
-        result = subprocess.run(command, input=json_payload_str, capture_output=True, text=True, check=False)
-        
-        response_data = {}
-        try:
-            if result.stdout:
-                response_data = json.loads(result.stdout)
-        except json.JSONDecodeError:
-            raise Exception(f"cURL 返回了非JSON响应: {result.stdout or '无输出'} | 错误: {result.stderr or '无错误信息'}")
-
-        if result.returncode != 0 or (response_data.get("message") and response_data.get("documentation_url")):
-            error_message = response_data.get('message', f"cURL 错误: {result.stderr}")
-            if response_data.get('status') == '422' and "sha" in error_message:
-                error_message = f"无效请求 (422)。服务器提示 'sha' 参数有问题。这可能是因为在您操作期间，文件被其他进程修改。请重试。({error_message})"
-            elif "409 Conflict" in result.stderr:
-                error_message = "GitHub API 返回 409 Conflict 错误，这通常是并发写入冲突导致的。请稍后重试。"
-            elif "schannel: failed to receive handshake" in result.stderr or "curl: (35)" in result.stderr:
-                error_message = f"SSL/TLS 握手失败。这通常是临时的网络或代理问题。错误: {result.stderr}"
-            raise Exception(f"GitHub API 错误: {error_message}")
-
-        return response_data
-    
-    def _execute_github_write_request_with_retry(self, method: str, url: str, pat: str, payload: Optional[Dict] = None, task_cat: str = "GitHub写入") -> Dict:
-        """
-        执行 GitHub 写入操作，并增加了针对网络错误的重试逻辑。
-        """
-        max_retries = 3
-        retry_delay = 5
-        for attempt in range(max_retries):
-            try:
-                return self._execute_github_write_request(method, url, pat, payload)
-            except Exception as e:
-                error_str = str(e).lower()
-                if "ssl/tls" in error_str or "handshake" in error_str or "curl: (35)" in error_str:
-                    if attempt < max_retries - 1:
-                        ui_logger.warning(f"  - ⚠️ 网络操作失败 (尝试 {attempt + 1}/{max_retries})，将在 {retry_delay} 秒后重试... 原因: {e}", task_category=task_cat)
-                        time.sleep(retry_delay)
-                        continue
-                raise e
-        raise Exception("重试逻辑执行完毕但未能成功。")
+    def _execute_github_write_request(self, method: str, url: str, pat: str, payload: Optional[Dict] = None, content_path: Optional[str] = None) -> Dict:
+        """通过共享的 GitHub 客户端执行写入操作 (连接复用，重试与限速等待由客户端统一处理)"""
+        return github_client.write(method, url, pat, payload, proxies=self.proxy_manager.get_proxies(url), content_path=content_path)
 
     def upload_to_github_task(self, cancellation_event: threading.Event, task_id: str, task_manager: TaskManager):
         task_cat = "演员头像映射-上传"
@@ -174,11 +104,7 @@ class ActorAvatarMapperLogic:
             raise FileNotFoundError("本地演员头像映射表文件 actor_avatar_map.json 不存在。")
 
         try:
-            ui_logger.info("➡️ [阶段1/3] 正在读取本地文件...", task_category=task_cat)
-            with open(ACTOR_AVATAR_MAP_FILE, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            content_b64 = base64.b64encode(content.encode('utf-8')).decode('utf-8')
+            ui_logger.info("➡️ [阶段1/3] 正在准备上传本地文件...", task_category=task_cat)
             api_url = self._get_github_api_url()
 
             ui_logger.info("➡️ [阶段2/3] 正在检查远程文件状态...", task_category=task_cat)
@@ -196,13 +122,12 @@ class ActorAvatarMapperLogic:
             ui_logger.info("➡️ [阶段3/3] 正在上传文件...", task_category=task_cat)
             payload = {
                 "message": f"feat: Update actor avatar map ({time.strftime('%Y-%m-%d %H:%M:%S')})",
-                "content": content_b64,
                 "branch": self.github_config.branch
             }
             if sha:
                 payload["sha"] = sha
             
-            self._execute_github_write_request_with_retry("PUT", api_url, self.github_config.personal_access_token, payload, task_cat=task_cat)
+            self._execute_github_write_request("PUT", api_url, self.github_config.personal_access_token, payload, content_path=ACTOR_AVATAR_MAP_FILE)
             
             ui_logger.info("✅ 上传成功！演员头像映射表已同步到 GitHub 仓库。", task_category=task_cat)
 
@@ -8,7 +8,7 @@ from typing import Dict, Any
 from log_manager import ui_logger
 from models import AppConfig, ScheduledTasksTargetScope
 from actor_avatar_mapper_logic import ActorAvatarMapperLogic, ACTOR_AVATAR_MAP_FILE
-from task_manager import task_manager
+from task_manager import task_manager, RESOURCE_GITHUB_WRITE
 import config as app_config
 
 router = APIRouter()
@@ -48,7 +48,8 @@ def upload_map():
     logic = get_logic()
     task_id = task_manager.register_task(
         logic.upload_to_github_task,
-        "上传演员头像映射表到GitHub"
+        "上传演员头像映射表到GitHub",
+        resources=[RESOURCE_GITHUB_WRITE]
     )
     return {"status": "success", "message": "上传任务已启动。", "task_id": task_id}
 
@@ -1,11 +1,9 @@
 
 import logging
-import os
-import json
 import requests
 import base64
 from io import BytesIO
-from typing import Dict, List, Any, Tuple, Literal, Optional
+from typing import Dict, List, Any, Tuple, Literal, Optional, Mapping
 from urllib.parse import unquote, urlparse, parse_qs
 
 try:
@@ -19,9 +17,10 @@ except ImportError:
 
 from log_manager import ui_logger
 from models import AppConfig, CombinedImage, CombinedImageResponse, CombinedAvatarResponse, CombinedActorImage, ActorTmdbImageFlowRequest, CombinedAvatarRequest
-from douban_manager import DOUBAN_CACHE_FILE
+from douban_store import douban_store
 from tmdb_logic import TmdbLogic, TMDB_IMAGE_BASE_URL, TMDB_IMAGE_SIZES
 from proxy_manager import ProxyManager
+from emby_client import emby_client
 EmbyImageType = Literal["Primary", "Backdrop", "Logo"]
 
 class ActorGalleryLogic:
@@ -34,21 +33,19 @@ class ActorGalleryLogic:
         self.params = {"api_key": self.api_key}
         self.douban_map = self._load_douban_data()
         self.tmdb_logic = TmdbLogic(app_config)
-        self.session = requests.Session()
+        self.session = emby_client
+        # 豆瓣 / TMDB 等外部图片使用独立会话，不占用 Emby 的连接池、重试策略与请求统计
+        self.external_session = requests.Session()
         self.proxy_manager = ProxyManager(app_config)
 
-    def _load_douban_data(self) -> Dict:
+    def _load_douban_data(self) -> Mapping[str, Dict]:
         task_cat = "媒体画廊-初始化"
-        if not os.path.exists(DOUBAN_CACHE_FILE):
-            ui_logger.warning("未找到豆瓣缓存文件，豆瓣匹配功能将无法使用。", task_category=task_cat)
-            return {}
-        try:
-            with open(DOUBAN_CACHE_FILE, 'r', encoding='utf-8') as f: data = json.load(f)
-            ui_logger.info(f"成功加载 {len(data)} 条豆瓣缓存数据。", task_category=task_cat)
-            return data
-        except Exception as e:
-            ui_logger.error(f"加载豆瓣缓存文件失败: {e}", task_category=task_cat)
+        if not douban_store.exists():
+            ui_logger.warning("未找到豆瓣数据，豆瓣匹配功能将无法使用。", task_category=task_cat)
             return {}
+        douban_map = douban_store.as_mapping()
+        ui_logger.info(f"成功连接豆瓣数据存储，共 {len(douban_map)} 条豆瓣数据。", task_category=task_cat)
+        return douban_map
 
     def get_library_items(self, library_id: str) -> List[Dict]:
         task_cat = f"媒体画廊-媒体库({library_id})"
@@ -343,7 +340,7 @@ class ActorGalleryLogic:
     def get_image_from_url(self, image_url: str, task_cat: str) -> Tuple[bytes, str]:
         headers = {'User-Agent': 'Mozilla/5.0', 'Referer': 'https://movie.douban.com/'}
         proxies = self.proxy_manager.get_proxies(image_url)
-        response = self.session.get(image_url, headers=headers, timeout=30, proxies=proxies)
+        response = self.external_session.get(image_url, headers=headers, timeout=30, proxies=proxies)
         response.raise_for_status()
         content_type = response.headers.get('Content-Type', 'image/jpeg')
         if not content_type.startswith('image/'): raise ValueError(f"URL返回的不是有效的图片类型: {content_type}")
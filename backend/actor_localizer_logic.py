@@ -5,10 +5,9 @@ import requests
 import json
 import re
 import copy
-import os
 import hmac
 import hashlib
-from typing import List, Dict, Any, Generator, Optional, Iterable
+from typing import List, Dict, Any, Generator, Optional, Iterable, Mapping
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 try:
@@ -19,9 +18,54 @@ except ImportError:
 
 from models import AppConfig, ActorLocalizerConfig, TargetScope, TencentApiConfig, SiliconflowApiConfig
 from task_manager import TaskManager
-from douban_manager import DOUBAN_CACHE_FILE
+from emby_client import emby_client
+from douban_store import douban_store
 from log_manager import ui_logger
 from actor_role_mapper_logic import ActorRoleMapperLogic
+from translation_memory import translation_memory
+
+# 跨媒体批量翻译时，每轮扫描的媒体项数量 (扫描 -> 翻译 -> 应用)
+PIPELINE_WINDOW_SIZE = 200
+
+SILICONFLOW_BATCH_SYSTEM_PROMPT = """你是一个严格遵守指令的、用于程序化调用的翻译API。你的核心任务是将一个包含多个角色名的JSON数组，翻译成一个包含对应中文译名的、新的JSON数组。
+
+**严格遵守以下规则：**
+
+1.  **输入格式**：你将收到的用户输入是一个JSON字符串数组，例如 `["Role A", "Role B", "Role C"]`。
+2.  **输出格式**：你的回答【必须】是且【仅是】一个合法的、与输入数组一一对应的JSON字符串数组。绝对不能包含任何解释、代码块标记（如 ```json ... ```）、或其他任何非JSON数组内容的文本。
+3.  **等长原则**：输出数组的元素数量【必须】严格等于输入数组的元素数量。
+4.  **顺序原则**：输出数组中元素的顺序【必须】严格对应输入数组中元素的顺序。第 `i` 个输出是第 `i` 个输入的翻译结果。
+5.  **翻译核心**：
+    *   **精准翻译**：将英文或拼音格式的人名和角色名，翻译成符合中文影视圈习惯的、最常见的官方或通用译名。
+    *   **保留上下文**：如果输入是 `Maj. Sophie E. Jean`，请翻译成“苏菲·E·让少校”。
+    *   **保持原文**：如果输入已经是中文、无法识别为人名/角色名、或者是常见的英文缩写（如 MJ, DJ, CEO），请在输出数组的对应位置直接返回原始文本。
+6.  **核心名称一致性原则 (重要)**：
+    *   在处理整个列表时，你必须识别出指向同一人物的不同角色名变体（例如 "Max", "Young Max"）。
+    *   你必须确保这些变体中的核心人物名称（"Max"）在整个输出数组中拥有完全相同的中文译名。
+    *   你可以翻译前缀或后缀等描述性词语，但核心名称的翻译绝不能改变。
+    *   **正确示例**：输入 `["Max", "Young Max"]`，正确的输出是 `["麦克斯", "年轻的麦克斯"]` 或 `["麦克斯", "少年麦克斯"]`。
+    *   **错误示例**：输出 `["麦克斯", "小马克斯"]` 是错误的，因为核心名称 "Max" 的翻译不一致 ("麦克斯" vs "马克斯")。
+7.  **上下文优先原则 (重要)**：
+    *   你必须**优先利用**我提供给你的影视作品上下文来决定译名。如果该作品有公认的官方或通用译名，你必须使用它。
+    *   **示例**：在电影《极乐空间》的上下文中，角色代号 `Spider` 的通用译名是 `蜘蛛`（意译），你必须返回此结果，而不是音译“斯派德”。
+8.  **结构化角色名处理规则**：
+    *   对于包含数字和符号的角色名（如 `Henchman #2`），请翻译文本部分并**完整保留**数字和符号，输出 `打手2号`。
+    *   对于包含缩写的角色名（如 `S.W.A.T. Officer`），请翻译非缩写部分，并**保留英文缩写**，输出 `S.W.A.T. 警官`。
+9.  **东亚人名处理偏好**：
+    *   当遇到疑似东亚（特别是中、日、韩）的罗马音拼写时，请优先查找并使用最通行的汉字写法，而不是纯粹的音译。
+    *   **示例**：对于 `Yoon Se-ri`，`尹世理` 是比 `允瑟瑞` 更好的翻译。
+10.  **约定俗称的规则**：
+    *   当遇到(voice)（voice）统一将这部分翻译为(配音)，而不是(声)或者(声音)
+    *   **示例**：对于 `Ken Kaneki (voice)，`金木研(配音)` 是比 `金木研(声)` 更好的翻译。
+11. **示例**：
+    *   如果输入是：`["Yoon Se-ri", "The President", "DJ"]`
+    *   你的输出必须是：`["尹世理", "总统", "DJ"]`
+
+**错误输出示例（你绝不能这样返回）：**
+*   `翻译结果如下：["尹世理", "总统", "DJ"]`  (包含多余文本)
+*   `["尹世理", "总统"]` (数量不匹配)
+*   `["总统", "尹世理", "DJ"]` (顺序不匹配)
+*   `"尹世理", "总统", "DJ"` (不是合法的JSON数组格式)"""
 
 DEFAULT_ROLE_SUFFIX_MAP = {
     "(voice)": "配 ",
@@ -30,6 +74,24 @@ DEFAULT_ROLE_SUFFIX_MAP = {
 
 # backend/actor_localizer_logic.py (函数替换)
 
+def _describe_context(context_info: Optional[Dict[str, Any]]) -> str:
+    """把媒体上下文拼成提示词中的作品描述，如 "一部于 2019 年上映的电影，《标题》，(TMDB ID: 123)"；无标题时返回空字符串"""
+    if not context_info or not context_info.get('title'):
+        return ""
+    year = context_info.get('year')
+    media_type = context_info.get('type', '影视作品')
+    tmdb_id = context_info.get('tmdb_id')
+    context_parts = [f"一部于 {year} 年上映的{media_type}"] if year else [f"一部{media_type}"]
+    context_parts.append(f"《{context_info['title']}》")
+    if tmdb_id:
+        context_parts.append(f"(TMDB ID: {tmdb_id})")
+    return "，".join(context_parts)
+
+def _estimate_tokens(text: str) -> int:
+    """粗略估算文本的 token 数：中日韩字符按 1 个计，其余字符按 4 个一组计"""
+    cjk_count = sum(1 for ch in text if '\u2e80' <= ch <= '\u9fff' or '\uac00' <= ch <= '\ud7af')
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
 def _format_role_with_rules(role: str, final_rules: Dict[str, str]) -> str:
     """
     根据最终规则集，格式化角色名。
@@ -71,21 +133,17 @@ class ActorLocalizerLogic:
         self.api_key = self.server_config.api_key
         self.user_id = self.server_config.user_id
         self.params = {"api_key": self.api_key}
+        self.session = emby_client
         self.douban_map = self._load_douban_data()
 
-    def _load_douban_data(self) -> Dict:
+    def _load_douban_data(self) -> Mapping[str, Dict]:
         task_cat = "演员中文化-初始化" # --- 统一任务类别 ---
-        if not os.path.exists(DOUBAN_CACHE_FILE):
-            ui_logger.warning("未找到豆瓣缓存文件，匹配功能将无法使用。", task_category=task_cat)
-            return {}
-        try:
-            with open(DOUBAN_CACHE_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            ui_logger.info(f"成功加载 {len(data)} 条豆瓣缓存数据。", task_category=task_cat)
-            return data
-        except Exception as e:
-            ui_logger.error(f"加载豆瓣缓存文件失败: {e}", task_category=task_cat)
+        if not douban_store.exists():
+            ui_logger.warning("未找到豆瓣数据，匹配功能将无法使用。", task_category=task_cat)
             return {}
+        douban_map = douban_store.as_mapping()
+        ui_logger.info(f"成功连接豆瓣数据存储，共 {len(douban_map)} 条豆瓣数据。", task_category=task_cat)
+        return douban_map
 
     def _contains_chinese(self, text: str) -> bool:
         if not text: return False
@@ -116,7 +174,7 @@ class ActorLocalizerLogic:
             params = {"api_key": self.api_key}
             if not full_json:
                 params["Fields"] = "People,ProviderIds,Name"
-            resp = requests.get(url, params=params, timeout=15)
+            resp = self.session.get(url, params=params, timeout=15)
             resp.raise_for_status()
             return resp.json()
         except requests.RequestException as e:
@@ -144,7 +202,7 @@ class ActorLocalizerLogic:
         blacklisted_ids = set()
         if target.scope == "all_libraries" and target.library_blacklist:
             views_url = f"{self.base_url}/Users/{self.user_id}/Views"
-            views_resp = requests.get(views_url, params=self.params)
+            views_resp = self.session.get(views_url, params=self.params)
             views = views_resp.json().get("Items", [])
             blacklist_names = {name.strip() for name in target.library_blacklist.split(',') if name.strip()}
             blacklisted_ids = {view['Id'] for view in views if view['Name'] in blacklist_names}
@@ -159,7 +217,7 @@ class ActorLocalizerLogic:
             while not cancellation_event.is_set():
                 params["StartIndex"] = start_index
                 try:
-                    response = requests.get(url, params=params, timeout=60)
+                    response = self.session.get(url, params=params, timeout=60)
                     response.raise_for_status()
                     page_items = response.json().get("Items", [])
                     if not page_items:
@@ -177,7 +235,7 @@ class ActorLocalizerLogic:
         try:
             url = f"{self.base_url}/Items/{item_id}"
             headers = {'Content-Type': 'application/json'}
-            resp = requests.post(url, params=self.params, json=item_json, headers=headers, timeout=30)
+            resp = self.session.post(url, params=self.params, json=item_json, headers=headers, timeout=30)
             resp.raise_for_status()
             return resp.status_code == 204
         except requests.RequestException as e:
@@ -192,7 +250,7 @@ class ActorLocalizerLogic:
         try:
             # 步骤 1: 获取演员的当前信息。注意：这里不使用 _get_item_details，而是直接请求。
             person_url = f"{self.base_url}/Users/{self.user_id}/Items/{person_id}"
-            person_details_resp = requests.get(person_url, params=self.params, timeout=15)
+            person_details_resp = self.session.get(person_url, params=self.params, timeout=15)
             person_details_resp.raise_for_status()
             person_details = person_details_resp.json()
 
@@ -208,7 +266,7 @@ class ActorLocalizerLogic:
             update_url = f"{self.base_url}/Items/{person_id}"
             headers = {'Content-Type': 'application/json'}
             
-            resp = requests.post(update_url, params=self.params, json=person_details, headers=headers, timeout=30)
+            resp = self.session.post(update_url, params=self.params, json=person_details, headers=headers, timeout=30)
             resp.raise_for_status()
             
             if resp.status_code == 204:
@@ -225,6 +283,27 @@ class ActorLocalizerLogic:
             ui_logger.error(f"     -- ❌ 演员重命名时发生未知错误: {e}", task_category=task_category, exc_info=True)
             return False
 
+    @staticmethod
+    def _build_context_info(details: Dict) -> Dict[str, Any]:
+        provider_ids_lower = {k.lower(): v for k, v in details.get('ProviderIds', {}).items()}
+        return {
+            "title": details.get('Name', '未知名称'),
+            "year": details.get("ProductionYear"),
+            "type": "电视剧" if details.get("Type") == "Series" else "电影",
+            "tmdb_id": provider_ids_lower.get("tmdb")
+        }
+
+    def _translation_memory_key(self, config: ActorLocalizerConfig, context_info: Optional[Dict[str, Any]] = None) -> tuple:
+        """返回翻译记忆的 (引擎, 模型, 作品上下文)；只有参考上下文的 AI 翻译才按作品区分译文"""
+        if config.translation_mode == 'translators':
+            return f"translators:{config.translator_engine}", "", ""
+        if config.translation_mode == 'siliconflow':
+            context = ""
+            if config.translation_memory_per_title and context_info:
+                context = f"{context_info.get('type')}-{context_info['tmdb_id']}" if context_info.get('tmdb_id') else (context_info.get('title') or "")
+            return "siliconflow", config.siliconflow_config.model_name, context
+        return config.translation_mode, "", ""
+
     def _translate_text_with_retry(self, text: str, config: ActorLocalizerConfig, context_info: Optional[Dict[str, Any]] = None) -> str:
         task_cat = f"翻译引擎({config.translation_mode})" # --- 定义任务类别 ---
         if not text: return ""
@@ -289,8 +368,15 @@ class ActorLocalizerLogic:
         return None
     
 
-    def _process_single_item_for_localization(self, item_id: str, config: ActorLocalizerConfig, task_category: str, preview_mode: bool = False, person_index: Optional[Dict] = None, allow_missing_douban: bool = False) -> Dict[str, Any]:
-        details = self._get_item_details(item_id)
+    def _process_single_item_for_localization(self, item_id: str, config: ActorLocalizerConfig, task_category: str, preview_mode: bool = False, person_index: Optional[Dict] = None, allow_missing_douban: bool = False, collect_only: bool = False, pretranslated: Optional[Dict[tuple, Dict[str, tuple]]] = None, details: Optional[Dict] = None) -> Dict[str, Any]:
+        """
+        处理单个媒体项的演员中文化。
+        collect_only 为 True 时只收集待翻译的角色名 (返回 translation_request)，不翻译也不应用；
+        pretranslated 为跨媒体批量翻译的结果 {翻译记忆键: {原文: (译文, 来源)}}，命中的角色名不再调用翻译接口。
+        details 为已获取的媒体详情 (跨媒体批量翻译的收集阶段缓存)，传入时不再重复请求 Emby。
+        """
+        if details is None:
+            details = self._get_item_details(item_id)
         if not details: return {"has_changes": False}
         
         item_name = details.get('Name', '未知名称')
@@ -463,18 +549,45 @@ class ActorLocalizerLogic:
                 item_changes_log[current_actor_name_for_log] = {'old': original_role, 'new': current_role, 'source': source_text}
                 actor_source_map[current_actor_name_for_log] = source_text
 
+        if collect_only:
+            if not (config.translation_enabled and actors_to_translate):
+                return {"has_changes": False}
+            context_info = self._build_context_info(details)
+            return {"has_changes": False, "translation_request": {
+                "context_info": context_info,
+                "memory_key": self._translation_memory_key(config, context_info),
+                "roles": [actor['role'] for actor in actors_to_translate],
+            }}
+
         if config.translation_enabled and actors_to_translate:
             if not preview_mode: ui_logger.info(f"【翻译】为媒体《{item_name}》收集到 {len(actors_to_translate)} 个待翻译角色。", task_category=task_category)
             
-            provider_ids_lower = {k.lower(): v for k, v in provider_ids.items()}
-            context_info = {
-                "title": item_name,
-                "year": details.get("ProductionYear"),
-                "type": "电视剧" if details.get("Type") == "Series" else "电影",
-                "tmdb_id": provider_ids_lower.get("tmdb")
-            }
-
-            use_batch = (config.translation_mode == 'siliconflow' and config.siliconflow_config.batch_translation_enabled)
+            context_info = self._build_context_info(details)
+
+            memory_key = self._translation_memory_key(config, context_info)
+            # {原文: (译文, 来源)}，先取跨媒体批量翻译的结果，再查翻译记忆
+            known_roles = dict(pretranslated.get(memory_key, {})) if pretranslated else {}
+            if config.translation_memory_enabled:
+                roles_to_lookup = [actor['role'] for actor in actors_to_translate if actor['role'] not in known_roles]
+                for role, new_role in translation_memory.lookup_many(roles_to_lookup, *memory_key).items():
+                    known_roles[role] = (new_role, '(来自翻译记忆)')
+            if known_roles:
+                for actor_info in actors_to_translate:
+                    new_role, source = known_roles.get(actor_info['role'], (None, None))
+                    if not new_role or new_role == actor_info['role']:
+                        continue
+                    for person in new_people_list:
+                        if person.get('Name') == actor_info['name'] and person.get('Role') == actor_info['role']:
+                            has_changes = True
+                            person['Role'] = new_role
+                            if not preview_mode: ui_logger.info(f"     -- 更新: {actor_info['name']}: '{actor_info['role']}' -> '{new_role}' {source}", task_category=task_category)
+                            item_changes_log[actor_info['name']] = {'old': actor_info['role'], 'new': new_role, 'source': source}
+                            actor_source_map[actor_info['name']] = source
+                            break
+                actors_to_translate = [actor for actor in actors_to_translate if actor['role'] not in known_roles]
+                if not preview_mode: ui_logger.info(f"【翻译】已有译文 {len(known_roles)} 个角色名，剩余 {len(actors_to_translate)} 个需调用翻译接口。", task_category=task_category)
+
+            use_batch = (config.translation_mode == 'siliconflow' and config.siliconflow_config.batch_translation_enabled and bool(actors_to_translate))
             
             if use_batch:
                 if not preview_mode and config.api_cooldown_enabled and config.api_cooldown_time > 0:
@@ -491,6 +604,8 @@ class ActorLocalizerLogic:
                 if translated_unique_roles and len(translated_unique_roles) == len(unique_roles_to_translate):
                     if not preview_mode: ui_logger.info("【翻译】批量翻译成功，开始构建映射并应用结果。", task_category=task_category)
                     translated_roles_map = {unique_roles_to_translate[i]: translated_unique_roles[i] for i in range(len(unique_roles_to_translate))}
+                    if config.translation_memory_enabled:
+                        translation_memory.store_many(translated_roles_map, *memory_key)
                     
                     for person in new_people_list:
                         original_role_for_person = next((a['role'] for a in actors_to_translate if a['name'] == person.get('Name') and a['role'] == person.get('Role')), None)
@@ -516,6 +631,8 @@ class ActorLocalizerLogic:
 
                     new_role = self._translate_text_with_retry(actor_info['role'], config, context_info)
                     if new_role and new_role != actor_info['role']:
+                        if config.translation_memory_enabled:
+                            translation_memory.store_many({actor_info['role']: new_role}, *memory_key)
                         has_changes = True
                         for person in new_people_list:
                             if person.get('Name') == actor_info['name'] and person.get('Role') == actor_info['role']:
@@ -635,6 +752,153 @@ class ActorLocalizerLogic:
 
         return {"has_changes": False}
 
+    def _use_cross_item_pipeline(self, config: ActorLocalizerConfig, item_count: int) -> bool:
+        sf_config = config.siliconflow_config
+        return (config.translation_enabled and config.translation_mode == 'siliconflow'
+                and sf_config.batch_translation_enabled and sf_config.cross_item_batch_enabled and item_count > 1)
+
+    @staticmethod
+    def _pack_translation_batches(groups: List[Dict[str, Any]], token_budget: int) -> List[List[Dict[str, Any]]]:
+        """
+        按估算的 token 数把各作品的角色名打包成请求，同一作品的角色名尽量放在同一个请求中，
+        单部作品超出预算时才拆分。返回的每个请求是若干 {"memory_key", "context_info", "texts"}。
+        """
+        batches: List[List[Dict[str, Any]]] = []
+        current: List[Dict[str, Any]] = []
+        current_tokens = 0
+        for group in groups:
+            context_tokens = _estimate_tokens(_describe_context(group['context_info'])) + 10
+            segments = []
+            chunk, chunk_tokens = [], context_tokens
+            for text in group['texts']:
+                text_tokens = _estimate_tokens(json.dumps(text, ensure_ascii=False)) + 1
+                if chunk and chunk_tokens + text_tokens > token_budget:
+                    segments.append((chunk, chunk_tokens))
+                    chunk, chunk_tokens = [], context_tokens
+                chunk.append(text)
+                chunk_tokens += text_tokens
+            if chunk:
+                segments.append((chunk, chunk_tokens))
+
+            for texts, tokens in segments:
+                if current and current_tokens + tokens > token_budget:
+                    batches.append(current)
+                    current, current_tokens = [], 0
+                current.append({**group, "texts": texts})
+                current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _pretranslate_items(self, item_ids: List[str], config: ActorLocalizerConfig, task_category: str, cancellation_event: threading.Event, allow_missing_douban: bool = False, details_cache: Optional[Dict[str, Dict]] = None) -> Dict[tuple, Dict[str, tuple]]:
+        """
+        跨媒体批量翻译：先扫描一组媒体项收集待翻译的角色名，按翻译记忆键去重，
+        再按 token 预算打包、在冷却限制下并发翻译。返回 {翻译记忆键: {原文: (译文, 来源)}}，
+        供逐项处理时直接使用；翻译失败的角色名不在结果中，逐项处理时会按原有方式重试。
+        传入 details_cache 时，收集阶段获取的媒体详情按 ID 存入其中，逐项处理时直接复用。
+        """
+        pending: Dict[tuple, Dict[str, Dict]] = {}
+        for item_id in item_ids:
+            if cancellation_event.is_set():
+                return {}
+            details = self._get_item_details(item_id)
+            if not details:
+                continue
+            if details_cache is not None:
+                # 收集阶段会就地修改演员列表，缓存一份未改动的副本供逐项处理使用
+                details_cache[item_id] = copy.deepcopy(details)
+            result = self._process_single_item_for_localization(item_id, config, task_category, preview_mode=True, allow_missing_douban=allow_missing_douban, collect_only=True, details=details)
+            request = result.get("translation_request")
+            if not request:
+                continue
+            roles = pending.setdefault(request['memory_key'], {})
+            for role in request['roles']:
+                roles.setdefault(role, request['context_info'])
+
+        total_roles = sum(len(roles) for roles in pending.values())
+        if total_roles == 0:
+            return {}
+
+        pretranslated: Dict[tuple, Dict[str, tuple]] = {}
+        remembered_count = 0
+        if config.translation_memory_enabled:
+            for memory_key, roles in pending.items():
+                for role, new_role in translation_memory.lookup_many(list(roles), *memory_key).items():
+                    pretranslated.setdefault(memory_key, {})[role] = (new_role, '(来自翻译记忆)')
+                    del roles[role]
+                    remembered_count += 1
+
+        groups_by_context: Dict[tuple, Dict[str, Any]] = {}
+        for memory_key, roles in pending.items():
+            for role, context_info in roles.items():
+                context_id = (memory_key, context_info['type'], context_info.get('tmdb_id') or context_info['title'])
+                group = groups_by_context.setdefault(context_id, {"memory_key": memory_key, "context_info": context_info, "texts": []})
+                group['texts'].append(role)
+
+        sf_config = config.siliconflow_config
+        batches = self._pack_translation_batches(list(groups_by_context.values()), sf_config.cross_item_batch_token_budget)
+        ui_logger.info(f"【跨媒体翻译】{len(item_ids)} 个媒体项共 {total_roles} 个去重后的待翻译角色名，翻译记忆命中 {remembered_count} 个，其余打包为 {len(batches)} 个请求。", task_category=task_category)
+        if not batches:
+            return pretranslated
+
+        # 所有并发请求共享同一个冷却间隔，保证请求发起的速率不超过单线程时的限制
+        cooldown = config.api_cooldown_time if config.api_cooldown_enabled else 0
+        pace_lock = threading.Lock()
+        next_request_at = [0.0]
+
+        def wait_for_turn():
+            with pace_lock:
+                now = time.monotonic()
+                start_at = max(now, next_request_at[0])
+                next_request_at[0] = start_at + cooldown
+            if start_at > now:
+                time.sleep(start_at - now)
+
+        def translate_batch(batch: List[Dict[str, Any]]):
+            expected = sum(len(group['texts']) for group in batch)
+            max_retries = 3
+            for attempt in range(max_retries):
+                if cancellation_event.is_set():
+                    return batch, None
+                wait_for_turn()
+                try:
+                    translated = self.translate_with_siliconflow_api_grouped(batch, sf_config)
+                    if len(translated) == expected:
+                        return batch, translated
+                    logging.warning(f"【跨媒体翻译】返回结果数量 ({len(translated)}) 与请求数量 ({expected}) 不匹配 (尝试 {attempt + 1}/{max_retries})。")
+                except Exception as e:
+                    logging.warning(f"【跨媒体翻译】批量请求失败 (尝试 {attempt + 1}/{max_retries}): {e}")
+            return batch, None
+
+        failed_batches = 0
+        with ThreadPoolExecutor(max_workers=sf_config.cross_item_concurrency, thread_name_prefix="role-translate") as executor:
+            futures = [executor.submit(translate_batch, batch) for batch in batches]
+            for future in as_completed(futures):
+                batch, translated = future.result()
+                if translated is None:
+                    failed_batches += 1
+                    continue
+                offset = 0
+                for group in batch:
+                    results = translated[offset:offset + len(group['texts'])]
+                    offset += len(group['texts'])
+                    group_map = {
+                        source: target.strip()
+                        for source, target in zip(group['texts'], results)
+                        if isinstance(target, str) and target.strip()
+                    }
+                    if config.translation_memory_enabled:
+                        translation_memory.store_many(group_map, *group['memory_key'])
+                    known = pretranslated.setdefault(group['memory_key'], {})
+                    for source, target in group_map.items():
+                        known[source] = (target, '(来自翻译引擎)')
+
+        if failed_batches:
+            ui_logger.warning(f"【跨媒体翻译】{failed_batches}/{len(batches)} 个请求失败，涉及的角色名将在逐项处理时重新翻译。", task_category=task_category)
+        else:
+            ui_logger.info(f"【跨媒体翻译】全部 {len(batches)} 个请求翻译完成，开始逐项应用。", task_category=task_category)
+        return pretranslated
+
     def run_localization_for_items(self, item_ids: Iterable[str], config: ActorLocalizerConfig, cancellation_event: threading.Event, task_id: str, task_manager: TaskManager, task_category: str):
         if not self.douban_map:
             ui_logger.error("【演员中文化】本地豆瓣数据库为空，任务中止。", task_category=task_category)
@@ -655,10 +919,16 @@ class ActorLocalizerLogic:
         # --- 新增结束 ---
 
         updated_count = 0
+        use_pipeline = self._use_cross_item_pipeline(config, total_items)
+        pretranslated = None
+        details_cache: Dict[str, Dict] = {}
         for index, item_id in enumerate(item_ids_list):
             if cancellation_event.is_set():
                 ui_logger.warning("任务被用户取消。", task_category=task_category)
                 break
+            if use_pipeline and index % PIPELINE_WINDOW_SIZE == 0:
+                details_cache = {}
+                pretranslated = self._pretranslate_items(item_ids_list[index:index + PIPELINE_WINDOW_SIZE], config, task_category, cancellation_event, allow_missing_douban=config.scheduled_task_skip_douban_check, details_cache=details_cache)
             task_manager.update_task_progress(task_id, index + 1, total_items)
             
             # --- 修改：传入索引 ---
@@ -667,7 +937,9 @@ class ActorLocalizerLogic:
                 config, 
                 task_category, 
                 person_index=person_index,
-                allow_missing_douban=config.scheduled_task_skip_douban_check
+                allow_missing_douban=config.scheduled_task_skip_douban_check,
+                pretranslated=pretranslated,
+                details=details_cache.pop(item_id, None)
             )
             # --- 修改结束 ---
             
@@ -777,72 +1049,47 @@ class ActorLocalizerLogic:
 
     @staticmethod
     def translate_with_siliconflow_api_batch(texts: List[str], config: SiliconflowApiConfig, context_info: Optional[Dict[str, Any]] = None) -> List[str]:
-        url = "https://api.siliconflow.cn/v1/chat/completions"
-        system_prompt = """你是一个严格遵守指令的、用于程序化调用的翻译API。你的核心任务是将一个包含多个角色名的JSON数组，翻译成一个包含对应中文译名的、新的JSON数组。
-
-**严格遵守以下规则：**
-
-1.  **输入格式**：你将收到的用户输入是一个JSON字符串数组，例如 `["Role A", "Role B", "Role C"]`。
-2.  **输出格式**：你的回答【必须】是且【仅是】一个合法的、与输入数组一一对应的JSON字符串数组。绝对不能包含任何解释、代码块标记（如 ```json ... ```）、或其他任何非JSON数组内容的文本。
-3.  **等长原则**：输出数组的元素数量【必须】严格等于输入数组的元素数量。
-4.  **顺序原则**：输出数组中元素的顺序【必须】严格对应输入数组中元素的顺序。第 `i` 个输出是第 `i` 个输入的翻译结果。
-5.  **翻译核心**：
-    *   **精准翻译**：将英文或拼音格式的人名和角色名，翻译成符合中文影视圈习惯的、最常见的官方或通用译名。
-    *   **保留上下文**：如果输入是 `Maj. Sophie E. Jean`，请翻译成“苏菲·E·让少校”。
-    *   **保持原文**：如果输入已经是中文、无法识别为人名/角色名、或者是常见的英文缩写（如 MJ, DJ, CEO），请在输出数组的对应位置直接返回原始文本。
-6.  **核心名称一致性原则 (重要)**：
-    *   在处理整个列表时，你必须识别出指向同一人物的不同角色名变体（例如 "Max", "Young Max"）。
-    *   你必须确保这些变体中的核心人物名称（"Max"）在整个输出数组中拥有完全相同的中文译名。
-    *   你可以翻译前缀或后缀等描述性词语，但核心名称的翻译绝不能改变。
-    *   **正确示例**：输入 `["Max", "Young Max"]`，正确的输出是 `["麦克斯", "年轻的麦克斯"]` 或 `["麦克斯", "少年麦克斯"]`。
-    *   **错误示例**：输出 `["麦克斯", "小马克斯"]` 是错误的，因为核心名称 "Max" 的翻译不一致 ("麦克斯" vs "马克斯")。
-7.  **上下文优先原则 (重要)**：
-    *   你必须**优先利用**我提供给你的影视作品上下文来决定译名。如果该作品有公认的官方或通用译名，你必须使用它。
-    *   **示例**：在电影《极乐空间》的上下文中，角色代号 `Spider` 的通用译名是 `蜘蛛`（意译），你必须返回此结果，而不是音译“斯派德”。
-8.  **结构化角色名处理规则**：
-    *   对于包含数字和符号的角色名（如 `Henchman #2`），请翻译文本部分并**完整保留**数字和符号，输出 `打手2号`。
-    *   对于包含缩写的角色名（如 `S.W.A.T. Officer`），请翻译非缩写部分，并**保留英文缩写**，输出 `S.W.A.T. 警官`。
-9.  **东亚人名处理偏好**：
-    *   当遇到疑似东亚（特别是中、日、韩）的罗马音拼写时，请优先查找并使用最通行的汉字写法，而不是纯粹的音译。
-    *   **示例**：对于 `Yoon Se-ri`，`尹世理` 是比 `允瑟瑞` 更好的翻译。
-10.  **约定俗称的规则**：
-    *   当遇到(voice)（voice）统一将这部分翻译为(配音)，而不是(声)或者(声音)
-    *   **示例**：对于 `Ken Kaneki (voice)，`金木研(配音)` 是比 `金木研(声)` 更好的翻译。
-11. **示例**：
-    *   如果输入是：`["Yoon Se-ri", "The President", "DJ"]`
-    *   你的输出必须是：`["尹世理", "总统", "DJ"]`
-
-**错误输出示例（你绝不能这样返回）：**
-*   `翻译结果如下：["尹世理", "总统", "DJ"]`  (包含多余文本)
-*   `["尹世理", "总统"]` (数量不匹配)
-*   `["总统", "尹世理", "DJ"]` (顺序不匹配)
-*   `"尹世理", "总统", "DJ"` (不是合法的JSON数组格式)"""
         roles_json_array = json.dumps(texts, ensure_ascii=False)
         
-        # --- 新增：构建更丰富的上下文描述 ---
-        if context_info and context_info.get('title'):
-            title = context_info['title']
-            year = context_info.get('year')
-            media_type = context_info.get('type', '影视作品')
-            tmdb_id = context_info.get('tmdb_id')
-            
-            context_parts = [f"一部于 {year} 年上映的{media_type}"] if year else [f"一部{media_type}"]
-            context_parts.append(f"《{title}》")
-            if tmdb_id:
-                context_parts.append(f"(TMDB ID: {tmdb_id})")
-            
-            context_description = "，".join(context_parts)
+        context_description = _describe_context(context_info)
+        if context_description:
             user_prompt = f"请在以下影视作品的上下文中进行翻译：{context_description}。请严格按照系统指令的要求，翻译以下JSON数组中的所有角色名：\n\n{roles_json_array}"
         else:
             user_prompt = f"请严格按照系统指令的要求，翻译以下JSON数组中的所有角色名：\n\n{roles_json_array}"
-        # --- 新增结束 ---
 
         logging.info(f"【翻译-批量】最终生成的 User Prompt:\n{user_prompt}")
+        return ActorLocalizerLogic._request_siliconflow_batch(user_prompt, roles_json_array, config)
 
+    @staticmethod
+    def translate_with_siliconflow_api_grouped(groups: List[Dict[str, Any]], config: SiliconflowApiConfig) -> List[str]:
+        """
+        在一次请求中翻译多部作品的角色名。groups 中每项为 {"context_info": ..., "texts": [...]}，
+        所有角色名按顺序拼成一个数组发送，并在提示词中注明每段序号所属的作品，返回与拼接后数组等长的译名列表。
+        """
+        texts: List[str] = []
+        context_lines = []
+        for group in groups:
+            first, last = len(texts) + 1, len(texts) + len(group['texts'])
+            texts.extend(group['texts'])
+            context_description = _describe_context(group.get('context_info')) or "未知作品"
+            range_text = f"第 {first} 项" if first == last else f"第 {first}-{last} 项"
+            context_lines.append(f"- {range_text}：{context_description}")
+        roles_json_array = json.dumps(texts, ensure_ascii=False)
+        user_prompt = (
+            "以下角色名来自多部不同的影视作品，请分别在各自作品的上下文中进行翻译 (序号从 1 开始)：\n"
+            + "\n".join(context_lines)
+            + f"\n\n请严格按照系统指令的要求，翻译以下JSON数组中的所有角色名：\n\n{roles_json_array}"
+        )
+        logging.debug(f"【翻译-跨媒体批量】最终生成的 User Prompt:\n{user_prompt}")
+        return ActorLocalizerLogic._request_siliconflow_batch(user_prompt, roles_json_array, config)
+
+    @staticmethod
+    def _request_siliconflow_batch(user_prompt: str, roles_json_array: str, config: SiliconflowApiConfig) -> List[str]:
+        url = "https://api.siliconflow.cn/v1/chat/completions"
         payload = {
             "model": config.model_name,
             "messages": [
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": SILICONFLOW_BATCH_SYSTEM_PROMPT},
                 {"role": "user", "content": user_prompt}
             ],
             "stream": False,
@@ -891,12 +1138,18 @@ class ActorLocalizerLogic:
         
         ui_logger.info("【步骤 3/3】开始逐一分析媒体项...", task_category=task_cat)
         items_to_update = []
+        use_pipeline = self._use_cross_item_pipeline(config, total_items)
+        pretranslated = None
+        details_cache: Dict[str, Dict] = {}
         for index, item_id in enumerate(item_ids_to_process):
             if cancellation_event.is_set(): break
+            if use_pipeline and index % PIPELINE_WINDOW_SIZE == 0:
+                details_cache = {}
+                pretranslated = self._pretranslate_items(item_ids_to_process[index:index + PIPELINE_WINDOW_SIZE], config, task_cat, cancellation_event, details_cache=details_cache)
             task_manager.update_task_progress(task_id, index + 1, total_items)
             
             # --- 核心重构：调用统一的逻辑函数 ---
-            result = self._process_single_item_for_localization(item_id, config, task_cat, preview_mode=True)
+            result = self._process_single_item_for_localization(item_id, config, task_cat, preview_mode=True, pretranslated=pretranslated, details=details_cache.pop(item_id, None))
             # --- 重构结束 ---
 
             if result.get("has_changes"):
@@ -1023,10 +1276,16 @@ class ActorLocalizerLogic:
         person_index = role_mapper_logic._fetch_all_persons_index()
 
         updated_count = 0
+        use_pipeline = self._use_cross_item_pipeline(config, total_items)
+        pretranslated = None
+        details_cache: Dict[str, Dict] = {}
         for index, item_id in enumerate(item_ids_to_process):
             if cancellation_event.is_set(): break
+            if use_pipeline and index % PIPELINE_WINDOW_SIZE == 0:
+                details_cache = {}
+                pretranslated = self._pretranslate_items(item_ids_to_process[index:index + PIPELINE_WINDOW_SIZE], config, task_category, cancellation_event, details_cache=details_cache)
             task_manager.update_task_progress(task_id, index + 1, total_items)
-            result = self._process_single_item_for_localization(item_id, config, task_category, person_index=person_index)
+            result = self._process_single_item_for_localization(item_id, config, task_category, person_index=person_index, pretranslated=pretranslated, details=details_cache.pop(item_id, None))
             if result.get("has_changes"):
                 updated_count += 1
         ui_logger.info(f"【步骤 2/2】自动应用任务执行完毕，共更新了 {updated_count} 个项目的演员角色。", task_category=task_category)
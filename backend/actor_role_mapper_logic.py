@@ -9,7 +9,6 @@ import re
 import hmac
 import hashlib
 import base64
-import subprocess
 from typing import List, Dict, Any, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from filelock import FileLock, Timeout
@@ -19,6 +18,10 @@ from models import AppConfig, ScheduledTasksTargetScope
 from task_manager import TaskManager
 from media_selector import MediaSelector
 from proxy_manager import ProxyManager
+from emby_client import emby_client
+from github_client import github_client
+from id_map_service import id_map_service
+from person_index import person_index as shared_person_index
 
 ACTOR_ROLE_MAP_FILE = os.path.join('/app/data', 'actor_role_map.json')
 ACTOR_ROLE_MAP_LOCK_FILE = ACTOR_ROLE_MAP_FILE + ".lock"
@@ -38,21 +41,7 @@ class ActorRoleMapperLogic:
         self.server_config = config.server_config
         self.github_config = config.episode_refresher_config.github_config
         self.proxy_manager = ProxyManager(config)
-        self.session = self._create_session()
-
-    def _create_session(self):
-        import requests
-        from requests.adapters import HTTPAdapter
-        from urllib3.util.retry import Retry
-        
-        session = requests.Session()
-        retry_strategy = Retry(
-            total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504]
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("https://", adapter)
-        session.mount("http://", adapter)
-        return session
+        self.session = emby_client
 
     def _get_emby_item_details(self, item_id: str, fields: str) -> Dict:
         url = f"{self.server_config.server}/Users/{self.server_config.user_id}/Items/{item_id}"
@@ -164,23 +153,18 @@ class ActorRoleMapperLogic:
             tmdb_key_to_item_id_map = {}
             skipped_count = 0
             
-            ui_logger.info("➡️ [阶段3/6] 正在并发获取所有媒体的 TMDB ID 及类型并进行预过滤...", task_category=task_cat)
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                # --- 修改 2: 请求的字段中增加 Type ---
-                future_to_id = {executor.submit(self._get_emby_item_details, item_id, "ProviderIds,Type"): item_id for item_id in media_ids}
-                for future in as_completed(future_to_id):
-                    if cancellation_event.is_set(): return
-                    item_id = future_to_id[future]
+            ui_logger.info("➡️ [阶段3/6] 正在批量获取所有媒体的 TMDB ID 及类型并进行预过滤...", task_category=task_cat)
+            for details_page in selector.iter_item_details_batch(media_ids, "ProviderIds,Type", cancellation_event=cancellation_event):
+                for details in details_page:
+                    item_id = details.get("Id")
                     try:
-                        details = future.result()
                         provider_ids_lower = {k.lower(): v for k, v in details.get("ProviderIds", {}).items()}
                         tmdb_id = provider_ids_lower.get("tmdb")
                         item_type = details.get("Type") # "Movie" or "Series"
                         
-                        if not tmdb_id or not item_type:
+                        if not item_id or not tmdb_id or not item_type:
                             continue
                         
-                        # --- 修改 3: 构建带前缀的 map_key ---
                         type_prefix = 'tv' if item_type == 'Series' else 'movie'
                         map_key = f"{type_prefix}-{tmdb_id}"
                         
@@ -192,6 +176,7 @@ class ActorRoleMapperLogic:
                         tmdb_key_to_item_id_map[item_id] = map_key
                     except Exception as e:
                         logging.error(f"【调试】预处理媒体 {item_id} 时出错: {e}")
+            if cancellation_event.is_set(): return
 
             if not media_ids_to_process:
                 if generation_mode == 'incremental':
@@ -208,19 +193,14 @@ class ActorRoleMapperLogic:
             processed_count = 0
 
             with ThreadPoolExecutor(max_workers=10) as executor:
-                ui_logger.info("➡️ [阶段4/6] 正在并发获取待处理媒体项的基础详情并裁切演员...", task_category=task_cat)
-                future_to_id = {executor.submit(self._get_emby_item_details, item_id, "People,Name"): item_id for item_id in media_ids_to_process}
+                ui_logger.info("➡️ [阶段4/6] 正在批量获取待处理媒体项的基础详情并裁切演员...", task_category=task_cat)
                 
                 all_actors_to_fetch_details = []
-                media_details_map = {}
+                media_details_map = selector.get_item_details_batch(media_ids_to_process, "People,Name", cancellation_event=cancellation_event)
+                if cancellation_event.is_set(): return
 
-                for future in as_completed(future_to_id):
-                    if cancellation_event.is_set(): return
-                    item_id = future_to_id[future]
+                for item_id, details in media_details_map.items():
                     try:
-                        details = future.result()
-                        media_details_map[item_id] = details
-                        
                         people = details.get("People", [])
                         if people:
                             actors = [p for p in people if p.get('Type') == 'Actor']
@@ -605,69 +585,13 @@ class ActorRoleMapperLogic:
             "Authorization": f"token {self.github_config.personal_access_token}"
         }
         proxies = self.proxy_manager.get_proxies(url)
-        response = self.session.request(method, url, headers=headers, timeout=30, proxies=proxies, **kwargs)
+        response = github_client.request(method, url, headers=headers, timeout=30, proxies=proxies, **kwargs)
         response.raise_for_status()
         return response.json() if response.content else None
     
-    def _execute_github_write_request(self, method: str, url: str, pat: str, payload: Optional[Dict] = None) -> Dict:
-        """通过 curl 执行 GitHub 写入操作（无重试）"""
-        command = [
-            'curl', '-L', '-X', method,
-            '-H', 'Accept: application/vnd.github.v3+json',
-            '-H', f'Authorization: token {pat}',
-            '-H', 'Content-Type: application/json'
-        ]
-        
-        json_payload_str = ""
-        if payload:
-            command.extend(['--data-binary', '@-'])
-            json_payload_str = json.dumps(payload)
-
-        proxies = self.proxy_manager.get_proxies(url)
-        if proxies.get('https'):
-            command.extend(['--proxy', proxies['https']])
-
-        command.append(url)
-
-        result = subprocess.run(command, input=json_payload_str, capture_output=True, text=True, check=False)
-        
-        response_data = {}
-        try:
-            if result.stdout:
-                response_data = json.loads(result.stdout)
-        except json.JSONDecodeError:
-            raise Exception(f"cURL 返回了非JSON响应: {result.stdout or '无输出'} | 错误: {result.stderr or '无错误信息'}")
-
-        if result.returncode != 0 or (response_data.get("message") and response_data.get("documentation_url")):
-            error_message = response_data.get('message', f"cURL 错误: {result.stderr}")
-            if response_data.get('status') == '422' and "sha" in error_message:
-                error_message = f"无效请求 (422)。服务器提示 'sha' 参数有问题。这可能是因为在您操作期间，文件被其他进程修改。请重试。({error_message})"
-            elif "409 Conflict" in result.stderr:
-                error_message = "GitHub API 返回 409 Conflict 错误，这通常是并发写入冲突导致的。请稍后重试。"
-            elif "schannel: failed to receive handshake" in result.stderr or "curl: (35)" in result.stderr:
-                error_message = f"SSL/TLS 握手失败。这通常是临时的网络或代理问题。错误: {result.stderr}"
-            raise Exception(f"GitHub API 错误: {error_message}")
-
-        return response_data
-    
-    def _execute_github_write_request_with_retry(self, method: str, url: str, pat: str, payload: Optional[Dict] = None, task_cat: str = "GitHub写入") -> Dict:
-        """
-        执行 GitHub 写入操作，并增加了针对网络错误的重试逻辑。
-        """
-        max_retries = 3
-        retry_delay = 5  # seconds
-        for attempt in range(max_retries):
-            try:
-                return self._execute_github_write_request(method, url, pat, payload)
-            except Exception as e:
-                error_str = str(e).lower()
-                if "ssl/tls" in error_str or "handshake" in error_str or "curl: (35)" in error_str:
-                    if attempt < max_retries - 1:
-                        ui_logger.warning(f"  - ⚠️ 网络操作失败 (尝试 {attempt + 1}/{max_retries})，将在 {retry_delay} 秒后重试... 原因: {e}", task_category=task_cat)
-                        time.sleep(retry_delay)
-                        continue
-                raise e
-        raise Exception("重试逻辑执行完毕但未能成功。")
+    def _execute_github_write_request(self, method: str, url: str, pat: str, payload: Optional[Dict] = None, content_path: Optional[str] = None) -> Dict:
+        """通过共享的 GitHub 客户端执行写入操作 (连接复用，重试与限速等待由客户端统一处理)"""
+        return github_client.write(method, url, pat, payload, proxies=self.proxy_manager.get_proxies(url), content_path=content_path)
 
     def upload_to_github_task(self, cancellation_event: threading.Event, task_id: str, task_manager: TaskManager):
         task_cat = "演员角色映射-上传"
@@ -680,11 +604,7 @@ class ActorRoleMapperLogic:
             raise FileNotFoundError("本地映射表文件 actor_role_map.json 不存在，请先生成。")
 
         try:
-            ui_logger.info("➡️ [阶段1/3] 正在读取本地文件...", task_category=task_cat)
-            with open(ACTOR_ROLE_MAP_FILE, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            content_b64 = base64.b64encode(content.encode('utf-8')).decode('utf-8')
+            ui_logger.info("➡️ [阶段1/3] 正在准备上传本地文件...", task_category=task_cat)
             api_url = self._get_github_api_url()
 
             ui_logger.info("➡️ [阶段2/3] 正在检查远程文件状态...", task_category=task_cat)
@@ -702,15 +622,12 @@ class ActorRoleMapperLogic:
             ui_logger.info("➡️ [阶段3/3] 正在上传文件...", task_category=task_cat)
             payload = {
                 "message": f"feat: Update actor role map ({time.strftime('%Y-%m-%d %H:%M:%S')})",
-                "content": content_b64,
                 "branch": self.github_config.branch
             }
             if sha:
                 payload["sha"] = sha
             
-            # --- 核心修改：调用新的基于 curl 的上传方法 ---
-            self._execute_github_write_request_with_retry("PUT", api_url, self.github_config.personal_access_token, payload, task_cat=task_cat)
-            # --- 修改结束 ---
+            self._execute_github_write_request("PUT", api_url, self.github_config.personal_access_token, payload, content_path=ACTOR_ROLE_MAP_FILE)
             
             ui_logger.info("✅ 上传成功！映射表已同步到 GitHub 仓库。", task_category=task_cat)
 
@@ -749,7 +666,7 @@ class ActorRoleMapperLogic:
                 ui_logger.info(f"   - 文件大小为 {file_size_mb:.2f} MB (>1MB)，将通过下载链接获取...", task_category=task_cat)
                 
                 proxies = self.proxy_manager.get_proxies(download_url)
-                response = self.session.get(download_url, timeout=60, proxies=proxies) # 增加大文件下载超时
+                response = github_client.get(download_url, timeout=60, proxies=proxies) # 增加大文件下载超时
                 response.raise_for_status()
                 content = response.text
             else:
@@ -774,56 +691,15 @@ class ActorRoleMapperLogic:
         
     def _fetch_all_persons_index(self) -> Dict[str, Dict]:
         """
-        一次性拉取全库演员数据，构建索引。
+        获取全库演员索引 (进程内共享，持久化到磁盘并按 DateLastSaved 增量刷新)。
         返回结构:
         {
-            "by_id": {
-                "EmbyId": { "Name": "张三", "ProviderIds": {...} }
-            },
-            "name_count": {
-                "张三": 2,
-                "李四": 1
-            }
+            "by_id": { "EmbyId": { "Name": "张三", "ProviderIds": {...} } },
+            "name_count": { "张三": 2, "李四": 1 }
         }
+        两者均为兼容字典用法的视图；索引不可用时返回空字典，后续将回退到慢速模式。
         """
-        ui_logger.info("➡️ [索引构建] 正在拉取全库演员数据以加速匹配...", task_category="演员角色映射-索引")
-        start_time = time.time()
-        try:
-            url = f"{self.server_config.server}/Items"
-            params = {
-                "api_key": self.server_config.api_key,
-                "Recursive": "true",
-                "IncludeItemTypes": "Person",
-                "Fields": "ProviderIds,Name"
-            }
-            # 增加超时时间，因为数据量可能很大
-            response = self.session.get(url, params=params, timeout=120)
-            response.raise_for_status()
-            items = response.json().get("Items", [])
-            
-            by_id_index = {}
-            name_count_index = {}
-
-            for item in items:
-                name = item.get("Name")
-                by_id_index[item['Id']] = {
-                    "Name": name,
-                    "ProviderIds": item.get("ProviderIds", {})
-                }
-                if name:
-                    name_count_index[name] = name_count_index.get(name, 0) + 1
-            
-            duration = time.time() - start_time
-            ui_logger.info(f"✅ [索引构建] 完成！耗时 {duration:.2f} 秒，共索引 {len(by_id_index)} 位演员。", task_category="演员角色映射-索引")
-            
-            return {
-                "by_id": by_id_index,
-                "name_count": name_count_index
-            }
-        except Exception as e:
-            ui_logger.error(f"❌ [索引构建] 失败: {e}，后续将回退到慢速模式。", task_category="演员角色映射-索引")
-            return {}
-    
+        return shared_person_index.get_index(self.config)
 
     def restore_single_map_task(self, item_ids: List[str], role_map: Dict, title: str, cancellation_event: threading.Event, task_id: str, task_manager: Optional[TaskManager] = None, task_category: Optional[str] = None, person_index: Optional[Dict] = None):
         """
@@ -994,9 +870,8 @@ class ActorRoleMapperLogic:
                                 person_in_list = next((p for p in current_people_base if p.get("Id") == person_id), None)
                                 if person_in_list:
                                     person_in_list["Name"] = target_name
-                                # 更新索引计数
-                                index_name_count[current_name] = max(0, index_name_count.get(current_name, 1) - 1)
-                                index_name_count[target_name] = index_name_count.get(target_name, 0) + 1
+                                # 同步共享索引中的姓名与重名计数
+                                shared_person_index.apply_rename(person_id, current_name, target_name)
                             else:
                                 raise Exception(f"直连改名 {current_name} -> {target_name} 失败。")
 
@@ -1045,10 +920,9 @@ class ActorRoleMapperLogic:
                         logging.debug(log_msg)
                         
                         if self._rename_person_by_id(person_id, target_name, task_cat):
-                            # 更新索引计数
+                            # 同步共享索引中的姓名与重名计数
                             if index_name_count:
-                                index_name_count[original_name] = max(0, index_name_count.get(original_name, 1) - 1)
-                                index_name_count[target_name] = index_name_count.get(target_name, 0) + 1
+                                shared_person_index.apply_rename(person_id, original_name, target_name)
                         else:
                             ui_logger.error(f"         - ❌ 恢复演员 (ID: {person_id}) 名称失败！请手动将其名称修改为 `{target_name}`。", task_category=task_cat)
                 
@@ -1134,13 +1008,9 @@ class ActorRoleMapperLogic:
             return
 
         ui_logger.info("➡️ [阶段2/5] 正在加载 TMDB-Emby ID 映射表...", task_category=task_cat)
-        id_map_file = os.path.join('/app/data', 'id_map.json')
-        if not os.path.exists(id_map_file):
+        if not id_map_service.has_data():
             ui_logger.error("❌ 关键文件 id_map.json 不存在！请先在“定时任务”页面生成该映射表。", task_category=task_cat)
             raise FileNotFoundError("ID映射表 (id_map.json) 不存在。")
-        with open(id_map_file, 'r', encoding='utf-8') as f:
-            id_map = json.load(f)
-        ui_logger.info("   - ❗ 提示：恢复操作将基于您上一次生成的 `id_map.json`。为确保结果准确，建议在恢复前重新生成ID映射表。", task_category=task_cat)
 
         # --- 新增步骤：构建全量演员索引 ---
         ui_logger.info("➡️ [阶段3/5] 正在构建全量演员索引...", task_category=task_cat)
@@ -1168,7 +1038,7 @@ class ActorRoleMapperLogic:
             processed_works_count += 1
             task_manager.update_task_progress(task_id, processed_works_count, total_works_to_process)
 
-            emby_ids_from_map = id_map.get(map_key, [])
+            emby_ids_from_map = id_map_service.lookup(map_key)
             item_ids_to_process = list(media_ids_in_scope.intersection(emby_ids_from_map))
             
             if not item_ids_to_process:
@@ -8,7 +8,8 @@ import json
 from log_manager import ui_logger
 from models import AppConfig, ScheduledTasksTargetScope, ActorRoleMapperConfig
 from actor_role_mapper_logic import ActorRoleMapperLogic, ACTOR_ROLE_MAP_FILE
-from task_manager import task_manager
+from task_manager import task_manager, RESOURCE_GITHUB_WRITE
+from id_map_service import id_map_service
 import config as app_config
 
 router = APIRouter()
@@ -69,7 +70,8 @@ def upload_map():
     logic = get_logic()
     task_id = task_manager.register_task(
         logic.upload_to_github_task,
-        "上传映射表到GitHub"
+        "上传映射表到GitHub",
+        resources=[RESOURCE_GITHUB_WRITE]
     )
     return {"status": "success", "message": "上传任务已启动。", "task_id": task_id}
 
@@ -121,15 +123,7 @@ def get_media_actors(item_id: str):
 @router.get("/avatars/{map_key}")
 def get_avatars_by_tmdb_id(map_key: str):
     """通过 map_key (例如 movie-12345) 获取演员头像信息，用于前端展示"""
-    id_map_file = os.path.join('/app/data', 'id_map.json')
-    if not os.path.exists(id_map_file):
-        return []
-    
-    with open(id_map_file, 'r', encoding='utf-8') as f:
-        id_map = json.load(f)
-    
-    # --- 修改 2: 直接使用 map_key 进行查询 ---
-    item_ids = id_map.get(map_key)
+    item_ids = id_map_service.lookup(map_key)
     if not item_ids:
         return []
 
@@ -153,15 +147,10 @@ def restore_single_map(req: SingleMapRequest):
     if not map_key:
         raise HTTPException(status_code=400, detail="请求数据缺少 map_key")
 
-    id_map_file = os.path.join('/app/data', 'id_map.json')
-    if not os.path.exists(id_map_file):
+    if not id_map_service.has_data():
         raise HTTPException(status_code=404, detail="ID映射表 (id_map.json) 不存在，无法进行单体恢复。请先在“定时任务”页面生成映射表。")
     
-    with open(id_map_file, 'r', encoding='utf-8') as f:
-        id_map = json.load(f)
-    
-    # --- 修改 2: 使用 map_key 进行查询 ---
-    item_ids = id_map.get(map_key)
+    item_ids = id_map_service.lookup(map_key)
     if not item_ids:
         raise HTTPException(status_code=404, detail=f"在您的 Emby 库中未找到与作品《{title}》匹配的媒体项。请确认 ID 映射表是否为最新。")
 
@@ -0,0 +1,99 @@
+# backend/blob_hash_cache.py
+
+import os
+import hashlib
+import sqlite3
+import logging
+import threading
+from typing import Dict, Optional, Iterable
+
+BLOB_HASH_CACHE_DB_FILE = os.path.join('/app/data', 'blob_hash_cache.db')
+
+# 计算哈希时每次读取的块大小，大文件不会整体读入内存
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blob_hashes (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha TEXT NOT NULL
+);
+"""
+
+
+def compute_git_blob_sha(path: str) -> str:
+    """按 git 的规则 (sha1("blob <size>\\0" + 内容)) 流式计算文件的 blob SHA，与 GitHub 返回的 sha 一致"""
+    digest = hashlib.sha1(f"blob {os.path.getsize(path)}\0".encode('ascii'))
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BlobHashCache:
+    """
+    本地文件 git blob SHA 的持久化缓存，以 (路径, 修改时间, 大小) 判断是否需要重新计算。
+    备份任务用它与远程索引中记录的 sha 比较，内容未变化的文件无需再次上传。
+    """
+    def __init__(self, db_path: str = BLOB_HASH_CACHE_DB_FILE):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    def _get_conn(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None:
+            try:
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+                conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(_SCHEMA)
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                logging.error(f"【哈希缓存】打开哈希缓存数据库失败，将每次重新计算: {e}")
+                return None
+        return self._conn
+
+    def get_many(self, paths: Iterable[str]) -> Dict[str, str]:
+        """
+        返回 {路径: blob SHA}。文件未变化时直接使用缓存，否则重新计算并写回缓存；
+        无法读取的文件不会出现在结果中。
+        """
+        result: Dict[str, str] = {}
+        updates = []
+        with self._lock:
+            conn = self._get_conn()
+            for path in paths:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                row = None
+                if conn is not None:
+                    row = conn.execute("SELECT mtime_ns, size, sha FROM blob_hashes WHERE path = ?", (path,)).fetchone()
+                if row and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+                    result[path] = row[2]
+                    continue
+                try:
+                    sha = compute_git_blob_sha(path)
+                except OSError as e:
+                    logging.warning(f"【哈希缓存】计算文件哈希失败: {path}，错误: {e}")
+                    continue
+                result[path] = sha
+                updates.append((path, stat.st_mtime_ns, stat.st_size, sha))
+
+            if updates and conn is not None:
+                try:
+                    conn.executemany("INSERT OR REPLACE INTO blob_hashes (path, mtime_ns, size, sha) VALUES (?, ?, ?, ?)", updates)
+                    conn.commit()
+                except sqlite3.Error as e:
+                    logging.warning(f"【哈希缓存】写入哈希缓存失败: {e}")
+        return result
+
+    def get(self, path: str) -> Optional[str]:
+        return self.get_many([path]).get(path)
+
+
+blob_hash_cache = BlobHashCache()
@@ -16,6 +16,7 @@ from episode_refresher_logic import EpisodeRefresherLogic
 from episode_renamer_logic import EpisodeRenamerLogic, RENAME_LOG_FILE
 from notification_manager import notification_manager, escape_markdown
 from task_manager import TaskManager
+from library_mirror import library_mirror
 
 CHASING_LIST_FILE = os.path.join('/app/data', 'chasing_series.json')
 
@@ -28,6 +29,23 @@ class ChasingCenterLogic:
         self.episode_renamer = EpisodeRenamerLogic(config)
         self.memory_cache: Dict[str, Any] = {}
 
+    def _use_mirror_for(self, series_id: str) -> bool:
+        return bool(self.config.library_mirror_config.enabled and library_mirror.is_ready() and library_mirror.get_item(series_id))
+
+    def _get_emby_episode_numbers(self, series_id: str) -> List[Dict[str, Any]]:
+        """获取剧集在 Emby 中所有分集的季号/集号，镜像就绪时直接读取本地镜像"""
+        if self._use_mirror_for(series_id):
+            return library_mirror.get_series_episodes(series_id)
+        episodes_url = f"{self.config.server_config.server}/Items"
+        episodes_params = {
+            "api_key": self.config.server_config.api_key, 
+            "ParentId": series_id, 
+            "IncludeItemTypes": "Episode", 
+            "Recursive": "true", 
+            "Fields": "ParentIndexNumber"
+        }
+        return self.episode_refresher.session.get(episodes_url, params=episodes_params, timeout=30).json().get("Items", [])
+
     def _get_chasing_list(self) -> List[Dict[str, Any]]:
         """安全地读取追更列表文件，并兼容新旧格式"""
         if not os.path.exists(CHASING_LIST_FILE):
@@ -69,6 +87,23 @@ class ChasingCenterLogic:
 
 
 
+    def _is_tmdb_cache_fresh(self, item_data: Dict, cache_duration_memory: int) -> bool:
+        """判断追更条目的 TMDB 数据是否仍在内存或文件缓存的有效期内 (与列表处理中的判断规则一致)"""
+        tmdb_id = item_data.get("tmdb_id")
+        cached_item = self.memory_cache.get(tmdb_id)
+        if cached_item and time.time() - cached_item.get("timestamp", 0) < cache_duration_memory:
+            return True
+        file_cache = item_data.get("cache")
+        if not file_cache:
+            return False
+        cached_status = file_cache.get("data", {}).get("details", {}).get("status")
+        cache_duration_file = 14 * 86400 if cached_status in ["Ended", "Canceled"] else 1 * 86400
+        try:
+            cached_at = datetime.fromisoformat(file_cache.get("timestamp", "1970-01-01T00:00:00Z")).timestamp()
+        except ValueError:
+            return False
+        return time.time() - cached_at < cache_duration_file
+
     # backend/chasing_center_logic.py (函数替换)
 
     def get_detailed_chasing_list(self) -> List[Dict]:
@@ -96,6 +131,15 @@ class ChasingCenterLogic:
 
         trakt_manager = TraktManager(self.config)
 
+        # 预先并发获取所有缓存已过期剧集的 TMDB 详情 (受全局限速约束)，下方逐个处理时直接命中 TMDB 缓存
+        stale_tmdb_ids = [
+            item.get("tmdb_id") for item in chasing_items_in_memory
+            if item.get("tmdb_id") and not self._is_tmdb_cache_fresh(item, cache_duration_memory)
+        ]
+        if stale_tmdb_ids:
+            ui_logger.info(f"➡️ [追更-API] 有 {len(stale_tmdb_ids)} 部剧集的缓存已过期，正在并发预取 TMDB 详情...", task_category=task_cat)
+            self.tmdb_logic.get_many([(f"tv/{tid}", None) for tid in stale_tmdb_ids])
+
         for item_data in chasing_items_in_memory:
             emby_id = item_data.get("emby_id")
             tmdb_id = item_data.get("tmdb_id")
@@ -121,15 +165,7 @@ class ChasingCenterLogic:
                         ui_logger.warning(f"⚠️ [追更] 剧集《{emby_details.get('Name')}》缺少 TMDB ID，无法处理。", task_category=task_cat)
                         continue
                 
-                episodes_url = f"{self.config.server_config.server}/Items"
-                episodes_params = {
-                    "api_key": self.config.server_config.api_key, 
-                    "ParentId": emby_id, 
-                    "IncludeItemTypes": "Episode", 
-                    "Recursive": "true", 
-                    "Fields": "ParentIndexNumber"
-                }
-                emby_episodes_full_list = self.episode_refresher.session.get(episodes_url, params=episodes_params, timeout=30).json().get("Items", [])
+                emby_episodes_full_list = self._get_emby_episode_numbers(emby_id)
                 emby_total_episodes_count = len(emby_episodes_full_list)
 
                 tmdb_cache_data = None
@@ -990,7 +1026,11 @@ class ChasingCenterLogic:
             series_name = "未知剧集"
             series_year = ""
             try:
-                emby_details = self.episode_refresher._get_emby_item_details(series_data.get("emby_id"), fields="Name,ProductionYear")
+                series_emby_id = series_data.get("emby_id")
+                if self._use_mirror_for(series_emby_id):
+                    emby_details = library_mirror.get_item(series_emby_id)
+                else:
+                    emby_details = self.episode_refresher._get_emby_item_details(series_emby_id, fields="Name,ProductionYear")
                 if emby_details:
                     series_name = emby_details.get("Name")
                     series_year = emby_details.get("ProductionYear")
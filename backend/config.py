@@ -2,6 +2,10 @@
 import json
 import os
 import logging
+import threading
+from types import MappingProxyType
+from typing import Any, Optional, Tuple
+from pydantic import BaseModel
 from models import AppConfig
 
 CONFIG_FILE = os.path.join('/app/data', 'config.json')
@@ -29,13 +33,60 @@ DEFAULT_SF_MODEL_REMARKS = {
     "deepseek-ai/DeepSeek-V2.5": "（收费 输入：￥1.33/ M Tokens）"
 }
 
+# --- 进程内配置缓存 ---
+# 缓存的配置快照及其对应的文件状态 (mtime_ns, size)，文件被外部修改后自动失效
+_cache_lock = threading.RLock()
+_cached_config: Optional[AppConfig] = None
+_cached_stat: Optional[Tuple[int, int]] = None
+_migrated = False
 
 
-def load_app_config() -> AppConfig:
-    config_dir = os.path.dirname(CONFIG_FILE)
-    if not os.path.exists(config_dir):
-        os.makedirs(config_dir, exist_ok=True)
+class ReadOnlyConfig:
+    """
+    配置快照的只读视图。属性读取时嵌套的模型、字典、列表也以只读形式返回
+    (模型 -> ReadOnlyConfig，字典 -> MappingProxyType，列表 -> tuple)，任何赋值都会抛出 TypeError，
+    避免某个调用方修改共享快照而影响其他线程。需要可修改的配置时调用 model_copy(deep=True) 或使用 load_app_config。
+    """
+    __slots__ = ('_target',)
+
+    def __init__(self, target: BaseModel):
+        object.__setattr__(self, '_target', target)
+
+    def __getattr__(self, name: str) -> Any:
+        return _freeze(getattr(self._target, name))
+
+    def __setattr__(self, name: str, value: Any):
+        raise TypeError(f"配置快照是只读的，无法修改属性 '{name}'；请改用 load_app_config() 获取可修改的副本。")
+
+    def __delattr__(self, name: str):
+        raise TypeError(f"配置快照是只读的，无法删除属性 '{name}'。")
 
+    def __eq__(self, other: Any) -> bool:
+        return self._target == (other._target if isinstance(other, ReadOnlyConfig) else other)
+
+    def __repr__(self) -> str:
+        return f"ReadOnlyConfig({self._target!r})"
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return ReadOnlyConfig(value)
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _file_stat() -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(CONFIG_FILE)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def _read_config_data() -> dict:
     config_data = {}
     if os.path.exists(CONFIG_FILE):
         try:
@@ -44,7 +95,61 @@ def load_app_config() -> AppConfig:
                 if content:
                     config_data = json.loads(content)
         except (json.JSONDecodeError, IOError):
-            pass 
+            pass
+    return config_data
+
+
+def get_app_config() -> ReadOnlyConfig:
+    """
+    返回进程内共享配置快照的只读视图 (如图片代理、Webhook 等高频路径)，尝试修改会抛出 TypeError。
+    - 首次调用时执行完整的兼容迁移链，之后仅在文件被外部修改 (mtime/size 变化) 时重新解析。
+    - save_app_config 会直接替换缓存的快照，无需重新读取磁盘。
+    需要修改配置或把配置交给会修改它的 *_logic 构造函数时，请使用 load_app_config，它返回可安全修改的独立副本。
+    """
+    return ReadOnlyConfig(_get_cached_config())
+
+
+def _get_cached_config() -> AppConfig:
+    global _cached_config, _cached_stat, _migrated
+    current_stat = _file_stat()
+    cached = _cached_config
+    if cached is not None and current_stat is not None and current_stat == _cached_stat:
+        return cached
+
+    with _cache_lock:
+        current_stat = _file_stat()
+        if _cached_config is not None and current_stat is not None and current_stat == _cached_stat:
+            return _cached_config
+        if not _migrated or current_stat is None:
+            new_config = _migrate_and_load()
+            _migrated = True
+        else:
+            logging.info("【配置】检测到配置文件已被外部修改，重新加载。")
+            try:
+                new_config = AppConfig(**_read_config_data())
+            except Exception as e:
+                logging.error(f"【配置】重新加载配置文件失败，继续使用缓存的配置: {e}")
+                if _cached_config is not None:
+                    _cached_stat = current_stat
+                    return _cached_config
+                raise
+        _cached_config = new_config
+        _cached_stat = _file_stat()
+        return new_config
+
+
+def load_app_config() -> AppConfig:
+    """返回当前配置的独立副本，调用方可以自由修改后交给 save_app_config 保存"""
+    return _get_cached_config().model_copy(deep=True)
+
+
+def _migrate_and_load() -> AppConfig:
+    """读取配置文件并执行完整的兼容迁移链，仅在进程首次加载配置时调用"""
+    config_dir = os.path.dirname(CONFIG_FILE)
+    if not os.path.exists(config_dir):
+        os.makedirs(config_dir, exist_ok=True)
+
+    config_data = _read_config_data()
 
     if "proxy_config" not in config_data:
         config_data["proxy_config"] = {"enabled": False, "url": "", "exclude": "", "mode": "blacklist", "target_tmdb": False, "target_douban": True, "target_emby": True, "custom_rules": []}
@@ -192,6 +297,14 @@ def load_app_config() -> AppConfig:
         config_data["douban_metadata_refresher_config"] = {}
         migration_needed = True
 
+    if "library_mirror_config" not in config_data:
+        config_data["library_mirror_config"] = {}
+        migration_needed = True
+
+    if "tmdb_cache_config" not in config_data:
+        config_data["tmdb_cache_config"] = {}
+        migration_needed = True
+
     if "subtitle_processor_config" in config_data:
         del config_data["subtitle_processor_config"]
 
@@ -225,10 +338,15 @@ def load_app_config() -> AppConfig:
 
 
 def save_app_config(app_config: AppConfig):
+    global _cached_config, _cached_stat
     config_dir = os.path.dirname(CONFIG_FILE)
     if not os.path.exists(config_dir):
         os.makedirs(config_dir, exist_ok=True)
-        
-    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-        dump_data = app_config.model_dump(mode='json')
-        json.dump(dump_data, f, ensure_ascii=False, indent=4)
\ No newline at end of file
+
+    with _cache_lock:
+        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
+            dump_data = app_config.model_dump(mode='json')
+            json.dump(dump_data, f, ensure_ascii=False, indent=4)
+        # 保存副本作为新的快照，调用方后续对传入对象的修改不会污染缓存
+        _cached_config = app_config.model_copy(deep=True)
+        _cached_stat = _file_stat()
\ No newline at end of file
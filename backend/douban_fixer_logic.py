@@ -17,6 +17,7 @@ import difflib
 from log_manager import ui_logger
 from models import AppConfig, ScheduledTasksTargetScope
 from task_manager import TaskManager
+from emby_client import emby_client
 
 DOUBAN_FIXER_CACHE_FILE = os.path.join('/app/data', 'douban_fix_cache.json')
 
@@ -29,6 +30,7 @@ class DoubanFixerLogic:
         self.api_key = self.server_config.api_key
         self.user_id = self.server_config.user_id
         self.params = {"api_key": self.api_key}
+        self.emby_session = emby_client
         self.session = requests.Session()
         
         self.session.headers.update({
@@ -40,7 +42,7 @@ class DoubanFixerLogic:
         try:
             url = f"{self.base_url}/Users/{self.user_id}/Items/{item_id}"
             params = {**self.params, "Fields": "ProviderIds,ProductionYear,Name"}
-            response = self.session.get(url, params=params, timeout=15)
+            response = self.emby_session.get(url, params=params, timeout=15)
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
@@ -68,7 +70,7 @@ class DoubanFixerLogic:
             
             update_url = f"{self.base_url}/Items/{item_id}"
             headers = {'Content-Type': 'application/json'}
-            response = self.session.post(update_url, params=self.params, json=item_details, headers=headers, timeout=20)
+            response = self.emby_session.post(update_url, params=self.params, json=item_details, headers=headers, timeout=20)
             response.raise_for_status()
             
             log_msg = f"旧媒体: 【{item_name}】({item_details.get('ProductionYear', 'N/A')}) ---> 新媒体: 豆瓣ID {douban_id}"
@@ -5,13 +5,16 @@ import json
 import logging
 import threading
 from typing import List
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from task_manager import TaskManager
 import config as app_config
 from models import DoubanCacheStatus
 from log_manager import ui_logger
+from douban_store import douban_store
 
-DOUBAN_CACHE_FILE = os.path.join('/app/data', 'douban_data.json')
+# 解析线程数的默认值，以及每批汇报一次进度的文件夹数量
+DEFAULT_SCAN_WORKERS = 8
+PROGRESS_BATCH_SIZE = 200
 
 def _parse_folder_name(folder_name):
     douban_id = 'N/A'
@@ -28,161 +31,200 @@ def _parse_folder_name(folder_name):
         douban_id = folder_name
     return douban_id, imdb_id
 
-# backend/douban_manager.py (函数替换)
-
-def scan_douban_directory_task(directory: str, extra_fields: List[str], cancellation_event: threading.Event, task_id: str, task_manager: TaskManager):
-    task_cat = "豆瓣扫描"
-    ui_logger.info("➡️ 【步骤 1/5】任务启动，开始扫描豆瓣数据目录...", task_category=task_cat)
-    
-    movie_dir = os.path.join(directory, 'douban-movies')
-    series_dir = os.path.join(directory, 'douban-tv')
-    
+def build_douban_item_data(data: dict, media_type: str, imdb_id: str, extra_fields: List[str]) -> dict:
+    """从豆瓣元数据文件内容中提取需要缓存的字段"""
+    #下方genres后移除简介  'intro': data.get('intro', ''),
+    item_data = {
+        'type': media_type,
+        'title': data.get('title', 'N/A'),
+        'year': data.get('year', ''),
+        'genres': data.get('genres', []),
+        'pic': data.get('pic', {}),
+        'actors': [
+            {
+                'id': actor.get('id'),
+                'name': actor.get('name'),
+                'latin_name': actor.get('latin_name'),
+                'character': actor.get('character'),
+                'avatar': actor.get('avatar', {})
+            } for actor in data.get('actors', [])
+        ],
+        'imdb_id': imdb_id,
+        'countries': data.get('countries', [])
+    }
+
+    if 'rating' in extra_fields:
+        item_data['rating'] = data.get('rating', {}).get('value')
+    if 'pubdate' in extra_fields:
+        item_data['pubdate'] = data.get('pubdate', [])
+    if 'card_subtitle' in extra_fields:
+        item_data['card_subtitle'] = data.get('card_subtitle', '')
+    if 'languages' in extra_fields:
+        item_data['languages'] = data.get('languages', [])
+    if 'durations' in extra_fields and media_type == 'Movie':
+        item_data['durations'] = data.get('durations', [])
+    return item_data
+
+def _stat_json(json_path: str) -> tuple:
+    try:
+        st = os.stat(json_path)
+        return (st.st_mtime, st.st_size)
+    except OSError:
+        return (-1, -1)
+
+def _list_media_folders(directory: str, executor: ThreadPoolExecutor) -> List[dict]:
+    """
+    列出豆瓣数据目录下的所有媒体文件夹，并记录元数据文件的 mtime/size 用于增量比对。
+    stat 调用在网络存储上延迟较高，交由线程池并发执行。
+    """
     media_folders = []
-    if os.path.isdir(movie_dir):
-        for folder in os.listdir(movie_dir):
-            full_path = os.path.join(movie_dir, folder)
-            if os.path.isdir(full_path):
-                media_folders.append({'path': full_path, 'type': 'Movie'})
-    
-    if os.path.isdir(series_dir):
-        for folder in os.listdir(series_dir):
-            full_path = os.path.join(series_dir, folder)
-            if os.path.isdir(full_path):
-                media_folders.append({'path': full_path, 'type': 'TVShow'})
+    for sub_dir, media_type in (('douban-movies', 'Movie'), ('douban-tv', 'TVShow')):
+        base_dir = os.path.join(directory, sub_dir)
+        if not os.path.isdir(base_dir):
+            continue
+        json_filename = 'all.json' if media_type == 'Movie' else 'series.json'
+        with os.scandir(base_dir) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    media_folders.append({'path': entry.path, 'type': media_type, 'json_path': os.path.join(entry.path, json_filename)})
+    for folder, stat_key in zip(media_folders, executor.map(_stat_json, [f['json_path'] for f in media_folders])):
+        folder['stat'] = stat_key
+    return media_folders
+
+def _parse_media_folder(folder_info: dict, extra_fields: List[str]):
+    """
+    解析单个媒体文件夹，返回 (状态, 豆瓣ID, 条目数据)。
+    状态: ok / no_json / no_id / json_error / error
+    """
+    folder_path = folder_info['path']
+    folder_name = os.path.basename(folder_path)
+    json_path = folder_info['json_path']
+
+    if folder_info['stat'] == (-1, -1) or not os.path.isfile(json_path):
+        logging.warning(f"【豆瓣扫描-跳过】在目录【{folder_path}】中未找到元数据文件 {os.path.basename(json_path)}。")
+        return 'no_json', None, None
+
+    try:
+        douban_id, imdb_id = _parse_folder_name(folder_name)
+        if douban_id == 'N/A':
+            logging.warning(f"【豆瓣扫描-跳过】无法从文件夹名【{folder_name}】解析出豆瓣ID。")
+            return 'no_id', None, None
+
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        return 'ok', douban_id, build_douban_item_data(data, folder_info['type'], imdb_id, extra_fields)
+    except json.JSONDecodeError:
+        logging.error(f"【豆瓣扫描-错误】解析JSON文件失败: {json_path}")
+        return 'json_error', None, None
+    except Exception as e:
+        logging.error(f"【豆瓣扫描-错误】处理文件夹【{folder_path}】时发生未知错误: {e}", exc_info=True)
+        return 'error', None, None
 
+def _manifest_signature(directory: str, extra_fields: List[str]) -> str:
+    """扫描目录或附加字段变化后，旧清单不再可用，需要全量重建"""
+    return json.dumps({'directory': directory, 'extra_fields': sorted(extra_fields)}, ensure_ascii=False)
+
+def scan_douban_directory_task(directory: str, extra_fields: List[str], cancellation_event: threading.Event, task_id: str, task_manager: TaskManager, incremental: bool = False, workers: int = DEFAULT_SCAN_WORKERS):
+    task_cat = "豆瓣扫描"
+    workers = max(1, workers)
+    ui_logger.info(f"➡️ 【步骤 1/5】任务启动，开始扫描豆瓣数据目录 (并发线程: {workers})...", task_category=task_cat)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return _scan_douban_directory(directory, extra_fields, incremental, executor, cancellation_event, task_id, task_manager, task_cat)
+
+def _scan_douban_directory(directory: str, extra_fields: List[str], incremental: bool, executor: ThreadPoolExecutor,
+                           cancellation_event: threading.Event, task_id: str, task_manager: TaskManager, task_cat: str):
+    media_folders = _list_media_folders(directory, executor)
     total_folders = len(media_folders)
-    task_manager.update_task_progress(task_id, 0, total_folders)
-    
     ui_logger.info(f"✅ 【步骤 2/5】目录扫描完成，共找到 {total_folders} 个媒体文件夹。", task_category=task_cat)
+
+    signature = _manifest_signature(directory, extra_fields)
+    manifest = douban_store.get_manifest(signature) if incremental and douban_store.exists() else None
+    if incremental and manifest is None:
+        ui_logger.info("ℹ️ 未找到可用的扫描清单 (首次扫描或扫描参数已变化)，将执行全量重建。", task_category=task_cat)
+
+    if manifest is not None:
+        current_paths = {folder['path'] for folder in media_folders}
+        folders_to_parse = [
+            folder for folder in media_folders
+            if folder['path'] not in manifest or manifest[folder['path']][:2] != folder['stat']
+        ]
+        removed_paths = [path for path in manifest if path not in current_paths]
+        ui_logger.info(f"🔄 增量模式：{len(folders_to_parse)} 个文件夹新增或变更，{len(removed_paths)} 个文件夹已移除。", task_category=task_cat)
+    else:
+        folders_to_parse = media_folders
+        removed_paths = []
+
+    total_to_parse = len(folders_to_parse)
+    task_manager.update_task_progress(task_id, 0, total_to_parse)
     ui_logger.info("➡️ 【步骤 3/5】开始解析元数据文件，过程中的详细日志将写入后端日志文件...", task_category=task_cat)
     
     final_data = {}
-    found_count = 0
-    skipped_no_json_count = 0
-    skipped_no_id_count = 0
-    error_json_count = 0
-    error_unknown_count = 0
+    manifest_updates = {}
+    counts = {'ok': 0, 'no_json': 0, 'no_id': 0, 'json_error': 0, 'error': 0}
 
-    for i, folder_info in enumerate(media_folders):
+    # 按批提交给线程池并行解析，executor.map 保证结果按输入顺序汇总；每批结束时检查取消并汇报一次进度
+    for batch_start in range(0, total_to_parse, PROGRESS_BATCH_SIZE):
         if cancellation_event.is_set():
             ui_logger.warning("⚠️ 任务被用户取消。", task_category=task_cat)
             return
 
-        folder_path = folder_info['path']
-        folder_name = os.path.basename(folder_path)
-        media_type = folder_info['type']
-        
-        # 仅在进度条更新时使用 logging.debug 记录详细信息到后端日志
-        if (i + 1) % 100 == 0 or (i + 1) == total_folders:
-            logging.debug(f"【豆瓣扫描】进度 {i+1}/{total_folders}: 正在处理【{folder_name}】")
-        
-        task_manager.update_task_progress(task_id, i + 1, total_folders)
+        batch = folders_to_parse[batch_start:batch_start + PROGRESS_BATCH_SIZE]
+        results = executor.map(lambda folder: _parse_media_folder(folder, extra_fields), batch)
+        for folder_info, (status, douban_id, item_data) in zip(batch, results):
+            counts[status] += 1
+            if status == 'ok':
+                final_data[douban_id] = item_data
+            # 解析出错的文件夹不写入清单，下次扫描时会重试
+            if status in ('ok', 'no_json', 'no_id'):
+                manifest_updates[folder_info['path']] = (*folder_info['stat'], douban_id)
 
-        json_filename = 'all.json' if media_type == 'Movie' else 'series.json'
-        json_path = os.path.join(folder_path, json_filename)
-
-        if not os.path.isfile(json_path):
-            logging.warning(f"【豆瓣扫描-跳过】在目录【{folder_path}】中未找到元数据文件 {json_filename}。")
-            skipped_no_json_count += 1
-            continue
-
-        try:
-            douban_id, imdb_id = _parse_folder_name(folder_name)
-            if douban_id == 'N/A':
-                logging.warning(f"【豆瓣扫描-跳过】无法从文件夹名【{folder_name}】解析出豆瓣ID。")
-                skipped_no_id_count += 1
-                continue
-
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
-
-            #下方genres后移除简介  'intro': data.get('intro', ''),
-            item_data = {
-                'type': media_type,
-                'title': data.get('title', 'N/A'),
-                'year': data.get('year', ''),
-                'genres': data.get('genres', []),
-                'pic': data.get('pic', {}),
-                'actors': [
-                    {
-                        'id': actor.get('id'),
-                        'name': actor.get('name'),
-                        'latin_name': actor.get('latin_name'),
-                        'character': actor.get('character'),
-                        'avatar': actor.get('avatar', {})
-                    } for actor in data.get('actors', [])
-                ],
-                'imdb_id': imdb_id,
-                'countries': data.get('countries', [])
-            }
-
-            if 'rating' in extra_fields:
-                item_data['rating'] = data.get('rating', {}).get('value')
-            if 'pubdate' in extra_fields:
-                item_data['pubdate'] = data.get('pubdate', [])
-            if 'card_subtitle' in extra_fields:
-                item_data['card_subtitle'] = data.get('card_subtitle', '')
-            if 'languages' in extra_fields:
-                item_data['languages'] = data.get('languages', [])
-            if 'durations' in extra_fields and media_type == 'Movie':
-                item_data['durations'] = data.get('durations', [])
-            
-            final_data[douban_id] = item_data
-            found_count += 1
-        except json.JSONDecodeError:
-            logging.error(f"【豆瓣扫描-错误】解析JSON文件失败: {json_path}")
-            error_json_count += 1
-        except Exception as e:
-            logging.error(f"【豆瓣扫描-错误】处理文件夹【{folder_path}】时发生未知错误: {e}", exc_info=True)
-            error_unknown_count += 1
+        processed = batch_start + len(batch)
+        logging.debug(f"【豆瓣扫描】进度 {processed}/{total_to_parse}: 已处理至【{os.path.basename(batch[-1]['path'])}】")
+        task_manager.update_task_progress(task_id, processed, total_to_parse)
 
     ui_logger.info(f"✅ 【步骤 4/5】元数据解析完成！", task_category=task_cat)
     # --- 汇总报告 ---
     ui_logger.info(f"""
     - - - - - - - - 扫描结果汇总 - - - - - - - -
-    ✅ 成功解析: {found_count} 条
-    ⚠️ 跳过 (缺少元数据文件): {skipped_no_json_count} 条
-    ⚠️ 跳过 (无法解析ID): {skipped_no_id_count} 条
-    ❌ 失败 (JSON格式错误): {error_json_count} 条
-    ❌ 失败 (其他未知错误): {error_unknown_count} 条
+    ✅ 成功解析: {counts['ok']} 条
+    ⚠️ 跳过 (缺少元数据文件): {counts['no_json']} 条
+    ⚠️ 跳过 (无法解析ID): {counts['no_id']} 条
+    ❌ 失败 (JSON格式错误): {counts['json_error']} 条
+    ❌ 失败 (其他未知错误): {counts['error']} 条
     - - - - - - - - - - - - - - - - - - - - - - -
     """, task_category=task_cat)
     
     try:
-        cache_dir = os.path.dirname(DOUBAN_CACHE_FILE)
-        if not os.path.exists(cache_dir):
-            os.makedirs(cache_dir, exist_ok=True)
-
-        old_data_keys = set()
-        if os.path.exists(DOUBAN_CACHE_FILE):
-            try:
-                with open(DOUBAN_CACHE_FILE, 'r', encoding='utf-8') as f:
-                    old_data = json.load(f)
-                old_data_keys = set(old_data.keys())
-            except (IOError, json.JSONDecodeError):
-                ui_logger.warning("⚠️ 读取旧缓存文件失败，无法进行数据对比。", task_category=task_cat)
-
-        new_data_keys = set(final_data.keys())
-        added_count = len(new_data_keys - old_data_keys)
-        removed_count = len(old_data_keys - new_data_keys)
-        
-        if old_data_keys:
-            ui_logger.info(f"🔄 数据对比：新增 {added_count} 条，移除 {removed_count} 条。", task_category=task_cat)
-
-        ui_logger.info(f"➡️ 【步骤 5/5】正在将 {found_count} 条数据写入缓存文件...", task_category=task_cat)
-        with open(DOUBAN_CACHE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(final_data, f, ensure_ascii=False, indent=4)
-        ui_logger.info("✅ 【步骤 5/5】缓存文件写入成功！", task_category=task_cat)
+        if manifest is not None:
+            # 已移除或改名的文件夹，只有在没有其他文件夹仍指向同一豆瓣ID时才删除对应条目
+            changed_paths = {folder['path'] for folder in folders_to_parse}
+            live_ids = {entry[2] for path, entry in manifest.items() if path not in changed_paths and path not in removed_paths}
+            live_ids.update(entry[2] for entry in manifest_updates.values())
+            ids_to_delete = {manifest[path][2] for path in removed_paths if manifest[path][2]} - live_ids
+            stale_ids = {manifest[path][2] for path in changed_paths if path in manifest and manifest[path][2]} - live_ids
+            ids_to_delete.update(stale_ids)
+
+            ui_logger.info(f"➡️ 【步骤 5/5】正在写入增量变更：更新 {len(final_data)} 条，移除 {len(ids_to_delete)} 条...", task_category=task_cat)
+            douban_store.apply_scan_changes(final_data, ids_to_delete, manifest_updates, removed_paths)
+        else:
+            old_data_keys = set(douban_store.keys())
+            new_data_keys = set(final_data.keys())
+            added_count = len(new_data_keys - old_data_keys)
+            removed_count = len(old_data_keys - new_data_keys)
+            
+            if old_data_keys:
+                ui_logger.info(f"🔄 数据对比：新增 {added_count} 条，移除 {removed_count} 条。", task_category=task_cat)
+
+            ui_logger.info(f"➡️ 【步骤 5/5】正在将 {counts['ok']} 条数据写入豆瓣数据存储...", task_category=task_cat)
+            douban_store.replace_all(final_data, manifest=manifest_updates, signature=signature)
+        ui_logger.info("✅ 【步骤 5/5】豆瓣数据存储写入成功！", task_category=task_cat)
 
         config = app_config.load_app_config()
-        mtime = os.path.getmtime(DOUBAN_CACHE_FILE)
-        last_modified = datetime.fromtimestamp(mtime).isoformat()
-        
         config.douban_cache_status = DoubanCacheStatus(
             exists=True,
-            item_count=found_count,
-            last_modified=last_modified,
+            item_count=douban_store.count(),
+            last_modified=douban_store.last_modified(),
             is_scanning=False
         )
         app_config.save_app_config(config)
@@ -192,4 +234,4 @@ def scan_douban_directory_task(directory: str, extra_fields: List[str], cancella
     except Exception as e:
         ui_logger.error(f"❌ 写入缓存或更新配置失败: {e}", task_category=task_cat, exc_info=True)
 
-    return {"found_count": found_count}
\ No newline at end of file
+    return {"found_count": counts['ok'], "incremental": manifest is not None}
@@ -9,13 +9,14 @@ import os
 import shutil
 from typing import List, Dict, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from filelock import FileLock, Timeout
 
 from log_manager import ui_logger
 from models import AppConfig, DoubanMetadataRefresherConfig, ScheduledTasksTargetScope
 from task_manager import TaskManager
+from emby_client import emby_client
 from media_selector import MediaSelector
-from douban_manager import DOUBAN_CACHE_FILE, _parse_folder_name
+from douban_manager import _parse_folder_name, build_douban_item_data
+from douban_store import douban_store
 from actor_localizer_logic import ActorLocalizerLogic
 from actor_role_mapper_logic import ActorRoleMapperLogic
 
@@ -28,7 +29,7 @@ class DoubanMetadataRefresherLogic:
         self.api_key = self.server_config.api_key
         self.user_id = self.server_config.user_id
         self.params = {"api_key": self.api_key}
-        self.session = requests.Session()
+        self.session = emby_client
 
     def _get_item_details(self, item_id: str, fields: str = "ProviderIds,Name,Type,Path,Locked") -> Optional[Dict]:
         try:
@@ -261,76 +262,41 @@ class DoubanMetadataRefresherLogic:
                 time.sleep(config.item_interval_seconds)
 
         # 阶段三：批量更新主缓存
-        ui_logger.info(f"➡️ [阶段 3/5] 开始批量更新主缓存文件 `douban_data.json`...", task_category=task_cat)
+        ui_logger.info(f"➡️ [阶段 3/5] 开始批量更新豆瓣数据存储...", task_category=task_cat)
         if successful_items:
             try:
-                lock_path = DOUBAN_CACHE_FILE + ".lock"
-                with FileLock(lock_path, timeout=10):
-                    if os.path.exists(DOUBAN_CACHE_FILE):
-                        with open(DOUBAN_CACHE_FILE, 'r', encoding='utf-8') as f:
-                            douban_map = json.load(f)
-                    else:
-                        douban_map = {}
+                updated_items = {}
+                for item in successful_items:
+                    douban_id = next((v for k, v in item.get("ProviderIds", {}).items() if k.lower() == 'douban'), None)
+                    if not douban_id: continue
+
+                    sub_dir = 'douban-movies' if item['Type'] == 'Movie' else 'douban-tv'
+                    target_dir = os.path.join(douban_data_root, sub_dir)
+                    found_folder = None
+                    if not os.path.isdir(target_dir): continue
+                    for folder_name in os.listdir(target_dir):
+                        parsed_db_id, _ = _parse_folder_name(folder_name)
+                        if parsed_db_id == douban_id:
+                            found_folder = os.path.join(target_dir, folder_name)
+                            break
                     
-                    updated_count = 0
-                    for item in successful_items:
-                        douban_id = next((v for k, v in item.get("ProviderIds", {}).items() if k.lower() == 'douban'), None)
-                        if not douban_id: continue
-
-                        sub_dir = 'douban-movies' if item['Type'] == 'Movie' else 'douban-tv'
-                        target_dir = os.path.join(douban_data_root, sub_dir)
-                        found_folder = None
-                        if not os.path.isdir(target_dir): continue
-                        for folder_name in os.listdir(target_dir):
-                            parsed_db_id, _ = _parse_folder_name(folder_name)
-                            if parsed_db_id == douban_id:
-                                found_folder = os.path.join(target_dir, folder_name)
-                                break
-                        
-                        if not found_folder: continue
-
-                        json_filename = 'all.json' if item['Type'] == 'Movie' else 'series.json'
-                        json_path = os.path.join(found_folder, json_filename)
-                        if not os.path.isfile(json_path): continue
+                    if not found_folder: continue
+
+                    json_filename = 'all.json' if item['Type'] == 'Movie' else 'series.json'
+                    json_path = os.path.join(found_folder, json_filename)
+                    if not os.path.isfile(json_path): continue
+
+                    with open(json_path, 'r', encoding='utf-8') as f:
+                        new_data = json.load(f)
+                    
+                    imdb_id = _parse_folder_name(os.path.basename(found_folder))[1]
+                    updated_items[douban_id] = build_douban_item_data(new_data, item['Type'], imdb_id, self.douban_config.extra_fields)
+
+                douban_store.upsert_many(updated_items)
+                ui_logger.info(f"✅ 豆瓣数据存储更新完毕，共覆盖 {len(updated_items)} 条记录。", task_category=task_cat)
 
-                        with open(json_path, 'r', encoding='utf-8') as f:
-                            new_data = json.load(f)
-                        
-                        item_data = {
-                            'type': item['Type'],
-                            'title': new_data.get('title', 'N/A'),
-                            'year': new_data.get('year', ''),
-                            'genres': new_data.get('genres', []),
-                            'pic': new_data.get('pic', {}),
-                            'actors': [
-                                {
-                                    'id': actor.get('id'), 'name': actor.get('name'),
-                                    'latin_name': actor.get('latin_name'), 'character': actor.get('character'),
-                                    'avatar': actor.get('avatar', {})
-                                } for actor in new_data.get('actors', [])
-                            ],
-                            'imdb_id': _parse_folder_name(os.path.basename(found_folder))[1],
-                            'countries': new_data.get('countries', [])
-                        }
-                        
-                        extra_fields = self.douban_config.extra_fields
-                        if 'rating' in extra_fields: item_data['rating'] = new_data.get('rating', {}).get('value')
-                        if 'pubdate' in extra_fields: item_data['pubdate'] = new_data.get('pubdate', [])
-                        if 'card_subtitle' in extra_fields: item_data['card_subtitle'] = new_data.get('card_subtitle', '')
-                        if 'languages' in extra_fields: item_data['languages'] = new_data.get('languages', [])
-                        if 'durations' in extra_fields and item['Type'] == 'Movie': item_data['durations'] = new_data.get('durations', [])
-
-                        douban_map[douban_id] = item_data
-                        updated_count += 1
-
-                    with open(DOUBAN_CACHE_FILE, 'w', encoding='utf-8') as f:
-                        json.dump(douban_map, f, ensure_ascii=False, indent=4)
-                    ui_logger.info(f"✅ 主缓存更新完毕，共覆盖 {updated_count} 条记录。", task_category=task_cat)
-
-            except Timeout:
-                ui_logger.error("❌ 更新主缓存失败：获取文件锁超时。", task_category=task_cat)
             except Exception as e:
-                ui_logger.error(f"❌ 更新主缓存时发生未知错误: {e}", task_category=task_cat)
+                ui_logger.error(f"❌ 更新豆瓣数据存储时发生未知错误: {e}", task_category=task_cat)
         else:
             ui_logger.info("没有成功刷新的项目，跳过主缓存更新。", task_category=task_cat)
 
@@ -347,8 +313,7 @@ class DoubanMetadataRefresherLogic:
         person_index = role_mapper_logic._fetch_all_persons_index()
         items_to_deep_process = []
         try:
-            with open(DOUBAN_CACHE_FILE, 'r', encoding='utf-8') as f:
-                current_douban_map = json.load(f)
+            current_douban_map = douban_store.as_mapping()
             
             for item in successful_items:
                 douban_id = next((v for k, v in item.get("ProviderIds", {}).items() if k.lower() == 'douban'), None)
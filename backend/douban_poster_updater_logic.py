@@ -3,17 +3,16 @@ import logging
 import threading
 import time
 import requests
-import json
-import os
 import re
 import base64
-from typing import List, Dict, Any, Optional, Iterable
+from typing import List, Dict, Any, Optional, Iterable, Mapping
 
 # --- 核心修改：导入 ui_logger ---
 from log_manager import ui_logger
 from models import AppConfig, DoubanPosterUpdaterConfig
 from task_manager import TaskManager
-from douban_manager import DOUBAN_CACHE_FILE
+from emby_client import emby_client
+from douban_store import douban_store
 
 class DoubanPosterUpdaterLogic:
     def __init__(self, app_config: AppConfig):
@@ -23,22 +22,19 @@ class DoubanPosterUpdaterLogic:
         self.api_key = self.server_config.api_key
         self.user_id = self.server_config.user_id
         self.params = {"api_key": self.api_key}
-        self.session = requests.Session()
+        self.session = emby_client
+        # 豆瓣海报使用独立会话，不占用 Emby 的连接池、重试策略与请求统计
+        self.external_session = requests.Session()
         self.douban_map = self._load_douban_data()
 
-    def _load_douban_data(self) -> Dict:
+    def _load_douban_data(self) -> Mapping[str, Dict]:
         task_cat = "海报更新-初始化"
-        if not os.path.exists(DOUBAN_CACHE_FILE):
-            ui_logger.warning("未找到豆瓣缓存文件，任务无法执行。", task_category=task_cat)
-            return {}
-        try:
-            with open(DOUBAN_CACHE_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            ui_logger.info(f"成功加载 {len(data)} 条豆瓣缓存数据。", task_category=task_cat)
-            return data
-        except Exception as e:
-            ui_logger.error(f"加载豆瓣缓存文件失败: {e}", task_category=task_cat)
+        if not douban_store.exists():
+            ui_logger.warning("未找到豆瓣数据，任务无法执行。", task_category=task_cat)
             return {}
+        douban_map = douban_store.as_mapping()
+        ui_logger.info(f"成功连接豆瓣数据存储，共 {len(douban_map)} 条豆瓣数据。", task_category=task_cat)
+        return douban_map
 
     def _get_item_details(self, item_id: str, fields: str = "ProviderIds,ImageTags") -> Optional[Dict]:
         """获取媒体项的详细信息"""
@@ -62,7 +58,7 @@ class DoubanPosterUpdaterLogic:
         """从URL上传海报到Emby"""
         try:
             ui_logger.debug(f"     -- 正在从URL下载海报: {poster_url}", task_category=task_cat)
-            image_response = self.session.get(poster_url, timeout=30, headers={'Referer': 'https://movie.douban.com/'})
+            image_response = self.external_session.get(poster_url, timeout=30, headers={'Referer': 'https://movie.douban.com/'})
             image_response.raise_for_status()
             image_data = image_response.content
             content_type = image_response.headers.get('Content-Type', 'image/jpeg')
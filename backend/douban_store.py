@@ -0,0 +1,233 @@
+# backend/douban_store.py
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Dict, Optional, Iterator, Iterable, Any, List
+
+DOUBAN_STORE_FILE = os.path.join('/app/data', 'douban_data.db')
+# 旧版的单文件 JSON 缓存，首次打开存储时会自动导入
+LEGACY_DOUBAN_JSON_FILE = os.path.join('/app/data', 'douban_data.json')
+
+# SQLite 内存映射读取的上限 (字节)，点查直接命中页缓存，无需整库解析
+MMAP_SIZE = 256 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS douban_items (
+    douban_id TEXT PRIMARY KEY,
+    type TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scan_manifest (
+    folder_path TEXT PRIMARY KEY,
+    mtime REAL,
+    size INTEGER,
+    douban_id TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class DoubanStore:
+    """
+    基于 SQLite 的豆瓣数据存储，取代整文件读写的 douban_data.json。
+    - 按豆瓣ID主键点查，单条记录独立解码，无需在每个任务开始时解析整个缓存。
+    - 支持单条/批量写入与删除，Webhook 增量更新不再重写整个文件。
+    - 进程内共享一个只读的字典视图 (as_mapping)，供各逻辑类按 dict 的方式使用。
+    """
+    def __init__(self, db_path: str = DOUBAN_STORE_FILE):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._view: Optional["DoubanMapView"] = None
+
+    def _get_conn(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._conn is None:
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+                conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+                conn.executescript(_SCHEMA)
+                conn.commit()
+                self._conn = conn
+                self._import_legacy_json()
+            return self._conn
+
+    def _import_legacy_json(self):
+        """一次性导入旧版 douban_data.json，之后不再读取该文件"""
+        conn = self._conn
+        if conn.execute("SELECT value FROM meta WHERE key = 'legacy_imported'").fetchone():
+            return
+        if os.path.exists(LEGACY_DOUBAN_JSON_FILE) and not conn.execute("SELECT 1 FROM douban_items LIMIT 1").fetchone():
+            try:
+                with open(LEGACY_DOUBAN_JSON_FILE, 'r', encoding='utf-8') as f:
+                    legacy_data = json.load(f)
+                self._write_many(conn, legacy_data)
+                self._touch(conn)
+                logging.info(f"【豆瓣存储】已从旧版缓存文件导入 {len(legacy_data)} 条豆瓣数据。")
+            except (IOError, json.JSONDecodeError) as e:
+                logging.error(f"【豆瓣存储】导入旧版缓存文件失败: {e}")
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', '1')")
+        conn.commit()
+
+    @staticmethod
+    def _write_many(conn: sqlite3.Connection, items: Dict[str, Dict]):
+        conn.executemany(
+            "INSERT OR REPLACE INTO douban_items (douban_id, type, data) VALUES (?, ?, ?)",
+            ((str(douban_id), item.get('type'), json.dumps(item, ensure_ascii=False)) for douban_id, item in items.items())
+        )
+
+    @staticmethod
+    def _touch(conn: sqlite3.Connection):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_modified', ?)", (datetime.now().isoformat(),))
+
+    # --- 读取 ---
+
+    def get(self, douban_id: str) -> Optional[Dict[str, Any]]:
+        if not douban_id:
+            return None
+        with self._lock:
+            row = self._get_conn().execute("SELECT data FROM douban_items WHERE douban_id = ?", (str(douban_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def contains(self, douban_id: str) -> bool:
+        if not douban_id:
+            return False
+        with self._lock:
+            return self._get_conn().execute("SELECT 1 FROM douban_items WHERE douban_id = ?", (str(douban_id),)).fetchone() is not None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._get_conn().execute("SELECT COUNT(*) FROM douban_items").fetchone()[0]
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._get_conn().execute("SELECT douban_id FROM douban_items").fetchall()]
+
+    def last_modified(self) -> Optional[str]:
+        with self._lock:
+            row = self._get_conn().execute("SELECT value FROM meta WHERE key = 'last_modified'").fetchone()
+        return row[0] if row else None
+
+    def exists(self) -> bool:
+        """存储是否已建立过 (至少完成过一次扫描或导入)"""
+        return self.last_modified() is not None
+
+    def as_mapping(self) -> "DoubanMapView":
+        if self._view is None:
+            self._view = DoubanMapView(self)
+        return self._view
+
+    # --- 写入 ---
+
+    def upsert(self, douban_id: str, item_data: Dict[str, Any]):
+        self.upsert_many({douban_id: item_data})
+
+    def upsert_many(self, items: Dict[str, Dict[str, Any]]):
+        if not items:
+            return
+        with self._lock:
+            conn = self._get_conn()
+            self._write_many(conn, items)
+            self._touch(conn)
+            conn.commit()
+
+    def delete_many(self, douban_ids: Iterable[str]) -> int:
+        ids = [(str(i),) for i in douban_ids if i]
+        if not ids:
+            return 0
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany("DELETE FROM douban_items WHERE douban_id = ?", ids)
+            self._touch(conn)
+            conn.commit()
+        return len(ids)
+
+    def replace_all(self, items: Dict[str, Dict[str, Any]], manifest: Optional[Dict[str, tuple]] = None, signature: Optional[str] = None):
+        """在单个事务内用完整扫描结果替换全部数据 (及扫描清单)，读取方不会看到中间状态"""
+        with self._lock:
+            conn = self._get_conn()
+            try:
+                conn.execute("DELETE FROM douban_items")
+                self._write_many(conn, items)
+                if manifest is not None:
+                    conn.execute("DELETE FROM scan_manifest")
+                    self._write_manifest(conn, manifest)
+                    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('manifest_signature', ?)", (signature,))
+                self._touch(conn)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+
+    # --- 扫描清单 (增量扫描使用) ---
+
+    @staticmethod
+    def _write_manifest(conn: sqlite3.Connection, manifest: Dict[str, tuple]):
+        conn.executemany(
+            "INSERT OR REPLACE INTO scan_manifest (folder_path, mtime, size, douban_id) VALUES (?, ?, ?, ?)",
+            ((path, mtime, size, douban_id) for path, (mtime, size, douban_id) in manifest.items())
+        )
+
+    def get_manifest(self, signature: str) -> Optional[Dict[str, tuple]]:
+        """返回 {文件夹路径: (mtime, size, douban_id)}；清单不存在或扫描参数已变化时返回 None"""
+        with self._lock:
+            conn = self._get_conn()
+            row = conn.execute("SELECT value FROM meta WHERE key = 'manifest_signature'").fetchone()
+            if not row or row[0] != signature:
+                return None
+            rows = conn.execute("SELECT folder_path, mtime, size, douban_id FROM scan_manifest").fetchall()
+        return {path: (mtime, size, douban_id) for path, mtime, size, douban_id in rows}
+
+    def apply_scan_changes(self, upserts: Dict[str, Dict[str, Any]], deletes: Iterable[str],
+                           manifest_upserts: Dict[str, tuple], manifest_deletes: Iterable[str]):
+        """在单个事务内写入增量扫描的结果"""
+        with self._lock:
+            conn = self._get_conn()
+            try:
+                self._write_many(conn, upserts)
+                conn.executemany("DELETE FROM douban_items WHERE douban_id = ?", ((str(i),) for i in deletes))
+                self._write_manifest(conn, manifest_upserts)
+                conn.executemany("DELETE FROM scan_manifest WHERE folder_path = ?", ((p,) for p in manifest_deletes))
+                self._touch(conn)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+
+
+class DoubanMapView(Mapping):
+    """豆瓣存储的只读字典视图，兼容原先 douban_map 的 get / in / len 用法，按需逐条读取"""
+    def __init__(self, store: DoubanStore):
+        self._store = store
+
+    def __getitem__(self, douban_id: str) -> Dict[str, Any]:
+        item = self._store.get(douban_id)
+        if item is None:
+            raise KeyError(douban_id)
+        return item
+
+    def get(self, douban_id, default=None):
+        item = self._store.get(douban_id)
+        return default if item is None else item
+
+    def __contains__(self, douban_id) -> bool:
+        return self._store.contains(douban_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store.keys())
+
+    def __len__(self) -> int:
+        return self._store.count()
+
+
+douban_store = DoubanStore()
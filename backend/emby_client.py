@@ -0,0 +1,127 @@
+# backend/emby_client.py
+
+import logging
+import threading
+import time
+from typing import Dict, Any
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 连接池与并发控制参数
+POOL_CONNECTIONS = 8          # 缓存的主机连接池数量
+POOL_MAXSIZE = 32             # 单个主机连接池可保持的最大长连接数
+PER_HOST_CONCURRENCY = 16     # 单个主机同时进行中的最大请求数
+
+# 延迟直方图的分桶上界 (秒)，最后一个桶为 +Inf
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _HostStats:
+    """单个主机的请求计数与延迟直方图"""
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+        self.by_method: Dict[str, int] = {}
+        self.by_status: Dict[str, int] = {}
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record(self, method: str, elapsed: float, status_code: Any):
+        self.requests += 1
+        self.total_seconds += elapsed
+        self.by_method[method] = self.by_method.get(method, 0) + 1
+        status_key = f"{status_code // 100}xx" if isinstance(status_code, int) else "error"
+        if status_key == "error":
+            self.errors += 1
+        self.by_status[status_key] = self.by_status.get(status_key, 0) + 1
+        for i, upper in enumerate(LATENCY_BUCKETS):
+            if elapsed <= upper:
+                self.latency_buckets[i] += 1
+                break
+        else:
+            self.latency_buckets[-1] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        histogram = {f"le_{upper}": count for upper, count in zip(LATENCY_BUCKETS, self.latency_buckets)}
+        histogram["le_inf"] = self.latency_buckets[-1]
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "avg_latency_ms": round(self.total_seconds / self.requests * 1000, 1) if self.requests else 0.0,
+            "by_method": dict(self.by_method),
+            "by_status": dict(self.by_status),
+            "latency_histogram": histogram,
+        }
+
+
+class EmbyClient(requests.Session):
+    """
+    进程级共享的 Emby HTTP 客户端。
+    - 长连接复用的有界连接池，避免每次请求重新握手。
+    - 统一的重试与退避策略 (幂等请求在 429/5xx 时自动重试)。
+    - 按主机限制并发请求数，防止多个任务同时压垮服务器。
+    - 记录每个主机的请求次数与延迟直方图，用于评估任务的真实往返开销。
+    仅用于访问 Emby；GitHub 请求使用 github_client，豆瓣 / TMDB 等外部请求使用各自的会话。
+    """
+    def __init__(self):
+        super().__init__()
+        retry_strategy = Retry(
+            total=3,
+            backoff_factor=1,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["HEAD", "GET", "OPTIONS"],
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retry_strategy)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+        self._stats_lock = threading.Lock()
+        self._host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_stats: Dict[str, _HostStats] = {}
+        self._started_at = time.time()
+
+    def _get_host_entry(self, host: str):
+        with self._stats_lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(PER_HOST_CONCURRENCY)
+                self._host_stats[host] = _HostStats()
+            return self._host_semaphores[host], self._host_stats[host]
+
+    def request(self, method, url, *args, **kwargs):
+        host = urlsplit(str(url)).netloc or "unknown"
+        semaphore, stats = self._get_host_entry(host)
+        status_code = None
+        with semaphore:
+            with self._stats_lock:
+                stats.in_flight += 1
+            start_time = time.monotonic()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+                status_code = response.status_code
+                return response
+            finally:
+                elapsed = time.monotonic() - start_time
+                with self._stats_lock:
+                    stats.in_flight -= 1
+                    stats.record(str(method).upper(), elapsed, status_code)
+                if elapsed > 10:
+                    logging.debug(f"【Emby客户端】慢请求 {method} {host} 耗时 {elapsed:.2f} 秒。")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回按主机聚合的请求统计快照"""
+        with self._stats_lock:
+            hosts = {host: stats.to_dict() for host, stats in self._host_stats.items()}
+        return {
+            "since": self._started_at,
+            "total_requests": sum(h["requests"] for h in hosts.values()),
+            "hosts": hosts,
+        }
+
+
+emby_client = EmbyClient()
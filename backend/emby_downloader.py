@@ -13,6 +13,7 @@ from typing import Dict, Any, Optional
 from log_manager import ui_logger
 from models import AppConfig, BatchDownloadRequest, DownloadConfig
 from task_manager import TaskManager
+from emby_client import emby_client
 
 def create_nfo_from_details(details: dict, download_config: DownloadConfig) -> str:
     """
@@ -139,7 +140,7 @@ class EmbyDownloader:
         self.api_key = self.server_config.api_key
         self.user_id = self.server_config.user_id
         self.params = {"api_key": self.api_key}
-        self.session = requests.Session()
+        self.session = emby_client
         self.task_category = task_category
 
 
@@ -241,7 +242,7 @@ class EmbyDownloader:
         if file_exists and self.download_config.download_behavior == "skip":
             return "skipped"
             
-        response = requests.get(url, params=self.params, stream=True, timeout=60)
+        response = self.session.get(url, params=self.params, stream=True, timeout=60)
         response.raise_for_status()
         with open(save_path, 'wb') as f:
             for chunk in response.iter_content(chunk_size=8192):
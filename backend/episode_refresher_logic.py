@@ -8,11 +8,14 @@ import subprocess
 import json
 import os
 import shutil
+import tempfile
 from typing import List, Iterable, Optional, Dict, Tuple
 from collections import defaultdict
 from collections import defaultdict
 from io import BytesIO
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from urllib.parse import urlsplit
 from filelock import FileLock, Timeout
 from datetime import datetime 
 
@@ -30,12 +33,118 @@ from models import AppConfig, EpisodeRefresherConfig, ScheduledTasksTargetScope
 from task_manager import TaskManager
 from tmdb_logic import TmdbLogic
 from media_selector import MediaSelector
+from emby_client import emby_client
+from github_committer import GitDataCommitter, DEFAULT_BATCH_SIZE
+from github_client import github_client, GitHubApiError
+from blob_hash_cache import blob_hash_cache
+from id_map_service import id_map_service
 
 # --- 新增常量 ---
 GITHUB_DELETE_LOG_FILE = os.path.join('/app/data', 'github_delete_log.json')
 GITHUB_DB_CACHE_FILE = os.path.join('/app/data', 'github_database_cache.json')
 GITHUB_DB_CACHE_DURATION = 3600  # 缓存1小时
 
+# 单次截图模式：在截图点之前预读一段画面用于黑边检测，随后在同一次解码中取帧
+CROPDETECT_LEAD_SECONDS = 2.0
+SMART_CAPTURE_WINDOW_SECONDS = 1.0
+# 智能截图评分使用的缩小灰度帧尺寸，清晰度比较只需相对值，无需全分辨率
+SHARPNESS_FRAME_WIDTH = 320
+SHARPNESS_FRAME_HEIGHT = 180
+
+
+class _SlotLimiter:
+    """上限可按调用动态指定的并发槽位，用于限制 ffmpeg 进程数和单服务器视频流数"""
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._in_use = 0
+
+    @contextmanager
+    def slot(self, limit: int):
+        with self._cond:
+            while self._in_use >= max(1, limit):
+                self._cond.wait()
+            self._in_use += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify_all()
+
+
+# 进程级共享：多个刷新任务同时运行时也共同遵守同一个上限
+_FFMPEG_SLOTS = _SlotLimiter()
+_STREAM_SLOTS: Dict[str, _SlotLimiter] = {}
+_STREAM_SLOTS_LOCK = threading.Lock()
+
+
+def _stream_slots_for(video_url: str) -> _SlotLimiter:
+    host = urlsplit(video_url).netloc or "unknown"
+    with _STREAM_SLOTS_LOCK:
+        if host not in _STREAM_SLOTS:
+            _STREAM_SLOTS[host] = _SlotLimiter()
+        return _STREAM_SLOTS[host]
+
+
+class _ScreenshotDirIndex:
+    """
+    EpisodeScreenshots 下 TMDB ID -> 剧集缓存目录的内存索引，避免每个分集都完整扫描一次目录。
+    - 首次查询时扫描一遍并建立索引，本进程内的创建 / 重命名 / 删除同步更新索引。
+    - 每次查询只 stat 一次根目录，修改时间变化 (如其他进程增删了目录) 时才重新扫描。
+    """
+    ID_PATTERN = re.compile(r'\[(\d+)\]$')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._base_dir: Optional[str] = None
+        self._mtime_ns: Optional[int] = None
+        self._dirs: Dict[str, str] = {}
+
+    def _rebuild(self, base_dir: str, mtime_ns: int):
+        dirs: Dict[str, str] = {}
+        with os.scandir(base_dir) as entries:
+            for entry in entries:
+                match = self.ID_PATTERN.search(entry.name)
+                if match and entry.is_dir():
+                    dirs.setdefault(match.group(1), entry.path)
+        self._base_dir, self._mtime_ns, self._dirs = base_dir, mtime_ns, dirs
+        logging.debug(f"【截图缓存】已重建截图目录索引，共 {len(dirs)} 个剧集目录。")
+
+    def _refresh_mtime(self, base_dir: str):
+        try:
+            self._mtime_ns = os.stat(base_dir).st_mtime_ns
+        except OSError:
+            self._mtime_ns = None
+
+    def lookup(self, base_dir: str, tmdb_id: str) -> Optional[str]:
+        with self._lock:
+            mtime_ns = os.stat(base_dir).st_mtime_ns
+            if base_dir != self._base_dir or mtime_ns != self._mtime_ns:
+                self._rebuild(base_dir, mtime_ns)
+            path = self._dirs.get(str(tmdb_id))
+            if path and not os.path.isdir(path):
+                # 修改时间精度较粗的文件系统上可能错过变化，命中失效时强制重建
+                self._rebuild(base_dir, mtime_ns)
+                path = self._dirs.get(str(tmdb_id))
+            return path
+
+    def set(self, base_dir: str, tmdb_id: str, path: str):
+        with self._lock:
+            if base_dir == self._base_dir:
+                self._dirs[str(tmdb_id)] = path
+                self._refresh_mtime(base_dir)
+
+    def discard(self, base_dir: str, tmdb_id: str):
+        with self._lock:
+            if base_dir == self._base_dir:
+                self._dirs.pop(str(tmdb_id), None)
+                self._refresh_mtime(base_dir)
+
+
+# 进程级共享：各任务每次创建新的 EpisodeRefresherLogic 实例，索引需跨实例复用
+_SCREENSHOT_DIR_INDEX = _ScreenshotDirIndex()
+
+
 class EpisodeRefresherLogic:
     @staticmethod
     def _sanitize_filename(name: str) -> str:
@@ -54,15 +163,8 @@ class EpisodeRefresherLogic:
         if not os.path.isdir(base_cache_dir):
             return None
 
-        id_pattern = re.compile(r'\[(\d+)\]$')
-
         try:
-            for dirname in os.listdir(base_cache_dir):
-                dirpath = os.path.join(base_cache_dir, dirname)
-                if os.path.isdir(dirpath):
-                    match = id_pattern.search(dirname)
-                    if match and match.group(1) == str(series_tmdb_id):
-                        return dirpath
+            return _SCREENSHOT_DIR_INDEX.lookup(base_cache_dir, series_tmdb_id)
         except OSError as e:
             ui_logger.error(f"【截图缓存】扫描缓存目录时出错: {e}", task_category="截图缓存")
         
@@ -75,9 +177,47 @@ class EpisodeRefresherLogic:
         self.api_key = self.server_config.api_key
         self.user_id = self.server_config.user_id
         self.params = {"api_key": self.api_key}
-        self.session = requests.Session()
+        self.session = emby_client
         self.tmdb_logic = TmdbLogic(app_config)
         self.ffmpeg_available = shutil.which('ffmpeg') is not None and shutil.which('ffprobe') is not None
+        # 截图阶段的并发控制：当前任务的取消信号、ffmpeg 并发上限与正在运行的子进程
+        self._cancel_event: Optional[threading.Event] = None
+        self._ffmpeg_limit = app_config.episode_refresher_config.screenshot_concurrency
+        self._active_procs = set()
+        self._procs_lock = threading.Lock()
+        self._local_cache_lock = threading.Lock()
+
+    def _run_media_command(self, command: List[str], timeout: int, text: bool = False, check: bool = False) -> subprocess.CompletedProcess:
+        """在 ffmpeg 并发槽位内执行 ffmpeg/ffprobe，并登记子进程，以便任务取消时立即终止"""
+        with _FFMPEG_SLOTS.slot(self._ffmpeg_limit):
+            with self._procs_lock:
+                if self._cancel_event is not None and self._cancel_event.is_set():
+                    raise subprocess.CalledProcessError(-9, command, stderr="任务已取消")
+                proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=text)
+                self._active_procs.add(proc)
+            try:
+                stdout, stderr = proc.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.communicate()
+                raise
+            finally:
+                with self._procs_lock:
+                    self._active_procs.discard(proc)
+        if check and proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, command, stdout, stderr)
+        return subprocess.CompletedProcess(command, proc.returncode, stdout, stderr)
+
+    def _kill_active_processes(self) -> int:
+        """终止本实例所有正在运行的 ffmpeg/ffprobe 子进程"""
+        with self._procs_lock:
+            procs = list(self._active_procs)
+        for proc in procs:
+            try:
+                proc.kill()
+            except OSError:
+                pass
+        return len(procs)
 
     @staticmethod
     def _is_generic_episode_title(text: str) -> bool:
@@ -232,7 +372,7 @@ class EpisodeRefresherLogic:
                 '-i', video_url
             ]
             ui_logger.debug(f"     - [截图] 正在执行 ffprobe 命令获取视频时长...", task_category=task_category)
-            result = subprocess.run(command, capture_output=True, text=True, check=True, timeout=60)
+            result = self._run_media_command(command, timeout=60, text=True, check=True)
             format_info = json.loads(result.stdout).get('format', {})
             duration_str = format_info.get('duration')
             if duration_str:
@@ -263,6 +403,11 @@ class EpisodeRefresherLogic:
 
     def _save_screenshot_to_local(self, image_bytes: bytes, series_tmdb_id: str, season_number: int, episode_number: int, series_name: str, task_category: str) -> bool:
         """将截图二进制数据保存到本地缓存，并智能处理文件夹重命名。"""
+        # 并发截图时同一剧集的多个分集可能同时回写，目录的查找与重命名需要串行
+        with self._local_cache_lock:
+            return self._save_screenshot_to_local_locked(image_bytes, series_tmdb_id, season_number, episode_number, series_name, task_category)
+
+    def _save_screenshot_to_local_locked(self, image_bytes: bytes, series_tmdb_id: str, season_number: int, episode_number: int, series_name: str, task_category: str) -> bool:
         new_filepath = self._get_local_screenshot_path(series_tmdb_id, season_number, episode_number, series_name)
         if not new_filepath:
             return False
@@ -278,10 +423,12 @@ class EpisodeRefresherLogic:
                 if old_dir != new_dir:
                     ui_logger.info(f"     - [本地缓存] 检测到剧集标题变更，正在重命名缓存文件夹: '{os.path.basename(old_dir)}' -> '{os.path.basename(new_dir)}'", task_category=task_category)
                     os.rename(old_dir, new_dir)
+                    _SCREENSHOT_DIR_INDEX.set(os.path.dirname(new_dir), series_tmdb_id, new_dir)
                 final_dir = new_dir
             else:
                 # 如果没找到旧目录，才创建新目录
                 os.makedirs(new_dir, exist_ok=True)
+                _SCREENSHOT_DIR_INDEX.set(os.path.dirname(new_dir), series_tmdb_id, new_dir)
             
             # 确保最终文件路径是基于正确的目录
             final_filepath = os.path.join(final_dir, os.path.basename(new_filepath))
@@ -336,6 +483,7 @@ class EpisodeRefresherLogic:
             try:
                 if not os.listdir(cache_dir):
                     os.rmdir(cache_dir)
+                    _SCREENSHOT_DIR_INDEX.discard(os.path.dirname(cache_dir), series_tmdb_id)
                     ui_logger.info(f"     - 🧹 [本地缓存] 检测到剧集缓存目录已空，成功清理: {os.path.basename(cache_dir)}", task_category=task_category)
             except OSError as e:
                 # 捕获可能的竞态条件错误（例如另一个进程瞬间又创建了文件）
@@ -345,48 +493,21 @@ class EpisodeRefresherLogic:
             ui_logger.error(f"     - [本地缓存] 删除本地截图失败: {e}", task_category=task_category, exc_info=True)
             return False
     
-    def _split_image_stream(self, stream: bytes) -> List[bytes]:
-        """将 ffmpeg image2pipe 输出的二进制流分割成独立的图片列表"""
-        images = []
-        start_marker = b'\xff\xd8'
-        end_marker = b'\xff\xd9'
-        
-        start = 0
-        while True:
-            start_pos = stream.find(start_marker, start)
-            if start_pos == -1: break
-            end_pos = stream.find(end_marker, start_pos)
-            if end_pos == -1: break
-            
-            images.append(stream[start_pos:end_pos+2])
-            start = end_pos + 2
-        return images
-
-    def _get_best_image_by_variance(self, images: List[bytes], task_category: str) -> Optional[bytes]:
-        """通过拉普拉斯方差计算，从图片列表中选择最清晰的一张"""
-        if not images:
+    def _pick_sharpest_frame(self, raw_frames: bytes, stderr_text: str, task_category: str) -> Optional[Tuple[int, float]]:
+        """
+        从评分输出中选出最清晰的一帧。评分输出为缩小的灰度原始帧 (rawvideo) 以及 showinfo 打印的每帧时间戳，
+        返回 (帧序号, 相对于输入起点的时间戳)；没有可用帧时返回 None。
+        """
+        frame_times = [float(t) for t in re.findall(r'Parsed_showinfo.*?pts_time:\s*([\d.]+)', stderr_text)]
+        frame_size = SHARPNESS_FRAME_WIDTH * SHARPNESS_FRAME_HEIGHT
+        frame_count = min(len(raw_frames) // frame_size, len(frame_times))
+        if frame_count == 0:
             return None
-        if not OPENCV_AVAILABLE:
-            ui_logger.warning("     - [截图-智能模式] OpenCV 未加载，将随机选择一张图片。", task_category=task_category)
-            return images[len(images) // 2]
-
-        max_variance = -1
-        best_image = None
-
-        for img_bytes in images:
-            try:
-                pil_img = Image.open(BytesIO(img_bytes))
-                cv_img = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2GRAY)
-                variance = cv2.Laplacian(cv_img, cv2.CV_64F).var()
-                if variance > max_variance:
-                    max_variance = variance
-                    best_image = img_bytes
-            except Exception as e:
-                ui_logger.debug(f"     - [截图-智能模式] 分析单张图片时出错: {e}", task_category=task_category)
-                continue
-        
-        ui_logger.info(f"     - [截图-智能模式] 分析了 {len(images)} 帧，选择了清晰度得分最高的一张 (方差: {max_variance:.2f})。", task_category=task_category)
-        return best_image
+        gray_frames = np.frombuffer(raw_frames, dtype=np.uint8, count=frame_count * frame_size)
+        scores = self._score_sharpness(gray_frames.reshape(frame_count, SHARPNESS_FRAME_HEIGHT, SHARPNESS_FRAME_WIDTH))
+        best_index = int(np.argmax(scores))
+        ui_logger.info(f"     - [截图-智能模式] 分析了 {frame_count} 帧，选择了清晰度得分最高的一张 (方差: {scores[best_index]:.2f})。", task_category=task_category)
+        return best_index, frame_times[best_index]
 
     def _capture_screenshot(self, video_url: str, seek_time: float, config: EpisodeRefresherConfig, task_category: str) -> Optional[bytes]:
         """使用 ffmpeg 从视频流截图，并根据配置处理黑边和比例"""
@@ -400,7 +521,7 @@ class EpisodeRefresherLogic:
                     '-f', 'null', '-'
                 ]
                 ui_logger.debug(f"     - [截图] 正在执行 cropdetect 命令检测黑边...", task_category=task_category)
-                detect_result = subprocess.run(detect_cmd, capture_output=True, text=True, timeout=60)
+                detect_result = self._run_media_command(detect_cmd, timeout=60, text=True)
                 
                 crop_match = re.search(r'crop=(\d+:\d+:\d+:\d+)', detect_result.stderr)
                 if crop_match:
@@ -422,18 +543,35 @@ class EpisodeRefresherLogic:
 
             if config.use_smart_screenshot:
                 ui_logger.info("     - [截图] 启动智能截图模式，将获取1秒内多帧进行筛选...", task_category=task_category)
+                best_time = seek_time + SMART_CAPTURE_WINDOW_SECONDS / 2
+                if OPENCV_AVAILABLE:
+                    # 评分只输出缩小的灰度原始帧，按 showinfo 时间戳定位得分最高的一帧后再单独截取
+                    score_filter = f"{crop_filter + ',' if crop_filter else ''}showinfo,scale={SHARPNESS_FRAME_WIDTH}:{SHARPNESS_FRAME_HEIGHT},format=gray"
+                    score_cmd = [
+                        'ffmpeg', '-hide_banner', '-ss', str(seek_time),
+                        '-i', video_url, '-t', str(SMART_CAPTURE_WINDOW_SECONDS),
+                        '-vf', score_filter, '-vsync', 'vfr', '-f', 'rawvideo', '-pix_fmt', 'gray', 'pipe:1'
+                    ]
+                    score_result = self._run_media_command(score_cmd, timeout=60, check=True)
+                    picked = self._pick_sharpest_frame(score_result.stdout, score_result.stderr.decode('utf-8', errors='ignore'), task_category)
+                    if picked is None:
+                        ui_logger.error("     - [失败❌] ffmpeg 未输出任何画面。", task_category=task_category)
+                        return None
+                    best_time = seek_time + picked[1]
+                else:
+                    ui_logger.warning("     - [截图-智能模式] OpenCV 未加载，将直接截取窗口中间的一帧。", task_category=task_category)
+
                 capture_cmd = [
-                    'ffmpeg', '-ss', str(seek_time),
-                    '-i', video_url, '-t', '1',
+                    'ffmpeg', '-ss', f"{best_time:.3f}",
+                    '-i', video_url, '-vframes', '1',
                     '-q:v', '2', '-f', 'image2pipe', '-'
                 ]
                 if crop_filter:
-                    capture_cmd.insert(7, '-vf')
-                    capture_cmd.insert(8, crop_filter)
-                
-                capture_result = subprocess.run(capture_cmd, capture_output=True, check=True, timeout=60)
-                all_frames = self._split_image_stream(capture_result.stdout)
-                return self._get_best_image_by_variance(all_frames, task_category)
+                    capture_cmd.insert(5, '-vf')
+                    capture_cmd.insert(6, crop_filter)
+
+                capture_result = self._run_media_command(capture_cmd, timeout=60, check=True)
+                return capture_result.stdout
             else:
                 ui_logger.info("     - [截图] 启动快速截图模式，将截取单帧图片...", task_category=task_category)
                 capture_cmd = [
@@ -445,7 +583,7 @@ class EpisodeRefresherLogic:
                     capture_cmd.insert(5, '-vf')
                     capture_cmd.insert(6, crop_filter)
                 
-                capture_result = subprocess.run(capture_cmd, capture_output=True, check=True, timeout=60)
+                capture_result = self._run_media_command(capture_cmd, timeout=60, check=True)
                 return capture_result.stdout
 
         except Exception as e:
@@ -453,6 +591,132 @@ class EpisodeRefresherLogic:
             return None
 
 
+    @staticmethod
+    def _resolve_crop_box(width: int, height: int, x: int, y: int, crop_widescreen: bool) -> Tuple[int, int, int, int]:
+        """根据检测到的有效画面区域计算最终裁剪框 (left, top, right, bottom)，按需将超宽屏居中裁剪为 16:9"""
+        if crop_widescreen and width / height > 1.8:
+            target_w = round(height * 16 / 9)
+            if target_w < width:
+                x += round((width - target_w) / 2)
+                width = target_w
+        return x, y, x + width, y + height
+
+    def _apply_detected_crop(self, image_bytes: bytes, crop_params: Optional[Tuple[int, int, int, int]], config: EpisodeRefresherConfig, task_category: str) -> bytes:
+        """在内存中对截取的帧应用黑边裁剪，无需为裁剪再次打开视频流"""
+        if not crop_params:
+            return image_bytes
+        try:
+            img = Image.open(BytesIO(image_bytes))
+            w, h, x, y = crop_params
+            box = self._resolve_crop_box(w, h, x, y, config.crop_widescreen_to_16_9)
+            if box == (0, 0, img.width, img.height) or box[2] > img.width or box[3] > img.height:
+                return image_bytes
+            ui_logger.debug(f"     - [截图] 应用裁剪区域: {box}", task_category=task_category)
+            output = BytesIO()
+            img.crop(box).convert('RGB').save(output, format='JPEG', quality=95)
+            return output.getvalue()
+        except Exception as e:
+            ui_logger.warning(f"     - [截图] 应用黑边裁剪失败，将使用原始画面。原因: {e}", task_category=task_category)
+            return image_bytes
+
+    @staticmethod
+    def _score_sharpness(gray_frames: "np.ndarray") -> "np.ndarray":
+        """对一批灰度帧 (N, H, W) 批量计算拉普拉斯方差，返回每帧的清晰度得分"""
+        f = gray_frames.astype(np.float32)
+        laplacian = (
+            f[:, :-2, 1:-1] + f[:, 2:, 1:-1] + f[:, 1:-1, :-2] + f[:, 1:-1, 2:]
+            - 4.0 * f[:, 1:-1, 1:-1]
+        )
+        return laplacian.reshape(laplacian.shape[0], -1).var(axis=1)
+
+    @staticmethod
+    def _parse_cropdetect(stderr_text: str) -> Optional[Tuple[int, int, int, int]]:
+        """取 cropdetect 最后一次输出的累计结果 (w, h, x, y)"""
+        crop_matches = re.findall(r'crop=(\d+):(\d+):(\d+):(\d+)', stderr_text)
+        if crop_matches:
+            w, h, x, y = map(int, crop_matches[-1])
+            if w > 0 and h > 0:
+                return w, h, x, y
+        return None
+
+    def _capture_screenshot_single_pass(self, video_url: str, seek_time: float, config: EpisodeRefresherConfig, task_category: str) -> Optional[bytes]:
+        """
+        单次打开视频流完成截图：同一次 ffmpeg 解码中先预读截图点前的片段做黑边检测 (cropdetect)，
+        再输出截图点的帧；裁剪在内存中完成。相比分别执行 ffprobe / cropdetect / 截图三次打开远程文件，
+        网络读取与寻址次数都更少。
+        智能模式下解码结果经 split 分为两路：缩小的灰度原始帧 (附带 showinfo 时间戳) 输出到管道，用 NumPy 批量计算清晰度；
+        全尺寸帧以未编码的 rgb24 原始数据写入临时文件，只读取得分最高的一帧并编码为 JPEG，无需再次打开视频流。
+        """
+        try:
+            lead = min(CROPDETECT_LEAD_SECONDS, seek_time)
+            start_time = seek_time - lead
+            input_args = [
+                'ffmpeg', '-hide_banner',
+                '-ss', f"{start_time:.3f}", '-t', f"{lead + (SMART_CAPTURE_WINDOW_SECONDS if config.use_smart_screenshot else 0.5):.3f}",
+                '-i', video_url,
+            ]
+            select_filter = f"cropdetect,select='gte(t,{lead:.3f})'"
+
+            if not config.use_smart_screenshot:
+                ui_logger.info("     - [截图] 启动单次解码快速截图模式 (黑边检测与取帧合并为一次读取)...", task_category=task_category)
+                capture_cmd = input_args + ['-vf', select_filter, '-vsync', 'vfr', '-frames:v', '1', '-q:v', '2', '-f', 'image2pipe', '-']
+                capture_result = self._run_media_command(capture_cmd, timeout=90, check=True)
+                crop_params = self._parse_cropdetect(capture_result.stderr.decode('utf-8', errors='ignore'))
+                if not capture_result.stdout:
+                    ui_logger.error("     - [失败❌] ffmpeg 未输出任何画面。", task_category=task_category)
+                    return None
+                if not crop_params:
+                    ui_logger.warning("     - [截图] 未能检测到黑边信息，将不进行裁剪。", task_category=task_category)
+                return self._apply_detected_crop(capture_result.stdout, crop_params, config, task_category)
+
+            ui_logger.info("     - [截图] 启动智能截图模式，将在同一次读取中完成黑边检测与多帧清晰度筛选...", task_category=task_category)
+            filter_graph = (
+                f"[0:v]{select_filter},showinfo,split=2[full][score];"
+                f"[score]scale={SHARPNESS_FRAME_WIDTH}:{SHARPNESS_FRAME_HEIGHT},format=gray[small]"
+            )
+            with tempfile.TemporaryDirectory(prefix="screenshot_") as temp_dir:
+                full_frames_path = os.path.join(temp_dir, "frames.rgb")
+                capture_cmd = input_args + [
+                    '-filter_complex', filter_graph,
+                    '-map', '[small]', '-vsync', 'vfr', '-f', 'rawvideo', '-pix_fmt', 'gray', 'pipe:1',
+                    '-map', '[full]', '-vsync', 'vfr', '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-y', full_frames_path,
+                ]
+                capture_result = self._run_media_command(capture_cmd, timeout=90, check=True)
+                stderr_text = capture_result.stderr.decode('utf-8', errors='ignore')
+                crop_params = self._parse_cropdetect(stderr_text)
+                if not crop_params:
+                    ui_logger.warning("     - [截图] 未能检测到黑边信息，将不进行裁剪。", task_category=task_category)
+
+                picked = self._pick_sharpest_frame(capture_result.stdout, stderr_text, task_category)
+                size_match = re.search(r'Parsed_showinfo.*?\bs:(\d+)x(\d+)', stderr_text)
+                if picked is None or not size_match:
+                    ui_logger.error("     - [失败❌] ffmpeg 未输出任何画面。", task_category=task_category)
+                    return None
+                best_index = picked[0]
+                width, height = int(size_match.group(1)), int(size_match.group(2))
+                full_frame_size = width * height * 3
+                with open(full_frames_path, 'rb') as f:
+                    f.seek(best_index * full_frame_size)
+                    raw_frame = f.read(full_frame_size)
+            if len(raw_frame) < full_frame_size:
+                ui_logger.error("     - [失败❌] 未能读取得分最高的全尺寸画面。", task_category=task_category)
+                return None
+
+            img = Image.frombytes('RGB', (width, height), raw_frame)
+            if crop_params:
+                box = self._resolve_crop_box(*crop_params, config.crop_widescreen_to_16_9)
+                if box != (0, 0, width, height) and box[2] <= width and box[3] <= height:
+                    ui_logger.debug(f"     - [截图] 应用裁剪区域: {box}", task_category=task_category)
+                    img = img.crop(box)
+            output = BytesIO()
+            img.save(output, format='JPEG', quality=95)
+            return output.getvalue()
+
+        except Exception as e:
+            ui_logger.error(f"     - [失败❌] 单次解码截图过程中发生错误: {e}", task_category=task_category, exc_info=True)
+            return None
+
+
     def _get_remote_db(self, config: EpisodeRefresherConfig, force_refresh: bool = False) -> Tuple[Optional[Dict], Optional[str]]:
         task_cat = "远程图床"
         github_conf = config.github_config
@@ -491,7 +755,7 @@ class EpisodeRefresherLogic:
             raw_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{github_conf.branch}/database.json"
             ui_logger.debug(f"     - [远程图床] 正在从 Raw URL 下载数据库: {raw_url}", task_category=task_cat)
             proxies = self.tmdb_logic.proxy_manager.get_proxies(raw_url)
-            response = self.session.get(raw_url, timeout=30, proxies=proxies)
+            response = github_client.get(raw_url, timeout=30, proxies=proxies)
             
             if response.status_code == 200:
                 db_content = response.json()
@@ -510,7 +774,7 @@ class EpisodeRefresherLogic:
                 headers["Authorization"] = f"token {github_conf.personal_access_token}"
             
             proxies = self.tmdb_logic.proxy_manager.get_proxies(api_url)
-            api_response = self.session.get(api_url, headers=headers, timeout=30, proxies=proxies)
+            api_response = github_client.get(api_url, headers=headers, timeout=30, proxies=proxies)
             api_response.raise_for_status()
             
             api_data = api_response.json()
@@ -601,17 +865,25 @@ class EpisodeRefresherLogic:
         if not video_url:
             ui_logger.error(f"{log_prefix} [失败❌] 未能获取到视频流 URL，无法截图。", task_category=task_category)
             return False, "none"
-            
-        if duration is None:
-            duration = self._get_video_duration(video_url, task_category)
 
-        seek_time = duration * (config.screenshot_percentage / 100) if duration else config.screenshot_fallback_seconds
-        if duration:
-            ui_logger.debug(f"     - [截图] 截图位置: {seek_time:.2f}s (基于 {config.screenshot_percentage}%)。", task_category=task_category)
-        else:
-            ui_logger.warning(f"     - [截图] 获取视频时长失败，将使用保底秒数进行截图: {seek_time}s。", task_category=task_category)
+        # 占用该视频源服务器的一个视频流名额，时长探测与截图都在名额内完成
+        with _stream_slots_for(video_url).slot(config.screenshot_streams_per_server):
+            if self._cancel_event is not None and self._cancel_event.is_set():
+                return False, "none"
+
+            if duration is None:
+                duration = self._get_video_duration(video_url, task_category)
 
-        image_bytes = self._capture_screenshot(video_url, seek_time, config, task_category)
+            seek_time = duration * (config.screenshot_percentage / 100) if duration else config.screenshot_fallback_seconds
+            if duration:
+                ui_logger.debug(f"     - [截图] 截图位置: {seek_time:.2f}s (基于 {config.screenshot_percentage}%)。", task_category=task_category)
+            else:
+                ui_logger.warning(f"     - [截图] 获取视频时长失败，将使用保底秒数进行截图: {seek_time}s。", task_category=task_category)
+
+            if config.screenshot_capture_mode == 'single_pass' and OPENCV_AVAILABLE:
+                image_bytes = self._capture_screenshot_single_pass(video_url, seek_time, config, task_category)
+            else:
+                image_bytes = self._capture_screenshot(video_url, seek_time, config, task_category)
         
         if image_bytes:
             # --- 新增/修改：图片压缩逻辑 ---
@@ -851,6 +1123,9 @@ class EpisodeRefresherLogic:
 
     def _refresh_season_by_toolbox(self, series_tmdb_id: str, season_number: int, emby_episodes: List[Dict], config: EpisodeRefresherConfig, task_category: str, remote_db: Optional[Dict], series_tags: List[str]) -> int:
         updated_count = 0
+        self._ffmpeg_limit = config.screenshot_concurrency
+        screenshot_pool: Optional[ThreadPoolExecutor] = None
+        screenshot_futures = []
         try:
             series_name_for_log = emby_episodes[0].get("SeriesName", f"剧集 {series_tmdb_id}")
             ui_logger.info(f"  -> [工具箱模式] 正在为《{series_name_for_log}》S{season_number:02d} 获取整季TMDB数据...", task_category=task_category)
@@ -878,6 +1153,8 @@ class EpisodeRefresherLogic:
                     break
 
             for emby_episode in emby_episodes:
+                if self._cancel_event is not None and self._cancel_event.is_set():
+                    break
                 episode_num = emby_episode.get("IndexNumber")
                 if episode_num is None:
                     continue
@@ -1021,40 +1298,97 @@ class EpisodeRefresherLogic:
                                 self._delete_local_screenshot(series_tmdb_id, season_number, episode_num, task_category)
                 
                 elif image_update_action == "screenshot":
-                    success, source = self._handle_screenshot_flow(series_tmdb_id, emby_episode["Id"], emby_episode, config, task_category)
-                    if success:
-                        source_map = {"remote": "远程图床", "local": "本地缓存", "screenshot": "实时截图"}
-                        final_changes_log.append(f"图片({source_map.get(source, '未知')})")
-                        if config.screenshot_cooldown > 0:
-                            ui_logger.debug(f"     - [截图] 操作冷却，等待 {config.screenshot_cooldown} 秒...", task_category=task_category)
-                            time.sleep(config.screenshot_cooldown)
-
-                if should_sync_local_file:
-                    self._update_local_scraper_episode_file(
-                        series_tmdb_id,
-                        season_number,
-                        episode_num,
-                        tmdb_episode,
-                        task_category
-                    )
-
-                if final_changes_log:
-                    ui_logger.info(f"{log_prefix} [成功🎉] 本次更新内容: [{', '.join(final_changes_log)}]", task_category=task_category)
-                    updated_count += 1
-                else:
-                    ui_logger.warning(f"{log_prefix} [警告⚠️] 检测到需要更新，但所有更新操作均失败。", task_category=task_category)
+                    # 截图交给并发截图池，元数据已在上方更新，截图完成后再各自收尾
+                    if screenshot_pool is None:
+                        screenshot_pool = ThreadPoolExecutor(max_workers=config.screenshot_concurrency, thread_name_prefix="screenshot")
+                        ui_logger.info(f"     - [截图] 启动并发截图池 (并发: {config.screenshot_concurrency}, 单服务器视频流上限: {config.screenshot_streams_per_server})。", task_category=task_category)
+                    screenshot_futures.append(screenshot_pool.submit(
+                        self._screenshot_and_finalize_episode,
+                        series_tmdb_id, season_number, emby_episode, tmdb_episode,
+                        final_changes_log, should_sync_local_file, config, task_category, log_prefix
+                    ))
+                    continue
+
+                updated_count += self._finalize_episode_update(
+                    series_tmdb_id, season_number, episode_num, tmdb_episode,
+                    final_changes_log, should_sync_local_file, task_category, log_prefix
+                )
+
+            updated_count += self._collect_screenshot_results(screenshot_futures, task_category)
 
         except Exception as e:
             ui_logger.error(f"     - [失败❌] 处理 S{season_number:02d} 时发生严重错误: {e}", task_category=task_category, exc_info=True)
+        finally:
+            if screenshot_pool is not None:
+                screenshot_pool.shutdown(wait=True, cancel_futures=True)
         
         return updated_count
 
+    def _finalize_episode_update(self, series_tmdb_id: str, season_number: int, episode_num: int, tmdb_episode: Optional[Dict],
+                                 final_changes_log: List[str], should_sync_local_file: bool, task_category: str, log_prefix: str) -> int:
+        """同步本地刮削源文件并输出单集的更新结果，返回成功更新的分集数 (0 或 1)"""
+        if should_sync_local_file:
+            self._update_local_scraper_episode_file(
+                series_tmdb_id,
+                season_number,
+                episode_num,
+                tmdb_episode,
+                task_category
+            )
+
+        if final_changes_log:
+            ui_logger.info(f"{log_prefix} [成功🎉] 本次更新内容: [{', '.join(final_changes_log)}]", task_category=task_category)
+            return 1
+        ui_logger.warning(f"{log_prefix} [警告⚠️] 检测到需要更新，但所有更新操作均失败。", task_category=task_category)
+        return 0
+
+    def _screenshot_and_finalize_episode(self, series_tmdb_id: str, season_number: int, emby_episode: Dict, tmdb_episode: Optional[Dict],
+                                         final_changes_log: List[str], should_sync_local_file: bool, config: EpisodeRefresherConfig,
+                                         task_category: str, log_prefix: str) -> int:
+        """截图池中执行的单集截图流程，截图完成后立即上传并收尾"""
+        if self._cancel_event is not None and self._cancel_event.is_set():
+            return 0
+        success, source = self._handle_screenshot_flow(series_tmdb_id, emby_episode["Id"], emby_episode, config, task_category)
+        if success:
+            source_map = {"remote": "远程图床", "local": "本地缓存", "screenshot": "实时截图"}
+            final_changes_log.append(f"图片({source_map.get(source, '未知')})")
+            if config.screenshot_cooldown > 0:
+                ui_logger.debug(f"     - [截图] 操作冷却，等待 {config.screenshot_cooldown} 秒...", task_category=task_category)
+                time.sleep(config.screenshot_cooldown)
+        return self._finalize_episode_update(
+            series_tmdb_id, season_number, emby_episode.get("IndexNumber"), tmdb_episode,
+            final_changes_log, should_sync_local_file, task_category, log_prefix
+        )
+
+    def _collect_screenshot_results(self, futures: List, task_category: str) -> int:
+        """等待截图池中的分集全部完成；任务被取消时终止正在运行的 ffmpeg 并放弃排队中的分集"""
+        updated_count = 0
+        pending = set(futures)
+        cancelled = False
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.cancelled():
+                    continue
+                try:
+                    updated_count += future.result()
+                except Exception as e:
+                    ui_logger.error(f"     - [失败❌] 并发截图时发生错误: {e}", task_category=task_category, exc_info=True)
+            if not cancelled and self._cancel_event is not None and self._cancel_event.is_set():
+                cancelled = True
+                for future in pending:
+                    future.cancel()
+                killed = self._kill_active_processes()
+                ui_logger.warning(f"     - [截图] 任务已取消，已终止 {killed} 个正在运行的 ffmpeg 进程。", task_category=task_category)
+        return updated_count
+
     
 
     def run_refresh_for_episodes(self, episode_ids: Iterable[str], config: EpisodeRefresherConfig, cancellation_event: threading.Event, task_id: Optional[str] = None, task_manager: Optional[TaskManager] = None, task_category: str = "剧集刷新"):
         
         episode_ids_list = list(episode_ids)
         total_episodes = len(episode_ids_list)
+        self._cancel_event = cancellation_event
         
         ui_logger.info(f"任务启动，共需处理 {total_episodes} 个剧集分集。", task_category=task_category)
         ui_logger.info(f"  - 刷新模式: {'工具箱代理刷新' if config.refresh_mode == 'toolbox' else '通知Emby刷新'}", task_category=task_category)
@@ -1077,23 +1411,25 @@ class EpisodeRefresherLogic:
 
         ui_logger.info("步骤 1/2: 正在获取并筛选需要处理的分集...", task_category=task_category)
         
-        all_episode_details = []
-        for index, episode_id in enumerate(episode_ids_list):
-            if cancellation_event.is_set(): break
+        selector = MediaSelector(self.app_config)
+        fields_to_get = "SeriesId,SeriesName,Name,Overview,ImageTags,IndexNumber,ParentIndexNumber,PremiereDate,ProviderIds,LockedFields,RunTimeTicks"
+        details_by_id = {}
+        for details_page in selector.iter_item_details_batch(episode_ids_list, fields_to_get, cancellation_event=cancellation_event):
+            for details in details_page:
+                details_by_id[details.get("Id")] = details
             if task_manager and task_id:
-                task_manager.update_task_progress(task_id, index + 1, total_episodes)
-            try:
-                fields_to_get = "SeriesId,SeriesName,Name,Overview,ImageTags,IndexNumber,ParentIndexNumber,PremiereDate,ProviderIds,LockedFields,RunTimeTicks"
-                details = self._get_emby_item_details(episode_id, fields_to_get)
-                if details:
-                    all_episode_details.append(details)
-            except requests.RequestException as e:
-                logging.error(f"【剧集刷新】获取分集详情 (ID: {episode_id}) 失败: {e}，跳过此分集。")
+                task_manager.update_task_progress(task_id, len(details_by_id), total_episodes)
         
         if cancellation_event.is_set():
             ui_logger.warning("任务在预处理阶段被取消。", task_category=task_category)
             return
 
+        # 保持与传入顺序一致，批量接口返回的顺序由服务器决定
+        all_episode_details = [details_by_id[ep_id] for ep_id in episode_ids_list if ep_id in details_by_id]
+        missing_count = total_episodes - len(all_episode_details)
+        if missing_count > 0:
+            logging.error(f"【剧集刷新】有 {missing_count} 个分集未能获取到详情，已跳过。")
+
         episodes_to_process = []
         if config.skip_if_complete:
             ui_logger.info("智能跳过已开启，正在逐一分析分集完整性...", task_category=task_category)
@@ -1103,10 +1439,12 @@ class EpisodeRefresherLogic:
             
             if series_ids_to_check:
                 ui_logger.info(f"正在检查 {len(series_ids_to_check)} 部剧集的强制刷新标签...", task_category=task_category)
+                series_details_map = selector.get_item_details_batch(series_ids_to_check, "Tags,TagItems")
+
                 def check_series_tag(sid):
                     try:
                         # 1. 请求字段增加 TagItems
-                        s_details = self._get_emby_item_details(sid, "Tags,TagItems")
+                        s_details = series_details_map.get(sid) or {}
                         
                         # 2. 健壮的解析逻辑 (优先 TagItems)
                         tags = []
@@ -1126,11 +1464,9 @@ class EpisodeRefresherLogic:
                     except:
                         return sid, False
 
-                with ThreadPoolExecutor(max_workers=10) as executor:
-                    futures = [executor.submit(check_series_tag, sid) for sid in series_ids_to_check]
-                    for f in as_completed(futures):
-                        sid, is_forced = f.result()
-                        series_force_map[sid] = is_forced
+                for sid in series_ids_to_check:
+                    _, is_forced = check_series_tag(sid)
+                    series_force_map[sid] = is_forced
 
             for ep in all_episode_details:
 
@@ -1381,15 +1717,14 @@ class EpisodeRefresherLogic:
             return {"uploaded_count": 0, "skipped_count": 0, "failed_count": 0}
 
         # 步骤 1: 获取远程状态
-        ui_logger.info(f"【{task_cat}】[步骤 1/5] 正在从 GitHub 获取最新的远程数据库...", task_category=task_cat)
-        remote_db, remote_sha = self._get_remote_db(config, force_refresh=True)
+        ui_logger.info(f"【{task_cat}】[步骤 1/4] 正在从 GitHub 获取最新的远程数据库...", task_category=task_cat)
+        remote_db, _ = self._get_remote_db(config, force_refresh=True)
         if remote_db is None:
             ui_logger.info(f"【{task_cat}】远程仓库似乎没有 'database.json' 文件，将创建一个新的。", task_category=task_cat)
             remote_db = {"version": 2, "last_updated": "", "series": {}}
-            remote_sha = None # 新建文件没有 sha
 
         # 步骤 2: 扫描本地文件
-        ui_logger.info(f"【{task_cat}】[步骤 2/5] 正在扫描本地截图文件夹...", task_category=task_cat)
+        ui_logger.info(f"【{task_cat}】[步骤 2/4] 正在扫描本地截图文件夹...", task_category=task_cat)
         upload_queue = []
         id_pattern = re.compile(r'\[(\d+)\]$')
         file_pattern = re.compile(r'season-(\d+)-episode-(\d+)\.jpg')
@@ -1416,158 +1751,107 @@ class EpisodeRefresherLogic:
                         "local_path": os.path.join(series_dir_path, filename),
                         "github_path": f"EpisodeScreenshots/{tmdb_id}/{filename}",
                         "tmdb_id": tmdb_id,
-                        "episode_key": episode_key
+                        "episode_key": episode_key,
+                        "exists_remotely": episode_key in remote_series_data
                     })
+
+        skipped_count = 0
+        if github_conf.overwrite_remote:
+            upload_queue, skipped_count = self._skip_unchanged_screenshots(upload_queue, remote_db, github_conf, task_cat)
         
         total_to_upload = len(upload_queue)
-        ui_logger.info(f"【{task_cat}】[步骤 2/5] 本地扫描完成，共发现 {total_to_upload} 个需要上传或更新的截图。", task_category=task_cat)
+        ui_logger.info(f"【{task_cat}】[步骤 2/4] 本地扫描完成，共发现 {total_to_upload} 个需要上传或更新的截图。", task_category=task_cat)
         if total_to_upload == 0:
             ui_logger.info(f"【{task_cat}】本地与远程没有差异，任务完成。", task_category=task_cat)
-            return {"uploaded_count": 0, "skipped_count": 0, "failed_count": 0}
+            return {"uploaded_count": 0, "skipped_count": skipped_count, "failed_count": 0}
 
-        # 步骤 3: 串行上传
-        ui_logger.info(f"【{task_cat}】[步骤 3/5] 开始串行上传截图，请稍候...", task_category=task_cat)
+        # 步骤 3: 分批提交 (每批一个提交，同时包含更新后的索引)
+        ui_logger.info(f"【{task_cat}】[步骤 3/4] 开始分批提交截图 (每批最多 {DEFAULT_BATCH_SIZE} 个文件，索引随每批同步更新)...", task_category=task_cat)
         task_manager.update_task_progress(task_id, 0, total_to_upload)
-        
-        successful_uploads = []
-        failed_uploads = []
-        
-        for i, item in enumerate(upload_queue):
-            if cancellation_event.is_set():
-                ui_logger.warning(f"【{task_cat}】任务在上传阶段被用户取消。", task_category=task_cat)
-                break
-            
-            ui_logger.info(f"➡️ 正在上传第 {i + 1}/{total_to_upload} 个文件: {os.path.basename(item['local_path'])}", task_category=task_cat)
-            try:
-                download_url = self._upload_file_to_github(item, github_conf)
-                if download_url:
-                    item["download_url"] = download_url
-                    successful_uploads.append(item)
-                    ui_logger.info(f"✅ 上传成功: {os.path.basename(item['local_path'])}", task_category=task_cat)
-                else:
-                    failed_uploads.append(item)
-                    ui_logger.error(f"❌ 上传失败: {os.path.basename(item['local_path'])}", task_category=task_cat)
-            except Exception as e:
-                ui_logger.error(f"❌ 上传文件 '{item['local_path']}' 时发生严重错误: {e}", task_category=task_cat)
-                failed_uploads.append(item)
-            
-            task_manager.update_task_progress(task_id, i + 1, total_to_upload)
-
-        ui_logger.info(f"【{task_cat}】[步骤 3/5] 截图上传完成。成功: {len(successful_uploads)}, 失败: {len(failed_uploads)}。", task_category=task_cat)
-        if failed_uploads:
-            ui_logger.error(f"【{task_cat}】⚠️ 由于存在上传失败的截图，任务中止，索引文件将不会更新。", task_category=task_cat)
-            return {"uploaded_count": len(successful_uploads), "skipped_count": 0, "failed_count": len(failed_uploads)}
 
-        # 步骤 4: 合并索引
-        ui_logger.info(f"【{task_cat}】[步骤 4/5] 正在合并索引文件...", task_category=task_cat)
-        final_db = remote_db
-        for item in successful_uploads:
-            tmdb_id = item["tmdb_id"]
-            episode_key = item["episode_key"]
-            if tmdb_id not in final_db["series"]:
-                final_db["series"][tmdb_id] = {}
-            final_db["series"][tmdb_id][episode_key] = item["download_url"]
-        
-        final_db["last_updated"] = datetime.utcnow().isoformat() + "Z"
-
-        # 步骤 5: 提交索引
-        ui_logger.info(f"【{task_cat}】[步骤 5/5] 正在将更新后的索引提交到 GitHub...", task_category=task_cat)
-        if self._upload_db_to_github(final_db, remote_sha, github_conf):
-            ui_logger.info(f"【{task_cat}】[成功🎉] 索引文件成功更新！备份任务全部完成。", task_category=task_cat)
-        else:
-            ui_logger.error(f"【{task_cat}】[失败❌] 索引文件提交失败！图片已上传但未记录，请重新运行备份任务以修复索引。", task_category=task_cat)
-            return {"uploaded_count": len(successful_uploads), "skipped_count": 0, "failed_count": len(failed_uploads) + 1}
-
-        return {"uploaded_count": len(successful_uploads), "skipped_count": 0, "failed_count": 0}
-
-
-    def _upload_file_to_github(self, item: Dict, github_conf) -> Optional[str]:
-        task_cat = "备份到GitHub"
         try:
-            if github_conf.upload_cooldown > 0:
-                ui_logger.debug(f"     - [GitHub上传] ⏱️ 上传冷却 {github_conf.upload_cooldown} 秒...", task_category=task_cat)
-                time.sleep(github_conf.upload_cooldown)
-
-            with open(item["local_path"], "rb") as f:
-                content_bytes = f.read()
-            
-            content_b64 = base64.b64encode(content_bytes).decode('utf-8')
-            
-            match = re.match(r"https?://github\.com/([^/]+)/([^/]+)", github_conf.repo_url)
-            owner, repo = match.groups()
-            
-            api_url = f"https://api.github.com/repos/{owner}/{repo}/contents/{item['github_path']}"
-            
-            sha = None
-            # --- 核心修改：无论是否覆盖，都尝试获取 SHA，因为更新操作总是需要它 ---
-            try:
-                ui_logger.debug(f"     - [GitHub上传] 正在查询文件 '{item['github_path']}' 的当前 SHA...", task_category=task_cat)
-                get_headers = {
-                    "Accept": "application/vnd.github.v3+json",
-                    "Authorization": f"token {github_conf.personal_access_token}"
-                }
-                proxies = self.tmdb_logic.proxy_manager.get_proxies(api_url)
-                get_resp = self.session.get(api_url, headers=get_headers, timeout=20, proxies=proxies)
-                if get_resp.status_code == 200:
-                    sha = get_resp.json().get('sha')
-                    ui_logger.debug(f"     - [GitHub上传] 文件已存在，获取到 SHA: {sha}", task_category=task_cat)
-                else:
-                    ui_logger.debug(f"     - [GitHub上传] 文件不存在或查询失败 (状态码: {get_resp.status_code})，将作为新文件创建。", task_category=task_cat)
-            except Exception as e:
-                # 获取SHA失败是正常的（比如文件第一次上传），记录一个debug日志即可
-                ui_logger.debug(f"     - [GitHub上传] 查询 SHA 时发生异常 (可能是新文件): {e}", task_category=task_cat)
-
-            payload_dict = {
-                "message": f"feat: Add screenshot for {item['github_path']}",
-                "content": content_b64,
-                "branch": github_conf.branch
-            }
-            # --- 核心修改：只要获取到了 SHA，就必须附带它 ---
-            if sha:
-                payload_dict["sha"] = sha
+            committed = self._commit_screenshots_to_github(
+                upload_queue, github_conf, "feat: Backup episode screenshots", cancellation_event,
+                progress_callback=lambda done, total: task_manager.update_task_progress(task_id, done, total)
+            )
+        except Exception as e:
+            ui_logger.error(f"【{task_cat}】[失败❌] 提交截图时发生错误: {e}。已完成的批次已完整写入 (图片与索引一致)，重新运行即可继续。", task_category=task_cat)
+            raise
 
-            payload_json_str = json.dumps(payload_dict)
+        if len(committed) < total_to_upload:
+            ui_logger.warning(f"【{task_cat}】任务被用户取消，已提交 {len(committed)}/{total_to_upload} 个截图。", task_category=task_cat)
+        ui_logger.info(f"【{task_cat}】[步骤 4/4][成功🎉] 共提交 {len(committed)} 个截图，索引文件已同步更新。", task_category=task_cat)
+        return {"uploaded_count": len(committed), "skipped_count": skipped_count, "failed_count": 0}
 
-            command = [
-                'curl',
-                '-L',
-                '-X', 'PUT',
-                '-H', 'Accept: application/vnd.github.v3+json',
-                '-H', f'Authorization: token {github_conf.personal_access_token}',
-                '-H', 'Content-Type: application/json',
-                '--data-binary', '@-',
-                api_url
-            ]
-            
-            proxies = self.tmdb_logic.proxy_manager.get_proxies(api_url)
-            if proxies.get('https'):
-                command.extend(['--proxy', proxies['https']])
-
-            result = subprocess.run(command, input=payload_json_str, capture_output=True, text=True, check=False)
-            
-            response_data = {}
+    def _skip_unchanged_screenshots(self, upload_queue: List[Dict], remote_db: Dict, github_conf, task_cat: str) -> Tuple[List[Dict], int]:
+        """
+        覆盖模式下，比较本地截图与远程文件的 git blob SHA，剔除内容完全相同的截图。
+        远程 SHA 优先取自 database.json 的 hashes 字段；旧版索引没有记录时，
+        通过一次目录树查询获取远程文件的实际 SHA。
+        """
+        candidates = [item for item in upload_queue if item["exists_remotely"]]
+        if not candidates:
+            return upload_queue, 0
+
+        ui_logger.info(f"【{task_cat}】正在比较 {len(candidates)} 个已存在截图的内容哈希...", task_category=task_cat)
+        local_shas = blob_hash_cache.get_many(item["local_path"] for item in candidates)
+        remote_hashes = remote_db.get("hashes", {})
+        remote_shas = {
+            item["github_path"]: remote_hashes.get(item["tmdb_id"], {}).get(item["episode_key"])
+            for item in candidates
+        }
+
+        if any(sha is None for sha in remote_shas.values()):
             try:
-                response_data = json.loads(result.stdout)
-            except json.JSONDecodeError:
-                if "409 Conflict" in result.stderr:
-                     raise Exception(f"GitHub API 返回 409 Conflict 错误，这通常是并发写入冲突导致的。请稍后重试。")
-                raise Exception(f"cURL 返回了非JSON响应: {result.stdout} | 错误: {result.stderr}")
-
-            if result.returncode != 0 or 'content' not in response_data or 'download_url' not in response_data.get('content', {}):
-                 if "message" in response_data and "documentation_url" in response_data:
-                     # --- 核心修改：对 422 错误进行更友好的日志提示 ---
-                     error_message = response_data['message']
-                     if response_data.get('status') == '422' and "sha" in error_message:
-                         error_message = f"无效请求。服务器提示 'sha' 参数有问题。这可能是因为在您操作期间，文件被其他进程修改。请重试。({error_message})"
-                     raise Exception(f"GitHub API 错误: {error_message} (状态码: {response_data.get('status', '未知')})")
-                 raise Exception(f"cURL 上传失败。返回码: {result.returncode}, 输出: {result.stdout}, 错误: {result.stderr}")
-
-            return response_data["content"]["download_url"]
+                committer = GitDataCommitter(
+                    github_conf.repo_url, github_conf.personal_access_token, github_conf.branch,
+                    proxy_manager=self.tmdb_logic.proxy_manager
+                )
+                tree_shas = committer.list_blob_shas("EpisodeScreenshots")
+                for path, sha in remote_shas.items():
+                    if sha is None:
+                        remote_shas[path] = tree_shas.get(path)
+            except Exception as e:
+                ui_logger.warning(f"【{task_cat}】获取远程文件哈希失败，未记录哈希的截图将全部重新上传: {e}", task_category=task_cat)
 
-        except Exception as e:
-            ui_logger.error(f"【{task_cat}】上传文件 '{item['local_path']}' 时发生错误: {e}", task_category=task_cat)
-            return None
+        unchanged = {
+            id(item) for item in candidates
+            if local_shas.get(item["local_path"]) is not None and local_shas[item["local_path"]] == remote_shas.get(item["github_path"])
+        }
+        if unchanged:
+            ui_logger.info(f"【{task_cat}】{len(unchanged)} 个截图与远程内容完全一致，跳过上传。", task_category=task_cat)
+        return [item for item in upload_queue if id(item) not in unchanged], len(unchanged)
 
+    @staticmethod
+    def _merge_screenshot_index(current_db: Optional[Dict], batch: List[Dict]) -> Dict:
+        """将一批已提交截图的地址合并到远程 database.json 中"""
+        final_db = current_db or {"version": 2, "last_updated": "", "series": {}}
+        final_db.setdefault("series", {})
+        for item in batch:
+            if item.get("delete"):
+                continue
+            final_db["series"].setdefault(item["tmdb_id"], {})[item["episode_key"]] = item["download_url"]
+            final_db.setdefault("hashes", {}).setdefault(item["tmdb_id"], {})[item["episode_key"]] = item["blob_sha"]
+        final_db["last_updated"] = datetime.utcnow().isoformat() + "Z"
+        return final_db
+
+    def _commit_screenshots_to_github(self, upload_items: List[Dict], github_conf, message: str,
+                                      cancellation_event: Optional[threading.Event] = None, progress_callback=None) -> List[Dict]:
+        """通过 Git Data API 分批提交截图，每批连同 database.json 原子地写入分支"""
+        committer = GitDataCommitter(
+            github_conf.repo_url, github_conf.personal_access_token, github_conf.branch,
+            proxy_manager=self.tmdb_logic.proxy_manager
+        )
+        for item in upload_items:
+            item["path"] = item["github_path"]
+        committed = committer.commit_in_batches(
+            upload_items, message,
+            index_path="database.json", update_index=self._merge_screenshot_index,
+            cooldown=github_conf.upload_cooldown, cancellation_event=cancellation_event,
+            progress_callback=progress_callback
+        )
+        logging.info(f"【GitHub提交】提交 {len(committed)} 个截图共发出 {committer.request_count} 次 API 请求。")
+        return committed
 
 
     def _upload_db_to_github(self, db_content: Dict, sha: Optional[str], github_conf) -> bool:
@@ -1577,23 +1861,17 @@ class EpisodeRefresherLogic:
                 ui_logger.debug(f"     - [GitHub上传] ⏱️ 上传冷却 {github_conf.upload_cooldown} 秒...", task_category=task_cat)
                 time.sleep(github_conf.upload_cooldown)
 
-            content_b64 = base64.b64encode(json.dumps(db_content, indent=2, ensure_ascii=False).encode('utf-8')).decode('utf-8')
-            
             match = re.match(r"https?://github\.com/([^/]+)/([^/]+)", github_conf.repo_url)
             owner, repo = match.groups()
             
             api_url = f"https://api.github.com/repos/{owner}/{repo}/contents/database.json"
+            proxies = self.tmdb_logic.proxy_manager.get_proxies(api_url)
             
-            # --- 核心修改：在上传前，重新获取一次最新的 SHA ---
+            # 上传前重新获取一次最新的 SHA
             latest_sha = None
             try:
                 ui_logger.debug(f"     - [GitHub上传] 正在为 'database.json' 查询最新的 SHA...", task_category=task_cat)
-                get_headers = {
-                    "Accept": "application/vnd.github.v3+json",
-                    "Authorization": f"token {github_conf.personal_access_token}"
-                }
-                proxies = self.tmdb_logic.proxy_manager.get_proxies(api_url)
-                get_resp = self.session.get(api_url, headers=get_headers, timeout=20, proxies=proxies)
+                get_resp = github_client.api_request("GET", api_url, github_conf.personal_access_token, proxies=proxies, timeout=20)
                 if get_resp.status_code == 200:
                     latest_sha = get_resp.json().get('sha')
                     ui_logger.debug(f"     - [GitHub上传] 成功获取到 'database.json' 的最新 SHA: {latest_sha}", task_category=task_cat)
@@ -1601,45 +1879,16 @@ class EpisodeRefresherLogic:
                     ui_logger.debug(f"     - [GitHub上传] 'database.json' 在远程不存在，将作为新文件创建。", task_category=task_cat)
             except Exception as e:
                 ui_logger.debug(f"     - [GitHub上传] 查询 'database.json' 的 SHA 时发生异常: {e}", task_category=task_cat)
-            # --- 结束核心修改 ---
 
             payload_dict = {
                 "message": f"feat: Update database.json - {datetime.utcnow().isoformat()}",
-                "content": content_b64,
                 "branch": github_conf.branch
             }
-            # --- 核心修改：使用最新获取的 SHA ---
             if latest_sha:
                 payload_dict["sha"] = latest_sha
 
-            payload_json_str = json.dumps(payload_dict)
-
-            command = [
-                'curl',
-                '-L',
-                '-X', 'PUT',
-                '-H', 'Accept: application/vnd.github.v3+json',
-                '-H', f'Authorization: token {github_conf.personal_access_token}',
-                '-H', 'Content-Type: application/json',
-                '--data-binary', '@-',
-                api_url
-            ]
-
-            proxies = self.tmdb_logic.proxy_manager.get_proxies(api_url)
-            if proxies.get('https'):
-                command.extend(['--proxy', proxies['https']])
-
-            result = subprocess.run(command, input=payload_json_str, capture_output=True, text=True, check=False)
-
-            if result.returncode != 0:
-                raise Exception(f"cURL 上传失败。返回码: {result.returncode}, 输出: {result.stdout}, 错误: {result.stderr}")
-            
-            try:
-                response_json = json.loads(result.stdout)
-                if "message" in response_json and "documentation_url" in response_json:
-                     raise Exception(f"GitHub API 返回错误: {response_json['message']}")
-            except json.JSONDecodeError:
-                pass
+            content = json.dumps(db_content, indent=2, ensure_ascii=False).encode('utf-8')
+            github_client.write("PUT", api_url, github_conf.personal_access_token, payload_dict, proxies=proxies, content=content)
 
             return True
         except Exception as e:
@@ -1721,27 +1970,15 @@ class EpisodeRefresherLogic:
             ui_logger.error(f"【{task_cat}】❌ 任务中止：未配置完整的 GitHub 仓库 URL 和个人访问令牌 (PAT)。", task_category=task_cat)
             raise ValueError("GitHub 仓库 URL 和 PAT 不能为空。")
 
-        # 步骤 1: 获取远程数据库状态
-        ui_logger.info(f"【{task_cat}】[步骤 1/3] 正在从 GitHub 获取最新的远程数据库...", task_category=task_cat)
-        remote_db, remote_sha = self._get_remote_db(config, force_refresh=True)
-        if remote_db is None:
-            ui_logger.info(f"【{task_cat}】远程仓库似乎没有 'database.json' 文件，将创建一个新的。", task_category=task_cat)
-            remote_db = {"version": 2, "last_updated": "", "series": {}}
-            remote_sha = None
-
-        # 步骤 2: 串行处理每个请求的分集
-        ui_logger.info(f"【{task_cat}】[步骤 2/3] 开始逐一处理请求的分集...", task_category=task_cat)
+        # 步骤 1: 定位每个请求分集的本地截图 (远程索引在提交时读取最新版本并合并)
+        ui_logger.info(f"【{task_cat}】[步骤 1/2] 正在定位请求分集的本地截图...", task_category=task_cat)
         task_manager.update_task_progress(task_id, 0, len(episodes))
         
-        successful_uploads = []
+        upload_items = []
         failed_uploads = []
         skipped_uploads = []
 
-        for i, episode_info in enumerate(episodes):
-            if cancellation_event.is_set():
-                ui_logger.warning(f"【{task_cat}】任务在处理中被用户取消。", task_category=task_cat)
-                break
-            
+        for episode_info in episodes:
             season_number = episode_info.get("season_number")
             episode_number = episode_info.get("episode_number")
             log_prefix = f"➡️ S{season_number:02d}E{episode_number:02d}:"
@@ -1758,47 +1995,30 @@ class EpisodeRefresherLogic:
                 skipped_uploads.append(episode_info)
                 continue
             
-            # 准备上传
-            upload_item = {
+            upload_items.append({
                 "local_path": local_path,
                 "github_path": f"EpisodeScreenshots/{series_tmdb_id}/{os.path.basename(local_path)}",
                 "tmdb_id": series_tmdb_id,
                 "episode_key": f"{season_number}-{episode_number}"
-            }
+            })
 
+        # 步骤 2: 所有截图与索引在同一个提交中写入
+        successful_uploads = []
+        if not upload_items:
+            ui_logger.info(f"【{task_cat}】[步骤 2/2] 没有可上传的截图，无需更新索引。", task_category=task_cat)
+        elif cancellation_event.is_set():
+            ui_logger.warning(f"【{task_cat}】任务在上传前被用户取消。", task_category=task_cat)
+        else:
+            ui_logger.info(f"【{task_cat}】[步骤 2/2] 正在将 {len(upload_items)} 个截图连同索引文件一次性提交到 GitHub...", task_category=task_cat)
             try:
-                download_url = self._upload_file_to_github(upload_item, github_conf)
-                if download_url:
-                    upload_item["download_url"] = download_url
-                    successful_uploads.append(upload_item)
-                    ui_logger.info(f"{log_prefix} ✅ 成功上传到 GitHub。", task_category=task_cat)
-                else:
-                    failed_uploads.append(episode_info)
-                    ui_logger.error(f"{log_prefix} ❌ 上传失败。", task_category=task_cat)
+                successful_uploads = self._commit_screenshots_to_github(
+                    upload_items, github_conf, f"feat: Update screenshots for {series_tmdb_id}", cancellation_event
+                )
+                ui_logger.info(f"【{task_cat}】🎉 截图与索引文件更新成功！", task_category=task_cat)
             except Exception as e:
-                failed_uploads.append(episode_info)
-                ui_logger.error(f"{log_prefix} ❌ 上传时发生严重错误: {e}", task_category=task_cat)
-            
-            task_manager.update_task_progress(task_id, i + 1, len(episodes))
-
-        # 步骤 3: 更新索引文件
-        if not successful_uploads:
-            ui_logger.info(f"【{task_cat}】[步骤 3/3] 本次没有任何文件成功上传，无需更新索引。", task_category=task_cat)
-        else:
-            ui_logger.info(f"【{task_cat}】[步骤 3/3] 正在合并并提交更新后的索引文件...", task_category=task_cat)
-            final_db = remote_db
-            for item in successful_uploads:
-                tmdb_id = item["tmdb_id"]
-                episode_key = item["episode_key"]
-                if tmdb_id not in final_db["series"]:
-                    final_db["series"][tmdb_id] = {}
-                final_db["series"][tmdb_id][episode_key] = item["download_url"]
-            final_db["last_updated"] = datetime.utcnow().isoformat() + "Z"
-
-            if self._upload_db_to_github(final_db, remote_sha, github_conf):
-                ui_logger.info(f"【{task_cat}】🎉 索引文件更新成功！", task_category=task_cat)
-            else:
-                ui_logger.error(f"【{task_cat}】❌ 索引文件更新失败！图片已上传但未记录，请重新运行以修复索引。", task_category=task_cat)
+                failed_uploads.extend(upload_items)
+                ui_logger.error(f"【{task_cat}】❌ 提交到 GitHub 失败: {e}", task_category=task_cat)
+        task_manager.update_task_progress(task_id, len(episodes), len(episodes))
         
         ui_logger.info(f"【{task_cat}】任务执行完毕。成功: {len(successful_uploads)}, 失败: {len(failed_uploads)}, 跳过: {len(skipped_uploads)}", task_category=task_cat)
         return {"success": len(successful_uploads), "failed": len(failed_uploads), "skipped": len(skipped_uploads)}
@@ -1961,20 +2181,14 @@ class EpisodeRefresherLogic:
                 "branch": github_conf.branch
             }
             
-            headers = {
-                "Accept": "application/vnd.github.v3+json",
-                "Authorization": f"token {github_conf.personal_access_token}"
-            }
             proxies = self.tmdb_logic.proxy_manager.get_proxies(api_url)
-            
-            response = self.session.delete(api_url, headers=headers, json=payload, timeout=30, proxies=proxies)
-            response.raise_for_status()
+            github_client.write("DELETE", api_url, github_conf.personal_access_token, payload, proxies=proxies)
             
             ui_logger.info(f"     - ✅ 成功从 GitHub 删除文件: {github_path}", task_category=task_cat)
             return True
 
-        except requests.HTTPError as e:
-            ui_logger.error(f"     - ❌ 从 GitHub 删除文件失败 (HTTP {e.response.status_code}): {e.response.text}", task_category=task_cat)
+        except GitHubApiError as e:
+            ui_logger.error(f"     - ❌ 从 GitHub 删除文件失败: {e}", task_category=task_cat)
             return False
         except Exception as e:
             ui_logger.error(f"     - ❌ 从 GitHub 删除文件时发生未知错误: {e}", task_category=task_cat, exc_info=True)
@@ -2037,7 +2251,7 @@ class EpisodeRefresherLogic:
             proxies = self.tmdb_logic.proxy_manager.get_proxies(api_url)
             
             try:
-                get_resp = self.session.get(api_url, headers=headers, timeout=20, proxies=proxies)
+                get_resp = github_client.get(api_url, headers=headers, timeout=20, proxies=proxies)
                 if get_resp.status_code == 404:
                     ui_logger.info(f"     - ⚠️ 文件在远程已不存在，跳过删除。", task_category=task_cat)
                     task_manager.update_task_progress(task_id, i + 1, len(delete_plan))
@@ -2066,6 +2280,11 @@ class EpisodeRefresherLogic:
                 del remote_db["series"][tmdb_id][episode_key]
                 if not remote_db["series"][tmdb_id]: # 如果剧集下没有分集了，删除整个剧集条目
                     del remote_db["series"][tmdb_id]
+            series_hashes = remote_db.get("hashes", {}).get(tmdb_id)
+            if series_hashes is not None:
+                series_hashes.pop(episode_key, None)
+                if not series_hashes:
+                    del remote_db["hashes"][tmdb_id]
         
         if not self._upload_db_to_github(remote_db, remote_sha, github_conf):
             ui_logger.error(f"【{task_cat}】❌ 远程索引更新失败！任务中止，请重试。", task_category=task_cat)
@@ -2117,19 +2336,15 @@ class EpisodeRefresherLogic:
             if not remote_db or not remote_db.get("series"):
                 raise ValueError("无法获取远程截图数据库，或数据库为空。")
 
-            id_map_file = os.path.join('/app/data', 'id_map.json')
-            if not os.path.exists(id_map_file):
+            if not id_map_service.has_data():
                 raise ValueError("ID映射表 (id_map.json) 不存在，无法进行反向恢复。请先在“定时任务”页面生成映射表。")
-            with open(id_map_file, 'r', encoding='utf-8') as f:
-                id_map = json.load(f)
 
             emby_centric_plan = {}
             for tmdb_id, episodes in remote_db["series"].items():
                 # --- 核心修改：手动为纯数字的 tmdb_id 加上 'tv-' 前缀 ---
                 map_key = f"tv-{tmdb_id}"
-                if map_key in id_map:
-                    for emby_series_id in id_map[map_key]:
-                        emby_centric_plan[emby_series_id] = episodes
+                for emby_series_id in id_map_service.lookup(map_key):
+                    emby_centric_plan[emby_series_id] = episodes
             
             if not emby_centric_plan:
                 ui_logger.info("✅ 远程备份中的所有剧集在您的 Emby 库中均未找到，任务完成。", task_category=task_cat)
@@ -2157,7 +2372,7 @@ class EpisodeRefresherLogic:
             
             all_episodes_details = []
             with ThreadPoolExecutor(max_workers=10) as executor:
-                session = requests.Session()
+                session = self.session
                 params = {
                     "api_key": self.server_config.api_key,
                     "IncludeItemTypes": "Episode",
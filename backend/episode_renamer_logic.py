@@ -12,6 +12,7 @@ from filelock import FileLock, Timeout
 from log_manager import ui_logger
 from models import AppConfig, EpisodeRenamerConfig
 from task_manager import TaskManager
+from emby_client import emby_client
 
 # 用于存储重命名记录的 JSON 文件路径
 RENAME_LOG_FILE = os.path.join('/app/data', 'rename_log.json')
@@ -28,9 +29,7 @@ class EpisodeRenamerLogic:
         self.api_key = self.server_config.api_key
         self.user_id = self.server_config.user_id
         self.params = {"api_key": self.api_key}
-        # 暂时不使用 session，因为我们只调用一次
-        # from proxy_manager import ProxyManager
-        # self.proxy_manager = ProxyManager(app_config)
+        self.session = emby_client
 
     def _trigger_emby_scan(self, series_id: str, task_cat: str):
         """触发 Emby 扫描指定剧集的文件，但不更新元数据"""
@@ -47,7 +46,7 @@ class EpisodeRenamerLogic:
                 "ReplaceAllMetadata": "false",
                 "ReplaceAllImages": "false"
             }
-            response = requests.post(url, params=params, timeout=30)
+            response = self.session.post(url, params=params, timeout=30)
             response.raise_for_status()
             ui_logger.info(f"     - 已成功向 Emby 发送扫描请求。", task_category=task_cat)
         except requests.RequestException as e:
@@ -74,7 +73,7 @@ class EpisodeRenamerLogic:
         try:
             url = f"{self.base_url}/Users/{self.user_id}/Items/{episode_id}"
             params = {**self.params, "Fields": fields}
-            response = requests.get(url, params=params, timeout=15)
+            response = self.session.get(url, params=params, timeout=15)
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
@@ -94,7 +93,7 @@ class EpisodeRenamerLogic:
                 "Recursive": "true",
                 "Fields": "Path,Name,SeriesId,SeriesName,IndexNumber,ParentIndexNumber,MediaSources"
             }
-            response = requests.get(url, params=params, timeout=30)
+            response = self.session.get(url, params=params, timeout=30)
             response.raise_for_status()
             episodes = response.json().get("Items", [])
             
@@ -287,7 +286,6 @@ class EpisodeRenamerLogic:
     def run_rename_for_episodes(self, episode_ids: Iterable[str], cancellation_event: threading.Event, task_id: str, task_manager: TaskManager, task_category: str):
         """(定时任务)为指定的剧集分集ID列表执行本地文件重命名，并记录到日志。"""
         from collections import defaultdict
-        import requests
 
         episode_ids_list = list(episode_ids)
         total_episodes_to_fetch = len(episode_ids_list)
@@ -593,7 +591,6 @@ class EpisodeRenamerLogic:
         task_cat = "手动扫描重命名"
         ui_logger.info(f"【{task_cat}】任务启动，正在扫描剧集 ID: {series_id}", task_category=task_cat)
 
-        import requests
         try:
             series_details = self._get_episode_details(series_id, fields="Name,ProductionYear")
             if not series_details:
@@ -608,7 +605,7 @@ class EpisodeRenamerLogic:
                 "Recursive": "true",
                 "Fields": "Name,IndexNumber,ParentIndexNumber,Path,SeriesName,MediaSources"
             }
-            episodes_resp = requests.get(episodes_url, params=episodes_params, timeout=30)
+            episodes_resp = self.session.get(episodes_url, params=episodes_params, timeout=30)
             episodes_resp.raise_for_status()
             emby_episodes = episodes_resp.json().get("Items", [])
         except Exception as e:
@@ -11,7 +11,8 @@ from typing import List, Dict, Any
 
 from models import AppConfig, EpisodeRoleSyncConfig
 from task_manager import TaskManager
-from douban_manager import DOUBAN_CACHE_FILE
+from emby_client import emby_client
+from douban_store import douban_store
 from log_manager import ui_logger
 from actor_role_mapper_logic import ACTOR_ROLE_MAP_FILE
 
@@ -23,7 +24,7 @@ class EpisodeRoleSyncLogic:
         self.api_key = self.server_config.api_key
         self.user_id = self.server_config.user_id
         self.params = {"api_key": self.api_key}
-        self.session = requests.Session()
+        self.session = emby_client
 
     def _load_data_sources(self, task_category: str) -> tuple[Dict, Dict, bool]:
         """一次性加载所有需要的数据源"""
@@ -42,15 +43,11 @@ class EpisodeRoleSyncLogic:
             return None, None, False
 
         douban_map = {}
-        if not os.path.exists(DOUBAN_CACHE_FILE):
-            ui_logger.warning("⚠️ [数据源] 未找到豆瓣缓存文件，豆瓣匹配降级功能将不可用。", task_category=task_category)
+        if not douban_store.exists():
+            ui_logger.warning("⚠️ [数据源] 未找到豆瓣数据，豆瓣匹配降级功能将不可用。", task_category=task_category)
         else:
-            try:
-                with open(DOUBAN_CACHE_FILE, 'r', encoding='utf-8') as f:
-                    douban_map = json.load(f)
-                ui_logger.info(f"✅ [数据源] 成功加载 {len(douban_map)} 条豆瓣缓存数据。", task_category=task_category)
-            except (IOError, json.JSONDecodeError) as e:
-                ui_logger.error(f"❌ [数据源] 加载豆瓣缓存文件失败: {e}", task_category=task_category)
+            douban_map = douban_store.as_mapping()
+            ui_logger.info(f"✅ [数据源] 成功连接豆瓣数据存储，共 {len(douban_map)} 条豆瓣数据。", task_category=task_category)
         
         return role_map_data, douban_map, True
 
@@ -2,13 +2,14 @@
 import logging
 import threading
 import time
-import requests
 from typing import List, Dict, Any
 
 # --- 核心修改 1: 导入 ui_logger ---
 from log_manager import ui_logger
 from models import AppConfig
 from task_manager import TaskManager
+from emby_client import emby_client
+from library_mirror import library_mirror
 
 
 def create_nfo_from_details(details: dict) -> str:
@@ -63,17 +64,19 @@ def create_nfo_from_details(details: dict) -> str:
     
 class GenreLogic:
     def __init__(self, app_config: AppConfig):
+        self.app_config = app_config
         self.server_config = app_config.server_config
         self.base_url = self.server_config.server
         self.api_key = self.server_config.api_key
         self.user_id = self.server_config.user_id
         self.params = {"api_key": self.api_key}
+        self.session = emby_client
 
     def get_all_genres(self) -> List[Dict[str, str]]:
         # 这个函数是同步的，且是获取基础数据，日志可以不那么详细
         url = f"{self.base_url}/Genres"
         params = {**self.params, "UserId": self.user_id}
-        response = requests.get(url, params=params, timeout=15)
+        response = self.session.get(url, params=params, timeout=15)
         response.raise_for_status()
         genres = response.json().get("Items", [])
         return [{"id": g["Id"], "name": g["Name"]} for g in genres if "Id" in g and "Name" in g]
@@ -91,7 +94,7 @@ class GenreLogic:
                     ui_logger.info("任务在获取列表阶段被取消。", task_category=task_cat)
                     return []
                 params["StartIndex"] = start_index
-                response = requests.get(url, params=params, timeout=60)
+                response = self.session.get(url, params=params, timeout=60)
                 response.raise_for_status()
                 items_page = response.json().get("Items", [])
                 if not items_page: break
@@ -111,7 +114,7 @@ class GenreLogic:
                         ui_logger.info("任务在获取列表阶段被取消。", task_category=task_cat)
                         return []
                     params["StartIndex"] = start_index
-                    response = requests.get(url, params=params, timeout=60)
+                    response = self.session.get(url, params=params, timeout=60)
                     response.raise_for_status()
                     items_page = response.json().get("Items", [])
                     if not items_page: break
@@ -126,7 +129,7 @@ class GenreLogic:
                     ui_logger.info("任务在获取列表阶段被取消。", task_category=task_cat)
                     return []
                 params["StartIndex"] = start_index
-                response = requests.get(url, params=params, timeout=60)
+                response = self.session.get(url, params=params, timeout=60)
                 response.raise_for_status()
                 items_page = response.json().get("Items", [])
                 if not items_page: break
@@ -134,7 +137,7 @@ class GenreLogic:
                 start_index += len(items_page)
             if blacklist:
                 views_url = f"{self.base_url}/Users/{self.user_id}/Views"
-                views_resp = requests.get(views_url, params=self.params)
+                views_resp = self.session.get(views_url, params=self.params)
                 views = views_resp.json().get("Items", [])
                 blacklist_names = {name.strip() for name in blacklist.split(',') if name.strip()}
                 blacklisted_ids = {view['Id'] for view in views if view['Name'] in blacklist_names}
@@ -144,14 +147,14 @@ class GenreLogic:
     def _get_full_item(self, item_id: str) -> Dict[str, Any]:
         url = f"{self.base_url}/Users/{self.user_id}/Items/{item_id}"
         params = {**self.params, "Fields": "GenreItems"}
-        response = requests.get(url, params=params, timeout=15)
+        response = self.session.get(url, params=params, timeout=15)
         response.raise_for_status()
         return response.json()
 
     def _update_item_on_server(self, item_id: str, item_json: Dict[str, Any]) -> bool:
         url = f"{self.base_url}/Items/{item_id}"
         headers = {'Content-Type': 'application/json'}
-        response = requests.post(url, params=self.params, json=item_json, headers=headers, timeout=30)
+        response = self.session.post(url, params=self.params, json=item_json, headers=headers, timeout=30)
         response.raise_for_status()
         return response.status_code == 204
 
@@ -197,6 +200,11 @@ class GenreLogic:
         changes_found = []
         console_log_lines = []
 
+        # 镜像就绪时直接读取本地的类型数据，避免逐个请求媒体详情
+        use_mirror = self.app_config.library_mirror_config.enabled and library_mirror.is_ready()
+        if use_mirror:
+            library_mirror.flush_dirty(self.app_config)
+
         for i, item in enumerate(items_to_scan):
             if cancellation_event.is_set():
                 ui_logger.warning("预览任务被用户取消。", task_category=task_cat)
@@ -206,7 +214,9 @@ class GenreLogic:
             ui_logger.debug(f"进度 {i+1}/{total_count}: 正在扫描 [{item_name}]", task_category=task_cat)
             
             try:
-                full_item = self._get_full_item(item['id'])
+                full_item = library_mirror.get_item(item['id']) if use_mirror else None
+                if full_item is None:
+                    full_item = self._get_full_item(item['id'])
                 current_genres = full_item.get('GenreItems', [])
                 if not current_genres:
                     ui_logger.debug(f"  -> 跳过 [{item_name}]，无类型信息。", task_category=task_cat)
@@ -261,6 +271,7 @@ class GenreLogic:
                 full_item = self._get_full_item(item_id)
                 full_item['GenreItems'] = new_genre_items
                 if self._update_item_on_server(item_id, full_item):
+                    library_mirror.mark_dirty([item_id])
                     ui_logger.debug(f"  -> 成功更新 [{item_name}]", task_category=task_cat)
                 else:
                     ui_logger.warning(f"  -> 更新 [{item_name}] 失败，服务器未返回成功状态。", task_category=task_cat)
@@ -0,0 +1,197 @@
+# backend/github_client.py
+
+import io
+import os
+import json
+import time
+import base64
+import logging
+import tempfile
+import threading
+from typing import Dict, Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 连接池参数：GitHub 只有少数几个主机，长连接复用即可避免每次写入重新进行 TLS 握手
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+REQUEST_TIMEOUT = 60
+
+MAX_RETRIES = 4
+RETRY_STATUS = {500, 502, 503, 504}
+# 次级限速未给出 Retry-After 时的基础等待时间 (GitHub 建议至少等待一分钟)
+SECONDARY_RATE_LIMIT_WAIT = 60
+# 单次等待的上限，超出后直接返回响应，交由调用方报错
+MAX_RATE_LIMIT_WAIT = 15 * 60
+
+# 请求体小于该大小时在内存中构造，否则写入临时文件后以流的方式发送
+IN_MEMORY_BODY_LIMIT = 4 * 1024 * 1024
+# base64 分块编码的块大小，必须是 3 的倍数，保证各块编码结果可直接拼接
+BASE64_CHUNK_SIZE = 3 * 256 * 1024
+
+
+class GitHubApiError(Exception):
+    """GitHub API 返回错误状态码"""
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def build_json_body(fields: Dict[str, Any], content_field: Optional[str] = None,
+                    content_path: Optional[str] = None, content: Optional[bytes] = None):
+    """
+    构造 JSON 请求体。指定 content_field 时，文件内容被分块 base64 编码后直接写入请求体，
+    不会在内存中同时保留原始内容、base64 字符串和 JSON 字符串三份副本。
+    返回可 seek 的文件对象，requests 会按块读取并发送。
+    """
+    if content_field is None:
+        return io.BytesIO(json.dumps(fields, ensure_ascii=False).encode('utf-8'))
+
+    if content_path is not None:
+        estimated_size = os.path.getsize(content_path) * 4 // 3
+    else:
+        estimated_size = len(content or b'') * 4 // 3
+    body = io.BytesIO() if estimated_size <= IN_MEMORY_BODY_LIMIT else tempfile.TemporaryFile()
+
+    head = json.dumps(fields, ensure_ascii=False)[:-1]
+    separator = ", " if fields else ""
+    body.write(f'{head}{separator}"{content_field}": "'.encode('utf-8'))
+    if content_path is not None:
+        with open(content_path, 'rb') as f:
+            while chunk := f.read(BASE64_CHUNK_SIZE):
+                body.write(base64.b64encode(chunk))
+    else:
+        data = content or b''
+        for start in range(0, len(data), BASE64_CHUNK_SIZE):
+            body.write(base64.b64encode(data[start:start + BASE64_CHUNK_SIZE]))
+    body.write(b'"}')
+    body.seek(0)
+    return body
+
+
+class GitHubClient(requests.Session):
+    """
+    进程级共享的 GitHub HTTP 客户端，取代每次写入都启动一个 curl 子进程的做法。
+    - 长连接复用的连接池，避免每次请求的进程创建与 TLS 握手。
+    - 请求体以流的方式发送，大文件的 base64 内容不会在内存中重复缓冲。
+    - 统一处理重试：网络错误与 5xx 指数退避；429 / 403 限速时遵循 Retry-After、
+      X-RateLimit-Reset 以及次级限速 (secondary rate limit) 的等待要求。
+    """
+    def __init__(self):
+        super().__init__()
+        adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "errors": 0}
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    @staticmethod
+    def _retry_delay(response: requests.Response, attempt: int) -> Optional[float]:
+        """根据响应判断是否需要重试，返回等待秒数；不应重试时返回 None"""
+        status = response.status_code
+        retry_after = response.headers.get('Retry-After')
+        if status in (403, 429):
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+            if response.headers.get('X-RateLimit-Remaining') == '0' and (reset := response.headers.get('X-RateLimit-Reset', '')).isdigit():
+                return max(0.0, int(reset) - time.time()) + 1
+            if 'secondary rate limit' in response.text.lower():
+                return SECONDARY_RATE_LIMIT_WAIT * (2 ** attempt)
+            # 其余 403 为权限问题，重试无意义
+            return 2.0 ** attempt if status == 429 else None
+        if status in RETRY_STATUS:
+            return float(retry_after) if retry_after and retry_after.isdigit() else 2.0 ** attempt
+        return None
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault('timeout', REQUEST_TIMEOUT)
+        body = kwargs.get('data')
+        for attempt in range(MAX_RETRIES + 1):
+            if hasattr(body, 'seek'):
+                body.seek(0)
+            self._count("requests")
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= MAX_RETRIES:
+                    self._count("errors")
+                    raise
+                delay = 2.0 ** (attempt + 1)
+                self._count("retries")
+                logging.warning(f"【GitHub客户端】{method} {url} 网络错误，{delay:.0f} 秒后重试 ({attempt + 1}/{MAX_RETRIES}): {e}")
+                time.sleep(delay)
+                continue
+
+            delay = self._retry_delay(response, attempt)
+            if delay is None or attempt >= MAX_RETRIES:
+                return response
+            if delay > MAX_RATE_LIMIT_WAIT:
+                logging.error(f"【GitHub客户端】{method} {url} 触发限速，需等待 {delay:.0f} 秒，超出上限，放弃重试。")
+                return response
+            if response.status_code in (403, 429):
+                self._count("rate_limited")
+            self._count("retries")
+            logging.warning(f"【GitHub客户端】{method} {url} 返回 {response.status_code}，{delay:.0f} 秒后重试 ({attempt + 1}/{MAX_RETRIES})。")
+            time.sleep(delay)
+        return response
+
+    # --- API 辅助方法 ---
+
+    @staticmethod
+    def auth_headers(token: Optional[str]) -> Dict[str, str]:
+        headers = {"Accept": "application/vnd.github+json"}
+        if token:
+            headers["Authorization"] = f"token {token}"
+        return headers
+
+    def api_request(self, method: str, url: str, token: Optional[str], payload: Optional[Dict] = None,
+                    body=None, proxies: Optional[Dict] = None, timeout: int = REQUEST_TIMEOUT) -> requests.Response:
+        headers = self.auth_headers(token)
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+            return self.request(method, url, headers=headers, data=body, proxies=proxies, timeout=timeout)
+        return self.request(method, url, headers=headers, json=payload, proxies=proxies, timeout=timeout)
+
+    @staticmethod
+    def raise_for_error(response: requests.Response) -> Dict[str, Any]:
+        """解析响应 JSON，错误状态码时抛出带友好说明的 GitHubApiError"""
+        try:
+            data = response.json() if response.content else {}
+        except ValueError:
+            data = {}
+        if response.status_code < 400:
+            return data
+
+        message = data.get('message') if isinstance(data, dict) else None
+        message = message or response.text[:200] or response.reason
+        if response.status_code == 422 and "sha" in message:
+            message = f"无效请求。服务器提示 'sha' 参数有问题。这可能是因为在您操作期间，文件被其他进程修改。请重试。({message})"
+        elif response.status_code == 409:
+            message = f"写入冲突，这通常是并发写入导致的。请稍后重试。({message})"
+        raise GitHubApiError(f"GitHub API 错误 ({response.status_code}): {message}", response.status_code)
+
+    def write(self, method: str, url: str, token: str, payload: Optional[Dict] = None, proxies: Optional[Dict] = None,
+              content_path: Optional[str] = None, content: Optional[bytes] = None) -> Dict[str, Any]:
+        """
+        执行 Contents API 等写入操作并返回响应 JSON。
+        提供 content_path 或 content 时，其 base64 编码以流的方式写入请求体的 content 字段。
+        """
+        has_content = content_path is not None or content is not None
+        body = build_json_body(payload or {}, "content" if has_content else None, content_path, content)
+        try:
+            response = self.api_request(method, url, token, body=body, proxies=proxies)
+        finally:
+            body.close()
+        return self.raise_for_error(response)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return dict(self.stats)
+
+
+github_client = GitHubClient()
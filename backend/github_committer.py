@@ -0,0 +1,262 @@
+# backend/github_committer.py
+
+import os
+import re
+import json
+import time
+import base64
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Callable, Tuple
+from urllib.parse import quote
+
+from github_client import github_client, build_json_body, GitHubApiError
+
+GITHUB_API_BASE = "https://api.github.com"
+GITHUB_RAW_BASE = "https://raw.githubusercontent.com"
+
+# 每个提交包含的文件数上限；数千个文件只需少量提交即可完成
+DEFAULT_BATCH_SIZE = 300
+# 并发创建 blob 的线程数，过高容易触发 GitHub 的次级限速
+BLOB_UPLOAD_WORKERS = 4
+# 分支在提交期间被其他进程推进时，基于最新提交重建的最大次数
+MAX_REF_UPDATE_ATTEMPTS = 3
+REQUEST_TIMEOUT = 60
+
+# 空仓库无法通过 Git Data API 写入，先用 Contents API 创建此文件以初始化分支
+BOOTSTRAP_FILE_PATH = ".gitkeep"
+
+
+def parse_repo_url(repo_url: str) -> Tuple[str, str]:
+    match = re.match(r"https?://github\.com/([^/]+)/([^/]+)", repo_url or "")
+    if not match:
+        raise ValueError(f"无效的 GitHub 仓库 URL: {repo_url}")
+    owner, repo = match.groups()
+    return owner, repo.replace('.git', '')
+
+
+class GitDataCommitter:
+    """
+    基于 Git Data API 的批量提交器。
+    - 每个文件只需一次 blob 创建请求，无需先查询 SHA，也无需逐文件冷却。
+    - 每批文件连同更新后的索引文件 (如 database.json) 组成一个 tree、一个 commit，
+      最后通过一次引用更新原子地推进分支，索引与文件始终一致。
+    - 分支在此期间被推进时，基于最新提交重新读取索引并重放更新，不会覆盖他人的改动。
+    - api_base / raw_base 可指向本地模拟的 GitHub API，便于离线测试。
+    """
+    def __init__(self, repo_url: str, token: str, branch: str = "main", proxy_manager=None,
+                 session=None, api_base: str = GITHUB_API_BASE, raw_base: str = GITHUB_RAW_BASE):
+        self.owner, self.repo = parse_repo_url(repo_url)
+        self.repo_url = repo_url
+        self.token = token
+        self.branch = branch or "main"
+        self.proxy_manager = proxy_manager
+        self.session = session or github_client
+        self.api_base = api_base.rstrip('/')
+        self.raw_base = raw_base.rstrip('/')
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+
+    # --- 底层请求 ---
+
+    def _api(self, method: str, path: str, payload: Optional[Dict] = None, allow_statuses: Tuple[int, ...] = (), body=None) -> Tuple[int, Any]:
+        url = f"{self.api_base}/repos/{self.owner}/{self.repo}/{path}"
+        headers = {"Accept": "application/vnd.github+json"}
+        if self.token:
+            headers["Authorization"] = f"token {self.token}"
+        proxies = self.proxy_manager.get_proxies(url) if self.proxy_manager else None
+        with self._count_lock:
+            self.request_count += 1
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+            response = self.session.request(method, url, headers=headers, data=body, timeout=REQUEST_TIMEOUT, proxies=proxies)
+        else:
+            response = self.session.request(method, url, headers=headers, json=payload, timeout=REQUEST_TIMEOUT, proxies=proxies)
+        data = None
+        if response.content:
+            try:
+                data = response.json()
+            except ValueError:
+                data = None
+        if response.status_code >= 400 and response.status_code not in allow_statuses:
+            message = data.get('message') if isinstance(data, dict) else response.text[:200]
+            raise GitHubApiError(f"{method} {path} 失败 ({response.status_code}): {message}", response.status_code)
+        return response.status_code, data
+
+    def raw_url(self, path: str) -> str:
+        """与 Contents API 返回的 download_url 格式一致的原始文件地址"""
+        return f"{self.raw_base}/{self.owner}/{self.repo}/{self.branch}/{quote(path)}"
+
+    # --- 引用与树 ---
+
+    def _get_head(self) -> Optional[str]:
+        status, data = self._api("GET", f"git/ref/heads/{quote(self.branch)}", allow_statuses=(404, 409))
+        if status in (404, 409):
+            return None
+        return data['object']['sha']
+
+    def _ensure_branch(self) -> str:
+        head = self._get_head()
+        if head is not None:
+            return head
+        logging.info(f"【GitHub提交】仓库 {self.repo_url} 的分支 {self.branch} 不存在或仓库为空，正在初始化...")
+        self._api("PUT", f"contents/{BOOTSTRAP_FILE_PATH}", {
+            "message": "chore: Initialize repository",
+            "content": "",
+            "branch": self.branch,
+        })
+        head = self._get_head()
+        if head is None:
+            raise GitHubApiError(f"初始化仓库 {self.repo_url} 的分支 {self.branch} 失败。")
+        return head
+
+    def _read_file_at_tree(self, tree_sha: str, path: str) -> Optional[bytes]:
+        """沿目录逐级查找文件并读取其 blob 内容，不受 Contents API 1MB 的限制"""
+        parts = path.strip('/').split('/')
+        current_tree = tree_sha
+        for index, part in enumerate(parts):
+            _, tree = self._api("GET", f"git/trees/{current_tree}")
+            entry = next((e for e in tree.get('tree', []) if e.get('path') == part), None)
+            if entry is None:
+                return None
+            if index == len(parts) - 1:
+                if entry.get('type') != 'blob':
+                    return None
+                _, blob = self._api("GET", f"git/blobs/{entry['sha']}")
+                return base64.b64decode(blob.get('content', ''))
+            if entry.get('type') != 'tree':
+                return None
+            current_tree = entry['sha']
+        return None
+
+    def read_json(self, path: str) -> Optional[Dict]:
+        """读取分支最新提交中的 JSON 文件，不存在时返回 None"""
+        head = self._get_head()
+        if head is None:
+            return None
+        _, commit = self._api("GET", f"git/commits/{head}")
+        content = self._read_file_at_tree(commit['tree']['sha'], path)
+        return json.loads(content.decode('utf-8')) if content else None
+
+    def list_blob_shas(self, directory: str) -> Dict[str, str]:
+        """
+        一次请求列出分支最新提交中某目录下所有文件的 blob sha，返回 {仓库内路径: sha}。
+        目录不存在时返回空字典；文件数超出 GitHub 单次返回上限时结果可能不完整。
+        """
+        head = self._get_head()
+        if head is None:
+            return {}
+        _, commit = self._api("GET", f"git/commits/{head}")
+        current_tree = commit['tree']['sha']
+        for part in directory.strip('/').split('/'):
+            _, tree = self._api("GET", f"git/trees/{current_tree}")
+            entry = next((e for e in tree.get('tree', []) if e.get('path') == part and e.get('type') == 'tree'), None)
+            if entry is None:
+                return {}
+            current_tree = entry['sha']
+        _, tree = self._api("GET", f"git/trees/{current_tree}?recursive=1")
+        if tree.get('truncated'):
+            logging.warning(f"【GitHub提交】目录 {directory} 的文件列表过大，GitHub 仅返回了部分结果。")
+        prefix = directory.strip('/')
+        return {f"{prefix}/{e['path']}": e['sha'] for e in tree.get('tree', []) if e.get('type') == 'blob'}
+
+    # --- 提交 ---
+
+    def create_blob(self, content: Optional[bytes] = None, local_path: Optional[str] = None) -> str:
+        """创建 blob，本地文件以流的方式编码发送，不整体读入内存"""
+        body = build_json_body({"encoding": "base64"}, "content", content_path=local_path, content=content)
+        try:
+            _, data = self._api("POST", "git/blobs", body=body)
+        finally:
+            body.close()
+        return data['sha']
+
+    def _create_blobs(self, files: List[Dict], cancellation_event: Optional[threading.Event]):
+        def upload(item: Dict):
+            if cancellation_event is not None and cancellation_event.is_set():
+                raise InterruptedError("任务被取消")
+            if item.get('delete'):
+                return
+            if item.get('content') is not None:
+                item['blob_sha'] = self.create_blob(content=item['content'])
+                item['size'] = len(item['content'])
+            else:
+                item['blob_sha'] = self.create_blob(local_path=item['local_path'])
+                item['size'] = os.path.getsize(item['local_path'])
+            item['download_url'] = self.raw_url(item['path'])
+
+        with ThreadPoolExecutor(max_workers=BLOB_UPLOAD_WORKERS, thread_name_prefix="github-blob") as executor:
+            # list() 使任一 blob 的异常在此处抛出
+            list(executor.map(upload, files))
+
+    def commit(self, files: List[Dict], message: str, index_path: Optional[str] = None,
+               update_index: Optional[Callable[[Optional[Dict], List[Dict]], Dict]] = None,
+               cancellation_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        将一批文件 (及可选的索引文件) 作为单个提交写入分支。
+        files 中每项为 {"path": 仓库内路径, "local_path": 本地文件} 或 {"path", "content": bytes}，
+        或 {"path", "delete": True} 表示删除。成功后每项会补充 blob_sha / size / download_url。
+        update_index(当前索引或 None, files) 返回新的索引内容，分支被并发推进时会基于最新索引重新调用。
+        """
+        head = self._ensure_branch()
+        self._create_blobs(files, cancellation_event)
+
+        for attempt in range(1, MAX_REF_UPDATE_ATTEMPTS + 1):
+            _, base_commit = self._api("GET", f"git/commits/{head}")
+            base_tree = base_commit['tree']['sha']
+
+            entries = [
+                {"path": item['path'], "mode": "100644", "type": "blob", "sha": None if item.get('delete') else item['blob_sha']}
+                for item in files
+            ]
+            new_index = None
+            if index_path and update_index:
+                current_raw = self._read_file_at_tree(base_tree, index_path)
+                current_index = json.loads(current_raw.decode('utf-8')) if current_raw else None
+                new_index = update_index(current_index, files)
+                entries.append({
+                    "path": index_path, "mode": "100644", "type": "blob",
+                    "content": json.dumps(new_index, indent=2, ensure_ascii=False),
+                })
+
+            _, tree = self._api("POST", "git/trees", {"base_tree": base_tree, "tree": entries})
+            _, new_commit = self._api("POST", "git/commits", {"message": message, "tree": tree['sha'], "parents": [head]})
+
+            status, _ = self._api("PATCH", f"git/refs/heads/{quote(self.branch)}", {"sha": new_commit['sha'], "force": False}, allow_statuses=(409, 422))
+            if status < 400:
+                return {"commit_sha": new_commit['sha'], "index": new_index}
+
+            logging.warning(f"【GitHub提交】分支 {self.branch} 在提交期间被推进，正在基于最新提交重试 ({attempt}/{MAX_REF_UPDATE_ATTEMPTS})...")
+            head = self._ensure_branch()
+
+        raise GitHubApiError(f"分支 {self.branch} 持续被其他进程更新，提交失败。")
+
+    def commit_in_batches(self, files: List[Dict], message: str, index_path: Optional[str] = None,
+                          update_index: Optional[Callable[[Optional[Dict], List[Dict]], Dict]] = None,
+                          batch_size: int = DEFAULT_BATCH_SIZE, cooldown: float = 0,
+                          cancellation_event: Optional[threading.Event] = None,
+                          progress_callback: Optional[Callable[[int, int], None]] = None) -> List[Dict]:
+        """
+        分批提交，每批一个提交 (含索引更新)。返回已成功提交的文件列表；
+        任务被取消时在当前批次结束后停止，已提交的批次保持完整。
+        """
+        committed: List[Dict] = []
+        total = len(files)
+        batch_count = (total + batch_size - 1) // batch_size
+        for batch_index, start in enumerate(range(0, total, batch_size)):
+            if cancellation_event is not None and cancellation_event.is_set():
+                break
+            if batch_index > 0 and cooldown > 0:
+                time.sleep(cooldown)
+            batch = files[start:start + batch_size]
+            batch_message = f"{message} ({batch_index + 1}/{batch_count}) - {datetime.utcnow().isoformat()}Z" if batch_count > 1 else message
+            try:
+                self.commit(batch, batch_message, index_path, update_index, cancellation_event)
+            except InterruptedError:
+                break
+            committed.extend(batch)
+            if progress_callback:
+                progress_callback(len(committed), total)
+        return committed
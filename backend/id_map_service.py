@@ -0,0 +1,232 @@
+# backend/id_map_service.py
+
+import os
+import json
+import logging
+import threading
+from typing import Dict, List, Optional, Iterable, Any
+
+import requests
+
+from models import AppConfig
+from emby_client import emby_client
+
+ID_MAP_FILE = os.path.join('/app/data', 'id_map.json')
+# 自上次快照以来的增量变更，每行一条 {"id": Emby ID, "key": "tv-123" 或 null (表示移除)}
+ID_MAP_LOG_FILE = os.path.join('/app/data', 'id_map.log')
+
+# 增量日志累计到该行数时合并进快照文件
+COMPACT_THRESHOLD = 500
+
+MAPPED_ITEM_TYPES = ("Movie", "Series")
+
+
+def build_map_key(item_type: Optional[str], provider_ids: Optional[Dict[str, Any]]) -> Optional[str]:
+    """由媒体类型与 ProviderIds 生成映射键 ("tv-123" / "movie-456")，无 TMDB ID 时返回 None"""
+    tmdb_id = next((v for k, v in (provider_ids or {}).items() if k.lower() == 'tmdb'), None)
+    if not tmdb_id or item_type not in MAPPED_ITEM_TYPES:
+        return None
+    prefix = 'tv' if item_type == 'Series' else 'movie'
+    return f"{prefix}-{tmdb_id}"
+
+
+class IdMapService:
+    """
+    TMDB -> Emby ID 映射的进程内服务，取代每次变更都全库重建 id_map.json 的做法。
+    - 映射常驻内存，恢复类任务直接通过 lookup 查询，无需重复读取 JSON 文件。
+    - Webhook 通知按条目增量更新映射，变更追加写入 id_map.log，累计一定数量后合并进 id_map.json 快照。
+    - 全量重建仅作为定期的一致性校验，结果直接替换内存映射并记录差异数量。
+    """
+    def __init__(self, map_file: str = ID_MAP_FILE, log_file: str = ID_MAP_LOG_FILE):
+        self.map_file = map_file
+        self.log_file = log_file
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._map: Dict[str, List[str]] = {}
+        self._reverse: Dict[str, str] = {}
+        self._log_lines = 0
+        self._dirty_ids: set = set()
+        self._dirty_lock = threading.Lock()
+
+    # --- 持久化 ---
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.map_file):
+                try:
+                    with open(self.map_file, 'r', encoding='utf-8') as f:
+                        snapshot = json.load(f)
+                    for key, item_ids in snapshot.items():
+                        for item_id in item_ids:
+                            self._apply(item_id, key)
+                except (IOError, json.JSONDecodeError) as e:
+                    logging.error(f"【ID映射】读取映射表快照失败: {e}")
+
+            if os.path.exists(self.log_file):
+                with open(self.log_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            # 进程异常退出时最后一行可能不完整，忽略即可
+                            continue
+                        self._apply(entry["id"], entry.get("key"))
+                        self._log_lines += 1
+            self._loaded = True
+            logging.info(f"【ID映射】已加载映射表，共 {len(self._map)} 个 TMDB-ID-类型 组合 (含 {self._log_lines} 条增量记录)。")
+
+    def _apply(self, item_id: str, key: Optional[str]) -> bool:
+        """在内存中设置条目的映射键 (None 表示移除)，返回是否有变化"""
+        old_key = self._reverse.get(item_id)
+        if old_key == key:
+            return False
+        if old_key is not None:
+            ids = self._map.get(old_key, [])
+            if item_id in ids:
+                ids.remove(item_id)
+            if not ids:
+                self._map.pop(old_key, None)
+        if key is None:
+            self._reverse.pop(item_id, None)
+        else:
+            self._map.setdefault(key, []).append(item_id)
+            self._reverse[item_id] = key
+        return True
+
+    def _write_snapshot(self):
+        tmp_file = f"{self.map_file}.tmp"
+        os.makedirs(os.path.dirname(self.map_file), exist_ok=True)
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self._map, f, indent=4)
+        os.replace(tmp_file, self.map_file)
+        if os.path.exists(self.log_file):
+            os.remove(self.log_file)
+        self._log_lines = 0
+
+    def _record(self, changes: List[tuple]):
+        """追加增量日志，必要时合并进快照"""
+        if not changes:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+            with open(self.log_file, 'a', encoding='utf-8') as f:
+                for item_id, key in changes:
+                    f.write(json.dumps({"id": item_id, "key": key}) + "\n")
+            self._log_lines += len(changes)
+            if self._log_lines >= COMPACT_THRESHOLD:
+                self._write_snapshot()
+                logging.info(f"【ID映射】增量日志已合并进映射表快照。")
+        except IOError as e:
+            logging.error(f"【ID映射】写入映射表增量日志失败: {e}")
+
+    # --- 查询 ---
+
+    def has_data(self) -> bool:
+        self._ensure_loaded()
+        with self._lock:
+            return bool(self._map)
+
+    def lookup(self, map_key: str) -> List[str]:
+        """返回映射键 (如 "tv-123") 对应的全部 Emby ID"""
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._map.get(map_key, []))
+
+    def get_map(self) -> Dict[str, List[str]]:
+        self._ensure_loaded()
+        with self._lock:
+            return {key: list(ids) for key, ids in self._map.items()}
+
+    # --- 增量更新 ---
+
+    def apply_items(self, items: Iterable[Dict]) -> int:
+        """根据条目详情 (需含 Id / Type / ProviderIds) 更新映射，返回实际变化的条目数"""
+        self._ensure_loaded()
+        with self._lock:
+            changes = []
+            for item in items:
+                item_id = item.get("Id")
+                if not item_id or item.get("Type") not in MAPPED_ITEM_TYPES:
+                    continue
+                key = build_map_key(item.get("Type"), item.get("ProviderIds"))
+                if self._apply(item_id, key):
+                    changes.append((item_id, key))
+            self._record(changes)
+        return len(changes)
+
+    def remove_items(self, item_ids: Iterable[str]) -> int:
+        self._ensure_loaded()
+        with self._lock:
+            changes = [(item_id, None) for item_id in item_ids if item_id and self._apply(item_id, None)]
+            self._record(changes)
+        return len(changes)
+
+    def replace_all(self, id_map: Dict[str, List[str]]) -> int:
+        """用全量重建的结果替换映射并立即写入快照，返回与原映射不一致的条目数 (首次生成时为 0)"""
+        self._ensure_loaded()
+        with self._lock:
+            new_reverse = {item_id: key for key, ids in id_map.items() for item_id in ids}
+            # 首次生成时没有可比较的增量映射
+            mismatches = sum(1 for item_id in set(self._reverse) | set(new_reverse) if self._reverse.get(item_id) != new_reverse.get(item_id)) if self._reverse else 0
+            self._map = {key: list(ids) for key, ids in id_map.items()}
+            self._reverse = new_reverse
+            self._write_snapshot()
+        return mismatches
+
+    # --- 变更通知 ---
+
+    def mark_dirty(self, item_ids: Iterable[str]):
+        """标记条目的 ProviderIds 可能已变化 (如 Webhook 新入库、刮削完成)，由调度器批量刷新"""
+        with self._dirty_lock:
+            self._dirty_ids.update(i for i in item_ids if i)
+
+    def has_dirty(self) -> bool:
+        with self._dirty_lock:
+            return bool(self._dirty_ids)
+
+    def flush_dirty(self, app_config: AppConfig) -> int:
+        """只为被标记的条目获取 ProviderIds 并更新映射，服务器上已删除的条目从映射中移除"""
+        with self._dirty_lock:
+            dirty_ids = list(self._dirty_ids)
+            self._dirty_ids.clear()
+        if not dirty_ids:
+            return 0
+
+        from media_selector import MediaSelector
+        selector = MediaSelector(app_config)
+        fetched_ids = set()
+        changed = 0
+        try:
+            for page in selector.iter_item_details_batch(dirty_ids, "ProviderIds,Type"):
+                changed += self.apply_items(page)
+                fetched_ids.update(item.get("Id") for item in page)
+        except Exception as e:
+            logging.error(f"【ID映射】刷新变更条目失败，将在下次重试: {e}")
+            self.mark_dirty(dirty_ids)
+            return 0
+
+        # 批量接口不返回已删除的条目，逐个确认为 404 后再移除，避免临时失败被误判为删除
+        server = app_config.server_config
+        for item_id in dirty_ids:
+            if item_id in fetched_ids:
+                continue
+            try:
+                response = emby_client.get(f"{server.server}/Users/{server.user_id}/Items/{item_id}", params={"api_key": server.api_key}, timeout=15)
+                if response.status_code == 404:
+                    changed += self.remove_items([item_id])
+                else:
+                    response.raise_for_status()
+                    changed += self.apply_items([response.json()])
+            except requests.RequestException as e:
+                logging.warning(f"【ID映射】确认条目 {item_id} 状态失败，将在下次重试: {e}")
+                self.mark_dirty([item_id])
+
+        logging.info(f"【ID映射】已增量刷新 {len(dirty_ids)} 个变更条目，映射变化 {changed} 处。")
+        return changed
+
+
+id_map_service = IdMapService()
@@ -0,0 +1,338 @@
+# backend/image_cache.py
+
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Any
+
+import httpx
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+IMAGE_CACHE_DIR = os.path.join('/app/data', 'image_cache')
+# 磁盘缓存总大小上限 (字节)，超出后按最近最少使用的顺序淘汰
+IMAGE_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# 缓存条目的新鲜期 (秒)，过期后使用 ETag / Last-Modified 向源站条件请求重新验证
+EXTERNAL_IMAGE_TTL = 7 * 24 * 3600
+EMBY_IMAGE_TTL = 3600
+
+# 每条代理线路 (直连 / 某个代理地址) 的长连接池参数
+CLIENT_MAX_CONNECTIONS = 32
+CLIENT_MAX_KEEPALIVE = 16
+REQUEST_TIMEOUT = 20
+STREAM_CHUNK_SIZE = 64 * 1024
+# 等待同一地址的其他回源请求完成的最长时间 (秒)，超时后自行回源
+COALESCE_WAIT_TIMEOUT = REQUEST_TIMEOUT + 10
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36',
+}
+
+_API_KEY_PATTERN = re.compile(r'([?&])api_key=[^&]*&?', re.IGNORECASE)
+
+
+def strip_api_key(path: str) -> str:
+    """从 Emby 路径中去掉 api_key 参数，使缓存键与密钥无关"""
+    return _API_KEY_PATTERN.sub(r'\1', path).rstrip('?&')
+
+
+class _UpstreamTransfer:
+    """
+    一次回源下载的收尾状态。流式生成器结束时与响应的后台任务都会调用 finish，只生效一次；
+    客户端在响应体开始前断开时生成器不会运行，由后台任务关闭上游连接并释放并发合并的等待者。
+    """
+    def __init__(self, upstream: httpx.Response, release, tmp_path: str):
+        self.upstream = upstream
+        self.release = release
+        self.tmp_path = tmp_path
+        self.completed = False
+        self._finished = False
+
+    async def finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        try:
+            await self.upstream.aclose()
+        finally:
+            if not self.completed:
+                await run_in_threadpool(self._remove_tmp)
+            self.release()
+
+    def _remove_tmp(self):
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+class ImageProxyCache:
+    """
+    图片代理的磁盘缓存。
+    - 以缓存键 (源地址) 的哈希命名文件，附带记录内容类型、ETag、Last-Modified 及内容哈希的元数据。
+    - 总大小有上限，按最近访问时间做 LRU 淘汰 (访问时刷新文件 mtime，重启后依旧有效)。
+    - 过期条目通过条件请求重新验证，源站返回 304 时直接续期，无需重新下载。
+    - 未命中时边下载边转发给浏览器，同时写入缓存；同一地址的并发请求只回源一次。
+    - 每条代理线路复用一个长连接的 httpx 客户端。
+    """
+    def __init__(self, cache_dir: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._index_loaded = False
+        self._clients: Dict[Optional[str], httpx.AsyncClient] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "coalesced": 0, "evicted": 0}
+
+    # --- 磁盘索引 ---
+
+    def _paths(self, key: str):
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return base + '.img', base + '.json'
+
+    def _ensure_index(self):
+        if self._index_loaded:
+            return
+        with self._lock:
+            if self._index_loaded:
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entries = []
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if not name.endswith('.img'):
+                        continue
+                    try:
+                        st = os.stat(os.path.join(root, name))
+                        entries.append((st.st_mtime, name[:-4], st.st_size))
+                    except OSError:
+                        continue
+            entries.sort()
+            for _, key, size in entries:
+                self._index[key] = size
+                self._total_bytes += size
+            self._index_loaded = True
+            logging.info(f"【图片缓存】已加载 {len(entries)} 个缓存条目，共 {self._total_bytes / 1024 / 1024:.1f} MB。")
+
+    def _touch(self, key: str):
+        img_path, _ = self._paths(key)
+        try:
+            os.utime(img_path, None)
+        except OSError:
+            pass
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+
+    def _read_meta(self, key: str) -> Optional[Dict[str, Any]]:
+        img_path, meta_path = self._paths(key)
+        if not os.path.exists(img_path):
+            return None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (IOError, json.JSONDecodeError):
+            return None
+
+    def _write_meta(self, key: str, meta: Dict[str, Any]):
+        _, meta_path = self._paths(key)
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def _commit_entry(self, key: str, size: int):
+        with self._lock:
+            self._total_bytes += size - self._index.pop(key, 0)
+            self._index[key] = size
+            while self._total_bytes > self.max_bytes and len(self._index) > 1:
+                old_key, old_size = self._index.popitem(last=False)
+                self._total_bytes -= old_size
+                self.stats["evicted"] += 1
+                for path in self._paths(old_key):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    # --- HTTP 客户端 ---
+
+    def _get_client(self, proxy_url: Optional[str]) -> httpx.AsyncClient:
+        client = self._clients.get(proxy_url)
+        if client is None or client.is_closed:
+            mounts = {'all://': httpx.AsyncHTTPTransport(proxy=httpx.Proxy(url=proxy_url))} if proxy_url else None
+            client = httpx.AsyncClient(
+                mounts=mounts,
+                follow_redirects=True,
+                timeout=REQUEST_TIMEOUT,
+                limits=httpx.Limits(max_connections=CLIENT_MAX_CONNECTIONS, max_keepalive_connections=CLIENT_MAX_KEEPALIVE)
+            )
+            self._clients[proxy_url] = client
+        return client
+
+    async def aclose(self):
+        for client in list(self._clients.values()):
+            await client.aclose()
+        self._clients.clear()
+
+    # --- 响应构造 ---
+
+    @staticmethod
+    def _cache_headers(meta: Dict[str, Any], ttl: int) -> Dict[str, str]:
+        remaining = max(0, int(meta.get('fetched_at', 0) + ttl - time.time()))
+        return {
+            'Cache-Control': f"public, max-age={remaining}",
+            'ETag': f'"{meta.get("sha256", "")}"',
+        }
+
+    def _serve_cached(self, key: str, meta: Dict[str, Any], ttl: int, if_none_match: Optional[str]) -> Response:
+        self._touch(key)
+        headers = self._cache_headers(meta, ttl)
+        if if_none_match and headers['ETag'] in [tag.strip() for tag in if_none_match.split(',')]:
+            return Response(status_code=304, headers=headers)
+        img_path, _ = self._paths(key)
+        return FileResponse(img_path, media_type=meta.get('content_type', 'image/jpeg'), headers=headers)
+
+    # --- 主流程 ---
+
+    async def serve(self, url: str, cache_key: str, proxy_url: Optional[str], ttl: int,
+                    extra_headers: Optional[Dict[str, str]] = None, if_none_match: Optional[str] = None) -> Response:
+        """
+        代理一张图片。缓存新鲜时直接从磁盘返回；否则回源 (带条件请求头)，
+        新内容以流式转发给调用方的同时写入缓存。
+        """
+        if not self._index_loaded:
+            await run_in_threadpool(self._ensure_index)
+        key = hashlib.sha256(cache_key.encode('utf-8')).hexdigest()
+
+        meta = await run_in_threadpool(self._read_meta, key)
+        if meta and time.time() - meta.get('fetched_at', 0) < ttl:
+            self.stats["hits"] += 1
+            return await run_in_threadpool(self._serve_cached, key, meta, ttl, if_none_match)
+
+        # 同一地址已有请求在回源，等待其完成后直接读取缓存；等待超时则自行回源
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats["coalesced"] += 1
+            try:
+                await asyncio.wait_for(asyncio.shield(pending), timeout=COALESCE_WAIT_TIMEOUT)
+            except asyncio.TimeoutError:
+                logging.warning(f"【图片缓存】等待同一地址的回源请求超时，将自行回源: {cache_key}")
+            meta = await run_in_threadpool(self._read_meta, key)
+            if meta and time.time() - meta.get('fetched_at', 0) < ttl:
+                return await run_in_threadpool(self._serve_cached, key, meta, ttl, if_none_match)
+
+        done = asyncio.get_running_loop().create_future()
+        self._inflight[key] = done
+
+        def release():
+            if self._inflight.get(key) is done:
+                del self._inflight[key]
+            if not done.done():
+                done.set_result(None)
+
+        try:
+            headers = dict(DEFAULT_HEADERS)
+            headers.update(extra_headers or {})
+            if meta:
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
+
+            client = self._get_client(proxy_url)
+            upstream = await client.send(client.build_request('GET', url, headers=headers), stream=True)
+        except BaseException:
+            release()
+            raise
+
+        try:
+            if upstream.status_code == 304 and meta:
+                await upstream.aclose()
+                self.stats["revalidated"] += 1
+                meta['fetched_at'] = time.time()
+                await run_in_threadpool(self._write_meta, key, meta)
+                release()
+                return await run_in_threadpool(self._serve_cached, key, meta, ttl, if_none_match)
+
+            if upstream.status_code >= 400:
+                await upstream.aclose()
+                raise HTTPException(status_code=502, detail=f"源站返回错误状态码 {upstream.status_code}")
+
+            content_type = upstream.headers.get('Content-Type', 'image/jpeg')
+            if not content_type.startswith('image/'):
+                await upstream.aclose()
+                raise HTTPException(status_code=400, detail=f"代理目标返回的不是有效的图片内容 ({content_type})。")
+        except BaseException:
+            release()
+            raise
+
+        self.stats["misses"] += 1
+        new_meta = {
+            'url': cache_key,
+            'content_type': content_type,
+            'etag': upstream.headers.get('ETag'),
+            'last_modified': upstream.headers.get('Last-Modified'),
+        }
+        img_path, _ = self._paths(key)
+        transfer = _UpstreamTransfer(upstream, release, f"{img_path}.{id(upstream)}.part")
+        return StreamingResponse(
+            self._stream_and_store(key, transfer, new_meta),
+            media_type=content_type,
+            headers={'Cache-Control': f"public, max-age={ttl}"},
+            background=BackgroundTask(transfer.finish)
+        )
+
+    def _store_entry(self, key: str, tmp_path: str, meta: Dict[str, Any]):
+        img_path, _ = self._paths(key)
+        os.replace(tmp_path, img_path)
+        self._write_meta(key, meta)
+        self._commit_entry(key, meta['size'])
+
+    async def _stream_and_store(self, key: str, transfer: _UpstreamTransfer, meta: Dict[str, Any]):
+        img_path, _ = self._paths(key)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            await run_in_threadpool(os.makedirs, os.path.dirname(img_path), exist_ok=True)
+            f = await run_in_threadpool(open, transfer.tmp_path, 'wb')
+            try:
+                async for chunk in transfer.upstream.aiter_bytes(STREAM_CHUNK_SIZE):
+                    await run_in_threadpool(f.write, chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+                    yield chunk
+            finally:
+                await run_in_threadpool(f.close)
+            meta['sha256'] = digest.hexdigest()
+            meta['size'] = size
+            meta['fetched_at'] = time.time()
+            await run_in_threadpool(self._store_entry, key, transfer.tmp_path, meta)
+            transfer.completed = True
+        except Exception as e:
+            logging.warning(f"【图片缓存】下载或写入缓存失败 ({meta.get('url')}): {e}")
+        finally:
+            await transfer.finish()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                "entries": len(self._index),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+image_proxy_cache = ImageProxyCache()
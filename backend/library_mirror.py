@@ -0,0 +1,422 @@
+# backend/library_mirror.py
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone, timedelta
+from typing import List, Dict, Optional, Iterable, Any
+
+import requests
+
+from log_manager import ui_logger
+from models import AppConfig
+from emby_client import emby_client
+
+LIBRARY_MIRROR_DB_FILE = os.path.join('/app/data', 'library_mirror.db')
+
+# 镜像的媒体类型与字段
+MIRROR_ITEM_TYPES = "Movie,Series,Episode"
+MIRROR_FIELDS = "ProviderIds,Path,ProductionYear,Tags,TagItems,Genres,GenreItems,People,SeriesId,IndexNumber,ParentIndexNumber,DateModified,DateLastSaved"
+# 分页拉取时每页的数量
+MIRROR_PAGE_SIZE = 500
+# 增量同步水位线回退的秒数，用于容忍服务器与本机之间的时钟偏差 (重复写入是幂等的)
+INCREMENTAL_OVERLAP_SECONDS = 300
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    name TEXT,
+    production_year INTEGER,
+    path TEXT,
+    provider_ids TEXT,
+    tmdb_id TEXT,
+    tags TEXT,
+    genres TEXT,
+    people TEXT,
+    series_id TEXT,
+    library_id TEXT,
+    season_number INTEGER,
+    episode_number INTEGER,
+    date_modified TEXT,
+    date_last_saved TEXT,
+    synced_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_items_type ON items(type);
+CREATE INDEX IF NOT EXISTS idx_items_tmdb ON items(tmdb_id);
+CREATE INDEX IF NOT EXISTS idx_items_series ON items(series_id);
+CREATE INDEX IF NOT EXISTS idx_items_library ON items(library_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _utc_iso(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.0000000Z')
+
+
+class LibraryMirror:
+    """
+    Emby 媒体库的本地 SQLite 镜像。
+    - 首次全量同步后，后续只通过 MinDateLastSaved 增量拉取变更，并由 Webhook 标记的脏数据及时补齐。
+    - 全量同步会对比出服务器上已删除的条目并从镜像中移除。
+    - 批量类任务 (ID映射、标签、类型预览、追更统计) 优先读取镜像，镜像未就绪时回退为直接请求 Emby。
+    """
+    def __init__(self, db_path: str = LIBRARY_MIRROR_DB_FILE):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._dirty_ids: set = set()
+        self._dirty_lock = threading.Lock()
+
+    # --- 存储 ---
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._get_conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            conn.commit()
+
+    @staticmethod
+    def _item_to_row(item: Dict, library_id: Optional[str], synced_at: float) -> tuple:
+        provider_ids = item.get("ProviderIds") or {}
+        tmdb_id = next((v for k, v in provider_ids.items() if k.lower() == 'tmdb'), None)
+
+        if item.get("TagItems"):
+            tags = [t.get("Name") for t in item["TagItems"] if t.get("Name")]
+        else:
+            tags = list(item.get("Tags") or [])
+
+        if item.get("GenreItems"):
+            genres = [{"Name": g.get("Name"), "Id": g.get("Id")} for g in item["GenreItems"] if g.get("Name")]
+        else:
+            genres = [{"Name": g} for g in (item.get("Genres") or [])]
+
+        people = [
+            {"Id": p.get("Id"), "Name": p.get("Name"), "Type": p.get("Type"), "Role": p.get("Role")}
+            for p in (item.get("People") or [])
+        ]
+
+        return (
+            item["Id"], item.get("Type"), item.get("Name"), item.get("ProductionYear"), item.get("Path"),
+            json.dumps(provider_ids, ensure_ascii=False), str(tmdb_id) if tmdb_id else None,
+            json.dumps(tags, ensure_ascii=False), json.dumps(genres, ensure_ascii=False),
+            json.dumps(people, ensure_ascii=False),
+            item.get("SeriesId"), library_id, item.get("ParentIndexNumber"), item.get("IndexNumber"),
+            item.get("DateModified"), item.get("DateLastSaved"), synced_at
+        )
+
+    @staticmethod
+    def _row_to_item(row: sqlite3.Row) -> Dict[str, Any]:
+        """将镜像行还原为与 Emby 接口返回结构一致的字典，便于调用方无差别使用"""
+        return {
+            "Id": row["id"],
+            "Type": row["type"],
+            "Name": row["name"],
+            "ProductionYear": row["production_year"],
+            "Path": row["path"],
+            "ProviderIds": json.loads(row["provider_ids"] or "{}"),
+            "Tags": json.loads(row["tags"] or "[]"),
+            "GenreItems": json.loads(row["genres"] or "[]"),
+            "People": json.loads(row["people"] or "[]"),
+            "SeriesId": row["series_id"],
+            "LibraryId": row["library_id"],
+            "ParentIndexNumber": row["season_number"],
+            "IndexNumber": row["episode_number"],
+            "DateModified": row["date_modified"],
+        }
+
+    def upsert_items(self, items: Iterable[Dict], library_id: Optional[str] = None, synced_at: Optional[float] = None) -> int:
+        """写入或更新一批条目。未提供 library_id 时保留镜像中已有的值，剧集则继承所属剧集的媒体库。"""
+        synced_at = synced_at or time.time()
+        rows = [self._item_to_row(item, library_id, synced_at) for item in items if item.get("Id")]
+        if not rows:
+            return 0
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany("""
+                INSERT INTO items (id, type, name, production_year, path, provider_ids, tmdb_id, tags, genres, people,
+                                   series_id, library_id, season_number, episode_number, date_modified, date_last_saved, synced_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    type = excluded.type, name = excluded.name, production_year = excluded.production_year,
+                    path = excluded.path, provider_ids = excluded.provider_ids, tmdb_id = excluded.tmdb_id,
+                    tags = excluded.tags, genres = excluded.genres, people = excluded.people,
+                    series_id = excluded.series_id, library_id = COALESCE(excluded.library_id, items.library_id),
+                    season_number = excluded.season_number, episode_number = excluded.episode_number,
+                    date_modified = excluded.date_modified, date_last_saved = excluded.date_last_saved,
+                    synced_at = excluded.synced_at
+            """, rows)
+            if library_id is None:
+                conn.execute("""
+                    UPDATE items SET library_id = (SELECT s.library_id FROM items s WHERE s.id = items.series_id)
+                    WHERE library_id IS NULL AND series_id IS NOT NULL
+                """)
+            conn.commit()
+        return len(rows)
+
+    def remove_items(self, item_ids: Iterable[str]) -> int:
+        ids = [(i,) for i in item_ids if i]
+        if not ids:
+            return 0
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany("DELETE FROM items WHERE id = ?", ids)
+            conn.executemany("DELETE FROM items WHERE series_id = ?", ids)
+            conn.commit()
+        return len(ids)
+
+    # --- 查询 ---
+
+    def is_ready(self) -> bool:
+        """至少完成过一次全量同步后，镜像才可作为数据源"""
+        try:
+            return self._get_meta("last_full_sync") is not None
+        except sqlite3.Error as e:
+            logging.error(f"【媒体库镜像】读取镜像状态失败: {e}")
+            return False
+
+    def get_item(self, item_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._get_conn().execute("SELECT * FROM items WHERE id = ?", (item_id,)).fetchone()
+        return self._row_to_item(row) if row else None
+
+    def get_items(self, item_types: List[str], library_ids: Optional[List[str]] = None) -> List[Dict]:
+        sql = f"SELECT * FROM items WHERE type IN ({','.join('?' * len(item_types))})"
+        args: List[Any] = list(item_types)
+        if library_ids is not None:
+            if not library_ids:
+                return []
+            sql += f" AND library_id IN ({','.join('?' * len(library_ids))})"
+            args.extend(library_ids)
+        with self._lock:
+            rows = self._get_conn().execute(sql, args).fetchall()
+        return [self._row_to_item(row) for row in rows]
+
+    def get_library_ids(self) -> set:
+        with self._lock:
+            rows = self._get_conn().execute("SELECT DISTINCT library_id FROM items WHERE library_id IS NOT NULL").fetchall()
+        return {row["library_id"] for row in rows}
+
+    def get_series_episodes(self, series_id: str) -> List[Dict]:
+        with self._lock:
+            rows = self._get_conn().execute(
+                "SELECT * FROM items WHERE type = 'Episode' AND series_id = ? ORDER BY season_number, episode_number",
+                (series_id,)
+            ).fetchall()
+        return [self._row_to_item(row) for row in rows]
+
+    def get_tmdb_id_map(self) -> Dict[str, List[str]]:
+        """生成与 id_map.json 相同结构的 TMDB ID 映射: {"tv-123": [emby_id, ...], "movie-456": [...]}"""
+        id_map: Dict[str, List[str]] = {}
+        with self._lock:
+            rows = self._get_conn().execute(
+                "SELECT id, type, tmdb_id FROM items WHERE type IN ('Movie', 'Series') AND tmdb_id IS NOT NULL"
+            ).fetchall()
+        for row in rows:
+            prefix = 'tv' if row["type"] == 'Series' else 'movie'
+            id_map.setdefault(f"{prefix}-{row['tmdb_id']}", []).append(row["id"])
+        return id_map
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._get_conn().execute("SELECT type, COUNT(*) AS c FROM items GROUP BY type").fetchall()
+        with self._dirty_lock:
+            pending = len(self._dirty_ids)
+        return {
+            "ready": self.is_ready(),
+            "counts": {row["type"]: row["c"] for row in rows},
+            "last_full_sync": self._get_meta("last_full_sync"),
+            "last_incremental_sync": self._get_meta("last_incremental_sync"),
+            "pending_dirty": pending,
+        }
+
+    # --- 变更通知 ---
+
+    def mark_dirty(self, item_ids: Iterable[str]):
+        """标记条目需要刷新 (通常来自 Webhook 或本程序自身的写操作)，由后台调度器批量拉取"""
+        with self._dirty_lock:
+            self._dirty_ids.update(i for i in item_ids if i)
+
+    def flush_dirty(self, app_config: AppConfig) -> int:
+        """通过批量详情接口刷新所有脏条目，服务器上已不存在的条目从镜像中移除"""
+        with self._dirty_lock:
+            dirty_ids = list(self._dirty_ids)
+            self._dirty_ids.clear()
+        if not dirty_ids or not self.is_ready():
+            return 0
+
+        from media_selector import MediaSelector
+        selector = MediaSelector(app_config)
+        fetched_ids = set()
+        try:
+            for page in selector.iter_item_details_batch(dirty_ids, MIRROR_FIELDS):
+                page = [item for item in page if item.get("Type") in MIRROR_ITEM_TYPES.split(',')]
+                self.upsert_items(page)
+                fetched_ids.update(item["Id"] for item in page)
+        except Exception as e:
+            logging.error(f"【媒体库镜像】刷新脏条目失败，将在下次重试: {e}")
+            self.mark_dirty(dirty_ids)
+            return 0
+
+        missing = [i for i in dirty_ids if i not in fetched_ids]
+        if missing:
+            with self._lock:
+                known = [row["id"] for row in self._get_conn().execute(
+                    f"SELECT id FROM items WHERE id IN ({','.join('?' * len(missing))})", missing
+                ).fetchall()]
+            # 批量接口不返回已删除的条目，但临时错误、权限过滤或分页不完整也会导致缺失，
+            # 因此逐个确认为 404 后再删除；其他错误保留脏标记，下次重试
+            server = app_config.server_config
+            removed = []
+            for item_id in known:
+                try:
+                    response = emby_client.get(f"{server.server}/Users/{server.user_id}/Items/{item_id}", params={"api_key": server.api_key, "Fields": MIRROR_FIELDS}, timeout=15)
+                    if response.status_code == 404:
+                        removed.append(item_id)
+                        continue
+                    response.raise_for_status()
+                    item = response.json()
+                    if item.get("Type") in MIRROR_ITEM_TYPES.split(','):
+                        self.upsert_items([item])
+                        fetched_ids.add(item_id)
+                except (requests.RequestException, ValueError) as e:
+                    logging.warning(f"【媒体库镜像】确认条目 {item_id} 状态失败，将在下次重试: {e}")
+                    self.mark_dirty([item_id])
+            if removed:
+                self.remove_items(removed)
+        logging.debug(f"【媒体库镜像】已刷新 {len(fetched_ids)} 个脏条目。")
+        return len(fetched_ids)
+
+    # --- 同步 ---
+
+    def _get_views(self, app_config: AppConfig) -> List[Dict]:
+        server = app_config.server_config
+        url = f"{server.server}/Users/{server.user_id}/Views"
+        response = emby_client.get(url, params={"api_key": server.api_key}, timeout=30)
+        response.raise_for_status()
+        # 合集与播放列表视图中的条目也属于其他媒体库，跳过以免覆盖条目所属的媒体库
+        return [v for v in response.json().get("Items", []) if v.get("CollectionType") not in ("boxsets", "playlists")]
+
+    def _iter_view_pages(self, app_config: AppConfig, view_id: str, min_date_last_saved: Optional[str] = None,
+                         cancellation_event: Optional[threading.Event] = None):
+        server = app_config.server_config
+        url = f"{server.server}/Users/{server.user_id}/Items"
+        start_index = 0
+        while True:
+            if cancellation_event and cancellation_event.is_set():
+                return
+            params = {
+                "api_key": server.api_key,
+                "ParentId": view_id,
+                "Recursive": "true",
+                "IncludeItemTypes": MIRROR_ITEM_TYPES,
+                "Fields": MIRROR_FIELDS,
+                "StartIndex": start_index,
+                "Limit": MIRROR_PAGE_SIZE,
+            }
+            if min_date_last_saved:
+                params["MinDateLastSaved"] = min_date_last_saved
+            response = emby_client.get(url, params=params, timeout=120)
+            response.raise_for_status()
+            page = response.json().get("Items", [])
+            if not page:
+                return
+            yield page
+            if len(page) < MIRROR_PAGE_SIZE:
+                return
+            start_index += len(page)
+
+    def full_sync(self, app_config: AppConfig, cancellation_event: Optional[threading.Event] = None,
+                  task_id: Optional[str] = None, task_manager=None) -> Dict[str, int]:
+        """全量同步: 拉取所有媒体库的条目，并移除服务器上已不存在的条目"""
+        task_cat = "媒体库镜像"
+        with self._sync_lock:
+            started_at = datetime.now(timezone.utc)
+            synced_at = time.time()
+            views = self._get_views(app_config)
+            ui_logger.info(f"➡️ 开始全量同步媒体库镜像，共 {len(views)} 个媒体库...", task_category=task_cat)
+            if task_manager and task_id:
+                task_manager.update_task_progress(task_id, 0, len(views))
+
+            total = 0
+            for i, view in enumerate(views):
+                if cancellation_event and cancellation_event.is_set():
+                    ui_logger.warning("⚠️ 全量同步被取消，镜像保持原状态。", task_category=task_cat)
+                    return {"synced": total}
+                view_count = 0
+                for page in self._iter_view_pages(app_config, view["Id"], cancellation_event=cancellation_event):
+                    view_count += self.upsert_items(page, library_id=view["Id"], synced_at=synced_at)
+                total += view_count
+                logging.info(f"【媒体库镜像】媒体库【{view.get('Name')}】同步 {view_count} 个条目。")
+                if task_manager and task_id:
+                    task_manager.update_task_progress(task_id, i + 1, len(views))
+
+            if cancellation_event and cancellation_event.is_set():
+                return {"synced": total}
+
+            with self._lock:
+                conn = self._get_conn()
+                removed = conn.execute("DELETE FROM items WHERE synced_at < ?", (synced_at,)).rowcount
+                conn.commit()
+
+            watermark = _utc_iso(started_at - timedelta(seconds=INCREMENTAL_OVERLAP_SECONDS))
+            self._set_meta("incremental_watermark", watermark)
+            self._set_meta("last_full_sync", started_at.isoformat())
+            ui_logger.info(f"✅ 媒体库镜像全量同步完成，共 {total} 个条目，移除 {removed} 个已删除条目。", task_category=task_cat)
+            return {"synced": total, "removed": removed}
+
+    def incremental_sync(self, app_config: AppConfig) -> int:
+        """增量同步: 只拉取自上次水位线以来保存过的条目"""
+        if not self.is_ready():
+            return 0
+        if not self._sync_lock.acquire(blocking=False):
+            return 0
+        try:
+            started_at = datetime.now(timezone.utc)
+            watermark = self._get_meta("incremental_watermark")
+            total = 0
+            for view in self._get_views(app_config):
+                for page in self._iter_view_pages(app_config, view["Id"], min_date_last_saved=watermark):
+                    total += self.upsert_items(page, library_id=view["Id"])
+            self._set_meta("incremental_watermark", _utc_iso(started_at - timedelta(seconds=INCREMENTAL_OVERLAP_SECONDS)))
+            self._set_meta("last_incremental_sync", started_at.isoformat())
+            if total:
+                logging.info(f"【媒体库镜像】增量同步更新了 {total} 个条目。")
+            return total
+        except requests.RequestException as e:
+            logging.error(f"【媒体库镜像】增量同步失败: {e}")
+            return 0
+        finally:
+            self._sync_lock.release()
+
+    def run_full_sync_task(self, cancellation_event: threading.Event, task_id: str, task_manager):
+        """供 TaskManager 调度的全量同步任务入口"""
+        from config import load_app_config
+        return self.full_sync(load_app_config(), cancellation_event, task_id, task_manager)
+
+
+library_mirror = LibraryMirror()
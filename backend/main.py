@@ -13,14 +13,14 @@ from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import List, Dict, Optional, Literal, Tuple, Any
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect, Query, Path, File, UploadFile
+from fastapi import FastAPI, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect, Query, Path, File, UploadFile, Request
 from fastapi.responses import Response, FileResponse
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 
-from task_manager import TaskManager, task_manager
+from task_manager import TaskManager, task_manager, PRIORITY_WEBHOOK, PRIORITY_SCHEDULED, RESOURCE_GITHUB_WRITE
 from models import EpisodeRenamerConfig
 from episode_renamer_router import router as episode_renamer_router
 from poster_manager_router import router as poster_manager_router
@@ -54,13 +54,21 @@ import config as app_config
 from emby_downloader import EmbyDownloader, batch_download_task
 from log_manager import setup_logging, broadcaster as log_broadcaster, ui_logger
 from genre_logic import GenreLogic
-from douban_manager import scan_douban_directory_task, DOUBAN_CACHE_FILE
+from douban_manager import scan_douban_directory_task
+from douban_store import douban_store
 from actor_localizer_logic import ActorLocalizerLogic
 from actor_gallery_router import router as actor_gallery_router
 from douban_fixer_logic import DoubanFixerLogic
 from douban_fixer_router import router as douban_fixer_router
 from webhook_logic import WebhookLogic
 from proxy_manager import ProxyManager
+from emby_client import emby_client
+from tmdb_cache import tmdb_cache
+from translation_memory import translation_memory
+from tmdb_client import tmdb_client
+from image_cache import image_proxy_cache, strip_api_key, EXTERNAL_IMAGE_TTL, EMBY_IMAGE_TTL
+from library_mirror import library_mirror
+from id_map_service import id_map_service
 from episode_renamer_logic import EpisodeRenamerLogic
 from episode_role_sync_logic import EpisodeRoleSyncLogic
 
@@ -71,8 +79,6 @@ episode_sync_queue: Dict[str, Dict[str, Any]] = {}
 episode_sync_queue_lock = threading.Lock()
 episode_sync_scheduler_task = None
 
-id_map_update_request_time: Optional[float] = None
-id_map_update_lock = threading.Lock()
 id_map_update_scheduler_task = None
 
 scan_and_rename_queue: Dict[str, Dict[str, Any]] = {}
@@ -89,6 +95,16 @@ def generate_id_map_task(cancellation_event: threading.Event, task_id: str, task
     ui_logger.info(f"➡️ 开始扫描全库，生成 TMDB-Emby ID 映射表...", task_category=task_cat)
     
     config = app_config.load_app_config()
+
+    if config.library_mirror_config.enabled and library_mirror.is_ready():
+        # 镜像已就绪时先补齐 Webhook 标记的变更，再直接从本地镜像生成映射，无需遍历全库请求 Emby
+        library_mirror.flush_dirty(config)
+        library_mirror.incremental_sync(config)
+        id_map = library_mirror.get_tmdb_id_map()
+        ui_logger.info(f"🔍 已从本地媒体库镜像读取映射数据，共 {len(id_map)} 个 TMDB-ID-类型 组合。", task_category=task_cat)
+        _save_id_map(id_map, task_cat)
+        return
+
     selector = MediaSelector(config)
     
     all_media_scope = ScheduledTasksTargetScope(mode='all')
@@ -107,21 +123,10 @@ def generate_id_map_task(cancellation_event: threading.Event, task_id: str, task
     skipped_count = 0
     failed_count = 0
 
-    from concurrent.futures import ThreadPoolExecutor, as_completed
-
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_id = {executor.submit(selector._get_emby_item_details, item_id, "ProviderIds,Name,Type"): item_id for item_id in all_item_ids}
-        
-        for future in as_completed(future_to_id):
-            if cancellation_event.is_set():
-                ui_logger.warning("⚠️ 任务在处理中被取消。", task_category=task_cat)
-                for f in future_to_id:
-                    f.cancel()
-                return
-            
-            item_id = future_to_id[future]
+    for details_page in selector.iter_item_details_batch(all_item_ids, "ProviderIds,Name,Type", cancellation_event=cancellation_event):
+        for details in details_page:
+            item_id = details.get("Id")
             try:
-                details = future.result()
                 provider_ids = details.get("ProviderIds", {})
                 provider_ids_lower = {k.lower(): v for k, v in provider_ids.items()}
                 tmdb_id = provider_ids_lower.get("tmdb")
@@ -144,56 +149,98 @@ def generate_id_map_task(cancellation_event: threading.Event, task_id: str, task
             except Exception as e:
                 ui_logger.error(f"   - ❌ 处理媒体 {item_id} 时出错: {e}", task_category=task_cat)
                 failed_count += 1
-            
-            processed_count += 1
-            if processed_count % 100 == 0 or processed_count == total_items:
-                task_manager.update_task_progress(task_id, processed_count, total_items)
 
-    ID_MAP_FILE = os.path.join('/app/data', 'id_map.json')
+        processed_count += len(details_page)
+        task_manager.update_task_progress(task_id, processed_count, total_items)
+
+    if cancellation_event.is_set():
+        ui_logger.warning("⚠️ 任务在处理中被取消。", task_category=task_cat)
+        return
+
+    missing_count = total_items - processed_count
+    if missing_count > 0:
+        ui_logger.warning(f"   - ⚠️ 有 {missing_count} 个媒体项未能获取到详情，已忽略。", task_category=task_cat)
+        failed_count += missing_count
+
+    _save_id_map(id_map, task_cat, f"共处理 {total_items} 个媒体项，跳过: {skipped_count} 项, 失败: {failed_count} 项。")
+
+def _save_id_map(id_map: Dict[str, List[str]], task_cat: str, summary: str = ""):
     try:
-        with open(ID_MAP_FILE, 'w', encoding='utf-8') as f:
-            json.dump(id_map, f, indent=4)
+        mismatches = id_map_service.replace_all(id_map)
         
         total_emby_ids_mapped = sum(len(v) for v in id_map.values())
-        ui_logger.info(f"✅ 映射表生成完毕。共处理 {total_items} 个媒体项，映射 {len(id_map)} 个唯一的 TMDB-ID-类型 组合，关联 {total_emby_ids_mapped} 个Emby媒体项。跳过: {skipped_count} 项, 失败: {failed_count} 项。", task_category=task_cat)
+        ui_logger.info(f"✅ 映射表生成完毕。映射 {len(id_map)} 个唯一的 TMDB-ID-类型 组合，关联 {total_emby_ids_mapped} 个Emby媒体项。{summary}", task_category=task_cat)
+        if mismatches:
+            ui_logger.warning(f"⚠️ 一致性校验：增量维护的映射与全量结果有 {mismatches} 处不一致，已按全量结果修正。", task_category=task_cat)
+        else:
+            ui_logger.info("   - 一致性校验：增量维护的映射与全量结果一致。", task_category=task_cat)
     except IOError as e:
         ui_logger.error(f"❌ 写入映射表文件失败: {e}", task_category=task_cat)
         raise e
     
 async def id_map_update_scheduler():
     """
-    独立的后台调度器，用于处理 ID 映射表更新的延迟触发任务。
+    独立的后台调度器，每 60 秒将 Webhook 标记的变更条目增量应用到 ID 映射表，
+    只请求变更条目的 ProviderIds，不再全库重建。
     """
     task_cat = "ID映射调度器"
-    logging.info(f"【{task_cat}】已启动，将每 60 秒检查一次更新请求...")
+    logging.info(f"【{task_cat}】已启动，将每 60 秒检查一次变更条目...")
     
     while True:
         try:
             await asyncio.sleep(60)
             
-            global id_map_update_request_time
-            if id_map_update_request_time is None:
+            if not id_map_service.has_dirty():
                 continue
 
-            now = time.time()
-            silence_duration = now - id_map_update_request_time
-            
-            is_task_running = any("ID 映射表" in task['name'] for task in task_manager.get_all_tasks())
-            if is_task_running:
-                logging.info(f"【{task_cat}】⏱️ 检测到已有ID映射表生成任务正在运行，本次调度跳过，等待其完成后再重新计时。")
+            config = app_config.load_app_config()
+            if not config.server_config.server:
                 continue
 
-            if silence_duration >= 300:
-                ui_logger.info(f"➡️【{task_cat}】检测到 Webhook 请求已静默 {silence_duration:.1f} 秒 (>=300s)，开始执行 ID 映射表全量更新...", task_category=task_cat)
-                
-                task_manager.register_task(generate_id_map_task, "Webhook触发-ID映射表更新")
-                
-                with id_map_update_lock:
-                    id_map_update_request_time = None
-                logging.info(f"【{task_cat}】✅ 任务已派发，更新请求计时器已重置。")
-            else:
-                remaining_time = 300 - silence_duration
-                logging.info(f"【{task_cat}】⏱️ 收到更新请求，当前已静默 {silence_duration:.1f} 秒，等待剩余 {remaining_time:.1f} 秒...")
+            await asyncio.to_thread(id_map_service.flush_dirty, config)
+
+        except asyncio.CancelledError:
+            logging.info(f"【{task_cat}】收到关闭信号，正在退出...")
+            break
+        except Exception as e:
+            logging.error(f"【{task_cat}】运行时发生未知错误: {e}", exc_info=True)
+            await asyncio.sleep(120)
+
+
+async def library_mirror_scheduler():
+    """
+    独立的后台调度器，负责维护本地媒体库镜像：
+    每 60 秒刷新一次 Webhook 标记的脏条目，按配置间隔执行增量同步，并定期执行全量对账。
+    """
+    task_cat = "媒体库镜像调度器"
+    logging.info(f"【{task_cat}】已启动，将每 60 秒检查一次镜像状态...")
+    last_incremental_time = time.time()
+
+    while True:
+        try:
+            await asyncio.sleep(60)
+
+            config = app_config.load_app_config()
+            mirror_conf = config.library_mirror_config
+            if not mirror_conf.enabled or not config.server_config.server or not library_mirror.is_ready():
+                continue
+
+            await asyncio.to_thread(library_mirror.flush_dirty, config)
+
+            now = time.time()
+            last_full_sync = library_mirror.get_status().get("last_full_sync")
+            full_sync_due = last_full_sync and (
+                datetime.now().astimezone() - datetime.fromisoformat(last_full_sync)
+            ).total_seconds() >= mirror_conf.full_sync_interval_hours * 3600
+            is_task_running = any("媒体库镜像" in task['name'] for task in task_manager.get_all_tasks())
+
+            if full_sync_due and not is_task_running:
+                logging.info(f"【{task_cat}】距上次全量同步已超过 {mirror_conf.full_sync_interval_hours} 小时，派发全量对账任务。")
+                task_manager.register_task(library_mirror.run_full_sync_task, "定时任务-媒体库镜像全量同步", priority=PRIORITY_SCHEDULED)
+                last_incremental_time = now
+            elif now - last_incremental_time >= mirror_conf.poll_interval_seconds:
+                await asyncio.to_thread(library_mirror.incremental_sync, config)
+                last_incremental_time = now
 
         except asyncio.CancelledError:
             logging.info(f"【{task_cat}】收到关闭信号，正在退出...")
@@ -353,7 +400,8 @@ async def episode_sync_scheduler():
                         series_id=series_id,
                         episode_ids=episode_ids,
                         config=config.episode_role_sync_config,
-                        task_category=task_name
+                        task_category=task_name,
+                        priority=PRIORITY_WEBHOOK
                     )
         except asyncio.CancelledError:
             logging.info(f"【{task_cat}】收到关闭信号，正在退出...")
@@ -366,32 +414,41 @@ async def episode_sync_scheduler():
 webhook_queue = asyncio.Queue()
 webhook_processing_set = set()
 
+async def _process_webhook_item(item_id: str, item_name: str):
+    try:
+        task_id = task_manager.register_task(
+            _webhook_task_runner, 
+            f"Webhook-自动处理-【{item_name}】",
+            item_id=item_id,
+            priority=PRIORITY_WEBHOOK
+        )
+        await asyncio.to_thread(task_manager.wait_for_task, task_id)
+    except Exception as e:
+        logging.error(f"【Webhook工作者】处理任务时发生未知错误: {e}", exc_info=True)
+    finally:
+        webhook_processing_set.discard(item_id)
+        webhook_queue.task_done()
+
 async def webhook_worker():
+    """从队列取出新入库媒体并发处理，同时处理的数量受 webhook_config.max_concurrent_items 限制"""
     logging.info("【Webhook工作者】已启动，等待处理任务...")
+    running = set()
     while True:
-        item_id = None
         try:
             item_id, item_name = await webhook_queue.get()
-            
-            task_id = task_manager.register_task(
-                _webhook_task_runner, 
-                f"Webhook-自动处理-【{item_name}】",
-                item_id=item_id
-            )
-            
-            while task_id in task_manager.tasks:
-                await asyncio.sleep(1)
-
+            limit = app_config.load_app_config().webhook_config.max_concurrent_items
+            while len(running) >= limit:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                running.difference_update(done)
+            running.add(asyncio.create_task(_process_webhook_item(item_id, item_name)))
         except asyncio.CancelledError:
             logging.info("【Webhook工作者】收到关闭信号，正在退出...")
+            for item_task in running:
+                item_task.cancel()
             break
         except Exception as e:
-            logging.error(f"【Webhook工作者】处理任务时发生未知错误: {e}", exc_info=True)
+            logging.error(f"【Webhook工作者】分发任务时发生未知错误: {e}", exc_info=True)
             await asyncio.sleep(5)
-        finally:
-            if item_id in webhook_processing_set:
-                webhook_processing_set.remove(item_id)
-            webhook_queue.task_done()
 
 def _webhook_task_runner(item_id: str, cancellation_event: threading.Event, task_id: str, task_manager: TaskManager):
     current_config = app_config.load_app_config()
@@ -401,11 +458,11 @@ def _webhook_task_runner(item_id: str, cancellation_event: threading.Event, task
 
 def trigger_douban_refresh():
     task_cat = "定时任务-豆瓣数据"
-    ui_logger.info("开始执行豆瓣数据强制刷新...", task_category=task_cat)
+    ui_logger.info("开始执行豆瓣数据增量刷新...", task_category=task_cat)
     config = app_config.load_app_config()
     douban_conf = config.douban_config
     if douban_conf.directory and os.path.isdir(douban_conf.directory):
-        task_manager.register_task(scan_douban_directory_task, "定时刷新豆瓣数据", douban_conf.directory, douban_conf.extra_fields)
+        task_manager.register_task(scan_douban_directory_task, "定时刷新豆瓣数据", douban_conf.directory, douban_conf.extra_fields, incremental=True, workers=douban_conf.scan_workers, priority=PRIORITY_SCHEDULED)
     else:
         ui_logger.warning("未配置有效的豆瓣目录，跳过定时刷新。", task_category=task_cat)
 
@@ -418,7 +475,7 @@ def trigger_douban_fixer_scan():
             ui_logger.warning("检测到已有豆瓣ID修复任务正在运行，本次调度跳过。", task_category=task_cat)
             return
     logic = DoubanFixerLogic(config)
-    task_manager.register_task(logic.scan_and_match_task, "豆瓣ID修复-all", "all", None, None)
+    task_manager.register_task(logic.scan_and_match_task, "豆瓣ID修复-all", "all", None, None, priority=PRIORITY_SCHEDULED)
 
 def trigger_actor_localizer_apply():
     task_cat = "定时任务-演员中文化"
@@ -429,7 +486,7 @@ def trigger_actor_localizer_apply():
             ui_logger.warning("检测到已有演员中文化任务正在运行，本次调度跳过。", task_category=task_cat)
             return
     logic = ActorLocalizerLogic(config)
-    task_manager.register_task(logic.apply_actor_changes_directly_task, "演员中文化-定时自动应用", config.actor_localizer_config)
+    task_manager.register_task(logic.apply_actor_changes_directly_task, "演员中文化-定时自动应用", config.actor_localizer_config, priority=PRIORITY_SCHEDULED)
 
 def _episode_refresher_task_runner(
     series_ids: List[str], 
@@ -444,7 +501,7 @@ def _episode_refresher_task_runner(
     task_manager.update_task_progress(task_id, 0, len(series_ids))
 
     all_episode_ids = []
-    session = requests.Session()
+    session = emby_client
     for i, series_id in enumerate(series_ids):
         if cancellation_event.is_set():
             ui_logger.warning("在获取分集阶段被取消。", task_category=task_cat)
@@ -511,7 +568,7 @@ def _episode_renamer_task_runner(
     task_manager.update_task_progress(task_id, 0, len(series_ids))
 
     all_episode_ids = []
-    session = requests.Session()
+    session = emby_client
     for i, series_id in enumerate(series_ids):
         if cancellation_event.is_set():
             ui_logger.warning("在获取分集阶段被取消。", task_category=task_cat)
@@ -563,7 +620,7 @@ def trigger_scheduled_task(task_id: str):
     ui_logger.info(f"开始执行定时任务...", task_category=task_cat)
     
     if task_id == "id_mapper":
-        task_manager.register_task(generate_id_map_task, f"定时任务-{task_display_name}")
+        task_manager.register_task(generate_id_map_task, f"定时任务-{task_display_name}", priority=PRIORITY_SCHEDULED)
         return
 
     config = app_config.load_app_config()
@@ -591,7 +648,8 @@ def trigger_scheduled_task(task_id: str):
             task_name, 
             item_ids, 
             config.actor_localizer_config,
-            task_category=task_name
+            task_category=task_name,
+            priority=PRIORITY_SCHEDULED
         )
     elif task_id == "douban_fixer":
         logic = DoubanFixerLogic(config)
@@ -600,7 +658,8 @@ def trigger_scheduled_task(task_id: str):
             logic.run_fixer_for_items,
             task_name,
             item_ids,
-            task_category=task_name
+            task_category=task_name,
+            priority=PRIORITY_SCHEDULED
         )
     elif task_id == "douban_poster_updater":
         logic = DoubanPosterUpdaterLogic(config)
@@ -609,7 +668,8 @@ def trigger_scheduled_task(task_id: str):
             logic.run_poster_update_for_items,
             task_name,
             item_ids,
-            config.douban_poster_updater_config
+            config.douban_poster_updater_config,
+            priority=PRIORITY_SCHEDULED
         )
     elif task_id == "episode_refresher":
         task_name = f"定时任务-剧集元数据刷新({scope.mode})"
@@ -618,7 +678,8 @@ def trigger_scheduled_task(task_id: str):
             task_name,
             series_ids=item_ids,
             config=config,
-            task_name=task_name
+            task_name=task_name,
+            priority=PRIORITY_SCHEDULED
         )
     elif task_id == "episode_renamer":
         task_name = f"定时任务-剧集文件重命名({scope.mode})"
@@ -627,7 +688,8 @@ def trigger_scheduled_task(task_id: str):
             task_name,
             series_ids=item_ids,
             config=config,
-            task_name=task_name
+            task_name=task_name,
+            priority=PRIORITY_SCHEDULED
         )
     elif task_id == "episode_role_sync":
         logic = EpisodeRoleSyncLogic(config)
@@ -637,7 +699,8 @@ def trigger_scheduled_task(task_id: str):
             task_name,
             item_ids,
             config.episode_role_sync_config,
-            task_category=task_name
+            task_category=task_name,
+            priority=PRIORITY_SCHEDULED
         )
     elif task_id == "movie_renamer":
         from movie_renamer_logic import MovieRenamerLogic
@@ -647,7 +710,8 @@ def trigger_scheduled_task(task_id: str):
             logic.run_rename_task_for_items,
             task_name,
             item_ids=item_ids,
-            task_category=task_name
+            task_category=task_name,
+            priority=PRIORITY_SCHEDULED
         )
     else:
         ui_logger.warning(f"未知的任务ID: {task_id}", task_category=task_cat)
@@ -663,7 +727,7 @@ def trigger_chasing_workflow():
     ui_logger.info("开始执行内置的每日追更维护任务...", task_category=task_cat)
     from chasing_center_logic import ChasingCenterLogic
     logic = ChasingCenterLogic(config)
-    task_manager.register_task(logic.run_chasing_workflow_task, "定时任务-追更每日维护")
+    task_manager.register_task(logic.run_chasing_workflow_task, "定时任务-追更每日维护", priority=PRIORITY_SCHEDULED)
 
 def trigger_upcoming_notification():
     """即将上映订阅通知触发器"""
@@ -689,7 +753,7 @@ def trigger_calendar_notification():
     ui_logger.info("开始执行追剧日历通知任务...", task_category=task_cat)
     from chasing_center_logic import ChasingCenterLogic
     logic = ChasingCenterLogic(config)
-    task_manager.register_task(logic.send_calendar_notification_task, "定时任务-追剧日历通知")
+    task_manager.register_task(logic.send_calendar_notification_task, "定时任务-追剧日历通知", priority=PRIORITY_SCHEDULED)
 
 def trigger_media_tagger_task():
     """媒体标签器定时任务触发器"""
@@ -702,7 +766,7 @@ def trigger_media_tagger_task():
     ui_logger.info("开始执行媒体标签器定时任务...", task_category=task_cat)
     from media_tagger_logic import MediaTaggerLogic
     logic = MediaTaggerLogic(config)
-    task_manager.register_task(logic.run_tagging_task, "媒体标签器-定时任务")
+    task_manager.register_task(logic.run_tagging_task, "媒体标签器-定时任务", priority=PRIORITY_SCHEDULED)
 
 def update_chasing_scheduler():
     """更新追更中心的定时任务"""
@@ -815,16 +879,24 @@ async def lifespan(app: FastAPI):
     id_map_update_scheduler_task = asyncio.create_task(id_map_update_scheduler())
 
     library_scan_scheduler_task = asyncio.create_task(library_scan_scheduler())
+    library_mirror_scheduler_task = asyncio.create_task(library_mirror_scheduler())
 
     config = app_config.load_app_config()
+
+    if config.library_mirror_config.enabled and config.server_config.server:
+        if not library_mirror.is_ready():
+            ui_logger.info("【启动检查】本地媒体库镜像尚未建立，将自动执行首次全量同步。", task_category=task_cat)
+            task_manager.register_task(library_mirror.run_full_sync_task, "首次构建媒体库镜像", priority=PRIORITY_SCHEDULED)
+        else:
+            logging.info("【启动检查】本地媒体库镜像已就绪，将由后台调度器增量维护。")
     
     douban_conf = config.douban_config
     if douban_conf.directory and os.path.isdir(douban_conf.directory):
-        if not os.path.exists(DOUBAN_CACHE_FILE):
-            ui_logger.info("【启动检查】未发现豆瓣缓存文件，将自动执行首次扫描。", task_category=task_cat)
-            task_manager.register_task(scan_douban_directory_task, "首次启动豆瓣扫描", douban_conf.directory, douban_conf.extra_fields)
+        if not douban_store.exists():
+            ui_logger.info("【启动检查】未发现豆瓣数据存储，将自动执行首次扫描。", task_category=task_cat)
+            task_manager.register_task(scan_douban_directory_task, "首次启动豆瓣扫描", douban_conf.directory, douban_conf.extra_fields, workers=douban_conf.scan_workers, priority=PRIORITY_SCHEDULED)
         else:
-            logging.info(f"【启动检查】已找到豆瓣缓存文件: {DOUBAN_CACHE_FILE}，跳过自动扫描。")
+            logging.info(f"【启动检查】已找到豆瓣数据存储: {douban_store.db_path}，跳过自动扫描。")
     else:
         logging.warning("【启动检查】未配置有效的豆瓣目录，无法执行扫描。")
 
@@ -912,14 +984,17 @@ async def lifespan(app: FastAPI):
         id_map_update_scheduler_task.cancel()
     if library_scan_scheduler_task:
         library_scan_scheduler_task.cancel()
+    library_mirror_scheduler_task.cancel()
     await asyncio.gather(
         webhook_worker_task, 
         task_manager_consumer, 
         episode_sync_scheduler_task, 
         id_map_update_scheduler_task, 
         library_scan_scheduler_task,
+        library_mirror_scheduler_task,
         return_exceptions=True
     )
+    await image_proxy_cache.aclose()
     logging.info("所有后台任务已成功取消。")
 
 app = FastAPI(lifespan=lifespan)
@@ -988,34 +1063,29 @@ def test_trakt_api(config: TraktConfig):
 
 
 @app.get("/api/image-proxy")
-async def image_proxy(url: str):
+async def image_proxy(url: str, request: Request):
     """
     通用的外部图片代理，用于解决前端混合内容问题。
-    此实现遵循用户定义的代理规则。
+    此实现遵循用户定义的代理规则，并通过磁盘缓存避免重复下载。
     """
     task_cat = "图片代理-通用"
     try:
-        config = app_config.load_app_config()
-        proxy_manager = ProxyManager(config)
-        mounts = proxy_manager.get_proxies_for_httpx(url)
+        config = app_config.get_app_config()
+        proxy_url = ProxyManager(config).get_proxies(url).get('https')
 
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36',
-        }
+        extra_headers = {}
         if 'doubanio.com' in url:
-            headers['Referer'] = 'https://movie.douban.com/'
-
-        async with httpx.AsyncClient(mounts=mounts or {}, follow_redirects=True) as client:
-            req = await client.get(url, headers=headers, timeout=20)
-            req.raise_for_status()
+            extra_headers['Referer'] = 'https://movie.douban.com/'
 
-        content_type = req.headers.get('Content-Type', 'image/jpeg')
-        if not content_type.startswith('image/'):
-            ui_logger.warning(f"⚠️ 代理请求返回的 Content-Type 不是图片: {content_type}。URL: {url}", task_category=task_cat)
-            raise HTTPException(status_code=400, detail="代理目标返回的不是有效的图片内容。")
+        return await image_proxy_cache.serve(
+            url, url, proxy_url, EXTERNAL_IMAGE_TTL,
+            extra_headers=extra_headers, if_none_match=request.headers.get('if-none-match')
+        )
 
-        return Response(content=req.content, media_type=content_type)
-        
+    except HTTPException as e:
+        if e.status_code == 400:
+            ui_logger.warning(f"⚠️ 代理请求返回的不是图片。URL: {url}", task_category=task_cat)
+        raise
     except httpx.RequestError as e:
         ui_logger.error(f"❌ 请求外部图片失败: {e}", task_category=task_cat, exc_info=True)
         raise HTTPException(status_code=502, detail=f"请求外部图片URL失败: {e}")
@@ -1034,7 +1104,7 @@ async def websocket_logs_endpoint(websocket: WebSocket):
 @app.websocket("/ws/tasks")
 async def websocket_tasks_endpoint(websocket: WebSocket):
     await task_manager.broadcaster.connect(websocket)
-    await websocket.send_json(task_manager.get_all_tasks())
+    await websocket.send_json(task_manager.get_snapshot())
     try:
         while True: await websocket.receive_text()
     except WebSocketDisconnect:
@@ -1042,10 +1112,10 @@ async def websocket_tasks_endpoint(websocket: WebSocket):
         logging.info("任务 WebSocket 客户端断开连接。")
 
 @app.get("/api/emby-image-proxy")
-async def emby_image_proxy(path: str):
+async def emby_image_proxy(path: str, request: Request):
     task_cat = "图片代理-Emby"
     try:
-        config = app_config.load_app_config()
+        config = app_config.get_app_config()
         server_conf = config.server_config
         if not server_conf.server:
             raise HTTPException(status_code=400, detail="Emby服务器未配置。")
@@ -1057,22 +1127,19 @@ async def emby_image_proxy(path: str):
             path_with_auth = path
 
         full_url = f"{server_conf.server}/{path_with_auth}"
-        
-        proxy_manager = ProxyManager(config)
-        mounts = proxy_manager.get_proxies_for_httpx(full_url)
+        # 缓存键不含 api_key，避免密钥变化导致缓存整体失效
+        cache_key = f"{server_conf.server}/{strip_api_key(path)}"
+        proxy_url = ProxyManager(config).get_proxies(full_url).get('https')
 
-        async with httpx.AsyncClient(mounts=mounts or {}, follow_redirects=True) as client:
-            req = await client.get(full_url, timeout=20)
-        
-        req.raise_for_status()
-        
-        content_type = req.headers.get('Content-Type', 'image/jpeg')
-        if not content_type.startswith('image/'):
-            ui_logger.warning(f"⚠️ 代理请求返回的 Content-Type 不是图片: {content_type}。URL: {full_url}", task_category=task_cat)
-            raise HTTPException(status_code=400, detail="代理目标返回的不是有效的图片内容。")
+        return await image_proxy_cache.serve(
+            full_url, cache_key, proxy_url, EMBY_IMAGE_TTL,
+            if_none_match=request.headers.get('if-none-match')
+        )
 
-        return Response(content=req.content, media_type=content_type)
-        
+    except HTTPException as e:
+        if e.status_code == 400 and server_conf.server:
+            ui_logger.warning(f"⚠️ 代理请求返回的不是图片。路径: {path}", task_category=task_cat)
+        raise
     except httpx.RequestError as e:
         ui_logger.error(f"❌ 请求 Emby 图片时发生网络异常: {e}", task_category=task_cat, exc_info=True)
         raise HTTPException(status_code=502, detail=f"请求 Emby 服务器失败: {e}")
@@ -1086,18 +1153,13 @@ def read_root(): return {"message": "欢迎来到 Emby 工具箱后端!"}
 def get_app_config_api():
     config = app_config.load_app_config()
     is_scanning = any("豆瓣" in task['name'] for task in task_manager.get_all_tasks())
-    if not os.path.exists(DOUBAN_CACHE_FILE):
-        status = DoubanCacheStatus(exists=False, item_count=0, last_modified=None, is_scanning=is_scanning)
-    else:
-        try:
-            mtime = os.path.getmtime(DOUBAN_CACHE_FILE)
-            last_modified = datetime.fromtimestamp(mtime).isoformat()
-            with open(DOUBAN_CACHE_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            item_count = len(data)
-            status = DoubanCacheStatus(exists=True, item_count=item_count, last_modified=last_modified, is_scanning=is_scanning)
-        except Exception:
-            status = DoubanCacheStatus(exists=True, item_count=0, last_modified=None, is_scanning=is_scanning)
+    try:
+        if not douban_store.exists():
+            status = DoubanCacheStatus(exists=False, item_count=0, last_modified=None, is_scanning=is_scanning)
+        else:
+            status = DoubanCacheStatus(exists=True, item_count=douban_store.count(), last_modified=douban_store.last_modified(), is_scanning=is_scanning)
+    except Exception:
+        status = DoubanCacheStatus(exists=True, item_count=0, last_modified=None, is_scanning=is_scanning)
     config.douban_cache_status = status
     return config
 @app.post("/api/config/server")
@@ -1116,14 +1178,14 @@ def save_server_config_api(server_config: ServerConfig):
             logging.info("【连接测试】将直接连接 Emby 服务器。")
 
         params = {"api_key": server_config.api_key}
-        response = requests.get(test_url, params=params, timeout=15, proxies=proxies)
+        response = emby_client.get(test_url, params=params, timeout=15, proxies=proxies)
         response.raise_for_status()
         user_data = response.json()
         if not user_data.get("Name"): raise ValueError("服务器响应异常，未找到有效的用户信息。")
         
         system_info_url = f"{server_config.server}/System/Info"
         proxies_system = proxy_manager.get_proxies(system_info_url)
-        response_system = requests.get(system_info_url, params=params, timeout=15, proxies=proxies_system)
+        response_system = emby_client.get(system_info_url, params=params, timeout=15, proxies=proxies_system)
         
         response_system.raise_for_status()
         system_info = response_system.json()
@@ -1303,7 +1365,7 @@ def force_refresh_douban_data_api():
     douban_conf = config.douban_config
     if not douban_conf.directory or not os.path.isdir(douban_conf.directory):
         raise HTTPException(status_code=400, detail="请先在配置页面设置一个有效的豆瓣数据根目录。")
-    task_id = task_manager.register_task(scan_douban_directory_task, "手动强制刷新豆瓣数据", douban_conf.directory, douban_conf.extra_fields)
+    task_id = task_manager.register_task(scan_douban_directory_task, "手动强制刷新豆瓣数据", douban_conf.directory, douban_conf.extra_fields, workers=douban_conf.scan_workers)
     return {"status": "success", "message": "强制刷新任务已启动，请在“运行任务”页面查看进度。", "task_id": task_id}
 LOG_FILE = os.path.join('/app/data', "app.log")
 
@@ -1510,7 +1572,7 @@ def get_libraries_api():
         proxy_manager = ProxyManager(config)
         proxies = proxy_manager.get_proxies(url)
 
-        response = requests.get(url, params={"api_key": server_conf.api_key}, timeout=15, proxies=proxies)
+        response = emby_client.get(url, params={"api_key": server_conf.api_key}, timeout=15, proxies=proxies)
         response.raise_for_status()
         views = response.json().get("Items", [])
 
@@ -1542,7 +1604,7 @@ def search_media_api(query: MediaSearchQuery):
         proxy_manager = ProxyManager(config)
         proxies = proxy_manager.get_proxies(url)
 
-        response = requests.get(url, params=params, timeout=20, proxies=proxies)
+        response = emby_client.get(url, params=params, timeout=20, proxies=proxies)
         response.raise_for_status()
         items = response.json().get("Items", [])
         if not items and query.query.isdigit():
@@ -1551,7 +1613,7 @@ def search_media_api(query: MediaSearchQuery):
                 item_params = { "api_key": server_conf.api_key, "Fields": "ProviderIds,ProductionYear,Genres" }
                 
                 proxies_item = proxy_manager.get_proxies(item_url)
-                item_resp = requests.get(item_url, params=item_params, timeout=10, proxies=proxies_item)
+                item_resp = emby_client.get(item_url, params=item_params, timeout=10, proxies=proxies_item)
 
                 if item_resp.ok: items = [item_resp.json()]
             except Exception: pass
@@ -1573,7 +1635,7 @@ def debug_get_item_details(item_id: str):
         proxy_manager = ProxyManager(config)
         proxies = proxy_manager.get_proxies(url)
 
-        response = requests.get(url, params=params, timeout=20, proxies=proxies)
+        response = emby_client.get(url, params=params, timeout=20, proxies=proxies)
         response.raise_for_status()
         data = response.json()
         logging.info(f"【调试】成功获取 Item ID: {item_id} 的数据。")
@@ -1608,6 +1670,33 @@ async def batch_download_api(req: BatchDownloadRequest):
     return {"status": "success", "message": "批量下载任务已成功启动", "task_id": task_id}
 @app.get("/api/tasks")
 def get_tasks_api(): return task_manager.get_all_tasks()
+@app.get("/api/tasks/{task_id}/result")
+def get_task_result_api(task_id: str):
+    task_result = task_manager.get_task_result(task_id)
+    if task_result is None: raise HTTPException(status_code=404, detail=f"任务 {task_id} 未找到或已清理。")
+    return task_result
+@app.get("/api/system/emby-client-stats")
+def get_emby_client_stats_api():
+    """返回共享 Emby 客户端按主机统计的请求次数与延迟直方图"""
+    return emby_client.get_stats()
+@app.get("/api/system/image-cache-stats")
+def get_image_cache_stats_api():
+    """返回图片代理磁盘缓存的命中率与占用情况"""
+    return image_proxy_cache.get_stats()
+@app.get("/api/system/tmdb-cache-stats")
+def get_tmdb_cache_stats_api():
+    """返回 TMDB 两级缓存按接口类别统计的命中率，以及全局 TMDB 客户端的限速与合并统计"""
+    return {**tmdb_cache.get_stats(), "client": tmdb_client.get_stats()}
+@app.get("/api/library-mirror/status")
+def get_library_mirror_status_api():
+    return library_mirror.get_status()
+@app.post("/api/library-mirror/rebuild")
+def rebuild_library_mirror_api():
+    config = app_config.load_app_config()
+    if not config.server_config.server:
+        raise HTTPException(status_code=400, detail="请先配置 Emby 服务器。")
+    task_id = task_manager.register_task(library_mirror.run_full_sync_task, "手动触发-媒体库镜像全量同步")
+    return {"status": "success", "message": "媒体库镜像全量同步任务已启动。", "task_id": task_id}
 @app.post("/api/tasks/{task_id}/cancel")
 def cancel_task_api(task_id: str):
     if task_manager.cancel_task(task_id): return {"status": "success", "message": f"任务 {task_id} 正在取消中。"}
@@ -1625,6 +1714,7 @@ class GenreApplyRequest(BaseModel):
 
 
 
+
 @app.get("/api/genres")
 def get_all_genres():
     config = app_config.load_app_config()
@@ -1760,6 +1850,35 @@ def test_translation_api(req: TestTranslationRequest):
     except Exception as e:
         logging.error(f"翻译API测试失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/actor-localizer/translation-memory/stats")
+def get_translation_memory_stats_api():
+    """返回翻译记忆的条目数及本次运行以来的命中率"""
+    return translation_memory.get_stats()
+
+@app.get("/api/actor-localizer/translation-memory/export")
+def export_translation_memory_api():
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    content = json.dumps(translation_memory.export_entries(), ensure_ascii=False, indent=2)
+    return Response(
+        content=content,
+        media_type='application/json',
+        headers={"Content-Disposition": f'attachment; filename="translation_memory_{timestamp}.json"'}
+    )
+
+@app.post("/api/actor-localizer/translation-memory/import")
+async def import_translation_memory_api(file: UploadFile = File(...), overwrite: bool = Query(False)):
+    """导入翻译记忆，默认保留本地已有的译文，overwrite=true 时以导入文件为准"""
+    task_cat = "翻译记忆"
+    if not file.filename.endswith('.json'):
+        raise HTTPException(status_code=400, detail="文件格式不正确，请上传 .json 文件。")
+    try:
+        data = json.loads(await file.read())
+        written, skipped = translation_memory.import_entries(data, overwrite=overwrite)
+    except (ValueError, AttributeError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"翻译记忆文件无效: {e}")
+    ui_logger.info(f"✅ 翻译记忆导入完成，写入 {written} 条，跳过 {skipped} 条。", task_category=task_cat)
+    return {"success": True, "written": written, "skipped": skipped}
     
 
 @app.get("/api/actor-localizer/media/{item_id}/people", response_model=List[Dict])
@@ -1959,7 +2078,8 @@ def backup_screenshots_to_github_api(req: GitHubBackupRequest):
     task_id = task_manager.register_task(
         logic.backup_screenshots_to_github_task,
         task_name,
-        config=config.episode_refresher_config
+        config=config.episode_refresher_config,
+        resources=[RESOURCE_GITHUB_WRITE]
     )
     return {"status": "success", "message": "备份到 GitHub 的任务已启动。", "task_id": task_id}
     
@@ -2015,7 +2135,7 @@ def get_series_episodes(series_id: str):
     task_cat = "API-剧集刷新"
     try:
         config = app_config.load_app_config()
-        session = requests.Session()
+        session = emby_client
         episodes_url = f"{config.server_config.server}/Items"
         episodes_params = {
             "api_key": config.server_config.api_key,
@@ -2060,7 +2180,8 @@ def precise_upload_from_local_api(req: PreciseScreenshotUpdateRequest):
         series_tmdb_id=req.series_tmdb_id,
         series_name=req.series_name,
         episodes=req.episodes,
-        config=req.config
+        config=req.config,
+        resources=[RESOURCE_GITHUB_WRITE]
     )
     return {"status": "success", "message": "精准覆盖任务已启动。", "task_id": task_id}
 
@@ -2104,7 +2225,8 @@ def cleanup_github_screenshots_api():
     task_id = task_manager.register_task(
         logic.cleanup_github_screenshots_task,
         task_name,
-        config=config.episode_refresher_config
+        config=config.episode_refresher_config,
+        resources=[RESOURCE_GITHUB_WRITE]
     )
     return {"status": "success", "message": "清理任务已启动。", "task_id": task_id}
 
@@ -2215,7 +2337,18 @@ async def emby_webhook_receiver(payload: EmbyWebhookPayload):
     task_cat = "Webhook"
     ui_logger.info(f"➡️ 收到来自 Emby 的通知，事件: {payload.Event}", task_category=task_cat)
     
-    config = app_config.load_app_config()
+    config = app_config.get_app_config()
+
+    # 无论 Webhook 自动处理是否启用，都用通知维护本地媒体库镜像
+    if payload.Item and payload.Item.Id and payload.Item.Type in ["Movie", "Series", "Episode"]:
+        if payload.Event in ["library.deleted", "item.deleted"]:
+            library_mirror.remove_items([payload.Item.Id])
+            id_map_service.remove_items([payload.Item.Id])
+        else:
+            library_mirror.mark_dirty([payload.Item.Id])
+            if payload.Item.Type in ["Movie", "Series"]:
+                id_map_service.mark_dirty([payload.Item.Id])
+
     if not config.webhook_config.enabled:
         ui_logger.info("【跳过】Webhook 功能未启用，忽略本次通知。", task_category=task_cat)
         return {"status": "skipped", "message": "Webhook processing is disabled."}
@@ -2241,7 +2374,7 @@ async def emby_webhook_receiver(payload: EmbyWebhookPayload):
                 server_conf = config.server_config
                 url = f"{server_conf.server}/Users/{server_conf.user_id}/Items/{episode_id}"
                 params = {"api_key": server_conf.api_key, "Fields": "SeriesId,SeriesName"}
-                response = requests.get(url, params=params, timeout=15)
+                response = emby_client.get(url, params=params, timeout=15)
                 response.raise_for_status()
                 episode_details = response.json()
                 
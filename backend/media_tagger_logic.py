@@ -10,6 +10,8 @@ from models import AppConfig, MediaTaggerConfig, MediaTaggerRule
 from log_manager import ui_logger
 from task_manager import TaskManager
 from proxy_manager import ProxyManager
+from emby_client import emby_client
+from library_mirror import library_mirror
 
 class MediaTaggerLogic:
     def __init__(self, config: AppConfig):
@@ -17,7 +19,7 @@ class MediaTaggerLogic:
         self.server_config = config.server_config
         self.tagger_config = config.media_tagger_config
         self.proxy_manager = ProxyManager(config)
-        self.session = requests.Session()
+        self.session = emby_client
         self._library_cache = None
         self._physical_library_cache = None
 
@@ -147,6 +149,20 @@ class MediaTaggerLogic:
         library_names = {lib['Id']: lib['Name'] for lib in target_libraries}
         ui_logger.info(f"🔍 将扫描 {len(target_libraries)} 个媒体库: {[lib['Name'] for lib in target_libraries]}", task_category=task_cat)
         all_parsed_items = {}
+
+        # 本地镜像已覆盖的媒体库直接读取镜像，其余媒体库 (如合集视图) 仍向 Emby 请求
+        if self.config.library_mirror_config.enabled and library_mirror.is_ready():
+            # 先补齐 Webhook 标记的变更与增量同步，避免基于过期的标签快照演算
+            library_mirror.flush_dirty(self.config)
+            library_mirror.incremental_sync(self.config)
+            mirrored_lib_ids = library_mirror.get_library_ids().intersection(library_names.keys())
+            if mirrored_lib_ids:
+                for item in library_mirror.get_items(["Movie", "Series"], list(mirrored_lib_ids)):
+                    parsed_data = self._parse_item_data(item, item['LibraryId'], library_names[item['LibraryId']])
+                    all_parsed_items[parsed_data['Id']] = parsed_data
+                logging.info(f"【{task_cat}】已从本地媒体库镜像读取 {len(mirrored_lib_ids)} 个媒体库的 {len(all_parsed_items)} 个媒体项。")
+                target_libraries = [lib for lib in target_libraries if lib['Id'] not in mirrored_lib_ids]
+
         with ThreadPoolExecutor(max_workers=10) as executor:
             future_to_lib = {
                 executor.submit(self._get_items_from_library, lib['Id'], "Tags,TagItems,Genres"): lib['Id'] 
@@ -167,7 +183,11 @@ class MediaTaggerLogic:
         ui_logger.info(f"✅ 数据准备完成，共获取到 {len(all_parsed_items)} 个媒体项。", task_category=task_cat)
         return all_parsed_items
 
-    def _update_item_tags(self, item_id: str, final_tags: List[str]) -> bool:
+    def _update_item_tags(self, item_id: str, final_tags: List[str], initial_tags: Optional[Set[str]] = None) -> bool:
+        """
+        写入媒体项的标签。传入 initial_tags 时只把 (final_tags - initial_tags) 的增删应用到服务器上的当前标签，
+        演算之后在 Emby 中新增的标签不会被覆盖；不传时直接以 final_tags 覆盖 (如清空全部标签)。
+        """
         task_cat = "媒体标签器"
         try:
             get_url = f"{self.server_config.server}/Users/{self.server_config.user_id}/Items/{item_id}"
@@ -176,6 +196,10 @@ class MediaTaggerLogic:
             response = self.session.get(get_url, params=params, timeout=15, proxies=proxies)
             response.raise_for_status()
             item_data = response.json()
+            if initial_tags is not None:
+                final_set = set(final_tags)
+                current_tags = self._parse_item_data(item_data, "", "")['Tags']
+                final_tags = (current_tags | (final_set - initial_tags)) - (initial_tags - final_set)
             sorted_final_tags = sorted(list(final_tags))
             item_data['Tags'] = sorted_final_tags
             item_data['TagItems'] = [{"Name": tag} for tag in sorted_final_tags]
@@ -192,6 +216,7 @@ class MediaTaggerLogic:
                 update_url, params=update_params, headers=headers, json=item_data, timeout=20, proxies=update_proxies
             )
             update_response.raise_for_status()
+            library_mirror.mark_dirty([item_id])
             return True
         except Exception as e:
             logging.error(f"更新媒体 {item_id} 标签时出错: {e}", exc_info=True)
@@ -298,7 +323,7 @@ class MediaTaggerLogic:
                 
                 full_log_message = "\n".join(log_lines)
                 ui_logger.info(full_log_message, task_category=task_cat)
-                self._update_item_tags(item_id, list(final_tags))
+                self._update_item_tags(item_id, list(final_tags), initial_tags)
             else:
                 full_log_message = "\n".join(log_lines)
                 ui_logger.info(full_log_message, task_category=task_cat)
@@ -428,7 +453,7 @@ class MediaTaggerLogic:
             full_log_message = "\n".join(log_lines)
             ui_logger.info(full_log_message, task_category=task_cat)
 
-            if self._update_item_tags(item_id, list(final_tags)):
+            if self._update_item_tags(item_id, list(final_tags), initial_tags):
                 success_count += 1
             processed_count += 1
             task_manager.update_task_progress(task_id, processed_count, len(items_to_update))
@@ -503,7 +528,7 @@ class MediaTaggerLogic:
             removed = sorted(list(current_tags.intersection(tags_to_remove_set)))
             new_tags = list(current_tags - tags_to_remove_set)
             ui_logger.info(f"   - 正在处理【{item_name}】: 当前标签 [{', '.join(sorted(list(current_tags)))}]，将移除 [{', '.join(removed)}]...", task_category=task_cat)
-            if self._update_item_tags(item_id, new_tags):
+            if self._update_item_tags(item_id, new_tags, current_tags):
                 success_count += 1
             processed_count += 1
             task_manager.update_task_progress(task_id, processed_count, len(items_to_process))
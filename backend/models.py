@@ -46,12 +46,15 @@ class TmdbConfig(BaseModel):
     api_key: str = ""
     custom_api_domain_enabled: bool = Field(default=False, description="是否启用自定义API域名")
     custom_api_domain: str = Field(default="https://api.themoviedb.org", description="自定义TMDB API域名")
+    rate_limit_per_second: float = Field(default=20.0, ge=1, le=50, description="全局 TMDB 请求速率上限（次/秒），所有任务共享")
+    max_concurrent_requests: int = Field(default=8, ge=1, le=32, description="同时进行中的 TMDB 请求数上限")
 
 class DoubanConfig(BaseModel):
     """豆瓣数据源配置"""
     directory: str = ""
     refresh_cron: str = ""
     extra_fields: List[str] = Field(default_factory=list)
+    scan_workers: int = Field(default=8, ge=1, le=32, description="扫描豆瓣目录时并行解析元数据文件的线程数")
 
 class DoubanCacheStatus(BaseModel):
     """豆瓣缓存状态信息，用于前端展示"""
@@ -100,6 +103,22 @@ class SiliconflowApiConfig(BaseModel):
         default=True,
         description="是否启用批量翻译模式，可大幅减少API请求次数"
     )
+    cross_item_batch_enabled: bool = Field(
+        default=True,
+        description="批量任务中是否跨媒体合并翻译：先扫描多个媒体项，去重后按 token 预算打包翻译"
+    )
+    cross_item_batch_token_budget: int = Field(
+        default=1500,
+        description="跨媒体合并翻译时，每个请求中角色名部分的估算 token 上限",
+        ge=200,
+        le=8000
+    )
+    cross_item_concurrency: int = Field(
+        default=2,
+        description="跨媒体合并翻译的并发请求数 (仍受API调用冷却限制)",
+        ge=1,
+        le=8
+    )
 
 class ActorLocalizerConfig(BaseModel):
     """演员中文化功能的完整配置"""
@@ -122,6 +141,8 @@ class ActorLocalizerConfig(BaseModel):
     )
     tencent_config: TencentApiConfig = Field(default_factory=TencentApiConfig)
     siliconflow_config: SiliconflowApiConfig = Field(default_factory=SiliconflowApiConfig)
+    translation_memory_enabled: bool = Field(default=True, description="是否启用翻译记忆，已翻译过的角色名直接复用译文，不再调用翻译接口")
+    translation_memory_per_title: bool = Field(default=True, description="AI翻译的译文是否只在同一作品内复用 (同一原文在不同作品中可能有不同译法)")
     apply_cron: str = Field(default="", description="定时自动应用CRON表达式")
     scheduled_task_skip_douban_check: bool = Field(default=False, description="定时任务中是否允许跳过豆瓣ID/数据检查，直接进行翻译")
 
@@ -147,7 +168,7 @@ class GitHubCacheConfig(BaseModel):
     allow_fallback: bool = Field(default=True, description="远程图床找不到时，是否允许降级为实时截图")
     overwrite_remote: bool = Field(default=False, description="备份时，是否覆盖远程已存在的同名文件")
     download_cooldown: float = Field(default=0.5, description="从GitHub下载文件（如索引）前的冷却时间（秒）", ge=0)
-    upload_cooldown: float = Field(default=1.0, description="向GitHub上传文件（截图或索引）前的冷却时间（秒）", ge=0)
+    upload_cooldown: float = Field(default=1.0, description="向GitHub分批提交截图时，相邻两批提交之间的冷却时间（秒）", ge=0)
     delete_cooldown: float = Field(default=1.5, description="从GitHub删除文件前的冷却时间（秒）", ge=0)
 
 class EpisodeRefresherConfig(BaseModel):
@@ -203,6 +224,22 @@ class EpisodeRefresherConfig(BaseModel):
         default=True,
         description="是否启用智能截图(分析1秒内多帧选择最清晰的一张)，会增加CPU消耗"
     )
+    screenshot_capture_mode: Literal['single_pass', 'multi_pass'] = Field(
+        default='single_pass',
+        description="截图方式: 'single_pass'-单次解码完成黑边检测与取帧, 'multi_pass'-分别执行黑边检测与截图(旧方式)"
+    )
+    screenshot_concurrency: int = Field(
+        default=3,
+        description="同时进行截图的分集数，即 ffmpeg/ffprobe 进程的并发上限",
+        ge=1,
+        le=16
+    )
+    screenshot_streams_per_server: int = Field(
+        default=2,
+        description="对同一个视频源服务器同时打开的视频流上限",
+        ge=1,
+        le=16
+    )
 
     screenshot_compression_enabled: bool = Field(default=True, description="是否启用截图后压缩")
     screenshot_compression_mode: Literal['quality', 'size'] = Field(default='quality', description="压缩模式: 'quality'-质量优先, 'size'-大小优先")
@@ -245,7 +282,7 @@ class PosterManagerConfig(BaseModel):
     global_personal_access_token: str = Field(default="", description="全局GitHub PAT")
     repository_size_threshold_mb: int = Field(default=900, description="单个仓库的容量上限阈值 (MB)")
     image_download_cooldown_seconds: float = Field(default=0.5, description="从GitHub下载图片文件前的等待时间 (秒)")
-    file_upload_cooldown_seconds: float = Field(default=1.0, description="向GitHub上传文件（图片或索引）前的等待时间 (秒)")
+    file_upload_cooldown_seconds: float = Field(default=1.0, description="向GitHub分批提交图片时，相邻两批提交之间的等待时间 (秒)")
     overwrite_remote_files: bool = Field(default=False, description="全局开关，决定备份时是否覆盖GitHub上已存在的同名文件")
     overwrite_on_restore: bool = Field(default=False, description="全局开关，决定恢复时是否覆盖Emby上已存在的图片")
     restore_mode: Literal['standard', 'from_remote'] = Field(default='standard', description="恢复模式: 'standard' - 标准模式, 'from_remote' - 从远程备份反向恢复")
@@ -288,8 +325,28 @@ class WebhookConfig(BaseModel):
     """Webhook 相关配置"""
     enabled: bool = Field(default=False, description="是否启用 Webhook 自动处理")
     url_override: str = Field(default="", description="用户自定义的 Webhook URL，如果为空，则前端会显示一个推荐值")
-    initial_wait_time: int = Field(default=30, description="收到通知后，等待 Emby 刮削的初始时间（秒）")
-    plugin_wait_time: int = Field(default=60, description="ID修复后，等待豆瓣插件下载数据的时间（秒）")
+    initial_wait_time: int = Field(default=30, description="收到通知后，等待 Emby 刮削出 TMDB 与豆瓣 ID 的最长时间（秒），两者齐全后立即继续")
+    plugin_wait_time: int = Field(default=60, description="ID修复后，等待豆瓣插件写入元数据文件的最长时间（秒），检测到后立即继续")
+    max_concurrent_items: int = Field(default=3, ge=1, le=6, description="同时处理的新入库媒体数量上限")
+
+class LibraryMirrorConfig(BaseModel):
+    """本地媒体库镜像配置"""
+    enabled: bool = Field(default=True, description="是否启用本地媒体库镜像，批量任务将优先从镜像读取数据")
+    poll_interval_seconds: int = Field(default=300, ge=60, description="增量同步的轮询间隔（秒）")
+    full_sync_interval_hours: int = Field(default=24, ge=1, description="全量同步（对账已删除条目）的间隔（小时）")
+
+class TmdbCacheConfig(BaseModel):
+    """TMDB 响应缓存配置 (内存 LRU + 本地 SQLite 两级缓存)"""
+    enabled: bool = Field(default=True, description="是否启用 TMDB 响应缓存")
+    memory_max_entries: int = Field(default=2000, ge=100, description="内存缓存的最大条目数")
+    disk_max_entries: int = Field(default=50000, ge=1000, description="磁盘缓存的最大条目数，超出后按最近访问时间淘汰")
+    ttl_person_hours: int = Field(default=720, ge=0, description="人物信息 (person/*) 的缓存时长（小时）")
+    ttl_movie_hours: int = Field(default=72, ge=0, description="电影详情 (movie/*) 的缓存时长（小时）")
+    ttl_tv_hours: int = Field(default=2, ge=0, description="剧集详情 (tv/{id}，含播出状态) 的缓存时长（小时）")
+    ttl_season_hours: int = Field(default=6, ge=0, description="剧季/分集详情 (tv/{id}/season/*) 的缓存时长（小时）")
+    ttl_images_hours: int = Field(default=168, ge=0, description="图片列表 (*/images) 的缓存时长（小时）")
+    ttl_search_hours: int = Field(default=24, ge=0, description="搜索与外部ID查找 (search/*, find/*) 的缓存时长（小时）")
+    ttl_default_hours: int = Field(default=1, ge=0, description="其他接口的缓存时长（小时）")
 
 class TelegramConfig(BaseModel):
     """Telegram 通知配置"""
@@ -413,6 +470,8 @@ class AppConfig(BaseModel):
     episode_role_sync_config: EpisodeRoleSyncConfig = Field(default_factory=EpisodeRoleSyncConfig)
     media_tagger_config: MediaTaggerConfig = Field(default_factory=MediaTaggerConfig)
     douban_metadata_refresher_config: DoubanMetadataRefresherConfig = Field(default_factory=DoubanMetadataRefresherConfig)
+    library_mirror_config: LibraryMirrorConfig = Field(default_factory=LibraryMirrorConfig)
+    tmdb_cache_config: TmdbCacheConfig = Field(default_factory=TmdbCacheConfig)
 
 class TargetScope(BaseModel):
     scope: Literal["media_type", "library", "all_libraries", "search"]
@@ -11,6 +11,7 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from log_manager import ui_logger
 from models import AppConfig
 from task_manager import TaskManager
+from emby_client import emby_client
 
 
 class MovieRenamerLogic:
@@ -23,6 +24,7 @@ class MovieRenamerLogic:
         self.api_key = self.server_config.api_key
         self.user_id = self.server_config.user_id
         self.params = {"api_key": self.api_key}
+        self.session = emby_client
 
         self._physical_library_cache: Optional[List[Dict]] = None
 
@@ -42,10 +44,10 @@ class MovieRenamerLogic:
                 folders_params = self.params
                 # 兼容 Jellyfin 的路径
                 try:
-                    folders_response = requests.get(folders_url, params=folders_params, timeout=15)
+                    folders_response = self.session.get(folders_url, params=folders_params, timeout=15)
                     if folders_response.status_code == 404:
                         folders_url = f"{self.base_url}/emby/Library/VirtualFolders/Query"
-                        folders_response = requests.get(folders_url, params=folders_params, timeout=15)
+                        folders_response = self.session.get(folders_url, params=folders_params, timeout=15)
                     folders_response.raise_for_status()
                     self._physical_library_cache = folders_response.json().get("Items", [])
                 except requests.RequestException as e:
@@ -81,10 +83,10 @@ class MovieRenamerLogic:
                 folders_url = f"{self.base_url}/Library/VirtualFolders/Query"
                 folders_params = self.params
                 try:
-                    folders_response = requests.get(folders_url, params=folders_params, timeout=15)
+                    folders_response = self.session.get(folders_url, params=folders_params, timeout=15)
                     if folders_response.status_code == 404:
                         folders_url = f"{self.base_url}/emby/Library/VirtualFolders/Query"
-                        folders_response = requests.get(folders_url, params=folders_params, timeout=15)
+                        folders_response = self.session.get(folders_url, params=folders_params, timeout=15)
                     folders_response.raise_for_status()
                     self._physical_library_cache = folders_response.json().get("Items", [])
                 except requests.RequestException as e:
@@ -108,7 +110,7 @@ class MovieRenamerLogic:
         try:
             url = f"{self.base_url}/Library/Refresh"
             params = {**self.params, "Recursive": "true"}
-            response = requests.post(url, params=params, timeout=30)
+            response = self.session.post(url, params=params, timeout=30)
             response.raise_for_status()
             ui_logger.info(f"  - [媒体库扫描] ✅ 已成功发送扫描指令。", task_category=task_cat)
         except requests.RequestException as e:
@@ -124,7 +126,7 @@ class MovieRenamerLogic:
             try:
                 url = f"{self.base_url}/Users/{self.user_id}/Items/{item_id}"
                 params = {**self.params, "Fields": "Name,Path,MediaSources"}
-                response = requests.get(url, params=params, timeout=15)
+                response = self.session.get(url, params=params, timeout=15)
                 response.raise_for_status()
                 return response.json()
             except requests.RequestException as e:
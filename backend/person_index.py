@@ -0,0 +1,385 @@
+# backend/person_index.py
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Optional, Any, List, Iterator
+
+from log_manager import ui_logger
+from models import AppConfig
+from emby_client import emby_client
+
+PERSON_INDEX_DB_FILE = os.path.join('/app/data', 'person_index.db')
+
+# 分页拉取演员时每页的数量
+PERSON_PAGE_SIZE = 5000
+# 两次增量刷新之间的最短间隔，同一时间段内的多个调用方直接复用内存索引
+INCREMENTAL_REFRESH_INTERVAL = 60
+# 增量刷新无法发现被删除的演员，超过该时长后执行一次全量重建
+FULL_REFRESH_INTERVAL = 7 * 24 * 3600
+# 增量水位线回退的秒数，用于容忍服务器与本机之间的时钟偏差
+INCREMENTAL_OVERLAP_SECONDS = 300
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS persons (
+    id TEXT PRIMARY KEY,
+    num_id INTEGER,
+    name TEXT,
+    provider_ids TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _utc_iso(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.0000000Z')
+
+
+def _compact_provider_ids(provider_ids: Optional[Dict]) -> str:
+    return json.dumps(provider_ids or {}, ensure_ascii=False, separators=(',', ':'))
+
+
+class _ByIdView:
+    """只读视图，兼容原 by_id 字典的用法: index[id] / index.get(id) / id in index"""
+    def __init__(self, owner: "PersonIndex"):
+        self._owner = owner
+
+    def get(self, person_id: str, default=None) -> Optional[Dict[str, Any]]:
+        info = self._owner.get_person(person_id)
+        return default if info is None else info
+
+    def __getitem__(self, person_id: str) -> Dict[str, Any]:
+        info = self._owner.get_person(person_id)
+        if info is None:
+            raise KeyError(person_id)
+        return info
+
+    def __contains__(self, person_id) -> bool:
+        return self._owner.get_person(person_id) is not None
+
+    def __len__(self) -> int:
+        return self._owner.size()
+
+
+class _NameCountView:
+    """重名计数只读视图，兼容原 name_count 字典的读取；计数由索引数据派生，改名请调用 PersonIndex.apply_rename"""
+    def __init__(self, owner: "PersonIndex"):
+        self._owner = owner
+
+    def get(self, name: str, default: int = 0) -> int:
+        with self._owner._lock:
+            return self._owner._name_count.get(name, default)
+
+    def __getitem__(self, name: str) -> int:
+        with self._owner._lock:
+            return self._owner._name_count[name]
+
+    def __setitem__(self, name: str, count: int):
+        raise TypeError("name_count 为只读视图，改名后请调用 person_index.apply_rename 同步索引")
+
+    def __contains__(self, name) -> bool:
+        with self._owner._lock:
+            return name in self._owner._name_count
+
+    def __len__(self) -> int:
+        with self._owner._lock:
+            return len(self._owner._name_count)
+
+
+class PersonIndex:
+    """
+    进程级共享的 Emby 演员索引，取代每次都一次性拉取全库 Person 的做法。
+    - 首次构建分页拉取并写入 SQLite，重启后直接从磁盘加载。
+    - 之后按 DateLastSaved 增量刷新，只拉取变更过的演员；定期全量重建以清除已删除的演员。
+    - 内存中使用紧凑结构：数字 ID 存放在有序 array 中二分查找，姓名统一 intern，
+      ProviderIds 保存为紧凑 JSON 字符串，按需解析。
+    """
+    def __init__(self, db_path: str = PERSON_INDEX_DB_FILE):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._server: Optional[str] = None
+        self._last_refresh = 0.0
+        # 全量重建期间的改名暂存于此，重建提交后再写入数据库，避免提交半成品表
+        self._rebuilding = False
+        self._pending_renames: List[tuple] = []
+        self._reset_memory()
+
+    def _reset_memory(self):
+        self._num_ids = array('q')
+        self._names: List[Optional[str]] = []
+        self._providers: List[str] = []
+        # 非数字 ID (非 Emby 服务器) 的演员单独存放
+        self._other: Dict[str, tuple] = {}
+        self._name_count: Dict[str, int] = {}
+
+    # --- 存储 ---
+
+    def _open_conn(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        conn.commit()
+        return conn
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = self._open_conn()
+        return self._conn
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._get_conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, conn: sqlite3.Connection, key: str, value: str):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _load_from_disk(self) -> int:
+        self._reset_memory()
+        rows = self._get_conn().execute("SELECT id, num_id, name, provider_ids FROM persons ORDER BY num_id")
+        for person_id, num_id, name, provider_ids in rows:
+            name = sys.intern(name) if name else None
+            if num_id is not None:
+                self._num_ids.append(num_id)
+                self._names.append(name)
+                self._providers.append(provider_ids)
+            else:
+                self._other[person_id] = (name, provider_ids)
+            if name:
+                self._name_count[name] = self._name_count.get(name, 0) + 1
+        return self.size()
+
+    # --- 内存索引 ---
+
+    def _position(self, num_id: int) -> int:
+        pos = bisect_left(self._num_ids, num_id)
+        return pos if pos < len(self._num_ids) and self._num_ids[pos] == num_id else -1
+
+    def _upsert_memory(self, person_id: str, name: Optional[str], provider_ids: str):
+        name = sys.intern(name) if name else None
+        existed, old_name = False, None
+        if person_id.isdigit():
+            num_id = int(person_id)
+            pos = bisect_left(self._num_ids, num_id)
+            if pos < len(self._num_ids) and self._num_ids[pos] == num_id:
+                existed, old_name = True, self._names[pos]
+                self._names[pos] = name
+                self._providers[pos] = provider_ids
+            else:
+                self._num_ids.insert(pos, num_id)
+                self._names.insert(pos, name)
+                self._providers.insert(pos, provider_ids)
+        else:
+            previous = self._other.get(person_id)
+            if previous is not None:
+                existed, old_name = True, previous[0]
+            self._other[person_id] = (name, provider_ids)
+
+        if existed and old_name == name:
+            return
+        if old_name:
+            remaining = self._name_count.get(old_name, 1) - 1
+            if remaining > 0:
+                self._name_count[old_name] = remaining
+            else:
+                self._name_count.pop(old_name, None)
+        if name:
+            self._name_count[name] = self._name_count.get(name, 0) + 1
+
+    def get_person(self, person_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if isinstance(person_id, str) and person_id.isdigit():
+                pos = self._position(int(person_id))
+                if pos < 0:
+                    return None
+                name, provider_ids = self._names[pos], self._providers[pos]
+            else:
+                entry = self._other.get(person_id)
+                if entry is None:
+                    return None
+                name, provider_ids = entry
+        return {"Name": name, "ProviderIds": json.loads(provider_ids)}
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._num_ids) + len(self._other)
+
+    def apply_rename(self, person_id: str, old_name: Optional[str], new_name: str):
+        """
+        在服务器上改名成功后同步索引：在同一把锁内更新姓名与重名计数并落盘。
+        之后的增量刷新拉到同一个新名字时不会重复调整计数；索引中没有该演员时忽略。
+        """
+        with self._lock:
+            if person_id.isdigit():
+                pos = self._position(int(person_id))
+                if pos < 0:
+                    return
+                provider_ids = self._providers[pos]
+            else:
+                entry = self._other.get(person_id)
+                if entry is None:
+                    return
+                provider_ids = entry[1]
+            self._upsert_memory(person_id, new_name, provider_ids)
+            if self._rebuilding:
+                self._pending_renames.append((new_name, person_id))
+                return
+            try:
+                conn = self._get_conn()
+                conn.execute("UPDATE persons SET name = ? WHERE id = ?", (new_name, person_id))
+                conn.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"【演员索引】写入改名 {old_name} -> {new_name} (ID: {person_id}) 失败: {e}")
+
+    def _flush_pending_renames(self):
+        """将全量重建期间暂存的改名写入数据库并同步到重新加载的内存索引 (需持有锁)"""
+        renames, self._pending_renames = self._pending_renames, []
+        if not renames:
+            return
+        try:
+            conn = self._get_conn()
+            conn.executemany("UPDATE persons SET name = ? WHERE id = ?", renames)
+            conn.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"【演员索引】写入全量重建期间的 {len(renames)} 个改名失败: {e}")
+
+    # --- 同步 ---
+
+    def _iter_person_pages(self, app_config: AppConfig, min_date_last_saved: Optional[str] = None) -> Iterator[List[Dict]]:
+        server = app_config.server_config
+        url = f"{server.server}/Items"
+        start_index = 0
+        while True:
+            params = {
+                "api_key": server.api_key,
+                "Recursive": "true",
+                "IncludeItemTypes": "Person",
+                "Fields": "ProviderIds",
+                "StartIndex": start_index,
+                "Limit": PERSON_PAGE_SIZE,
+            }
+            if min_date_last_saved:
+                params["MinDateLastSaved"] = min_date_last_saved
+            response = emby_client.get(url, params=params, timeout=120)
+            response.raise_for_status()
+            page = response.json().get("Items", [])
+            if not page:
+                return
+            yield page
+            if len(page) < PERSON_PAGE_SIZE:
+                return
+            start_index += len(page)
+
+    def _store_page(self, conn: sqlite3.Connection, page: List[Dict]):
+        rows = []
+        for item in page:
+            person_id = item.get("Id")
+            if not person_id:
+                continue
+            provider_ids = _compact_provider_ids(item.get("ProviderIds"))
+            rows.append((person_id, int(person_id) if person_id.isdigit() else None, item.get("Name"), provider_ids))
+        conn.executemany("INSERT OR REPLACE INTO persons (id, num_id, name, provider_ids) VALUES (?, ?, ?, ?)", rows)
+        return rows
+
+    def _full_refresh(self, app_config: AppConfig):
+        task_cat = "演员角色映射-索引"
+        ui_logger.info("➡️ [索引构建] 正在分页拉取全库演员数据，建立本地演员索引 (仅首次或定期校验时执行)...", task_category=task_cat)
+        start_time = time.time()
+        started_at = datetime.now(timezone.utc)
+        # 重建使用独立连接，在同一个事务中整体替换；拉取期间内存索引保持可用，
+        # 其他线程的改名只更新内存并暂存，不会在共享连接上提交这个未完成的事务
+        with self._lock:
+            self._rebuilding = True
+        conn = self._open_conn()
+        try:
+            conn.execute("DELETE FROM persons")
+            for page in self._iter_person_pages(app_config):
+                self._store_page(conn, page)
+            self._set_meta(conn, "server", app_config.server_config.server)
+            self._set_meta(conn, "watermark", _utc_iso(started_at - timedelta(seconds=INCREMENTAL_OVERLAP_SECONDS)))
+            self._set_meta(conn, "last_full_refresh", str(time.time()))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            with self._lock:
+                self._rebuilding = False
+                self._flush_pending_renames()
+            raise
+        finally:
+            conn.close()
+        with self._lock:
+            self._rebuilding = False
+            self._flush_pending_renames()
+            count = self._load_from_disk()
+        ui_logger.info(f"✅ [索引构建] 完成！耗时 {time.time() - start_time:.2f} 秒，共索引 {count} 位演员。", task_category=task_cat)
+
+    def _incremental_refresh(self, app_config: AppConfig):
+        started_at = datetime.now(timezone.utc)
+        watermark = self._get_meta("watermark")
+        conn = self._get_conn()
+        updated = 0
+        for page in self._iter_person_pages(app_config, min_date_last_saved=watermark):
+            with self._lock:
+                for person_id, _, name, provider_ids in self._store_page(conn, page):
+                    self._upsert_memory(person_id, name, provider_ids)
+                conn.commit()
+            updated += len(page)
+        with self._lock:
+            self._set_meta(conn, "watermark", _utc_iso(started_at - timedelta(seconds=INCREMENTAL_OVERLAP_SECONDS)))
+            conn.commit()
+        if updated:
+            logging.info(f"【演员索引】增量刷新了 {updated} 位演员。")
+
+    def refresh(self, app_config: AppConfig, force_full: bool = False):
+        """按需刷新：首次使用或服务器变更时全量构建，其余情况下做增量刷新"""
+        # 已有索引时不等待其他线程正在进行的刷新，直接使用现有数据
+        if not self._refresh_lock.acquire(blocking=self.size() == 0):
+            return
+        try:
+            server = app_config.server_config.server
+            if self._server != server:
+                with self._lock:
+                    if self._get_meta("server") == server:
+                        self._load_from_disk()
+                    else:
+                        self._reset_memory()
+                    self._server = server
+                    self._last_refresh = 0.0
+
+            last_full = float(self._get_meta("last_full_refresh") or 0)
+            if force_full or self.size() == 0 or time.time() - last_full >= FULL_REFRESH_INTERVAL:
+                self._full_refresh(app_config)
+            elif time.time() - self._last_refresh >= INCREMENTAL_REFRESH_INTERVAL:
+                self._incremental_refresh(app_config)
+            self._last_refresh = time.time()
+        finally:
+            self._refresh_lock.release()
+
+    def get_index(self, app_config: AppConfig) -> Dict[str, Any]:
+        """
+        返回与原全量拉取结果兼容的结构 {"by_id": ..., "name_count": ...}。
+        刷新失败时沿用已有的索引；完全没有索引时返回空字典，调用方会回退到逐个查询。
+        """
+        try:
+            self.refresh(app_config)
+        except Exception as e:
+            ui_logger.error(f"❌ [索引构建] 刷新演员索引失败: {e}", task_category="演员角色映射-索引")
+            if self.size() == 0:
+                return {}
+        return {"by_id": _ByIdView(self), "name_count": _NameCountView(self)}
+
+
+person_index = PersonIndex()
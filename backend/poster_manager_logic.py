@@ -7,7 +7,6 @@ import threading
 import time
 import re
 import base64
-import subprocess
 from typing import List, Dict, Any, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor
 from filelock import FileLock, Timeout
@@ -18,6 +17,11 @@ from models import AppConfig, PosterManagerConfig, ScheduledTasksTargetScope
 from task_manager import TaskManager
 from media_selector import MediaSelector
 from proxy_manager import ProxyManager
+from emby_client import emby_client
+from github_client import github_client
+from blob_hash_cache import blob_hash_cache
+from id_map_service import id_map_service
+from github_committer import GitDataCommitter
 import config as app_config_module
 
 
@@ -29,24 +33,8 @@ class PosterManagerLogic:
         self.config = config
         self.pm_config = config.poster_manager_config
         self.proxy_manager = ProxyManager(config)
-        self.session = self._create_session()
+        self.session = emby_client
 
-    def _create_session(self):
-        import requests
-        from requests.adapters import HTTPAdapter
-        from urllib3.util.retry import Retry
-        
-        session = requests.Session()
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("https://", adapter)
-        session.mount("http://", adapter)
-        return session
-    
     def _get_emby_item_details(self, item_id: str, fields: str) -> Dict:
         """从 Emby 获取媒体项的详细信息"""
         import requests
@@ -69,22 +57,24 @@ class PosterManagerLogic:
         try:
             # --- 核心修改：调用我们已修改的详情函数，同时获取 ProviderIds 和 Type ---
             details = self._get_emby_item_details(item_id, "ProviderIds,Type")
-            
-            provider_ids = details.get("ProviderIds", {})
-            provider_ids_lower = {k.lower(): v for k, v in provider_ids.items()}
-            tmdb_id = provider_ids_lower.get("tmdb")
-            item_type = details.get("Type") # "Movie" or "Series"
-
-            if tmdb_id and item_type:
-                prefix = 'tv' if item_type == 'Series' else 'movie'
-                return f"{prefix}-{tmdb_id}"
-            # --- 修改结束 ---
-            
-            return None
+            return self._build_tmdb_key(details)
         except Exception as e:
             logging.error(f"【海报备份】获取媒体项 {item_id} 的 TMDB ID 失败: {e}")
             return None
 
+    @staticmethod
+    def _build_tmdb_key(details: Dict) -> Optional[str]:
+        """根据媒体详情中的 ProviderIds 和 Type 构建带类型前缀的复合键"""
+        provider_ids = details.get("ProviderIds", {})
+        provider_ids_lower = {k.lower(): v for k, v in provider_ids.items()}
+        tmdb_id = provider_ids_lower.get("tmdb")
+        item_type = details.get("Type") # "Movie" or "Series"
+
+        if tmdb_id and item_type:
+            prefix = 'tv' if item_type == 'Series' else 'movie'
+            return f"{prefix}-{tmdb_id}"
+        return None
+
 
 
     def _scan_local_cache(self, media_ids: List[str], content_types: List[str], task_cat: str) -> List[Dict]:
@@ -106,16 +96,12 @@ class PosterManagerLogic:
         # --- 新增 1: 用于统计去重数量的计数器 ---
         duplicate_count = 0
 
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_id = {executor.submit(self._get_tmdb_id, item_id): item_id for item_id in media_ids}
-            for future in future_to_id:
-                item_id = future_to_id[future]
-                try:
-                    tmdb_key = future.result()
-                    if tmdb_key:
-                        tmdb_id_map[item_id] = tmdb_key
-                except Exception as e:
-                    logging.error(f"【海报备份】获取 TMDB ID 时出错 (Emby ID: {item_id}): {e}")
+        selector = MediaSelector(self.config)
+        for details_page in selector.iter_item_details_batch(media_ids, "ProviderIds,Type"):
+            for details in details_page:
+                tmdb_key = self._build_tmdb_key(details)
+                if tmdb_key:
+                    tmdb_id_map[details.get("Id")] = tmdb_key
 
         for item_id in media_ids:
             tmdb_key = tmdb_id_map.get(item_id)
@@ -177,7 +163,7 @@ class PosterManagerLogic:
         
         try:
             proxies = self.proxy_manager.get_proxies(api_url)
-            response = self.session.get(api_url, headers=headers, timeout=30, proxies=proxies)
+            response = github_client.get(api_url, headers=headers, timeout=30, proxies=proxies)
             if response.status_code == 404:
                 return {"version": 1, "last_updated": "", "images": {}} # 仓库是新的，返回空索引
             response.raise_for_status()
@@ -294,6 +280,15 @@ class PosterManagerLogic:
         overwrite_files = []
 
         skipped_count = 0
+        unchanged_count = 0
+
+        # 覆盖模式下预先计算已存在于远程的文件的 blob SHA (有缓存时无需读取文件)
+        local_shas = {}
+        if overwrite:
+            local_shas = blob_hash_cache.get_many(
+                item['local_path'] for item in initial_list
+                if f"{item['tmdb_id']}-{item['image_type']}" in remote_map
+            )
         
         for item in initial_list:
             key = f"{item['tmdb_id']}-{item['image_type']}"
@@ -302,6 +297,11 @@ class PosterManagerLogic:
             if not remote_info:
                 new_files.append(item)
             elif overwrite:
+                local_sha = local_shas.get(item['local_path'])
+                if local_sha and local_sha == remote_info.get('sha'):
+                    # 内容与远程完全一致，覆盖没有意义
+                    unchanged_count += 1
+                    continue
                 item['remote_info'] = remote_info
                 overwrite_files.append(item)
             else:
@@ -309,7 +309,10 @@ class PosterManagerLogic:
                 skipped_count += 1
         
 
-        ui_logger.info(f"✅ [阶段2] 分类完成。新增: {len(new_files)} 项, 覆盖: {len(overwrite_files)} 项, 跳过: {skipped_count} 项。", task_category=task_cat)
+        log_message = f"✅ [阶段2] 分类完成。新增: {len(new_files)} 项, 覆盖: {len(overwrite_files)} 项, 跳过: {skipped_count} 项。"
+        if unchanged_count > 0:
+            log_message += f" (另有 {unchanged_count} 项与远程内容一致，无需覆盖)"
+        ui_logger.info(log_message, task_category=task_cat)
         return new_files, overwrite_files
 
 
@@ -398,71 +401,9 @@ class PosterManagerLogic:
         ui_logger.info("✅ [阶段3] 文件分发计划制定成功。", task_category=task_cat)
         return dispatch_plan
 
-    def _execute_github_write_request(self, method: str, url: str, pat: str, payload: Optional[Dict] = None) -> Dict:
-        """通过 curl 执行 GitHub 写入操作（无重试）"""
-        command = [
-            'curl', '-L', '-X', method,
-            '-H', 'Accept: application/vnd.github.v3+json',
-            '-H', f'Authorization: token {pat}',
-            '-H', 'Content-Type: application/json'
-        ]
-        
-        json_payload_str = ""
-        if payload:
-            command.extend(['--data-binary', '@-'])
-            json_payload_str = json.dumps(payload)
-
-        proxies = self.proxy_manager.get_proxies(url)
-        if proxies.get('https'):
-            command.extend(['--proxy', proxies['https']])
-
-        command.append(url)
-
-        result = subprocess.run(command, input=json_payload_str, capture_output=True, text=True, check=False)
-        
-        response_data = {}
-        try:
-            if result.stdout:
-                response_data = json.loads(result.stdout)
-        except json.JSONDecodeError:
-
-            raise Exception(f"cURL 返回了非JSON响应: {result.stdout or '无输出'} | 错误: {result.stderr or '无错误信息'}")
-
-        if result.returncode != 0 or (response_data.get("message") and response_data.get("documentation_url")):
-            error_message = response_data.get('message', f"cURL 错误: {result.stderr}")
-            if response_data.get('status') == '422' and "sha" in error_message:
-                error_message = f"无效请求 (422)。服务器提示 'sha' 参数有问题。这可能是因为在您操作期间，文件被其他进程修改。请重试。({error_message})"
-            elif "409 Conflict" in result.stderr:
-                error_message = "GitHub API 返回 409 Conflict 错误，这通常是并发写入冲突导致的。请稍后重试。"
-
-            elif "schannel: failed to receive handshake" in result.stderr or "curl: (35)" in result.stderr:
-                error_message = f"SSL/TLS 握手失败。这通常是临时的网络或代理问题。错误: {result.stderr}"
-
-            raise Exception(f"GitHub API 错误: {error_message}")
-
-        return response_data
-    
-    def _execute_github_write_request_with_retry(self, method: str, url: str, pat: str, payload: Optional[Dict] = None, task_cat: str = "GitHub写入") -> Dict:
-        """
-        执行 GitHub 写入操作，并增加了针对网络错误的重试逻辑。
-        """
-        max_retries = 3
-        retry_delay = 5  # seconds
-        for attempt in range(max_retries):
-            try:
-                return self._execute_github_write_request(method, url, pat, payload)
-            except Exception as e:
-
-                error_str = str(e).lower()
-                if "ssl/tls" in error_str or "handshake" in error_str or "curl: (35)" in error_str:
-                    if attempt < max_retries - 1:
-                        ui_logger.warning(f"  - ⚠️ 网络操作失败 (尝试 {attempt + 1}/{max_retries})，将在 {retry_delay} 秒后重试... 原因: {e}", task_category=task_cat)
-                        time.sleep(retry_delay)
-                        continue
-
-                raise e
-
-        raise Exception("重试逻辑执行完毕但未能成功。")
+    def _execute_github_write_request(self, method: str, url: str, pat: str, payload: Optional[Dict] = None, content_path: Optional[str] = None) -> Dict:
+        """通过共享的 GitHub 客户端执行写入操作 (连接复用，重试与限速等待由客户端统一处理)"""
+        return github_client.write(method, url, pat, payload, proxies=self.proxy_manager.get_proxies(url), content_path=content_path)
 
 
     def _get_latest_repo_size(self, repo_url: str, pat: str) -> int:
@@ -475,7 +416,7 @@ class PosterManagerLogic:
             headers["Authorization"] = f"token {pat}"
         
         proxies = self.proxy_manager.get_proxies(api_url)
-        response = self.session.get(api_url, headers=headers, timeout=30, proxies=proxies)
+        response = github_client.get(api_url, headers=headers, timeout=30, proxies=proxies)
         response.raise_for_status()
         return response.json().get('size', 0)
 
@@ -498,133 +439,40 @@ class PosterManagerLogic:
 
             ui_logger.info(f"  - 正在处理仓库: {repo_url}", task_category=task_cat)
             pat = repo_config.personal_access_token or self.pm_config.global_personal_access_token
-            branch = repo_config.branch
-            match = re.match(r"https?://github\.com/([^/]+)/([^/]+)", repo_url)
-            owner, repo_name = match.groups()
+            committer = GitDataCommitter(repo_url, pat, repo_config.branch, proxy_manager=self.proxy_manager)
 
+            files_to_process = plan['overwrite'] + plan['new']
+            for item in files_to_process:
+                item['path'] = f"images/{item['tmdb_id']}/{os.path.basename(item['local_path'])}"
 
-            try:
-
-                lock_path = ".lock"
-                lock_api_url = f"https://api.github.com/repos/{owner}/{repo_name}/contents/{lock_path}"
-                lock_payload = {
-                    "message": f"feat: Acquire lock for task",
-                    "content": base64.b64encode(f"locked_at: {datetime.now().isoformat()}".encode()).decode(),
-                    "branch": branch
-                }
-                self._execute_github_write_request_with_retry("PUT", lock_api_url, pat, lock_payload, task_cat=task_cat)
-                ui_logger.info(f"    - 🔒 已成功在仓库 {repo_url} 中创建 .lock 文件。", task_category=task_cat)
-            
-            except Exception as e:
-                if "422" in str(e) or "Unprocessable Entity" in str(e):
-                    error_message = (
-                        f"❌ 无法锁定仓库 {repo_url}，任务中止！\n"
-                        f"    - **可能原因**: 上一次备份任务异常中断，导致 .lock 文件未能被自动删除。\n"
-                        f"    - **修复建议**: 请手动前往该 GitHub 仓库，检查并删除根目录下的 `.lock` 文件后，再重新运行备份任务。\n"
-                        f"    - **补充说明**: 如果您确认没有其他任务正在运行，删除 .lock 文件是安全的操作。重新运行一次完整的备份任务可以修复任何潜在的索引不一致问题。"
-                    )
-                    ui_logger.error(error_message, task_category=task_cat)
-
-                    raise Exception(f"获取仓库 {repo_url} 的锁失败。")
-                else:
-
-                    raise e
-
-
-            try:
-
-                current_index = self._get_repo_index(repo_config.model_dump())
-                if current_index is None:
-                    raise Exception("获取最新索引失败，无法继续。")
-
-
-                files_to_process = plan['overwrite'] + plan['new']
-                for item in files_to_process:
-                    if cancellation_event.is_set(): raise InterruptedError("任务被取消")
-                    
-                    action_type = '新增'
-                    
-                    cooldown = self.pm_config.file_upload_cooldown_seconds
-                    if cooldown > 0:
-                        ui_logger.info(f"    - ⏱️ 文件上传冷却 {cooldown} 秒...", task_category=task_cat)
-                        time.sleep(cooldown)
-                    
-                    with open(item['local_path'], 'rb') as f:
-                        content_b64 = base64.b64encode(f.read()).decode()
-                    
-                    github_path = f"images/{item['tmdb_id']}/{os.path.basename(item['local_path'])}"
-                    api_url = f"https://api.github.com/repos/{owner}/{repo_name}/contents/{github_path}"
-                    
-                    payload = {
-                        "message": f"feat: Add/Update {item['image_type']} for {item['tmdb_id']}",
-                        "content": content_b64,
-                        "branch": branch
-                    }
-
-                    is_overwrite = 'remote_info' in item
-                    if is_overwrite:
-                        payload['sha'] = item['remote_info']['sha']
-                        action_type = '覆盖'
-
-                    try:
-                        response_data = self._execute_github_write_request_with_retry("PUT", api_url, pat, payload, task_cat=task_cat)
-                    except Exception as e:
-                        if "422" in str(e) and not is_overwrite:
-                            ui_logger.info(f"    - 🔄 文件 {github_path} 已存在，触发“新增转覆盖”容错机制...", task_category=task_cat)
-                            action_type = '覆盖'
-                            get_resp = self.session.get(api_url, headers={"Authorization": f"token {pat}"}, proxies=self.proxy_manager.get_proxies(api_url)).json()
-                            payload['sha'] = get_resp['sha']
-                            response_data = self._execute_github_write_request_with_retry("PUT", api_url, pat, payload, task_cat=task_cat)
-                        else:
-                            raise e
-                    
-                    if action_type == '覆盖':
-                        ui_logger.info(f"    - ✅ 覆盖上传成功: {github_path}", task_category=task_cat)
-                    else:
-                        ui_logger.info(f"    - ⬆️ 新增上传成功: {github_path}", task_category=task_cat)
-
-
-                    tmdb_id_str = str(item['tmdb_id'])
-                    if tmdb_id_str not in current_index['images']:
-                        current_index['images'][tmdb_id_str] = {}
-                    
-                    current_index['images'][tmdb_id_str][item['image_type']] = {
+            def merge_index(current_index: Optional[Dict], batch: List[Dict], repo_url=repo_url) -> Dict:
+                index = current_index or {"version": 1, "last_updated": "", "images": {}}
+                index.setdefault('images', {})
+                for item in batch:
+                    index['images'].setdefault(str(item['tmdb_id']), {})[item['image_type']] = {
                         "repo_url": repo_url,
-                        "sha": response_data['content']['sha'],
-                        "size": response_data['content']['size'],
-                        "url": response_data['content']['download_url']
+                        "sha": item['blob_sha'],
+                        "size": item['size'],
+                        "url": item['download_url']
                     }
+                index['last_updated'] = datetime.now().isoformat()
+                return index
+
+            def log_progress(done: int, total: int):
+                ui_logger.info(f"    - ⬆️ 已提交 {done}/{total} 个文件 (图片与索引 database.json 在同一提交中更新)。", task_category=task_cat)
+
+            # 每批文件与索引组成一个提交，通过一次引用更新原子写入，无需再借助 .lock 文件互斥
+            committed = committer.commit_in_batches(
+                files_to_process, "feat: Add/Update poster backups",
+                index_path="database.json", update_index=merge_index,
+                cooldown=self.pm_config.file_upload_cooldown_seconds,
+                cancellation_event=cancellation_event, progress_callback=log_progress
+            )
+            logging.info(f"【海报备份】仓库 {repo_url} 提交 {len(committed)} 个文件共发出 {committer.request_count} 次 API 请求。")
 
-
-                current_index['last_updated'] = datetime.now().isoformat()
-                index_api_url = f"https://api.github.com/repos/{owner}/{repo_name}/contents/database.json"
-                
-                get_index_resp = self.session.get(index_api_url, headers={"Authorization": f"token {pat}"}, proxies=self.proxy_manager.get_proxies(index_api_url)).json()
-                index_sha = get_index_resp.get('sha')
-
-                index_payload = {
-                    "message": f"chore: Update database index",
-                    "content": base64.b64encode(json.dumps(current_index, indent=2).encode()).decode(),
-                    "branch": branch
-                }
-                if index_sha:
-                    index_payload['sha'] = index_sha
-                
-                self._execute_github_write_request_with_retry("PUT", index_api_url, pat, index_payload, task_cat=task_cat)
-                ui_logger.info(f"    - 索引文件 database.json 更新成功。", task_category=task_cat)
-
-            finally:
-
-                lock_get_resp = self.session.get(lock_api_url, headers={"Authorization": f"token {pat}"}, proxies=self.proxy_manager.get_proxies(lock_api_url)).json()
-                lock_sha = lock_get_resp.get('sha')
-                if lock_sha:
-                    delete_payload = {
-                        "message": "feat: Release lock",
-                        "sha": lock_sha,
-                        "branch": branch
-                    }
-                    self._execute_github_write_request_with_retry("DELETE", lock_api_url, pat, delete_payload, task_cat=task_cat)
-                    ui_logger.info(f"    - 🔓 已成功从仓库 {repo_url} 中移除 .lock 文件。", task_category=task_cat)
+            if len(committed) < len(files_to_process):
+                ui_logger.warning("⚠️ 任务在执行阶段被取消，已提交的批次保持完整。", task_category=task_cat)
+                return
 
         ui_logger.info("✅ [阶段4] 所有文件上传和索引更新完成。", task_category=task_cat)
 
@@ -701,11 +549,8 @@ class PosterManagerLogic:
             if not remote_map:
                 raise ValueError("无法获取远程聚合索引，任务中止。")
 
-            id_map_file = os.path.join('/app/data', 'id_map.json')
-            if not os.path.exists(id_map_file):
+            if not id_map_service.has_data():
                 raise ValueError("ID映射表 (id_map.json) 不存在，无法进行反向恢复。请先在“定时任务”页面生成映射表。")
-            with open(id_map_file, 'r', encoding='utf-8') as f:
-                id_map = json.load(f)
 
             # --- 核心修改：整个匹配逻辑重构 ---
             # 阶段二：根据远程备份，构建初始的 Emby 媒体检查列表
@@ -720,8 +565,7 @@ class PosterManagerLogic:
             # 2. 使用这些复合键直接在 id_map 中查找对应的 Emby ID
             initial_emby_ids_to_check = set()
             for tmdb_key in target_tmdb_keys:
-                if tmdb_key in id_map:
-                    initial_emby_ids_to_check.update(id_map[tmdb_key])
+                initial_emby_ids_to_check.update(id_map_service.lookup(tmdb_key))
             
             if not initial_emby_ids_to_check:
                 ui_logger.info("✅ 远程备份中的所有媒体在您的 Emby 库中均未找到，任务完成。", task_category=task_cat)
@@ -863,7 +707,7 @@ class PosterManagerLogic:
             
             ui_logger.debug(f"     - 正在下载: {image_url}", task_category=task_cat)
             proxies = self.proxy_manager.get_proxies(image_url)
-            image_response = self.session.get(image_url, timeout=60, proxies=proxies)
+            image_response = github_client.get(image_url, timeout=60, proxies=proxies)
             image_response.raise_for_status()
             image_data = image_response.content
             
@@ -944,7 +788,6 @@ class PosterManagerLogic:
         恢复任务的入口函数，根据配置分发到不同的执行流程。
         """
         if self.pm_config.restore_mode == 'from_remote':
-            from concurrent.futures import as_completed
             self.start_restore_from_remote_task(scope, content_types, cancellation_event, task_id, task_manager)
             return
     
@@ -1513,15 +1356,14 @@ class PosterManagerLogic:
         
         index['last_updated'] = datetime.now().isoformat()
         index_api_url = f"https://api.github.com/repos/{owner}/{repo_name}/contents/database.json"
-        get_index_resp = self.session.get(index_api_url, headers={"Authorization": f"token {pat}"}, proxies=self.proxy_manager.get_proxies(index_api_url)).json()
+        get_index_resp = github_client.get(index_api_url, headers={"Authorization": f"token {pat}"}, proxies=self.proxy_manager.get_proxies(index_api_url)).json()
         index_sha = get_index_resp.get('sha')
         index_payload = {
             "message": "chore: Update index after deletion",
-            "content": base64.b64encode(json.dumps(index, indent=2).encode()).decode(),
             "branch": branch,
             "sha": index_sha
         }
-        self._execute_github_write_request("PUT", index_api_url, pat, index_payload)
+        github_client.write("PUT", index_api_url, pat, index_payload, proxies=self.proxy_manager.get_proxies(index_api_url), content=json.dumps(index, indent=2).encode())
         ui_logger.info(f"  - ✅ 索引文件 database.json 更新成功。", task_category=task_cat)
 
 
@@ -7,7 +7,7 @@ from typing import List, Dict
 from log_manager import ui_logger
 from models import AppConfig, PosterManagerConfig, ScheduledTasksTargetScope
 from poster_manager_logic import PosterManagerLogic
-from task_manager import task_manager
+from task_manager import task_manager, RESOURCE_GITHUB_WRITE, ResourceBusyError
 import config as app_config
 
 router = APIRouter()
@@ -66,7 +66,8 @@ def start_backup(req: BackupRequest = Body(...)):
         task_name,
         scope=req.scope,
         content_types=req.content_types,
-        overwrite=req.overwrite
+        overwrite=req.overwrite,
+        resources=[RESOURCE_GITHUB_WRITE]
     )
     return {"status": "success", "message": "海报备份任务已启动。", "task_id": task_id}
 
@@ -136,8 +137,12 @@ def backup_single_image(req: SingleImageRequest):
     """备份单张图片"""
     try:
         logic = get_logic()
-        logic.backup_single_image(req.item_id, req.image_type)
+        # 同步写入 GitHub，与备份等任务共用写入并发限制；有任务占用时短暂等待后返回 409
+        with task_manager.hold_resources([RESOURCE_GITHUB_WRITE]):
+            logic.backup_single_image(req.item_id, req.image_type)
         return {"status": "success", "message": "单体备份成功！"}
+    except ResourceBusyError:
+        raise HTTPException(status_code=409, detail="有备份任务正在写入 GitHub，请稍后再试。")
     except Exception as e:
         ui_logger.error(f"单体备份失败 (ID: {req.item_id}, 类型: {req.image_type}): {e}", task_category="API-海报管理")
         raise HTTPException(status_code=500, detail=str(e))
@@ -147,8 +152,11 @@ def delete_single_image(req: SingleImageRequest):
     """删除单张备份图片"""
     try:
         logic = get_logic()
-        logic.delete_single_image(req.item_id, req.image_type)
+        with task_manager.hold_resources([RESOURCE_GITHUB_WRITE]):
+            logic.delete_single_image(req.item_id, req.image_type)
         return {"status": "success", "message": "单体删除成功！"}
+    except ResourceBusyError:
+        raise HTTPException(status_code=409, detail="有备份任务正在写入 GitHub，请稍后再试。")
     except Exception as e:
         ui_logger.error(f"单体删除失败 (ID: {req.item_id}, 类型: {req.image_type}): {e}", task_category="API-海报管理")
         raise HTTPException(status_code=500, detail=str(e))
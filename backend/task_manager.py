@@ -6,8 +6,9 @@ import threading
 import logging
 import queue
 import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Callable, Any, Optional
+from typing import Dict, List, Callable, Any, Optional, Iterable
 from fastapi import WebSocket
 from pydantic import BaseModel
 
@@ -20,6 +21,28 @@ class TaskInfo(BaseModel):
     total: int = 0
     result: Optional[Any] = None
 
+# 任务状态推送的最短间隔 (秒)，间隔内的多次更新会被合并为一帧
+BROADCAST_INTERVAL = 0.25
+
+# 同时运行的任务数上限，超出的任务进入队列等待
+MAX_WORKERS = 6
+# 任务优先级，数值越小越先执行: Webhook > 手动 > 定时
+PRIORITY_WEBHOOK = 0
+PRIORITY_MANUAL = 1
+PRIORITY_SCHEDULED = 2
+# 按资源限制并发，任务通过 resources 声明占用的资源
+RESOURCE_GITHUB_WRITE = "github_write"
+RESOURCE_LIMITS: Dict[str, int] = {
+    RESOURCE_GITHUB_WRITE: 1,
+}
+# 同步接口等待受限资源的最长时间 (秒)，超时后直接提示稍后重试
+RESOURCE_WAIT_TIMEOUT = 5.0
+# 已结束的任务在列表中保留的时间 (秒)
+FINISHED_TASK_TTL = 10.0
+
+class ResourceBusyError(Exception):
+    """受限资源被其他任务占用且等待超时"""
+
 class TaskBroadcaster:
     def __init__(self):
         self.connections: List[WebSocket] = []
@@ -32,9 +55,13 @@ class TaskBroadcaster:
         if websocket in self.connections:
             self.connections.remove(websocket)
 
-    async def broadcast(self, data: List[Dict]):
-        for connection in self.connections:
-            await connection.send_json(data)
+    async def broadcast(self, data: Dict[str, Any]):
+        for connection in list(self.connections):
+            try:
+                await connection.send_json(data)
+            except Exception as e:
+                logging.debug(f"任务广播发送失败，已移除该连接: {e}")
+                self.disconnect(connection)
 
 class TaskManager:
     _instance = None
@@ -53,22 +80,87 @@ class TaskManager:
             self.broadcaster = TaskBroadcaster()
             self.update_queue = queue.Queue()
             self.loop = None 
+            self._wakeup: Optional[asyncio.Event] = None
+            # 调度器状态: 等待队列、各资源的占用数、工作线程与清理线程
+            self._cond = threading.Condition(self._lock)
+            self._pending: List[Dict[str, Any]] = []
+            self._pending_seq = 0
+            self._resource_usage: Dict[str, int] = {}
+            self._workers: List[threading.Thread] = []
+            self._reaper: Optional[threading.Thread] = None
             self.initialized = True
 
-    def _broadcast_update(self):
-        self.update_queue.put("UPDATE")
+    def _broadcast_update(self, task_id: Optional[str] = None):
+        """
+        记录一次变更通知并唤醒广播消费者。
+        消费者按固定帧率合并通知，只推送版本号发生变化的任务。
+        """
+        self.update_queue.put(task_id)
+        loop = self.loop
+        if loop and not loop.is_closed() and self._wakeup is not None:
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _touch(self, task_id: str, result_changed: bool = False):
+        """在持有锁的情况下递增任务的版本号"""
+        task = self.tasks[task_id]
+        task['version'] += 1
+        if result_changed:
+            task['result_version'] += 1
+
+    @staticmethod
+    def _summarize(data: Dict[str, Any]) -> Dict[str, Any]:
+        """推送用的任务摘要，不含可能很大的 result，前端按 result_version 按需拉取"""
+        return {
+            "id": data["id"],
+            "name": data["name"],
+            "status": data["status"],
+            "start_time": data["start_time"],
+            "progress": data["progress"],
+            "total": data["total"],
+            "has_result": data.get("result") is not None,
+            "result_version": data["result_version"],
+        }
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        """新连接建立时发送的完整快照"""
+        with self._lock:
+            return {"type": "snapshot", "tasks": [self._summarize(data) for data in self.tasks.values()]}
+
+    def _build_delta(self, sent_versions: Dict[str, int]) -> Dict[str, Any]:
+        with self._lock:
+            changed = [
+                self._summarize(data) for task_id, data in self.tasks.items()
+                if sent_versions.get(task_id) != data['version']
+            ]
+            current_versions = {task_id: data['version'] for task_id, data in self.tasks.items()}
+        removed = [task_id for task_id in sent_versions if task_id not in current_versions]
+        sent_versions.clear()
+        sent_versions.update(current_versions)
+        return {"type": "delta", "tasks": changed, "removed": removed}
 
     async def broadcast_consumer(self):
         self.loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
         logging.info("任务广播消费者的事件循环已成功获取。")
+        sent_versions: Dict[str, int] = {}
         while True:
             try:
-                self.update_queue.get_nowait()
-                task_list = self.get_all_tasks()
-                if self.loop and not self.loop.is_closed():
-                    asyncio.run_coroutine_threadsafe(self.broadcaster.broadcast(task_list), self.loop)
-            except queue.Empty:
-                await asyncio.sleep(0.1)
+                if self.update_queue.empty():
+                    await self._wakeup.wait()
+                self._wakeup.clear()
+                while True:
+                    try:
+                        self.update_queue.get_nowait()
+                    except queue.Empty:
+                        break
+
+                delta = self._build_delta(sent_versions)
+                if delta["tasks"] or delta["removed"]:
+                    await self.broadcaster.broadcast(delta)
+                # 限制推送帧率，期间到达的更新会在下一帧合并发送
+                await asyncio.sleep(BROADCAST_INTERVAL)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logging.error(f"任务广播时发生错误: {e}")
                 await asyncio.sleep(1)
@@ -78,15 +170,17 @@ class TaskManager:
             if task_id in self.tasks:
                 self.tasks[task_id]['progress'] = progress
                 self.tasks[task_id]['total'] = total
-        self._broadcast_update()
+                self._touch(task_id)
+        self._broadcast_update(task_id)
 
     # --- 核心修改 3: 新增一个用于实时更新结果的方法 ---
     def update_task_result(self, task_id: str, result: Any):
-        """实时更新任务的结果字段，并立即广播。"""
+        """实时更新任务的结果字段，并通知广播 (前端按 result_version 拉取最新结果)。"""
         with self._lock:
             if task_id in self.tasks:
                 self.tasks[task_id]['result'] = result
-        self._broadcast_update()
+                self._touch(task_id, result_changed=True)
+        self._broadcast_update(task_id)
 
     def _run_task_wrapper(self, task_id: str, target: Callable, *args, **kwargs):
         cancellation_event = self.tasks[task_id]['cancellation_event']
@@ -108,48 +202,170 @@ class TaskManager:
                 if task_id in self.tasks:
                     self.tasks[task_id]['status'] = final_status
                     self.tasks[task_id]['result'] = task_result
+                    self.tasks[task_id]['finished_at'] = time.monotonic()
+                    self.tasks[task_id]['done_event'].set()
+                    self._touch(task_id, result_changed=True)
             
-            self._broadcast_update()
-            
-            def cleanup_task():
-                with self._lock:
-                    if task_id in self.tasks:
-                        del self.tasks[task_id]
-                self._broadcast_update()
-                logging.info(f"已清理已完成的任务: {task_id}")
+            self._broadcast_update(task_id)
+
+    # --- 调度器 ---
+
+    def _ensure_threads(self):
+        """按需启动固定数量的工作线程和唯一的清理线程 (需持有锁)"""
+        self._workers = [w for w in self._workers if w.is_alive()]
+        while len(self._workers) < MAX_WORKERS:
+            worker = threading.Thread(target=self._worker_loop, name=f"task-worker-{len(self._workers)}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        if self._reaper is None or not self._reaper.is_alive():
+            self._reaper = threading.Thread(target=self._reaper_loop, name="task-reaper", daemon=True)
+            self._reaper.start()
+
+    def _pop_runnable(self) -> Optional[Dict[str, Any]]:
+        """取出优先级最高、且所需资源均未达上限的排队任务 (需持有锁)"""
+        for entry in sorted(self._pending, key=lambda e: (e['priority'], e['seq'])):
+            if all(self._resource_usage.get(r, 0) < RESOURCE_LIMITS.get(r, MAX_WORKERS) for r in entry['resources']):
+                self._pending.remove(entry)
+                return entry
+        return None
 
-            threading.Timer(10.0, cleanup_task).start()
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                entry = self._pop_runnable()
+                while entry is None:
+                    self._cond.wait()
+                    entry = self._pop_runnable()
+                task_id = entry['task_id']
+                for resource in entry['resources']:
+                    self._resource_usage[resource] = self._resource_usage.get(resource, 0) + 1
+                self.tasks[task_id]['status'] = 'running'
+                self.tasks[task_id]['start_time'] = datetime.now().isoformat()
+                self._touch(task_id)
+            self._broadcast_update(task_id)
+
+            try:
+                self._run_task_wrapper(task_id, entry['target'], *entry['args'], **entry['kwargs'])
+            finally:
+                with self._cond:
+                    for resource in entry['resources']:
+                        self._resource_usage[resource] -= 1
+                    self._cond.notify_all()
+
+    @contextmanager
+    def hold_resources(self, resources: Iterable[str], timeout: float = RESOURCE_WAIT_TIMEOUT):
+        """
+        在任务调度之外 (如同步执行的接口) 占用受限资源，与声明了相同资源的任务共享 RESOURCE_LIMITS 限制。
+        资源已满时最多等待 timeout 秒，仍未获得则抛出 ResourceBusyError；退出时释放并唤醒排队的任务。
+        """
+        resources = list(resources)
+        with self._cond:
+            acquired = self._cond.wait_for(
+                lambda: all(self._resource_usage.get(r, 0) < RESOURCE_LIMITS.get(r, MAX_WORKERS) for r in resources),
+                timeout=timeout
+            )
+            if not acquired:
+                raise ResourceBusyError(f"资源 {', '.join(resources)} 正被其他任务占用")
+            for resource in resources:
+                self._resource_usage[resource] = self._resource_usage.get(resource, 0) + 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                for resource in resources:
+                    self._resource_usage[resource] -= 1
+                self._cond.notify_all()
+
+    def _reaper_loop(self):
+        """定期清理已结束超过 FINISHED_TASK_TTL 秒的任务"""
+        while True:
+            time.sleep(1.0)
+            now = time.monotonic()
+            with self._lock:
+                expired = [
+                    task_id for task_id, data in self.tasks.items()
+                    if data.get('finished_at') is not None and now - data['finished_at'] >= FINISHED_TASK_TTL
+                ]
+                for task_id in expired:
+                    del self.tasks[task_id]
+            if expired:
+                self._broadcast_update()
+                logging.info(f"已清理 {len(expired)} 个已结束的任务: {', '.join(expired)}")
 
-    def register_task(self, target: Callable, name: str, *args, **kwargs) -> str:
+    def register_task(self, target: Callable, name: str, *args, priority: int = PRIORITY_MANUAL,
+                      resources: Optional[Iterable[str]] = None, **kwargs) -> str:
+        """
+        注册任务并放入调度队列。
+        - priority: 任务优先级 (PRIORITY_WEBHOOK / PRIORITY_MANUAL / PRIORITY_SCHEDULED)
+        - resources: 任务占用的受限资源 (如 RESOURCE_GITHUB_WRITE)，同一资源的并发数受 RESOURCE_LIMITS 限制
+        """
         task_id = str(uuid.uuid4())
         cancellation_event = threading.Event()
-        with self._lock:
+        with self._cond:
             self.tasks[task_id] = {
                 'id': task_id,
                 'name': name,
-                'status': 'running',
+                'status': 'queued',
                 'start_time': datetime.now().isoformat(),
                 'cancellation_event': cancellation_event,
+                'done_event': threading.Event(),
                 'progress': 0,
                 'total': 0,
                 'result': None,
+                'version': 0,
+                'result_version': 0,
+                'finished_at': None,
             }
-        logging.info(f"注册新任务: '{name}' (ID: {task_id})")
-        thread = threading.Thread(target=self._run_task_wrapper, args=(task_id, target, *args), kwargs=kwargs)
-        thread.start()
-        self._broadcast_update()
+            self._pending_seq += 1
+            self._pending.append({
+                'task_id': task_id, 'priority': priority, 'seq': self._pending_seq,
+                'resources': list(resources or []), 'target': target, 'args': args, 'kwargs': kwargs,
+            })
+            self._ensure_threads()
+            self._cond.notify_all()
+            queued_count = len(self._pending)
+        logging.info(f"注册新任务: '{name}' (ID: {task_id})，优先级 {priority}，当前排队 {queued_count} 个。")
+        self._broadcast_update(task_id)
         return task_id
 
+    def wait_for_task(self, task_id: str, timeout: Optional[float] = None) -> bool:
+        """阻塞直到任务结束 (完成、失败或取消)，任务不存在时立即返回；超时返回 False"""
+        with self._lock:
+            task = self.tasks.get(task_id)
+            done_event = task['done_event'] if task else None
+        if done_event is None:
+            return True
+        return done_event.wait(timeout)
+
     def cancel_task(self, task_id: str) -> bool:
         with self._lock:
+            if task_id in self.tasks and self.tasks[task_id]['status'] == 'queued':
+                # 尚未开始的任务直接出队
+                self._pending = [e for e in self._pending if e['task_id'] != task_id]
+                self.tasks[task_id]['cancellation_event'].set()
+                self.tasks[task_id]['status'] = 'cancelled'
+                self.tasks[task_id]['finished_at'] = time.monotonic()
+                self.tasks[task_id]['done_event'].set()
+                self._touch(task_id)
+                logging.info(f"已取消排队中的任务 '{self.tasks[task_id]['name']}' (ID: {task_id})")
+                self._broadcast_update(task_id)
+                return True
             if task_id in self.tasks and self.tasks[task_id]['status'] == 'running':
                 self.tasks[task_id]['cancellation_event'].set()
                 self.tasks[task_id]['status'] = 'cancelling'
+                self._touch(task_id)
                 logging.info(f"正在取消任务 '{self.tasks[task_id]['name']}' (ID: {task_id})")
-                self._broadcast_update()
+                self._broadcast_update(task_id)
                 return True
         return False
 
+    def get_task_result(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            data = self.tasks.get(task_id)
+            if data is None:
+                return None
+            return {"id": task_id, "result_version": data["result_version"], "result": data.get("result")}
+
     def get_all_tasks(self) -> List[Dict]:
         with self._lock:
             return [
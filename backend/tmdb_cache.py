@@ -0,0 +1,206 @@
+# backend/tmdb_cache.py
+
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlencode
+
+from models import TmdbCacheConfig
+
+TMDB_CACHE_DB_FILE = os.path.join('/app/data', 'tmdb_cache.db')
+
+# 每写入多少条执行一次磁盘淘汰与过期清理
+DISK_MAINTENANCE_INTERVAL = 200
+
+# 接口分类规则，按顺序匹配；分类决定缓存时长 (见 TmdbCacheConfig.ttl_*_hours)
+ENDPOINT_CLASSES = (
+    ("images", re.compile(r'^(movie|tv|person)/\d+/images$')),
+    ("person", re.compile(r'^person/')),
+    ("season", re.compile(r'^tv/\d+/season/')),
+    ("tv", re.compile(r'^tv/\d+')),
+    ("movie", re.compile(r'^movie/\d+')),
+    ("search", re.compile(r'^(search|find)/')),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    endpoint_class TEXT,
+    data TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access);
+"""
+
+
+def classify_endpoint(endpoint: str) -> str:
+    endpoint = endpoint.strip('/')
+    for name, pattern in ENDPOINT_CLASSES:
+        if pattern.match(endpoint):
+            return name
+    return "default"
+
+
+def build_cache_key(endpoint: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """规范化的缓存键：接口路径 + 排序后的参数 (不含 api_key，更换密钥不影响缓存)"""
+    items = sorted((str(k), str(v)) for k, v in (params or {}).items() if k != "api_key")
+    return f"{endpoint.strip('/')}?{urlencode(items)}"
+
+
+class TmdbCache:
+    """
+    TMDB 响应的两级缓存。
+    - 第一级为进程内 LRU，命中时无需任何 IO。
+    - 第二级为 SQLite 磁盘存储，重启后依旧有效，按最近访问时间淘汰超出上限的条目。
+    - 不同类别的接口使用不同的缓存时长 (人物信息长期有效，剧集播出状态则较快过期)。
+    - 所有读写均在同一把锁内完成，可被多个任务线程同时使用。
+    """
+    def __init__(self, db_path: str = TMDB_CACHE_DB_FILE):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._memory: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._writes_since_maintenance = 0
+        self.config = TmdbCacheConfig()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def configure(self, config: TmdbCacheConfig):
+        with self._lock:
+            self.config = config
+            while len(self._memory) > config.memory_max_entries:
+                self._memory.popitem(last=False)
+
+    def _get_conn(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None:
+            try:
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+                conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(_SCHEMA)
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                logging.error(f"【TMDB缓存】打开磁盘缓存失败，将仅使用内存缓存: {e}")
+                return None
+        return self._conn
+
+    def _record(self, endpoint_class: str, event: str):
+        stats = self._stats.setdefault(endpoint_class, {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0})
+        stats[event] += 1
+
+    def ttl_for(self, endpoint_class: str) -> int:
+        hours = getattr(self.config, f"ttl_{endpoint_class}_hours", self.config.ttl_default_hours)
+        return int(hours * 3600)
+
+    def _remember(self, key: str, data: Any, expires_at: float):
+        self._memory[key] = (data, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.config.memory_max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str, endpoint_class: str, persistent: bool = True) -> Optional[Any]:
+        if not self.config.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self._record(endpoint_class, "memory_hits")
+                    return entry[0]
+                del self._memory[key]
+
+            if persistent and (conn := self._get_conn()) is not None:
+                try:
+                    row = conn.execute("SELECT data, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+                    if row and row[1] > now:
+                        data = json.loads(row[0])
+                        conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                        conn.commit()
+                        self._remember(key, data, row[1])
+                        self._record(endpoint_class, "disk_hits")
+                        return data
+                except (sqlite3.Error, json.JSONDecodeError) as e:
+                    logging.warning(f"【TMDB缓存】读取磁盘缓存失败: {e}")
+
+            self._record(endpoint_class, "misses")
+            return None
+
+    def set(self, key: str, endpoint_class: str, data: Any, persistent: bool = True, ttl: Optional[int] = None):
+        if not self.config.enabled:
+            return
+        ttl = self.ttl_for(endpoint_class) if ttl is None else ttl
+        if ttl <= 0:
+            return
+        now = time.time()
+        expires_at = now + ttl
+        with self._lock:
+            self._remember(key, data, expires_at)
+            self._record(endpoint_class, "writes")
+            if not persistent or (conn := self._get_conn()) is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, endpoint_class, data, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (key, endpoint_class, json.dumps(data, ensure_ascii=False), expires_at, now)
+                )
+                self._writes_since_maintenance += 1
+                if self._writes_since_maintenance >= DISK_MAINTENANCE_INTERVAL:
+                    self._writes_since_maintenance = 0
+                    self._maintain(conn, now)
+                conn.commit()
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                logging.warning(f"【TMDB缓存】写入磁盘缓存失败: {e}")
+
+    def _maintain(self, conn: sqlite3.Connection, now: float):
+        """清理过期条目，并按最近访问时间淘汰超出上限的条目"""
+        conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        count = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        overflow = count - self.config.disk_max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+            logging.info(f"【TMDB缓存】磁盘缓存超出上限，已淘汰 {overflow} 条最久未使用的记录。")
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._memory.pop(key, None)
+            if (conn := self._get_conn()) is not None:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_class = {name: dict(stats) for name, stats in self._stats.items()}
+            disk_entries = 0
+            if (conn := self._get_conn()) is not None:
+                disk_entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            memory_entries = len(self._memory)
+        totals = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+        for stats in by_class.values():
+            for k in totals:
+                totals[k] += stats[k]
+        for stats in list(by_class.values()) + [totals]:
+            lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+            stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return {
+            "enabled": self.config.enabled,
+            "memory_entries": memory_entries,
+            "disk_entries": disk_entries,
+            "totals": totals,
+            "by_class": by_class,
+        }
+
+
+tmdb_cache = TmdbCache()
@@ -0,0 +1,189 @@
+# backend/tmdb_client.py
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Any, Optional, List, Tuple
+
+import httpx
+import requests
+
+# 令牌桶默认参数，TMDB 官方限制约为每秒 50 次，留出余量
+DEFAULT_RATE_PER_SECOND = 20.0
+DEFAULT_BURST = 20
+DEFAULT_MAX_CONCURRENCY = 16
+REQUEST_TIMEOUT = 20
+MAX_RETRIES = 3
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class AsyncTokenBucket:
+    """异步令牌桶，进程内所有 TMDB 请求共享同一个预算"""
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def configure(self, rate: float, burst: int):
+        self.rate = max(0.1, rate)
+        self.capacity = max(1, burst)
+        self._tokens = min(self._tokens, self.capacity)
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class TmdbClient:
+    """
+    进程级共享的异步 TMDB 客户端，运行在独立的事件循环线程中。
+    - 所有请求经过同一个令牌桶限速，多个任务同时运行也不会突破 TMDB 的频率限制。
+    - 相同的请求 (如同一剧季) 在进行中时只发出一次，其余调用方共享结果。
+    - 提供 get_many 批量并发获取，在限速预算内尽可能并行。
+    - 同步线程通过 request / get_many 调用，错误以 requests 的异常类型抛出，兼容原有的异常处理。
+    """
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._clients: Dict[Optional[str], httpx.AsyncClient] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_size = 0
+        self._max_concurrency = DEFAULT_MAX_CONCURRENCY
+        self.bucket = AsyncTokenBucket(DEFAULT_RATE_PER_SECOND, DEFAULT_BURST)
+        self.stats = {"requests": 0, "coalesced": 0, "retries": 0, "errors": 0}
+
+    # --- 事件循环线程 ---
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is not None:
+            return self._loop
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name="tmdb-client", daemon=True)
+                self._thread.start()
+                self._loop = loop
+        return self._loop
+
+    def configure(self, rate_per_second: float, max_concurrency: int):
+        self.bucket.configure(rate_per_second, max(1, int(rate_per_second)))
+        self._max_concurrency = max(1, max_concurrency)
+
+    def _run(self, coro) -> Any:
+        future: Future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        return future.result()
+
+    def _get_client(self, proxy_url: Optional[str]) -> httpx.AsyncClient:
+        client = self._clients.get(proxy_url)
+        if client is None:
+            mounts = {'all://': httpx.AsyncHTTPTransport(proxy=httpx.Proxy(url=proxy_url))} if proxy_url else None
+            client = httpx.AsyncClient(
+                mounts=mounts,
+                timeout=REQUEST_TIMEOUT,
+                limits=httpx.Limits(max_connections=DEFAULT_MAX_CONCURRENCY * 2, max_keepalive_connections=DEFAULT_MAX_CONCURRENCY)
+            )
+            self._clients[proxy_url] = client
+        return client
+
+    # --- 异步实现 ---
+
+    async def _send(self, url: str, params: Dict[str, Any], proxy_url: Optional[str]) -> Dict[str, Any]:
+        if self._semaphore is None or self._semaphore_size != self._max_concurrency:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+            self._semaphore_size = self._max_concurrency
+        client = self._get_client(proxy_url)
+        for attempt in range(MAX_RETRIES + 1):
+            await self.bucket.acquire()
+            async with self._semaphore:
+                self.stats["requests"] += 1
+                try:
+                    response = await client.get(url, params=params)
+                except httpx.TimeoutException as e:
+                    self.stats["errors"] += 1
+                    raise requests.Timeout(f"请求 TMDB 超时: {url}") from e
+                except httpx.HTTPError as e:
+                    self.stats["errors"] += 1
+                    raise requests.ConnectionError(f"请求 TMDB 失败: {e}") from e
+
+            if response.status_code in RETRY_STATUS and attempt < MAX_RETRIES:
+                self.stats["retries"] += 1
+                retry_after = response.headers.get("Retry-After")
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt
+                logging.debug(f"【TMDB客户端】{url} 返回 {response.status_code}，{delay} 秒后重试 ({attempt + 1}/{MAX_RETRIES})。")
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code >= 400:
+                self.stats["errors"] += 1
+                compat_response = requests.Response()
+                compat_response.status_code = response.status_code
+                compat_response._content = response.content
+                compat_response.url = str(response.url)
+                raise requests.HTTPError(f"{response.status_code} Error for url: {url}", response=compat_response)
+            return response.json()
+
+    async def _request(self, key: str, url: str, params: Dict[str, Any], proxy_url: Optional[str]) -> Dict[str, Any]:
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            data = await self._send(url, params, proxy_url)
+            future.set_result(data)
+            return data
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 若没有其他等待者，标记异常已被读取，避免事件循环输出未处理异常的警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _request_many(self, items: List[Tuple[str, str, Dict[str, Any], Optional[str]]]) -> List[Any]:
+        return await asyncio.gather(
+            *(self._request(key, url, params, proxy_url) for key, url, params, proxy_url in items),
+            return_exceptions=True
+        )
+
+    # --- 同步入口 ---
+
+    def request(self, key: str, url: str, params: Dict[str, Any], proxy_url: Optional[str] = None) -> Dict[str, Any]:
+        """同步调用：阻塞当前线程直到请求完成，相同 key 的并发请求共享一次网络往返"""
+        return self._run(self._request(key, url, params, proxy_url))
+
+    def request_many(self, items: List[Tuple[str, str, Dict[str, Any], Optional[str]]]) -> List[Any]:
+        """批量并发请求，返回与输入顺序一致的结果列表，失败项为对应的异常对象"""
+        if not items:
+            return []
+        return self._run(self._request_many(items))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "inflight": len(self._inflight),
+            "rate_per_second": self.bucket.rate,
+            "max_concurrency": self._max_concurrency,
+        }
+
+
+tmdb_client = TmdbClient()
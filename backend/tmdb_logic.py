@@ -1,7 +1,6 @@
 
 import logging
 import requests
-import time
 import os
 import json
 from typing import Dict, List, Any, Optional, Tuple
@@ -15,6 +14,9 @@ from models import (
     ActorTmdbImageFlowRequest, ActorTmdbImageFlowResponse, TmdbPersonCandidate, SingleActorConfirmContext
 )
 from proxy_manager import ProxyManager
+from emby_client import emby_client
+from tmdb_cache import tmdb_cache, classify_endpoint, build_cache_key
+from tmdb_client import tmdb_client
 TMDB_IMAGE_BASE_URL = "https://image.tmdb.org/t/p/"
 TMDB_IMAGE_SIZES = {
     "poster": "w780",
@@ -23,8 +25,8 @@ TMDB_IMAGE_SIZES = {
     "original": "original"
 }
 
-CACHE: Dict[str, Tuple[Any, float]] = {}
-CACHE_DURATION = 3600
+# Emby 项目详情只在内存中短暂缓存，不写入磁盘，避免修改后长期读到旧数据
+EMBY_ITEM_CACHE_TTL = 3600
 
 class TmdbLogic:
     def __init__(self, app_config: AppConfig):
@@ -56,39 +58,58 @@ class TmdbLogic:
         self.session.mount("http://", adapter)
         
         self.proxy_manager = ProxyManager(app_config)
+        self.emby_session = emby_client
+        tmdb_cache.configure(app_config.tmdb_cache_config)
+        tmdb_client.configure(self.tmdb_config.rate_limit_per_second, self.tmdb_config.max_concurrent_requests)
 
-    def _get_from_cache(self, key: str) -> Optional[Any]:
-        if key in CACHE:
-            data, timestamp = CACHE[key]
-            if time.time() - timestamp < CACHE_DURATION:
-                logging.debug(f"【TMDB缓存】命中缓存: {key}")
-                return data
-            else:
-                logging.debug(f"【TMDB缓存】缓存已过期: {key}")
-        return None
-
-    def _set_to_cache(self, key: str, data: Any):
-        logging.debug(f"【TMDB缓存】设置缓存: {key}")
-        CACHE[key] = (data, time.time())
-
-    def _tmdb_request(self, endpoint: str, params: Optional[Dict] = None) -> Dict:
-        full_params = {"api_key": self.tmdb_api_key, "language": "zh-CN", **(params or {})}
-        cache_key = f"{endpoint}?{frozenset(full_params.items())}"
-        cached_data = self._get_from_cache(cache_key)
-        if cached_data: return cached_data
+    def _prepare_request(self, endpoint: str, params: Optional[Dict], with_language: bool = True) -> Tuple[str, str, str, Dict, Optional[str]]:
+        """返回 (缓存键, 接口类别, URL, 完整参数, 代理地址)"""
+        full_params = {"api_key": self.tmdb_api_key, **({"language": "zh-CN"} if with_language else {}), **(params or {})}
         url = f"{self.tmdb_base_url}/{endpoint}"
+        proxy_url = self.proxy_manager.get_proxies(url).get('https')
+        return build_cache_key(endpoint, full_params), classify_endpoint(endpoint), url, full_params, proxy_url
+
+    def _tmdb_request(self, endpoint: str, params: Optional[Dict] = None, with_language: bool = True) -> Dict:
+        cache_key, endpoint_class, url, full_params, proxy_url = self._prepare_request(endpoint, params, with_language)
+        cached_data = tmdb_cache.get(cache_key, endpoint_class)
+        if cached_data is not None:
+            logging.debug(f"【TMDB缓存】命中缓存: {cache_key}")
+            return cached_data
         logging.debug(f"【TMDB请求】向 TMDB 发起请求: {url}，参数: {params}")
-        proxies = self.proxy_manager.get_proxies(url)
-        response = self.session.get(url, params=full_params, timeout=20, proxies=proxies)
-        response.raise_for_status()
-        data = response.json()
-        self._set_to_cache(cache_key, data)
+        data = tmdb_client.request(cache_key, url, full_params, proxy_url)
+        tmdb_cache.set(cache_key, endpoint_class, data)
         return data
 
+    def get_many(self, requests_list: List[Tuple[str, Optional[Dict]]]) -> List[Optional[Dict]]:
+        """
+        批量获取多个 TMDB 接口，未命中缓存的请求在全局限速预算内并发发出。
+        返回与输入顺序一致的结果列表，失败的请求对应 None。
+        """
+        results: List[Optional[Dict]] = [None] * len(requests_list)
+        to_fetch = []
+        for index, (endpoint, params) in enumerate(requests_list):
+            cache_key, endpoint_class, url, full_params, proxy_url = self._prepare_request(endpoint, params)
+            cached_data = tmdb_cache.get(cache_key, endpoint_class)
+            if cached_data is not None:
+                results[index] = cached_data
+            else:
+                to_fetch.append((index, cache_key, endpoint_class, url, full_params, proxy_url))
+
+        if to_fetch:
+            logging.debug(f"【TMDB请求】批量获取 {len(to_fetch)} 个接口 (另有 {len(requests_list) - len(to_fetch)} 个命中缓存)。")
+            responses = tmdb_client.request_many([(key, url, full_params, proxy_url) for _, key, _, url, full_params, proxy_url in to_fetch])
+            for (index, cache_key, endpoint_class, _, _, _), response in zip(to_fetch, responses):
+                if isinstance(response, Exception):
+                    logging.warning(f"【TMDB请求】批量获取 {requests_list[index][0]} 失败: {response}")
+                    continue
+                tmdb_cache.set(cache_key, endpoint_class, response)
+                results[index] = response
+        return results
+
     def _get_emby_item_details(self, item_id: str, fields: str = "ProviderIds,People,ProductionYear") -> Dict:
         cache_key = f"emby_item_{item_id}_{fields}"
-        cached_data = self._get_from_cache(cache_key)
-        if cached_data:
+        cached_data = tmdb_cache.get(cache_key, "emby_item", persistent=False)
+        if cached_data is not None:
             logging.debug(f"【TMDB逻辑】命中请求级缓存，直接返回 Emby 项目 (ID: {item_id}) 的信息。")
             return cached_data
 
@@ -96,12 +117,12 @@ class TmdbLogic:
         url = f"{self.emby_config.server}/Users/{self.emby_config.user_id}/Items/{item_id}"
         params = {"api_key": self.emby_config.api_key, "Fields": fields}
         proxies = self.proxy_manager.get_proxies(url)
-        response = self.session.get(url, params=params, timeout=15, proxies=proxies)
+        response = self.emby_session.get(url, params=params, timeout=15, proxies=proxies)
         response.raise_for_status()
         data = response.json()
         logging.debug(f"【TMDB逻辑】成功获取 Emby 项目 (ID: {item_id}) 的信息。")
         
-        self._set_to_cache(cache_key, data)
+        tmdb_cache.set(cache_key, "emby_item", data, persistent=False, ttl=EMBY_ITEM_CACHE_TTL)
         return data
 
     def _smart_match(self, item_details: Dict) -> TmdbImageResponse:
@@ -144,17 +165,7 @@ class TmdbLogic:
         ui_logger.info(f"正在为 TMDB ID: {tmdb_id} 获取 {image_type} 图片...", task_category=task_cat)
         details = self._tmdb_request(f"{item_type}/{tmdb_id}")
         original_language = details.get("original_language")
-        images_endpoint = f"{item_type}/{tmdb_id}/images"
-        all_images_params = {"api_key": self.tmdb_api_key}
-        cache_key = f"{images_endpoint}?{frozenset(all_images_params.items())}"
-        all_images_data = self._get_from_cache(cache_key)
-        if not all_images_data:
-            url = f"{self.tmdb_base_url}/{images_endpoint}"
-            proxies = self.proxy_manager.get_proxies(url)
-            response = self.session.get(url, params=all_images_params, timeout=20, proxies=proxies)
-            response.raise_for_status()
-            all_images_data = response.json()
-            self._set_to_cache(cache_key, all_images_data)
+        all_images_data = self._tmdb_request(f"{item_type}/{tmdb_id}/images", with_language=False)
         target_images_key = f"{image_type}s"
         if image_type == 'poster': target_images_key = 'posters'
         elif image_type == 'backdrop': target_images_key = 'backdrops'
@@ -195,7 +206,7 @@ class TmdbLogic:
             headers = {'Content-Type': 'application/json'}
             params = {"api_key": self.emby_config.api_key}
             proxies = self.proxy_manager.get_proxies(url)
-            response = self.session.post(url, params=params, headers=headers, json=item_details, timeout=20, proxies=proxies)
+            response = self.emby_session.post(url, params=params, headers=headers, json=item_details, timeout=20, proxies=proxies)
             response.raise_for_status()
             ui_logger.info(f"成功更新 Emby ProviderIds。", task_category=task_cat)
         except Exception as e:
@@ -222,7 +233,7 @@ class TmdbLogic:
             params = {"api_key": self.emby_config.api_key}
             proxies = self.proxy_manager.get_proxies(url)
             
-            response = self.session.post(url, params=params, headers=headers, json=person_details, timeout=20, proxies=proxies)
+            response = self.emby_session.post(url, params=params, headers=headers, json=person_details, timeout=20, proxies=proxies)
             response.raise_for_status()
             ui_logger.info(f"成功将演员的 TMDB ID 更新为 {tmdb_person_id}。", task_category=task_cat)
         except Exception as e:
@@ -0,0 +1,160 @@
+# backend/translation_memory.py
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Iterable, Any, Tuple
+
+TRANSLATION_MEMORY_DB_FILE = os.path.join('/app/data', 'translation_memory.db')
+
+# 导出文件的格式版本，导入时用于校验
+EXPORT_FORMAT_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    source TEXT NOT NULL,
+    engine TEXT NOT NULL,
+    model TEXT NOT NULL DEFAULT '',
+    context TEXT NOT NULL DEFAULT '',
+    target TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (source, engine, model, context)
+);
+"""
+
+
+class TranslationMemory:
+    """
+    角色名翻译记忆，以 (原文, 翻译引擎, 模型, 作品上下文) 为键持久化保存译文。
+    - 翻译前先查询记忆，只有未命中的原文才会调用翻译接口 (批量模式下只发送未命中项)。
+    - 作品上下文为空表示通用译文；AI 翻译按作品区分时，同一作品的不同季、不同分集仍可复用。
+    - 支持导出 / 导入，便于多个实例共享。
+    """
+    def __init__(self, db_path: str = TRANSLATION_MEMORY_DB_FILE):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0}
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def lookup_many(self, texts: Iterable[str], engine: str, model: str = "", context: str = "") -> Dict[str, str]:
+        """返回命中的 {原文: 译文}；未命中的原文不出现在结果中"""
+        unique_texts = list(dict.fromkeys(t for t in texts if t))
+        if not unique_texts:
+            return {}
+        found: Dict[str, str] = {}
+        try:
+            with self._lock:
+                conn = self._get_conn()
+                for text in unique_texts:
+                    row = conn.execute(
+                        "SELECT target FROM translations WHERE source = ? AND engine = ? AND model = ? AND context = ?",
+                        (text, engine, model, context)
+                    ).fetchone()
+                    if row:
+                        found[text] = row[0]
+                if found:
+                    conn.executemany(
+                        "UPDATE translations SET hits = hits + 1, last_used = ? WHERE source = ? AND engine = ? AND model = ? AND context = ?",
+                        [(time.time(), text, engine, model, context) for text in found]
+                    )
+                    conn.commit()
+                self._stats["hits"] += len(found)
+                self._stats["misses"] += len(unique_texts) - len(found)
+        except sqlite3.Error as e:
+            logging.warning(f"【翻译记忆】查询翻译记忆失败: {e}")
+        return found
+
+    def store_many(self, translations: Dict[str, str], engine: str, model: str = "", context: str = ""):
+        """保存译文；译文为空或与原文相同 (通常意味着翻译失败) 时不保存"""
+        now = time.time()
+        rows = [
+            (source, engine, model, context, target, now, now)
+            for source, target in translations.items()
+            if source and target and target.strip() != source.strip()
+        ]
+        if not rows:
+            return
+        try:
+            with self._lock:
+                conn = self._get_conn()
+                conn.executemany("""
+                    INSERT INTO translations (source, engine, model, context, target, created_at, last_used)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(source, engine, model, context) DO UPDATE SET target = excluded.target, last_used = excluded.last_used
+                """, rows)
+                conn.commit()
+                self._stats["writes"] += len(rows)
+        except sqlite3.Error as e:
+            logging.warning(f"【翻译记忆】写入翻译记忆失败: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._get_conn().execute("SELECT engine, COUNT(*) FROM translations GROUP BY engine").fetchall()
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            **stats,
+            "hit_rate": round(stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": sum(count for _, count in rows),
+            "entries_by_engine": {engine: count for engine, count in rows},
+        }
+
+    # --- 导出 / 导入 ---
+
+    def export_entries(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._get_conn().execute(
+                "SELECT source, engine, model, context, target, hits FROM translations ORDER BY engine, model, context, source"
+            ).fetchall()
+        return {
+            "version": EXPORT_FORMAT_VERSION,
+            "exported_at": time.time(),
+            "entries": [
+                {"source": source, "engine": engine, "model": model, "context": context, "target": target, "hits": hits}
+                for source, engine, model, context, target, hits in rows
+            ],
+        }
+
+    def import_entries(self, data: Dict[str, Any], overwrite: bool = False) -> Tuple[int, int]:
+        """导入导出文件中的条目，返回 (写入数, 跳过数)；overwrite 为 False 时保留本地已有的译文"""
+        if data.get("version") != EXPORT_FORMAT_VERSION:
+            raise ValueError(f"不支持的翻译记忆文件版本: {data.get('version')}")
+        now = time.time()
+        rows: List[tuple] = []
+        skipped = 0
+        for entry in data.get("entries", []):
+            if not entry.get("source") or not entry.get("engine") or not entry.get("target"):
+                skipped += 1
+                continue
+            rows.append((entry["source"], entry["engine"], entry.get("model") or "", entry.get("context") or "",
+                         entry["target"], int(entry.get("hits") or 0), now, now))
+        conflict = "DO UPDATE SET target = excluded.target" if overwrite else "DO NOTHING"
+        with self._lock:
+            conn = self._get_conn()
+            before = conn.total_changes
+            conn.executemany(f"""
+                INSERT INTO translations (source, engine, model, context, target, hits, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(source, engine, model, context) {conflict}
+            """, rows)
+            conn.commit()
+            written = conn.total_changes - before
+        return written, skipped + len(rows) - written
+
+
+translation_memory = TranslationMemory()
@@ -1,22 +1,23 @@
 # backend/upcoming_logic.py (完整文件覆盖)
 
 import logging
-import os
-import json
 import time
 from typing import Dict, Any, Optional, List, Literal, Tuple
 from datetime import datetime, timedelta, timezone
-from filelock import FileLock, Timeout
 
 from models import AppConfig
 from log_manager import ui_logger
 from trakt_manager import TraktManager
 from tmdb_logic import TmdbLogic
 from notification_manager import notification_manager, escape_markdown
+from upcoming_store import upcoming_store
 
 
-UPCOMING_DB_FILE = os.path.join('/app/data', 'upcoming_database.json')
 CACHE_DURATION_HOURS = 11
+# 详情补全每批并发请求的条目数，每批完成后立即写入数据库，前端可提前看到部分结果
+ENRICH_BATCH_SIZE = 20
+# 由用户操作维护的字段，刷新写入时保留库中已有的值
+USER_STATE_FIELDS = ('is_subscribed', 'subscribed_at', 'is_permanent', 'is_ignored')
 
 class UpcomingLogic:
     def __init__(self, app_config: AppConfig):
@@ -26,31 +27,8 @@ class UpcomingLogic:
         self.tmdb_logic = TmdbLogic(app_config)
 
     def _read_db(self) -> Dict:
-        """安全地读取数据库文件"""
-        if not os.path.exists(UPCOMING_DB_FILE):
-            return {"timestamp": None, "data": {}}
-        try:
-            with open(UPCOMING_DB_FILE, 'r', encoding='utf-8') as f:
-                content = f.read()
-                if not content:
-                    return {"timestamp": None, "data": {}}
-                return json.loads(content)
-        except (IOError, json.JSONDecodeError):
-            return {"timestamp": None, "data": {}}
-
-    
-
-    def _write_db(self, db_content: Dict):
-        """安全地写入数据库文件"""
-        task_cat = "即将上映-数据库"
-        try:
-            # --- 核心修改：移除这里的 with FileLock ---
-            with open(UPCOMING_DB_FILE, 'w', encoding='utf-8') as f:
-                json.dump(db_content, f, ensure_ascii=False, indent=4)
-        except Exception as e:
-            # --- 核心修改：调整日志，因为锁的错误会在调用方被捕获 ---
-            ui_logger.error(f"❌ 写入数据库时发生IO错误: {e}", task_category=task_cat)
-            raise # 抛出异常让上层处理
+        """读取数据库的完整快照"""
+        return {"timestamp": upcoming_store.get_timestamp(), "data": upcoming_store.get_all()}
 
     def _is_cache_valid(self, db_content: Dict) -> Tuple[bool, str]:
         """检查 Trakt 缓存是否有效"""
@@ -119,6 +97,34 @@ class UpcomingLogic:
         ui_logger.info(f"✅ [步骤 2/3] 预筛选完成。候选条目从 {len(raw_items)} 个减少到 {len(verified_items)} 个。", task_category=task_cat)
         return verified_items
 
+    def _build_item_from_details(self, details: Dict, item: Dict) -> Optional[Dict]:
+        """将 TMDB 详情转换为数据库条目，缺少海报时返回 None"""
+        if not details.get('poster_path'):
+            return None
+        raw_genres = [genre['name'] for genre in details.get('genres', [])]
+        genres = [
+            "科幻奇幻" if g == "Sci-Fi & Fantasy" else g
+            for g in raw_genres
+        ]
+        cast = details.get('credits', {}).get('cast', [])
+        return {
+            "tmdb_id": details['id'],
+            "media_type": item['media_type'],
+            "title": details.get('title') or details.get('name'),
+            "overview": details.get('overview'),
+            "poster_path": details.get('poster_path'),
+            "release_date": item['release_date'],
+            "is_subscribed": False,
+            "subscribed_at": None,
+            "genres": genres,
+            "origin_country": details.get('origin_country', []),
+            "popularity": details.get('popularity', 0),
+            "actors": [actor['name'] for actor in cast[:6]],
+            "is_permanent": False,
+            "is_ignored": False,
+            "is_new": True,
+        }
+
     # backend/upcoming_logic.py (函数替换)
 
     def get_upcoming_list(self, dynamic_filters: Optional[Dict] = None) -> List[Dict]:
@@ -146,11 +152,9 @@ class UpcomingLogic:
 
             # --- 新增：在刷新开始前，重置所有现有条目的 is_new 状态 ---
             ui_logger.info("   - [重置状态] 正在将所有旧条目的“新”标记清除...", task_category=task_cat)
-            reset_count = 0
-            for tmdb_id, item_data in db_content.get('data', {}).items():
-                if item_data.get('is_new', False):
-                    item_data['is_new'] = False
-                    reset_count += 1
+            reset_count = upcoming_store.clear_new_flags()
+            for item_data in db_content.get('data', {}).values():
+                item_data['is_new'] = False
             if reset_count > 0:
                 ui_logger.info(f"   - [重置状态] 完成，共清除了 {reset_count} 个旧的“新”标记。", task_category=task_cat)
             # --- 新增结束 ---
@@ -182,60 +186,52 @@ class UpcomingLogic:
             newly_added_items_for_notification = []
             # --- 新增结束 ---
 
+            # 已存在的条目只同步上映日期；其余条目分批并发获取详情 (全局限速由 TMDB 客户端负责)
+            date_updates = {}
+            items_to_enrich = []
             for item in filtered_items:
                 tmdb_id_str = str(item['tmdb_id'])
-                if tmdb_id_str in db_content['data']:
+                existing = db_content['data'].get(tmdb_id_str)
+                if existing is not None:
                     logging.debug(f"  - [跳过] TMDB ID: {tmdb_id_str} 已存在于本地数据库。")
-                    db_content['data'][tmdb_id_str]['release_date'] = item['release_date']
-                    continue
-                
-                try:
-                    endpoint = f"{item['media_type']}/{item['tmdb_id']}"
-                    params = {'language': 'zh-CN', 'append_to_response': 'images,credits'}
-                    details = self.tmdb_logic._tmdb_request(endpoint, params)
-                    
-                    if not details.get('poster_path'):
+                    if existing.get('release_date') != item['release_date']:
+                        date_updates[tmdb_id_str] = {'release_date': item['release_date']}
+                else:
+                    items_to_enrich.append(item)
+            # 只合并刷新得到的字段，避免覆盖刷新期间用户的订阅 / 忽略等操作
+            db_content['data'].update(upcoming_store.merge_many(date_updates))
+
+            total_to_enrich = len(items_to_enrich)
+            for batch_start in range(0, total_to_enrich, ENRICH_BATCH_SIZE):
+                batch = items_to_enrich[batch_start:batch_start + ENRICH_BATCH_SIZE]
+                requests_list = [
+                    (f"{item['media_type']}/{item['tmdb_id']}", {'language': 'zh-CN', 'append_to_response': 'images,credits'})
+                    for item in batch
+                ]
+                batch_results = self.tmdb_logic.get_many(requests_list)
+
+                batch_new_items = {}
+                for item, details in zip(batch, batch_results):
+                    tmdb_id_str = str(item['tmdb_id'])
+                    if details is None:
+                        logging.error(f"获取 TMDB 详情失败 (ID: {item['tmdb_id']})")
+                        continue
+                    new_item_data = self._build_item_from_details(details, item)
+                    if new_item_data is None:
                         skipped_items_count += 1
                         item_title = details.get('title') or details.get('name', f"ID: {tmdb_id_str}")
                         logging.debug(f"  - [丢弃-调试] TMDB ID: {tmdb_id_str} (《{item_title}》) 因缺少 poster_path 而被忽略。")
                         continue
-                    
-                    raw_genres = [genre['name'] for genre in details.get('genres', [])]
-                    genres = [
-                        "科幻奇幻" if g == "Sci-Fi & Fantasy" else g
-                        for g in raw_genres
-                    ]
-                    origin_country = details.get('origin_country', [])
-                    popularity = details.get('popularity', 0)
-                    cast = details.get('credits', {}).get('cast', [])
-                    actors = [actor['name'] for actor in cast[:6]]
-
-                    new_item_data = {
-                        "tmdb_id": details['id'],
-                        "media_type": item['media_type'],
-                        "title": details.get('title') or details.get('name'),
-                        "overview": details.get('overview'),
-                        "poster_path": details.get('poster_path'),
-                        "release_date": item['release_date'],
-                        "is_subscribed": False,
-                        "subscribed_at": None,
-                        "genres": genres,
-                        "origin_country": origin_country,
-                        "popularity": popularity,
-                        "actors": actors,
-                        "is_permanent": False,
-                        "is_ignored": False,
-                        "is_new": True,
-                    }
-                    db_content['data'][tmdb_id_str] = new_item_data
-                    # --- 新增：将新项目添加到通知列表 ---
-                    newly_added_items_for_notification.append(new_item_data)
-                    # --- 新增结束 ---
-                    new_items_count += 1
+                    batch_new_items[tmdb_id_str] = new_item_data
                     logging.debug(f"  - [新增] 成功获取 TMDB ID: {tmdb_id_str} 的数据。")
-                    time.sleep(0.1)
-                except Exception as e:
-                    logging.error(f"获取 TMDB 详情失败 (ID: {item['tmdb_id']}): {e}")
+
+                # 每批完成后立即落库，前端轮询即可看到已补全的条目
+                db_content['data'].update(upcoming_store.merge_many(batch_new_items, keep_existing=USER_STATE_FIELDS))
+                # --- 新增：将新项目添加到通知列表 ---
+                newly_added_items_for_notification.extend(batch_new_items.values())
+                # --- 新增结束 ---
+                new_items_count += len(batch_new_items)
+                ui_logger.info(f"   - [进度] 已处理 {min(batch_start + ENRICH_BATCH_SIZE, total_to_enrich)}/{total_to_enrich} 个条目，新增 {new_items_count} 个。", task_category=task_cat)
             
             summary_log = f"✅ [步骤 3/3] 完成。新增了 {new_items_count} 条高质量结果到数据库。"
             if skipped_items_count > 0:
@@ -254,6 +250,7 @@ class UpcomingLogic:
             if rules.enabled:
                 ui_logger.info("➡️ [步骤 4/4] 开始执行自动化订阅...", task_category=task_cat)
                 auto_subscribed_count = 0
+                auto_subscribed_items = {}
                 
                 rule_actors = {actor.strip().lower() for actor in rules.actors if actor.strip()}
                 rule_countries = {country.strip().lower() for country in rules.countries if country.strip()}
@@ -262,7 +259,7 @@ class UpcomingLogic:
                      ui_logger.warning("   - [跳过] 自动化订阅已启用，但未配置任何有效规则。", task_category=task_cat)
                 else:
                     today = datetime.now(timezone.utc).date()
-                    for item in db_content['data'].values():
+                    for tmdb_id_str, item in db_content['data'].items():
                         if item.get('is_subscribed'):
                             continue
 
@@ -288,6 +285,7 @@ class UpcomingLogic:
                                 item['is_subscribed'] = True
                                 item['subscribed_at'] = datetime.now(timezone.utc).isoformat()
                                 auto_subscribed_count += 1
+                                auto_subscribed_items[tmdb_id_str] = item
                                 ui_logger.info(f"   - ✅ 自动订阅《{item['title']}》，原因：匹配到演员关键词 '{next(iter(matched_actors))}'。", task_category=task_cat)
                                 continue
 
@@ -298,15 +296,20 @@ class UpcomingLogic:
                                     item['is_subscribed'] = True
                                     item['subscribed_at'] = datetime.now(timezone.utc).isoformat()
                                     auto_subscribed_count += 1
+                                    auto_subscribed_items[tmdb_id_str] = item
                                     ui_logger.info(f"   - ✅ 自动订阅《{item['title']}》，原因：满足国家匹配且热门度 ({item.get('popularity', 0):.2f}) >= {rules.min_popularity}。", task_category=task_cat)
                     
+                    db_content['data'].update(upcoming_store.merge_many({
+                        tmdb_id_str: {'is_subscribed': item['is_subscribed'], 'subscribed_at': item['subscribed_at']}
+                        for tmdb_id_str, item in auto_subscribed_items.items()
+                    }))
                     if auto_subscribed_count > 0:
                         ui_logger.info(f"🎉 [步骤 4/4] 自动化订阅完成，共新增 {auto_subscribed_count} 个订阅。", task_category=task_cat)
                     else:
                         ui_logger.info("   - [步骤 4/4] 自动化订阅检查完成，没有发现符合条件的新项目。", task_category=task_cat)
             
             db_content['timestamp'] = datetime.now(timezone.utc).isoformat()
-            self._write_db(db_content)
+            upcoming_store.set_timestamp(db_content['timestamp'])
             ui_logger.info(f"🎉 数据库更新完毕！Trakt 日历缓存时间戳已刷新。", task_category=task_cat)
 
         # --- 核心修改：应用两步过滤，并确保 is_new 字段存在 ---
@@ -331,10 +334,11 @@ class UpcomingLogic:
         return sorted(final_list, key=lambda x: (x['release_date'], -x.get('popularity', 0)))
 
 
-    def get_all_data(self) -> List[Dict]:
-        """获取数据库中所有对前端可见的项目"""
+    def get_all_data(self, quiet: bool = False) -> List[Dict]:
+        """获取数据库中所有对前端可见的项目；quiet 用于刷新期间前端轮询部分结果，不输出日志"""
         task_cat = "即将上映-获取"
-        ui_logger.info("➡️ [核心入口] get_all_data 被调用 (仅读取本地数据库)。", task_category=task_cat)
+        if not quiet:
+            ui_logger.info("➡️ [核心入口] get_all_data 被调用 (仅读取本地数据库)。", task_category=task_cat)
         db_content = self._read_db()
         
         # --- 核心修改：应用两步过滤 ---
@@ -446,30 +450,18 @@ class UpcomingLogic:
     def update_subscription(self, tmdb_id: int, subscribe: bool) -> bool:
         task_cat = "即将上映-订阅"
         try:
-            # --- 核心修改：将 FileLock 移到这里，并管理完整的读-改-写事务 ---
-            with FileLock(UPCOMING_DB_FILE + ".lock", timeout=10):
-                db_content = self._read_db()
-                tmdb_id_str = str(tmdb_id)
-                
-                if tmdb_id_str not in db_content['data']:
-                    ui_logger.error(f"❌ 操作失败：数据库中未找到 TMDB ID 为 {tmdb_id} 的项目。", task_category=task_cat)
-                    return False
-                
-                item = db_content['data'][tmdb_id_str]
+            def mutate(item):
                 item['is_subscribed'] = subscribe
                 item['subscribed_at'] = datetime.now(timezone.utc).isoformat() if subscribe else None
-                
-                # 直接在这里写入，而不是调用 _write_db
-                with open(UPCOMING_DB_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(db_content, f, ensure_ascii=False, indent=4)
-            # --- 修改结束 ---
+
+            item = upcoming_store.update(tmdb_id, mutate)
+            if item is None:
+                ui_logger.error(f"❌ 操作失败：数据库中未找到 TMDB ID 为 {tmdb_id} 的项目。", task_category=task_cat)
+                return False
                 
             action_text = "订阅" if subscribe else "取消订阅"
             ui_logger.info(f"✅ 成功{action_text}《{item['title']}》！", task_category=task_cat)
             return True
-        except Timeout:
-            ui_logger.error("❌ 操作失败：获取文件锁超时，另一进程可能正在操作数据库。", task_category=task_cat)
-            return False
         except Exception as e:
             ui_logger.error(f"❌ 操作失败: {e}", task_category=task_cat)
             return False
@@ -477,26 +469,14 @@ class UpcomingLogic:
     def update_permanence(self, tmdb_id: int, is_permanent: bool) -> bool:
         task_cat = "即将上映-收藏"
         try:
-            with FileLock(UPCOMING_DB_FILE + ".lock", timeout=10):
-                db_content = self._read_db()
-                tmdb_id_str = str(tmdb_id)
-                
-                if tmdb_id_str not in db_content['data']:
-                    ui_logger.error(f"❌ 操作失败：数据库中未找到 TMDB ID 为 {tmdb_id} 的项目。", task_category=task_cat)
-                    return False
-                
-                item = db_content['data'][tmdb_id_str]
-                item['is_permanent'] = is_permanent
-                
-                with open(UPCOMING_DB_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(db_content, f, ensure_ascii=False, indent=4)
+            item = upcoming_store.update(tmdb_id, lambda item: item.update(is_permanent=is_permanent))
+            if item is None:
+                ui_logger.error(f"❌ 操作失败：数据库中未找到 TMDB ID 为 {tmdb_id} 的项目。", task_category=task_cat)
+                return False
             
             action_text = "永久收藏" if is_permanent else "取消收藏"
             ui_logger.info(f"✅ 成功{action_text}《{item['title']}》！", task_category=task_cat)
             return True
-        except Timeout:
-            ui_logger.error("❌ 操作失败：获取文件锁超时。", task_category=task_cat)
-            return False
         except Exception as e:
             ui_logger.error(f"❌ 操作失败: {e}", task_category=task_cat)
             return False
@@ -506,24 +486,20 @@ class UpcomingLogic:
         """将指定项目标记为不感兴趣，并联动取消其永久收藏状态。"""
         task_cat = "即将上映-忽略"
         try:
-            with FileLock(UPCOMING_DB_FILE + ".lock", timeout=10):
-                db_content = self._read_db()
-                tmdb_id_str = str(tmdb_id)
-                
-                if tmdb_id_str not in db_content['data']:
-                    ui_logger.error(f"❌ 操作失败：数据库中未找到 TMDB ID 为 {tmdb_id} 的项目。", task_category=task_cat)
-                    return False
-                
-                item = db_content['data'][tmdb_id_str]
-                
-                # --- 核心修改：联动逻辑 ---
+            was_permanent = False
+
+            # --- 核心修改：联动逻辑 ---
+            def mutate(item):
+                nonlocal was_permanent
                 was_permanent = item.get('is_permanent', False)
                 item['is_ignored'] = True
                 item['is_permanent'] = False # 无论之前是什么状态，都强制设为 false
-                # --- 修改结束 ---
-                
-                with open(UPCOMING_DB_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(db_content, f, ensure_ascii=False, indent=4)
+            # --- 修改结束 ---
+
+            item = upcoming_store.update(tmdb_id, mutate)
+            if item is None:
+                ui_logger.error(f"❌ 操作失败：数据库中未找到 TMDB ID 为 {tmdb_id} 的项目。", task_category=task_cat)
+                return False
             
             # --- 核心修改：增强日志 ---
             log_message = f"✅ 已将《{item['title']}》标记为不感兴趣，它将不再显示。"
@@ -533,9 +509,6 @@ class UpcomingLogic:
             # --- 修改结束 ---
             
             return True
-        except Timeout:
-            ui_logger.error("❌ 操作失败：获取文件锁超时，另一进程可能正在操作数据库。", task_category=task_cat)
-            return False
         except Exception as e:
             ui_logger.error(f"❌ 操作失败: {e}", task_category=task_cat)
             return False
@@ -654,57 +627,52 @@ class UpcomingLogic:
         ui_logger.info("➡️ 开始执行订阅列表过期项目清理任务...", task_category=task_cat)
         
         try:
-            with FileLock(UPCOMING_DB_FILE + ".lock", timeout=30):
-                db_content = self._read_db()
-                if not db_content['data']:
-                    ui_logger.info("✅ 数据库为空，无需清理。", task_category=task_cat)
-                    return
-
-                original_count = len(db_content['data'])
-                today_str = datetime.now().strftime('%Y-%m-%d')
-                
-                # --- 核心修改：引入详细的分类和计数 ---
-                items_to_keep = {}
-                items_to_prune = []
-                exempted_count = 0
+            db_content = self._read_db()
+            if not db_content['data']:
+                ui_logger.info("✅ 数据库为空，无需清理。", task_category=task_cat)
+                return
+
+            original_count = len(db_content['data'])
+            today_str = datetime.now().strftime('%Y-%m-%d')
+            
+            # --- 核心修改：引入详细的分类和计数 ---
+            items_to_keep = {}
+            items_to_prune = []
+            exempted_count = 0
 
-                for tmdb_id, item in db_content['data'].items():
-                    is_expired = item.get('release_date') and item['release_date'] < today_str
-                    is_permanent = item.get('is_permanent', False)
+            for tmdb_id, item in db_content['data'].items():
+                is_expired = item.get('release_date') and item['release_date'] < today_str
+                is_permanent = item.get('is_permanent', False)
 
-                    if is_expired and not is_permanent:
-                        items_to_prune.append(item)
-                    else:
-                        if is_expired and is_permanent:
-                            exempted_count += 1
-                            logging.debug(f"  - [豁免]《{item.get('title', tmdb_id)}》已过期但因永久收藏被保留。")
-                        items_to_keep[tmdb_id] = item
+                if is_expired and not is_permanent:
+                    items_to_prune.append((tmdb_id, item))
+                else:
+                    if is_expired and is_permanent:
+                        exempted_count += 1
+                        logging.debug(f"  - [豁免]《{item.get('title', tmdb_id)}》已过期但因永久收藏被保留。")
+                    items_to_keep[tmdb_id] = item
+            
+            pruned_count = len(items_to_prune)
+            
+            if pruned_count > 0:
+                upcoming_store.delete_many(tmdb_id for tmdb_id, _ in items_to_prune)
                 
-                pruned_count = len(items_to_prune)
+                summary_log = f"✅ 清理完成！共移除了 {pruned_count} 个已上映的过期项目。"
+                if exempted_count > 0:
+                    summary_log += f" (另有 {exempted_count} 个项目因永久收藏被豁免)"
+                ui_logger.info(summary_log, task_category=task_cat)
                 
-                if pruned_count > 0:
-                    db_content['data'] = items_to_keep
-                    with open(UPCOMING_DB_FILE, 'w', encoding='utf-8') as f:
-                        json.dump(db_content, f, ensure_ascii=False, indent=4)
-                    
-                    summary_log = f"✅ 清理完成！共移除了 {pruned_count} 个已上映的过期项目。"
-                    if exempted_count > 0:
-                        summary_log += f" (另有 {exempted_count} 个项目因永久收藏被豁免)"
-                    ui_logger.info(summary_log, task_category=task_cat)
-                    
-                    # 打印被删除的项目的详细日志
-                    pruned_titles = "、".join([f"《{item.get('title', '未知')}》" for item in items_to_prune])
-                    logging.info(f"  - [详情] 被移除的项目: {pruned_titles}")
+                # 打印被删除的项目的详细日志
+                pruned_titles = "、".join([f"《{item.get('title', '未知')}》" for _, item in items_to_prune])
+                logging.info(f"  - [详情] 被移除的项目: {pruned_titles}")
+
+            else:
+                summary_log = "✅ 检查完成，没有发现需要清理的过期项目。"
+                if exempted_count > 0:
+                    summary_log += f" (有 {exempted_count} 个日期过期项目因永久收藏被保留)"
+                ui_logger.info(summary_log, task_category=task_cat)
+            # --- 修改结束 ---
 
-                else:
-                    summary_log = "✅ 检查完成，没有发现需要清理的过期项目。"
-                    if exempted_count > 0:
-                        summary_log += f" (有 {exempted_count} 个日期过期项目因永久收藏被保留)"
-                    ui_logger.info(summary_log, task_category=task_cat)
-                # --- 修改结束 ---
-
-        except Timeout:
-            ui_logger.error("❌ 清理任务失败：获取文件锁超时。", task_category=task_cat)
         except Exception as e:
             ui_logger.error(f"❌ 清理任务时发生未知错误: {e}", task_category=task_cat, exc_info=True)
 
@@ -799,27 +767,15 @@ class UpcomingLogic:
             }
 
             # 4. 写入数据库
-            with FileLock(UPCOMING_DB_FILE + ".lock", timeout=10):
-                db_content = self._read_db()
-                tmdb_id_str = str(tmdb_id)
-                
-                if tmdb_id_str in db_content['data']:
-                    ui_logger.info(f"数据库中已存在《{item_data['title']}》，将直接将其设置为永久收藏。", task_category=task_cat)
-                    db_content['data'][tmdb_id_str]['is_permanent'] = True
-                else:
-                    db_content['data'][tmdb_id_str] = item_data
-                
-                with open(UPCOMING_DB_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(db_content, f, ensure_ascii=False, indent=4)
+            if upcoming_store.update(tmdb_id, lambda item: item.update(is_permanent=True)) is not None:
+                ui_logger.info(f"数据库中已存在《{item_data['title']}》，将直接将其设置为永久收藏。", task_category=task_cat)
+            else:
+                upcoming_store.upsert_many({str(tmdb_id): item_data})
             
             msg = f"🎉 成功将《{item_data['title']}》添加到永久收藏！"
             ui_logger.info(msg, task_category=task_cat)
             return True, msg
 
-        except Timeout:
-            msg = "操作失败：获取文件锁超时。"
-            ui_logger.error(f"❌ {msg}", task_category=task_cat)
-            return False, msg
         except Exception as e:
             msg = f"操作失败: {e}"
             ui_logger.error(f"❌ {msg}", task_category=task_cat, exc_info=True)
@@ -43,11 +43,11 @@ def get_upcoming_list(dynamic_filters: Optional[Dict] = None):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/data")
-def get_all_data():
-    """获取数据库中所有未过期的项目"""
+def get_all_data(quiet: bool = False):
+    """获取数据库中所有未过期的项目 (刷新进行中时为已补全的部分结果)"""
     config = app_config.load_app_config()
     logic = UpcomingLogic(config)
-    return logic.get_all_data()
+    return logic.get_all_data(quiet=quiet)
 
 @router.post("/subscribe")
 def subscribe_item(payload: Dict[str, int]):
@@ -0,0 +1,163 @@
+# backend/upcoming_store.py
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from typing import Dict, Optional, Any, Iterable, Callable
+
+UPCOMING_STORE_FILE = os.path.join('/app/data', 'upcoming_database.db')
+# 旧版的单文件 JSON 数据库，首次打开存储时会自动导入
+LEGACY_UPCOMING_JSON_FILE = os.path.join('/app/data', 'upcoming_database.json')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS upcoming_items (
+    tmdb_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class UpcomingStore:
+    """
+    基于 SQLite 的即将上映数据库，取代整文件重写的 upcoming_database.json。
+    - 每个条目独立存储，刷新时按批写入，前端在刷新过程中即可读到已完成的部分。
+    - 订阅 / 收藏 / 忽略等操作只更新单条记录，在同一把锁内完成读-改-写。
+    """
+    def __init__(self, db_path: str = UPCOMING_STORE_FILE):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._conn is None:
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+                conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(_SCHEMA)
+                conn.commit()
+                self._conn = conn
+                self._import_legacy_json()
+            return self._conn
+
+    def _import_legacy_json(self):
+        """一次性导入旧版 upcoming_database.json，之后不再读取该文件"""
+        conn = self._conn
+        if conn.execute("SELECT value FROM meta WHERE key = 'legacy_imported'").fetchone():
+            return
+        if os.path.exists(LEGACY_UPCOMING_JSON_FILE):
+            try:
+                with open(LEGACY_UPCOMING_JSON_FILE, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                legacy_db = json.loads(content) if content else {}
+                legacy_data = legacy_db.get('data', {})
+                self._write_many(conn, legacy_data)
+                if legacy_db.get('timestamp'):
+                    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('timestamp', ?)", (legacy_db['timestamp'],))
+                logging.info(f"【即将上映存储】已从旧版数据库文件导入 {len(legacy_data)} 个条目。")
+            except (IOError, json.JSONDecodeError) as e:
+                logging.error(f"【即将上映存储】导入旧版数据库文件失败: {e}")
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', '1')")
+        conn.commit()
+
+    @staticmethod
+    def _write_many(conn: sqlite3.Connection, items: Dict[str, Dict[str, Any]]):
+        conn.executemany(
+            "INSERT OR REPLACE INTO upcoming_items (tmdb_id, data) VALUES (?, ?)",
+            ((str(tmdb_id), json.dumps(item, ensure_ascii=False)) for tmdb_id, item in items.items())
+        )
+
+    # --- 读取 ---
+
+    def get(self, tmdb_id) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._get_conn().execute("SELECT data FROM upcoming_items WHERE tmdb_id = ?", (str(tmdb_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_all(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            rows = self._get_conn().execute("SELECT tmdb_id, data FROM upcoming_items").fetchall()
+        return {tmdb_id: json.loads(data) for tmdb_id, data in rows}
+
+    def get_timestamp(self) -> Optional[str]:
+        with self._lock:
+            row = self._get_conn().execute("SELECT value FROM meta WHERE key = 'timestamp'").fetchone()
+        return row[0] if row else None
+
+    # --- 写入 ---
+
+    def set_timestamp(self, timestamp: str):
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('timestamp', ?)", (timestamp,))
+            conn.commit()
+
+    def upsert_many(self, items: Dict[str, Dict[str, Any]]):
+        if not items:
+            return
+        with self._lock:
+            conn = self._get_conn()
+            self._write_many(conn, items)
+            conn.commit()
+
+    def merge_many(self, items: Dict[str, Dict[str, Any]], keep_existing: Iterable[str] = ()) -> Dict[str, Dict[str, Any]]:
+        """
+        按字段合并写入，返回合并后的条目：已存在的条目只覆盖传入的字段，其余字段 (如用户的订阅 / 忽略状态) 保持库中的值；
+        keep_existing 中的字段只在库中缺失时才写入；不存在的条目直接插入。
+        """
+        if not items:
+            return {}
+        keep_existing = set(keep_existing)
+        merged: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            conn = self._get_conn()
+            for tmdb_id, fields in items.items():
+                row = conn.execute("SELECT data FROM upcoming_items WHERE tmdb_id = ?", (str(tmdb_id),)).fetchone()
+                if row is None:
+                    merged[str(tmdb_id)] = dict(fields)
+                    continue
+                current = json.loads(row[0])
+                current.update({k: v for k, v in fields.items() if k not in keep_existing or k not in current})
+                merged[str(tmdb_id)] = current
+            self._write_many(conn, merged)
+            conn.commit()
+        return merged
+
+    def update(self, tmdb_id, mutate: Callable[[Dict[str, Any]], None]) -> Optional[Dict[str, Any]]:
+        """对单个条目做原子的读-改-写，条目不存在时返回 None"""
+        with self._lock:
+            item = self.get(tmdb_id)
+            if item is None:
+                return None
+            mutate(item)
+            self.upsert_many({str(tmdb_id): item})
+            return item
+
+    def delete_many(self, tmdb_ids: Iterable) -> int:
+        ids = [(str(i),) for i in tmdb_ids]
+        if not ids:
+            return 0
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany("DELETE FROM upcoming_items WHERE tmdb_id = ?", ids)
+            conn.commit()
+        return len(ids)
+
+    def clear_new_flags(self) -> int:
+        """清除所有条目的“新”标记，返回被清除的数量"""
+        with self._lock:
+            flagged = {tmdb_id: item for tmdb_id, item in self.get_all().items() if item.get('is_new', False)}
+            for item in flagged.values():
+                item['is_new'] = False
+            self.upsert_many(flagged)
+        return len(flagged)
+
+
+upcoming_store = UpcomingStore()
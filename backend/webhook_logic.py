@@ -6,16 +6,45 @@ import time
 import os
 import json
 from datetime import datetime
+from typing import Any, Callable, Optional
 
 from log_manager import ui_logger
 from models import AppConfig, WebhookConfig
 from task_manager import TaskManager
+from emby_client import emby_client
 import config as app_config
 
 from douban_fixer_logic import DoubanFixerLogic
 from actor_localizer_logic import ActorLocalizerLogic
 from douban_poster_updater_logic import DoubanPosterUpdaterLogic
-from douban_manager import DOUBAN_CACHE_FILE, _parse_folder_name
+from douban_manager import _parse_folder_name, build_douban_item_data
+from douban_store import douban_store
+from id_map_service import id_map_service
+
+# 就绪轮询的退避参数：首次间隔、退避倍数与最大间隔 (秒)
+READY_POLL_INITIAL_INTERVAL = 2.0
+READY_POLL_BACKOFF = 1.5
+READY_POLL_MAX_INTERVAL = 15.0
+# 元数据文件最后修改后需静置的时间 (秒)，避免读到插件尚未写完的文件
+DOUBAN_FILE_SETTLE_SECONDS = 2.0
+
+
+def _poll_until(check: Callable[[], Any], timeout: float, cancellation_event: threading.Event) -> Any:
+    """
+    以指数退避反复调用 check，直到其返回真值、超时或任务被取消。
+    返回 check 最后一次的结果 (超时或取消时为假值)。
+    """
+    deadline = time.monotonic() + max(0, timeout)
+    interval = READY_POLL_INITIAL_INTERVAL
+    while True:
+        result = check()
+        remaining = deadline - time.monotonic()
+        if result or remaining <= 0:
+            return result
+        if cancellation_event.wait(min(interval, remaining)):
+            return None
+        interval = min(interval * READY_POLL_BACKOFF, READY_POLL_MAX_INTERVAL)
+
 
 class WebhookLogic:
     def __init__(self, config: AppConfig):
@@ -23,13 +52,14 @@ class WebhookLogic:
         self.server_config = config.server_config
         self.webhook_config = getattr(config, 'webhook_config', WebhookConfig())
         self.processed_flag_key = "ToolboxWebhookProcessed"
+        self.session = emby_client
 
     def _get_emby_item_details(self, item_id: str, fields: str = "ProviderIds,Name,Type"):
         import requests
         url = f"{self.server_config.server}/Users/{self.server_config.user_id}/Items/{item_id}"
         params = {"api_key": self.server_config.api_key, "Fields": fields}
         try:
-            response = requests.get(url, params=params, timeout=15)
+            response = self.session.get(url, params=params, timeout=15)
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
@@ -39,7 +69,6 @@ class WebhookLogic:
     def _set_processed_flag(self, item_id: str) -> bool:
         logging.info(f"【Webhook任务】正在为媒体项 (ID: {item_id}) 写入处理完成标记...")
         try:
-            import requests
             item_details = self._get_emby_item_details(item_id, fields="ProviderIds")
             if not item_details:
                 logging.error(f"【Webhook任务】写入标记前获取媒体详情失败，无法写入标记。")
@@ -51,7 +80,7 @@ class WebhookLogic:
             headers = {'Content-Type': 'application/json'}
             params = {"api_key": self.server_config.api_key}
             
-            response = requests.post(update_url, params=params, json=item_details, headers=headers, timeout=20)
+            response = self.session.post(update_url, params=params, json=item_details, headers=headers, timeout=20)
             response.raise_for_status()
             
             logging.info(f"【Webhook任务】成功为媒体项 (ID: {item_id}) 写入处理完成标记。")
@@ -63,115 +92,121 @@ class WebhookLogic:
     # --- 新增函数：快速检查主缓存是否存在指定豆瓣ID ---
     def _check_cache_exists(self, douban_id: str) -> bool:
         """
-        快速检查主缓存文件 (douban_data.json) 中是否存在指定的豆瓣ID。
+        快速检查豆瓣数据存储中是否存在指定的豆瓣ID (主键点查)。
         """
-        if not os.path.exists(DOUBAN_CACHE_FILE):
-            logging.info("【Webhook-快速检查】主缓存文件不存在，无法进行检查。")
-            return False
         try:
-            with open(DOUBAN_CACHE_FILE, 'r', encoding='utf-8') as f:
-                douban_map = json.load(f)
-            return douban_id in douban_map
-        except (IOError, json.JSONDecodeError) as e:
-            logging.error(f"【Webhook-快速检查】读取主缓存文件失败: {e}")
+            return douban_store.contains(douban_id)
+        except Exception as e:
+            logging.error(f"【Webhook-快速检查】查询豆瓣数据存储失败: {e}")
             return False
     
 
+    def _get_douban_sub_dir(self, media_type: str) -> Optional[str]:
+        douban_data_root = self.config.douban_config.directory
+        if not douban_data_root or not os.path.isdir(douban_data_root):
+            return None
+        return os.path.join(douban_data_root, 'douban-movies' if media_type == 'Movie' else 'douban-tv')
+
+    @staticmethod
+    def _find_douban_folder(target_dir: str, douban_id: str) -> Optional[str]:
+        with os.scandir(target_dir) as entries:
+            for entry in entries:
+                parsed_db_id, _ = _parse_folder_name(entry.name)
+                if parsed_db_id == douban_id and entry.is_dir():
+                    return entry.path
+        return None
+
+    def _required_provider_ids(self) -> set:
+        """后续步骤需要的 ProviderIds：豆瓣ID 用于数据同步与中文化 (缺失时会触发ID修复)，TMDB ID 用于追更判断与角色映射"""
+        return {'tmdb', 'douban'}
+
+    def _wait_for_provider_ids(self, item_id: str, cancellation_event: threading.Event, timeout: float) -> Optional[dict]:
+        """
+        轮询 Emby，直到后续步骤需要的 ProviderIds 全部刮削完成 (豆瓣插件通常晚于 TMDB 写入)；
+        超时后返回最后一次获取到的详情，缺失的ID交由后续步骤处理。
+        """
+        required = self._required_provider_ids()
+        last_details = {}
+
+        def check():
+            details = self._get_emby_item_details(item_id)
+            if details:
+                last_details['value'] = details
+                provider_keys = {k.lower() for k, v in details.get("ProviderIds", {}).items() if v}
+                return details if required <= provider_keys else None
+            return None
+
+        return _poll_until(check, timeout, cancellation_event) or last_details.get('value')
+
+    def _wait_for_douban_file(self, douban_id: str, media_type: str, cancellation_event: threading.Event, timeout: float) -> bool:
+        """
+        监视豆瓣数据目录，直到豆瓣插件写入目标文件夹及其元数据文件。
+        只有子目录的修改时间变化时才重新扫描目录，文件最后修改超过 DOUBAN_FILE_SETTLE_SECONDS 秒才视为写入完成。
+        """
+        target_dir = self._get_douban_sub_dir(media_type)
+        if not target_dir:
+            return False
+        json_filename = 'all.json' if media_type == 'Movie' else 'series.json'
+        state = {"dir_mtime": None, "folder": None}
+
+        def check():
+            if state["folder"] is None:
+                try:
+                    dir_mtime = os.stat(target_dir).st_mtime_ns
+                except OSError:
+                    return False
+                if dir_mtime == state["dir_mtime"]:
+                    return False
+                state["dir_mtime"] = dir_mtime
+                state["folder"] = self._find_douban_folder(target_dir, douban_id)
+                if state["folder"] is None:
+                    return False
+            try:
+                file_mtime = os.stat(os.path.join(state["folder"], json_filename)).st_mtime
+            except OSError:
+                return False
+            return time.time() - file_mtime >= DOUBAN_FILE_SETTLE_SECONDS
+
+        return bool(_poll_until(check, timeout, cancellation_event))
+
     def _update_douban_cache_incrementally(self, douban_id: str, media_type: str) -> bool:
         logging.info(f"【Webhook-数据同步】开始为豆瓣ID {douban_id} 执行增量缓存更新...")
         
         try:
-            from filelock import FileLock, Timeout
-            # --- 核心修改：定义锁文件目录和路径 ---
-            lock_dir = os.path.join(os.path.dirname(DOUBAN_CACHE_FILE), "locks")
-            os.makedirs(lock_dir, exist_ok=True)
-            lock_path = os.path.join(lock_dir, os.path.basename(DOUBAN_CACHE_FILE) + ".lock")
-            # --- 结束修改 ---
-
-            # --- 核心修改：使用新的 lock_path ---
-            lock = FileLock(lock_path, timeout=10)
-            # --- 结束修改 ---
-            with lock:
-                if os.path.exists(DOUBAN_CACHE_FILE):
-                    with open(DOUBAN_CACHE_FILE, 'r', encoding='utf-8') as f:
-                        douban_map = json.load(f)
-                else:
-                    douban_map = {}
-                
-                if douban_id in douban_map:
-                    logging.info(f"【Webhook-数据同步】豆瓣ID {douban_id} 的数据已存在于缓存中，跳过文件更新。")
-                    return True
-
-                douban_data_root = self.config.douban_config.directory
-                if not douban_data_root or not os.path.isdir(douban_data_root):
-                    logging.error("【Webhook-数据同步】豆瓣数据根目录未配置或无效，无法进行增量更新。")
-                    return False
+            if douban_store.contains(douban_id):
+                logging.info(f"【Webhook-数据同步】豆瓣ID {douban_id} 的数据已存在于缓存中，跳过更新。")
+                return True
 
-                sub_dir = 'douban-movies' if media_type == 'Movie' else 'douban-tv'
-                target_dir = os.path.join(douban_data_root, sub_dir)
+            target_dir = self._get_douban_sub_dir(media_type)
+            if not target_dir:
+                logging.error("【Webhook-数据同步】豆瓣数据根目录未配置或无效，无法进行增量更新。")
+                return False
 
-                if not os.path.isdir(target_dir):
-                    logging.error(f"【Webhook-数据同步】找不到豆瓣数据子目录: {target_dir}")
-                    return False
+            if not os.path.isdir(target_dir):
+                logging.error(f"【Webhook-数据同步】找不到豆瓣数据子目录: {target_dir}")
+                return False
 
-                found_folder = None
-                for folder_name in os.listdir(target_dir):
-                    parsed_db_id, _ = _parse_folder_name(folder_name)
-                    if parsed_db_id == douban_id:
-                        found_folder = os.path.join(target_dir, folder_name)
-                        break
-                
-                if not found_folder:
-                    logging.error(f"【Webhook-数据同步】在 {target_dir} 中未找到与豆瓣ID {douban_id} 匹配的文件夹。")
-                    return False
+            found_folder = self._find_douban_folder(target_dir, douban_id)
+            if not found_folder:
+                logging.error(f"【Webhook-数据同步】在 {target_dir} 中未找到与豆瓣ID {douban_id} 匹配的文件夹。")
+                return False
 
-                json_filename = 'all.json' if media_type == 'Movie' else 'series.json'
-                json_path = os.path.join(found_folder, json_filename)
+            json_filename = 'all.json' if media_type == 'Movie' else 'series.json'
+            json_path = os.path.join(found_folder, json_filename)
 
-                if not os.path.isfile(json_path):
-                    logging.error(f"【Webhook-数据同步】在目录【{found_folder}】中未找到元数据文件 {json_filename}。")
-                    return False
+            if not os.path.isfile(json_path):
+                logging.error(f"【Webhook-数据同步】在目录【{found_folder}】中未找到元数据文件 {json_filename}。")
+                return False
 
-                with open(json_path, 'r', encoding='utf-8') as f:
-                    new_data = json.load(f)
+            with open(json_path, 'r', encoding='utf-8') as f:
+                new_data = json.load(f)
 
+            imdb_id = _parse_folder_name(os.path.basename(found_folder))[1]
+            item_data = build_douban_item_data(new_data, media_type, imdb_id, self.config.douban_config.extra_fields)
+            douban_store.upsert(douban_id, item_data)
             
-                
-                item_data = {
-                    'type': media_type,
-                    'title': new_data.get('title', 'N/A'),
-                    'year': new_data.get('year', ''),
-                    'genres': new_data.get('genres', []),
-                    'pic': new_data.get('pic', {}),
-                    'actors': [
-                        {
-                            'id': actor.get('id'),
-                            'name': actor.get('name'),
-                            'latin_name': actor.get('latin_name'),
-                            'character': actor.get('character'),
-                            'avatar': actor.get('avatar', {})
-                        } for actor in new_data.get('actors', [])
-                    ],
-                    'imdb_id': _parse_folder_name(os.path.basename(found_folder))[1],
-                    'countries': new_data.get('countries', [])
-                }
-                
-                extra_fields = self.config.douban_config.extra_fields
-                if 'rating' in extra_fields: item_data['rating'] = new_data.get('rating', {}).get('value')
-                if 'pubdate' in extra_fields: item_data['pubdate'] = new_data.get('pubdate', [])
-                if 'card_subtitle' in extra_fields: item_data['card_subtitle'] = new_data.get('card_subtitle', '')
-                if 'languages' in extra_fields: item_data['languages'] = new_data.get('languages', [])
-                if 'durations' in extra_fields and media_type == 'Movie': item_data['durations'] = new_data.get('durations', [])
-
-                douban_map[douban_id] = item_data
-                with open(DOUBAN_CACHE_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(douban_map, f, ensure_ascii=False, indent=4)
-                
-                logging.info(f"【Webhook-数据同步】成功将豆瓣ID {douban_id} 的数据增量更新到缓存文件。")
-                return True
-        except Timeout:
-            logging.error("【Webhook-数据同步】获取文件锁超时，另一个进程可能正在写入缓存文件。")
-            return False
+            logging.info(f"【Webhook-数据同步】成功将豆瓣ID {douban_id} 的数据增量写入豆瓣数据存储。")
+            return True
         except Exception as e:
             logging.error(f"【Webhook-数据同步】处理或写入新豆瓣数据时失败: {e}", exc_info=True)
             return False
@@ -179,8 +214,7 @@ class WebhookLogic:
 
     def process_new_media_task(self, item_id: str, cancellation_event: threading.Event, series_id: str):
         # --- 新增：从 main 导入全局标记集合 ---
-        from main import main_task_completed_series, episode_sync_queue_lock, id_map_update_lock, scan_and_rename_queue, scan_and_rename_queue_lock
-        import main as main_module
+        from main import main_task_completed_series, episode_sync_queue_lock, scan_and_rename_queue, scan_and_rename_queue_lock
         # --- 新增结束 ---
         from tmdb_logic import TmdbLogic
         from chasing_center_logic import ChasingCenterLogic
@@ -222,13 +256,13 @@ class WebhookLogic:
 
         wait_time = self.webhook_config.initial_wait_time
 
-        ui_logger.info(f"【步骤 1/9 | 初始等待】等待 {wait_time} 秒，以便 Emby 自动刮削... (可配置)", task_category=task_cat)
-
-        time.sleep(wait_time)
+        ui_logger.info(f"【步骤 1/9 | 等待刮削】正在轮询 Emby，等待刮削出 TMDB 与豆瓣 ID (最长 {wait_time} 秒，可配置)...", task_category=task_cat)
+        wait_started = time.monotonic()
+        item_details = self._wait_for_provider_ids(item_id, cancellation_event, wait_time)
         if cancellation_event.is_set(): return
+        ui_logger.info(f"【步骤 1/9 | 等待刮削】等待结束，耗时 {time.monotonic() - wait_started:.0f} 秒。", task_category=task_cat)
 
         ui_logger.info(f"【步骤 2/9 | 获取豆瓣ID】开始...", task_category=task_cat)
-        item_details = self._get_emby_item_details(item_id)
         if not item_details:
             ui_logger.error(f"等待后无法再次获取媒体【{item_name}】的详细信息，任务中止。", task_category=task_cat)
             return
@@ -288,12 +322,16 @@ class WebhookLogic:
         else:
             ui_logger.info(f"【智能等待】未命中缓存，需要等待豆瓣插件下载元数据。", task_category=task_cat)
             wait_time_for_plugin = self.webhook_config.plugin_wait_time
-            ui_logger.info(f"【智能等待】开始等待 {wait_time_for_plugin} 秒... (此时间可在“定时任务”页面的Webhook设置中修改)", task_category=task_cat)
-            time.sleep(wait_time_for_plugin)
-            
+            ui_logger.info(f"【智能等待】正在监视豆瓣数据目录，等待插件写入元数据 (最长 {wait_time_for_plugin} 秒，可在“定时任务”页面的Webhook设置中修改)...", task_category=task_cat)
+            wait_started = time.monotonic()
+            file_ready = self._wait_for_douban_file(douban_id, item_type, cancellation_event, wait_time_for_plugin)
+
             if cancellation_event.is_set(): return
 
-            ui_logger.info(f"【智能等待】等待结束，开始尝试从本地文件系统增量更新缓存。", task_category=task_cat)
+            if file_ready:
+                ui_logger.info(f"【智能等待】检测到元数据文件 (耗时 {time.monotonic() - wait_started:.0f} 秒)，开始从本地文件系统增量更新缓存。", task_category=task_cat)
+            else:
+                ui_logger.info(f"【智能等待】等待超时，仍尝试从本地文件系统增量更新缓存。", task_category=task_cat)
             if not self._update_douban_cache_incrementally(douban_id, item_type):
                 ui_logger.warning(f"【智能等待】增量更新失败。未能从本地文件找到豆瓣ID {douban_id} 的元数据，后续流程可能失败或使用旧数据。", task_category=task_cat)
         
@@ -326,7 +364,7 @@ class WebhookLogic:
                     ui_logger.info(f"   - 🔄 [角色恢复] 开始将已存在的中文角色名应用到新入库的媒体项...", task_category=task_cat)
                     role_mapper_logic = ActorRoleMapperLogic(self.config)
                     map_data = actor_role_map[map_key]
-                    ui_logger.info(f"   - [索引构建] 正在拉取全库演员数据以加速匹配 (Webhook模式)...", task_category=task_cat)
+                    ui_logger.info(f"   - [索引构建] 正在获取共享演员索引以加速匹配 (Webhook模式)...", task_category=task_cat)
                     person_index = role_mapper_logic._fetch_all_persons_index()
                     
                     role_mapper_logic.restore_single_map_task(
@@ -352,7 +390,7 @@ class WebhookLogic:
             ui_logger.info(f"【步骤 6/9 | 演员中文化】开始...", task_category=task_cat)
 
             role_mapper_logic_for_index = ActorRoleMapperLogic(self.config)
-            ui_logger.info(f"   - [索引构建] 正在拉取全库演员数据以加速匹配 (Webhook模式)...", task_category=task_cat)
+            ui_logger.info(f"   - [索引构建] 正在获取共享演员索引以加速匹配 (Webhook模式)...", task_category=task_cat)
             person_index = role_mapper_logic_for_index._fetch_all_persons_index()
             actor_localization_success = False
             try:
@@ -464,9 +502,6 @@ class WebhookLogic:
         else:
             ui_logger.warning(f"媒体【{item_name}】的自动化流程已执行，但写入完成标记失败。下次可能会重复执行。", task_category=task_cat)
 
-        try:
-            with id_map_update_lock:
-                setattr(main_module, 'id_map_update_request_time', time.time())
-            ui_logger.info(f"🔔【ID映射调度器】已成功发送ID映射表更新请求，静默期计时器已重置。", task_category=task_cat)
-        except Exception as e:
-            ui_logger.error(f"❌【Webhook任务】发送ID映射表更新请求时发生未知错误: {e}", task_category=task_cat, exc_info=True)
\ No newline at end of file
+        # 刮削完成后 ProviderIds 可能已变化，交由 ID 映射调度器增量刷新该条目
+        id_map_service.mark_dirty([item_id])
+        ui_logger.info(f"🔔【ID映射调度器】已标记该媒体的 ID 映射待刷新。", task_category=task_cat)
\ No newline at end of file
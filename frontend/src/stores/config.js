@@ -21,6 +21,8 @@ export const useConfigStore = defineStore('config', () => {
       translator_engine: "baidu",
       api_cooldown_enabled: true,
       api_cooldown_time: 0.2,
+      translation_memory_enabled: true,
+      translation_memory_per_title: true,
       person_limit: 15,
       tencent_config: { secret_id: '', secret_key: '', region: 'ap-guangzhou' },
       siliconflow_config: { api_key: '', model_name: 'Qwen/Qwen2-7B-Instruct', model_remarks: {} }
@@ -46,7 +48,8 @@ export const useConfigStore = defineStore('config', () => {
     webhook_config: {
       enabled: false,
       initial_wait_time: 30,
-      plugin_wait_time: 60
+      plugin_wait_time: 60,
+      max_concurrent_items: 3
     },
     episode_refresher_config: {
       refresh_mode: 'emby',
@@ -176,7 +179,7 @@ export const useConfigStore = defineStore('config', () => {
         }
 
         if (!fullConfig.webhook_config) {
-          fullConfig.webhook_config = { enabled: false, initial_wait_time: 30, plugin_wait_time: 60 };
+          fullConfig.webhook_config = { enabled: false, initial_wait_time: 30, plugin_wait_time: 60, max_concurrent_items: 3 };
         }
         
         if (!fullConfig.episode_refresher_config) {
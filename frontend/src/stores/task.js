@@ -16,6 +16,8 @@ export const useTaskStore = defineStore('task', () => {
   const isConnected = ref(false)
   let ws = null
   let reconnectTimer = null
+  // 按顺序应用推送消息，避免异步拉取结果时后到的消息先生效
+  let applyChain = Promise.resolve()
 
   const showMessage = (type, message) => {
     ElMessage({ message, type, showClose: true, duration: 3000 })
@@ -30,7 +32,10 @@ export const useTaskStore = defineStore('task', () => {
       console.log("任务 WebSocket 已连接")
       if (reconnectTimer) { clearTimeout(reconnectTimer); reconnectTimer = null; }
     }
-    ws.onmessage = (event) => { tasks.value = JSON.parse(event.data) }
+    ws.onmessage = (event) => {
+      const message = JSON.parse(event.data)
+      applyChain = applyChain.then(() => applyMessage(message)).catch(error => console.error("处理任务推送失败:", error))
+    }
     ws.onclose = () => {
       isConnected.value = false
       console.log("任务 WebSocket 已断开")
@@ -39,6 +44,38 @@ export const useTaskStore = defineStore('task', () => {
     ws.onerror = (error) => { isConnected.value = false; console.error("任务 WebSocket 错误:", error) }
   }
 
+  async function fetchTaskResult(taskId) {
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/tasks/${taskId}/result`)
+      if (!response.ok) return null
+      const data = await response.json()
+      return data.result
+    } catch (error) {
+      console.error("获取任务结果失败:", error)
+      return null
+    }
+  }
+
+  // 后端推送的是不含 result 的任务摘要：snapshot 为全量，delta 只包含变化的任务和已移除的任务ID。
+  // result_version 变化时再按需拉取结果，保证任务进入最终状态时 result 已就绪。
+  async function applyMessage(message) {
+    const previousTasks = new Map(tasks.value.map(t => [t.id, t]))
+    const nextTasks = message.type === 'snapshot' ? new Map() : new Map(previousTasks)
+    ;(message.removed || []).forEach(id => nextTasks.delete(id))
+
+    for (const summary of message.tasks || []) {
+      const previous = previousTasks.get(summary.id)
+      let result = null
+      if (summary.has_result) {
+        result = (previous && previous.result_version === summary.result_version)
+          ? previous.result
+          : await fetchTaskResult(summary.id)
+      }
+      nextTasks.set(summary.id, { ...summary, result })
+    }
+    tasks.value = Array.from(nextTasks.values())
+  }
+
   function disconnect() {
     if (reconnectTimer) { clearTimeout(reconnectTimer); reconnectTimer = null; }
     if (ws) { ws.onclose = null; ws.close(); ws = null; isConnected.value = false; console.log("任务 WebSocket 已手动断开") }
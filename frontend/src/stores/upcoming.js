@@ -7,6 +7,9 @@ import { API_BASE_URL } from '@/config/apiConfig';
 import { GENRE_MAP, COUNTRY_MAP, LANGUAGE_MAP, mapToOptions } from '@/config/filterConstants';
 import _ from 'lodash';
 
+// 刷新列表期间拉取部分结果的间隔
+const PARTIAL_POLL_INTERVAL_MS = 3000;
+
 export const useUpcomingStore = defineStore('upcoming', () => {
   // --- State ---
   const config = ref({
@@ -171,6 +174,22 @@ export const useUpcomingStore = defineStore('upcoming', () => {
 
     isListLoading.value = true;
     allData.value = [];
+    // 刷新期间后端按批写入数据库，定时拉取已补全的部分结果，无需等待整个列表完成
+    let listSettled = false;
+    const partialPoller = setInterval(async () => {
+      try {
+        const partialResponse = await fetch(`${API_BASE_URL}/api/upcoming/data?quiet=true`);
+        if (partialResponse.ok && !listSettled) {
+          const partialData = await partialResponse.json();
+          // 等待响应体期间完整列表可能已返回，此时丢弃过期的部分结果
+          if (!listSettled) {
+            allData.value = partialData;
+          }
+        }
+      } catch (error) {
+        // 轮询失败不影响主请求，忽略即可
+      }
+    }, PARTIAL_POLL_INTERVAL_MS);
     try {
       let payload = {};
       if (useDefaults) {
@@ -193,6 +212,7 @@ export const useUpcomingStore = defineStore('upcoming', () => {
       });
       const data = await response.json();
       if (!response.ok) throw new Error(data.detail || '获取列表失败');
+      listSettled = true;
       allData.value = data;
       
       // 强制刷新后，更新快照
@@ -202,6 +222,8 @@ export const useUpcomingStore = defineStore('upcoming', () => {
     } catch (error) {
       showMessage('error', error.message);
     } finally {
+      listSettled = true;
+      clearInterval(partialPoller);
       isListLoading.value = false;
     }
   }